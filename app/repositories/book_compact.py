@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import sys
+from typing import Any, Dict
+
+# 同じ値になりやすいテキストフィールド（抽出直後は src_text と同じ、自動翻訳後は trans_auto == trans_text など）
+TEXT_FIELDS = ("src_text", "src_joined", "src_replaced", "trans_auto", "trans_text")
+# 値の種類が少ないフィールド（全ブックで1つの文字列オブジェクトを使う）
+_INTERN_FIELDS = ("trans_status", "block_tag", "base_style", "paragraph_style")
+
+
+def share_book_strings(book_data: Dict[str, Any]) -> int:
+    """book_data の段落の文字列を重複なく持つようにする。共有に切り替えた値の数を返す。
+
+    JSON から読み込むと、同じ内容のフィールドでもそれぞれ別の文字列オブジェクトになる。
+    段落内で等しいテキストフィールドは1つのオブジェクトを指すようにし、id は paragraphs のキーと、
+    状態・タグ・スタイル名は sys.intern で共有する。値も dict/list の形も変えないので、呼び出し側はそのまま使える。
+    """
+    shared = 0
+    styles = book_data.get("styles")
+    if isinstance(styles, dict):
+        book_data["styles"] = {sys.intern(k) if isinstance(k, str) else k: v for k, v in styles.items()}
+    for page in (book_data.get("pages") or {}).values():
+        paragraphs = (page or {}).get("paragraphs") if isinstance(page, dict) else None
+        if not isinstance(paragraphs, dict):
+            continue
+        for pid, p in paragraphs.items():
+            if not isinstance(p, dict):
+                continue
+            if p.get("id") == pid and p["id"] is not pid:
+                p["id"] = pid
+                shared += 1
+            seen: Dict[str, str] = {}
+            for name in TEXT_FIELDS:
+                value = p.get(name)
+                if not isinstance(value, str) or not value:
+                    continue
+                first = seen.setdefault(value, value)
+                if first is not value:
+                    p[name] = first
+                    shared += 1
+            for name in _INTERN_FIELDS:
+                value = p.get(name)
+                if isinstance(value, str) and value:
+                    interned = sys.intern(value)
+                    if interned is not value:
+                        p[name] = interned
+                        shared += 1
+    return shared
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Optional
+
+# book JSON の形式
+# - 2.0.0: 段落ごとに全フィールドを持つ（メモリ上の book_data は常にこの形）
+# - 3.0.0: 元のフィールドと同じ値の派生フィールドを省略して保存する。読み込み時に元の値で埋め直す
+BOOK_VERSION_V2 = "2.0.0"
+BOOK_VERSION_V3 = "3.0.0"
+
+# (派生フィールド, 元のフィールド)。この順に埋め直すので、元のフィールドが省略されていてもよい
+DERIVED_FIELDS = (
+    ("src_joined", "src_text"),
+    ("src_replaced", "src_joined"),
+    ("trans_auto", "src_replaced"),
+    ("trans_text", "trans_auto"),
+)
+
+
+def write_version() -> str:
+    """保存時に使う形式（環境変数 BOOK_FORMAT=3 なら 3.0.0、それ以外は 2.0.0）。"""
+    return BOOK_VERSION_V3 if os.getenv("BOOK_FORMAT", "2").strip() in ("3", BOOK_VERSION_V3) else BOOK_VERSION_V2
+
+
+def _single_span_html(p: Dict[str, Any]) -> Optional[str]:
+    # スタイルが1つだけの段落の src_html（parapara_blocks_to_paragraphs.create_paragraph が作るもの）
+    style = p.get("base_style")
+    text = p.get("src_text")
+    if not style or not isinstance(text, str):
+        return None
+    return f'<span class="{style}">{text}</span>'
+
+
+def encode_paragraph(p: Dict[str, Any]) -> Dict[str, Any]:
+    """3.0.0 で保存する段落を返す（p は変更しない）。"""
+    omit = set()
+    for name, source in DERIVED_FIELDS:
+        if name in p and source in p and p[name] == p[source]:
+            omit.add(name)
+    if "src_html" in p and p["src_html"] == _single_span_html(p):
+        omit.add("src_html")
+    if not omit:
+        return p
+    return {k: v for k, v in p.items() if k not in omit}
+
+
+def decode_paragraph(p: Dict[str, Any]) -> None:
+    """3.0.0 の段落で省略されたフィールドを埋め直す（p をそのまま書き換える）。"""
+    if "src_html" not in p:
+        html = _single_span_html(p)
+        if html is not None:
+            p["src_html"] = html
+    for name, source in DERIVED_FIELDS:
+        if name not in p and source in p:
+            p[name] = p[source]
+
+
+def encode_page(page: Any) -> Any:
+    if not isinstance(page, dict) or not isinstance(page.get("paragraphs"), dict):
+        return page
+    encoded = dict(page)
+    encoded["paragraphs"] = {
+        pid: encode_paragraph(p) if isinstance(p, dict) else p for pid, p in page["paragraphs"].items()
+    }
+    return encoded
+
+
+def decode_page(page: Any) -> None:
+    if not isinstance(page, dict) or not isinstance(page.get("paragraphs"), dict):
+        return
+    for p in page["paragraphs"].values():
+        if isinstance(p, dict):
+            decode_paragraph(p)
+
+
+def is_v3(data: Any) -> bool:
+    return isinstance(data, dict) and data.get("version") == BOOK_VERSION_V3
+
+
+def encode_book(data: Any, version: Optional[str] = None) -> Any:
+    """保存用の book_data を返す。version（省略時は write_version()）が 3.0.0 なら派生フィールドを省く。
+
+    data の段落は書き換えない（3.0.0 ならページと段落を浅くコピーする。読み込んだままの 3.0.0 だけは先に埋め直す）。
+    2.0.0 で保存するなら data をそのまま返す。
+    """
+    if not isinstance(data, dict) or data.get("version") not in (BOOK_VERSION_V2, BOOK_VERSION_V3):
+        return data
+    # 読み込んだままの 3.0.0 が渡されたら、先に埋め直す
+    decode_book(data)
+    version = version or write_version()
+    if version != BOOK_VERSION_V3:
+        return data
+    encoded = dict(data, version=BOOK_VERSION_V3)
+    if isinstance(data.get("pages"), dict):
+        encoded["pages"] = {key: encode_page(page) for key, page in data["pages"].items()}
+    return encoded
+
+
+def decode_book(data: Any) -> Any:
+    """読み込んだ book_data を 2.0.0 の形にする（3.0.0 なら埋め直し、それ以外はそのまま）。"""
+    if not is_v3(data):
+        return data
+    for page in (data.get("pages") or {}).values():
+        decode_page(page)
+    data["version"] = BOOK_VERSION_V2
+    return data
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import datetime
+import os
+from typing import Any, Dict, Iterable, List
+
+from app.repositories.json_repo import dumps, loads
+
+JOURNAL_SUFFIX = ".journal"
+
+
+def journal_path(json_path: str) -> str:
+    return json_path + JOURNAL_SUFFIX
+
+
+def paragraph_patch(page_key: Any, para_id: Any, paragraph: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """段落の指定フィールドの現在値をパッチにする（段落に無いフィールドは unset 扱い）。"""
+    set_fields: Dict[str, Any] = {}
+    unset: List[str] = []
+    for name in fields:
+        if name in paragraph:
+            set_fields[name] = paragraph[name]
+        else:
+            unset.append(name)
+    patch: Dict[str, Any] = {"page": str(page_key), "id": str(para_id), "set": set_fields}
+    if unset:
+        patch["unset"] = unset
+    return patch
+
+
+def book_patch(book_data: Dict[str, Any], fields: Iterable[str]) -> Dict[str, Any]:
+    """title / trans_status_counts などブック直下のフィールドのパッチ。"""
+    return {"book": {name: book_data.get(name) for name in fields}}
+
+
+def append_patches(json_path: str, patches: List[Dict[str, Any]]) -> None:
+    """パッチをジャーナルへ追記して fsync する（1行1レコードの JSON Lines）。"""
+    if not patches:
+        return
+    ts = datetime.datetime.now().isoformat()
+    lines = []
+    for patch in patches:
+        record = dict(patch)
+        record.setdefault("ts", ts)
+        lines.append(dumps(record))
+    with open(journal_path(json_path), "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_patches(json_path: str) -> List[Dict[str, Any]]:
+    """ジャーナルを読み込む。書き込み途中で落ちた末尾の壊れた行は捨てる。"""
+    path = journal_path(json_path)
+    if not os.path.isfile(path):
+        return []
+    patches: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                patches.append(record)
+    return patches
+
+
+def apply_patches(book_data: Dict[str, Any], patches: Iterable[Dict[str, Any]]) -> int:
+    """パッチを順に book_data へ適用し、適用できた件数を返す。"""
+    applied = 0
+    pages = book_data.get("pages", {}) or {}
+    for patch in patches:
+        book_fields = patch.get("book")
+        if isinstance(book_fields, dict):
+            book_data.update(book_fields)
+            applied += 1
+            continue
+        page = pages.get(str(patch.get("page")))
+        paragraphs = (page or {}).get("paragraphs", {}) or {}
+        paragraph = paragraphs.get(str(patch.get("id")))
+        if not isinstance(paragraph, dict):
+            continue
+        paragraph.update(patch.get("set") or {})
+        for name in patch.get("unset") or []:
+            paragraph.pop(name, None)
+        applied += 1
+    return applied
+
+
+def discard_journal(json_path: str) -> None:
+    try:
+        os.remove(journal_path(json_path))
+    except FileNotFoundError:
+        pass
+
+
+def has_journal(json_path: str) -> bool:
+    return os.path.isfile(journal_path(json_path))
+
@@ -0,0 +1,497 @@
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.repositories.book_format import (
+    BOOK_VERSION_V2,
+    BOOK_VERSION_V3,
+    decode_book,
+    encode_book,
+    encode_page,
+    write_version,
+)
+from app.repositories.book_journal import (
+    JOURNAL_SUFFIX,
+    append_patches,
+    apply_patches,
+    discard_journal,
+    has_journal,
+    journal_path,
+    read_patches,
+)
+from app.repositories.book_sidecar import (
+    discard_sidecar,
+    move_sidecar,
+    read_sidecar,
+    sidecar_enabled,
+    source_signature,
+    worth_caching,
+    write_sidecar,
+)
+from app.repositories.json_repo import dumps, load_json, save_json_atomic, write_indent
+
+# パッチがこの件数を超える変更は、ジャーナルに積むより全体を書き直した方が速い
+MAX_JOURNAL_PATCHES = 2000
+
+# シャード形式: <base>.json はマニフェスト（pages 以外の項目 + page_keys）だけを持ち、
+# 各ページは <base>.pages/<page_key>.json に分割して保存する
+SHARD_DIR_SUFFIX = ".pages"
+STORAGE_SHARDED = "sharded"
+_MANIFEST_ONLY_KEYS = ("storage", "page_keys")
+
+BookSignature = Tuple[int, int, int, int]
+
+_journal_locks: Dict[str, threading.RLock] = {}
+_journal_locks_guard = threading.Lock()
+
+
+def journal_lock(json_path: str) -> threading.RLock:
+    """本体 JSON とジャーナルの読み書きを直列化するロック（同じパスには常に同じロック）。"""
+    key = os.path.normcase(os.path.abspath(json_path))
+    with _journal_locks_guard:
+        lock = _journal_locks.get(key)
+        if lock is None:
+            lock = threading.RLock()
+            _journal_locks[key] = lock
+        return lock
+
+
+def book_signature(json_path: str) -> Optional[BookSignature]:
+    """本体とジャーナルの (mtime_ns, size) をまとめた値。本体が無ければ None。
+
+    ジャーナルへの追記でも値が変わるので、キャッシュの検証に使える。
+    """
+    try:
+        st = os.stat(json_path)
+    except OSError:
+        return None
+    try:
+        jst = os.stat(journal_path(json_path))
+        journal = (jst.st_mtime_ns, jst.st_size)
+    except OSError:
+        journal = (0, 0)
+    return (st.st_mtime_ns, st.st_size) + journal
+
+
+def journal_size(json_path: str) -> int:
+    try:
+        return os.path.getsize(journal_path(json_path))
+    except OSError:
+        return 0
+
+
+def shard_dir(json_path: str) -> str:
+    base = json_path[: -len(".json")] if json_path.endswith(".json") else json_path
+    return base + SHARD_DIR_SUFFIX
+
+
+def shard_path(json_path: str, page_key: Any) -> str:
+    return os.path.join(shard_dir(json_path), f"{page_key}.json")
+
+
+def _is_manifest(data: Any) -> bool:
+    return isinstance(data, dict) and data.get("storage") == STORAGE_SHARDED
+
+
+def _target_version(data: Dict[str, Any], version: Optional[str] = None) -> Optional[str]:
+    """保存時の形式（省略時は write_version()）。book の形式（2.0.0 / 3.0.0）でないデータは None（そのまま書く）。"""
+    if data.get("version") not in (BOOK_VERSION_V2, BOOK_VERSION_V3):
+        return None
+    return version or write_version()
+
+
+def is_sharded(json_path: str) -> bool:
+    """シャード形式で保存されたブックか（シャードフォルダが無ければマニフェストは読まない）。"""
+    if not os.path.isdir(shard_dir(json_path)):
+        return False
+    try:
+        return _is_manifest(load_json(json_path))
+    except (OSError, ValueError):
+        return False
+
+
+def _book_from_manifest(json_path: str, manifest: Dict[str, Any], page_keys: Optional[List[str]]) -> Dict[str, Any]:
+    """マニフェストから book_data を組み立てる。page_keys が None なら全ページを読む。"""
+    data = {k: v for k, v in manifest.items() if k not in _MANIFEST_ONLY_KEYS}
+    keys = [str(k) for k in (manifest.get("page_keys") or [])]
+    if page_keys is not None:
+        wanted = set(page_keys)
+        keys = [k for k in keys if k in wanted]
+    pages: Dict[str, Any] = {}
+    for key in keys:
+        path = shard_path(json_path, key)
+        if os.path.isfile(path):
+            pages[key] = load_json(path)
+    data["pages"] = pages
+    return data
+
+
+def _save_sharded(
+    json_path: str,
+    data: Dict[str, Any],
+    page_keys: List[str],
+    write_keys: Optional[Iterable[str]],
+    indent: Optional[int],
+    version: Optional[str] = None,
+) -> None:
+    """シャードを書いてからマニフェストを置き換える。write_keys が None なら全ページを書き直す。"""
+    pages = data.get("pages") or {}
+    version = _target_version(data, version)
+    directory = shard_dir(json_path)
+    os.makedirs(directory, exist_ok=True)
+    keys_to_write = [str(k) for k in pages] if write_keys is None else [str(k) for k in write_keys]
+    for key in keys_to_write:
+        page = pages.get(key)
+        if page is not None:
+            if version == BOOK_VERSION_V3:
+                page = encode_page(page)
+            save_json_atomic(shard_path(json_path, key), page, indent=indent)
+    if write_keys is None:
+        # 全体保存ではページ構成が変わり得るので、使われなくなったシャードを消す
+        live = {f"{k}.json" for k in page_keys}
+        for name in os.listdir(directory):
+            if name.endswith(".json") and name not in live:
+                os.remove(os.path.join(directory, name))
+    manifest = {k: v for k, v in data.items() if k != "pages"}
+    if version is not None:
+        manifest["version"] = version
+    manifest["storage"] = STORAGE_SHARDED
+    manifest["page_keys"] = page_keys
+    save_json_atomic(json_path, manifest, indent=indent)
+
+
+def _same_format(manifest: Dict[str, Any]) -> bool:
+    """シャードの形式が保存時の形式と同じか（違えば一部のシャードだけを書き直すことはできない）。"""
+    version = _target_version(manifest)
+    return version is None or manifest.get("version") == version
+
+
+def _discard_derived(json_path: str) -> None:
+    # 本体を書き直したあとに呼ぶ。ジャーナルは data に含まれ、サイドカーは元ファイルと一致しなくなる
+    discard_journal(json_path)
+    discard_sidecar(json_path)
+
+
+def _load_base(json_path: str) -> Any:
+    """ジャーナル適用前の book_data（2.0.0 の形）を返す。呼び出し側で journal_lock を取っていること。
+
+    サイドカー（book_sidecar）が本体・シャードと一致すればそちらを読み、一致しなければ JSON から読んで作り直す。
+    """
+    signature = None
+    if sidecar_enabled():
+        signature = source_signature(json_path, shard_dir(json_path) if os.path.isdir(shard_dir(json_path)) else None)
+        if signature is not None and worth_caching(signature):
+            data = read_sidecar(json_path, signature)
+            if data is not None:
+                return data
+        else:
+            # 小さくなったブックなど。前に作ったサイドカーが残っていれば消す
+            discard_sidecar(json_path)
+            signature = None
+    data = load_json(json_path)
+    if _is_manifest(data):
+        data = _book_from_manifest(json_path, data, None)
+    decode_book(data)
+    if signature is not None and isinstance(data, dict) and data.get("version") == BOOK_VERSION_V2:
+        write_sidecar(json_path, signature, data)
+    return data
+
+
+def load_book(json_path: str) -> Any:
+    """book JSON を読み込み、未畳み込みのジャーナルがあれば再生した状態で返す。
+
+    シャード形式の場合は全ページを読み込んで従来と同じ形の book_data を組み立てる。
+    """
+    with journal_lock(json_path):
+        data = _load_base(json_path)
+        if has_journal(json_path):
+            apply_patches(data, read_patches(json_path))
+        return data
+
+
+def load_book_page(json_path: str, page_key: Any) -> Any:
+    """指定ページだけを含む book_data を返す（シャード形式以外は全体を読む）。"""
+    with journal_lock(json_path):
+        data = load_json(json_path)
+        if _is_manifest(data):
+            data = _book_from_manifest(json_path, data, [str(page_key)])
+        decode_book(data)
+        if has_journal(json_path):
+            # 他ページ宛てのパッチは対象ページが無いので読み飛ばされる
+            apply_patches(data, read_patches(json_path))
+        return data
+
+
+def load_book_meta(json_path: str) -> Any:
+    """pages 以外の項目を返す（シャード形式ならマニフェストだけを読む）。"""
+    with journal_lock(json_path):
+        data = load_json(json_path)
+        if _is_manifest(data):
+            data = _book_from_manifest(json_path, data, [])
+        decode_book(data)
+        if has_journal(json_path):
+            apply_patches(data, read_patches(json_path))
+        return data
+
+
+def save_book(json_path: str, data: Any, *, indent: int = 2, version: Optional[str] = None) -> None:
+    """book JSON 全体をアトミックに保存する（ジャーナルの内容は data に含まれている前提で破棄）。
+
+    既にシャード形式のブックはシャード形式のまま保存する。
+    形式（2.0.0 / 3.0.0）は version で指定する。省略時は環境変数 BOOK_FORMAT に従う（book_format.write_version）。
+    """
+    with journal_lock(json_path):
+        if is_sharded(json_path):
+            page_keys = [str(k) for k in (data.get("pages") or {})]
+            _save_sharded(json_path, data, page_keys, None, indent, version)
+        else:
+            save_json_atomic(json_path, encode_book(data, version), indent=indent)
+        _discard_derived(json_path)
+
+
+def save_book_pages(json_path: str, data: Any, page_keys: Iterable[Any], *, indent: int = 2) -> None:
+    """ページを差し替えた book_data を保存する。シャード形式なら page_keys のシャードとマニフェストだけを書く。
+
+    未畳み込みのジャーナルが触れているページも一緒に書く（data にはジャーナルの内容が含まれている前提で破棄する）。
+    1ファイル形式は save_book() と同じく全体を書く。
+    """
+    with journal_lock(json_path):
+        if not is_sharded(json_path) or not _same_format(load_json(json_path)):
+            save_book(json_path, data, indent=indent)
+            return
+        touched = {str(k) for k in page_keys}
+        touched.update(str(p["page"]) for p in read_patches(json_path) if "page" in p)
+        all_keys = [str(k) for k in (data.get("pages") or {})]
+        _save_sharded(json_path, data, all_keys, sorted(touched), indent)
+        _discard_derived(json_path)
+
+
+def _indent_json(value: Any, indent: Optional[int], level: int) -> str:
+    # dumps(..., indent=indent) の結果を level 段の深さに置いたときの文字列（JSON の文字列は改行を含まない）
+    text = dumps(value, indent=indent)
+    return text if indent is None else text.replace("\n", "\n" + " " * (indent * level))
+
+
+def _sibling_shard_dir(directory: str, tag: str) -> str:
+    # 一覧などで読み飛ばされるよう、名前はシャードフォルダと同じ SHARD_DIR_SUFFIX で終える
+    base = os.path.basename(directory)[: -len(SHARD_DIR_SUFFIX)]
+    return tempfile.mkdtemp(dir=os.path.dirname(directory) or ".", prefix=f"{base}.{tag}-", suffix=SHARD_DIR_SUFFIX)
+
+
+class BookStreamWriter:
+    """book JSON を1ページずつ書き出す。全ページを book_data に溜めずに保存したい場合（抽出など）に使う。
+
+    - head の項目 → "pages"（write_page() の順）→ close() に渡した tail の項目、の順に書く
+    - 一時ファイルに書いてから close() で置き換える。途中で例外が出たら（with を抜けたら）元のファイルは残る
+    - 既にシャード形式のブックはシャード形式のまま書く。シャードは隣の一時フォルダに書き、close() でシャードフォルダと
+      入れ替えてからマニフェストを書く（途中で例外が出たら一時フォルダを消し、元のシャードとマニフェストは残る）
+    - save_book() と同じく、置き換えたときにジャーナルは破棄する
+    - JSON_COMPACT=1 なら改行・空白なしで書く（save_json_atomic() と同じ）
+    """
+
+    def __init__(self, json_path: str, head: Dict[str, Any], *, indent: int = 2) -> None:
+        self.json_path = json_path
+        self.indent = write_indent(indent)
+        self._head = dict(head)
+        self._v3 = False
+        if self._head.get("version") in (BOOK_VERSION_V2, BOOK_VERSION_V3):
+            self._head["version"] = write_version()
+            self._v3 = self._head["version"] == BOOK_VERSION_V3
+        self._page_keys: List[str] = []
+        self._sharded = is_sharded(json_path)
+        self._file = None
+        self._tmp_path: Optional[str] = None
+        self._tmp_shard_dir: Optional[str] = None
+        if self._sharded:
+            directory = shard_dir(json_path)
+            self._tmp_shard_dir = _sibling_shard_dir(directory, "tmp")
+            return
+        tmp_fd, self._tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path) or ".", suffix=".tmp", text=True)
+        self._file = os.fdopen(tmp_fd, "w", encoding="utf-8")
+        self._file.write("{")
+        for key, value in self._head.items():
+            self._file.write(f"{self._item(key, value, 1)},")
+        self._file.write(f"{self._newline(1)}\"pages\":{self._space()}")
+
+    def _newline(self, level: int) -> str:
+        return "" if self.indent is None else "\n" + " " * (self.indent * level)
+
+    def _space(self) -> str:
+        return "" if self.indent is None else " "
+
+    def _item(self, key: Any, value: Any, level: int) -> str:
+        return f"{self._newline(level)}{dumps(str(key))}:{self._space()}{_indent_json(value, self.indent, level)}"
+
+    def write_page(self, page_key: Any, page: Any) -> None:
+        key = str(page_key)
+        if self._v3:
+            page = encode_page(page)
+        if self._sharded:
+            save_json_atomic(os.path.join(self._tmp_shard_dir, f"{key}.json"), page, indent=self.indent)
+        else:
+            self._file.write("{" if not self._page_keys else ",")
+            self._file.write(self._item(key, page, 2))
+        self._page_keys.append(key)
+
+    def close(self, tail: Optional[Dict[str, Any]] = None) -> None:
+        """tail の項目を書き足して保存を確定する。"""
+        tail = dict(tail or {})
+        with journal_lock(self.json_path):
+            if self._sharded:
+                # 書き終えたシャードのフォルダと入れ替える（古いフォルダは一度よけてから消す）
+                directory = shard_dir(self.json_path)
+                old_dir = None
+                if os.path.isdir(directory):
+                    old_dir = _sibling_shard_dir(directory, "old")
+                    os.replace(directory, os.path.join(old_dir, "pages"))
+                os.replace(self._tmp_shard_dir, directory)
+                self._tmp_shard_dir = None
+                manifest = dict(self._head)
+                manifest.update(tail)
+                manifest["storage"] = STORAGE_SHARDED
+                manifest["page_keys"] = self._page_keys
+                save_json_atomic(self.json_path, manifest, indent=self.indent)
+                if old_dir is not None:
+                    shutil.rmtree(old_dir, ignore_errors=True)
+            else:
+                self._file.write(f"{self._newline(1)}}}" if self._page_keys else "{}")
+                for key, value in tail.items():
+                    self._file.write(f",{self._item(key, value, 1)}")
+                self._file.write(f"{self._newline(0)}}}")
+                self._file.close()
+                self._file = None
+                os.replace(self._tmp_path, self.json_path)
+                self._tmp_path = None
+            _discard_derived(self.json_path)
+
+    def abort(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._tmp_path is not None:
+            try:
+                os.remove(self._tmp_path)
+            except OSError:
+                pass
+            self._tmp_path = None
+        if self._tmp_shard_dir is not None:
+            shutil.rmtree(self._tmp_shard_dir, ignore_errors=True)
+            self._tmp_shard_dir = None
+
+    def __enter__(self) -> "BookStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # close() されずに抜けた（例外など）場合は一時ファイル・一時フォルダを消す
+        self.abort()
+
+
+def append_book_patches(json_path: str, patches: List[Dict[str, Any]]) -> None:
+    """段落単位のパッチをジャーナルへ追記する。本体は書き換えない。"""
+    if not patches:
+        return
+    with journal_lock(json_path):
+        append_patches(json_path, patches)
+
+
+def save_book_changes(json_path: str, data: Any, patches: List[Dict[str, Any]]) -> None:
+    """変更分のパッチをジャーナルへ追記する。パッチが多すぎる場合は全体を保存する。"""
+    if len(patches) > MAX_JOURNAL_PATCHES:
+        save_book(json_path, data)
+    else:
+        append_book_patches(json_path, patches)
+
+
+def compact_book(json_path: str) -> int:
+    """ジャーナルを本体 JSON に畳み込む。畳み込んだパッチ件数を返す（ジャーナルが無ければ 0）。
+
+    シャード形式の場合は、パッチが触れたページのシャードとマニフェストだけを書き直す。
+    """
+    with journal_lock(json_path):
+        if not has_journal(json_path):
+            return 0
+        patches = read_patches(json_path)
+        data = load_json(json_path)
+        if not _is_manifest(data):
+            decode_book(data)
+            applied = apply_patches(data, patches)
+            save_book(json_path, data)
+            return applied
+        page_keys = [str(k) for k in (data.get("page_keys") or [])]
+        # 形式を切り替えるときは全ページを書き直す
+        touched = sorted({str(p["page"]) for p in patches if "page" in p}) if _same_format(data) else None
+        book_data = decode_book(_book_from_manifest(json_path, data, touched))
+        applied = apply_patches(book_data, patches)
+        _save_sharded(json_path, book_data, page_keys, touched, 2)
+        _discard_derived(json_path)
+        return applied
+
+
+def shard_book(json_path: str) -> bool:
+    """1ファイル形式のブックをシャード形式に変換する。変換した場合は True。"""
+    with journal_lock(json_path):
+        data = load_json(json_path)
+        if _is_manifest(data):
+            return False
+        decode_book(data)
+        if has_journal(json_path):
+            apply_patches(data, read_patches(json_path))
+        page_keys = [str(k) for k in (data.get("pages") or {})]
+        # シャードを全部書き終えてからマニフェストで置き換えるので、途中で落ちても元の JSON が残る
+        _save_sharded(json_path, data, page_keys, None, 2)
+        _discard_derived(json_path)
+        return True
+
+
+def unshard_book(json_path: str) -> bool:
+    """シャード形式のブックを1ファイル形式に戻す。変換した場合は True。"""
+    with journal_lock(json_path):
+        if not is_sharded(json_path):
+            return False
+        data = load_book(json_path)
+        save_json_atomic(json_path, encode_book(data))
+        _discard_derived(json_path)
+        shutil.rmtree(shard_dir(json_path), ignore_errors=True)
+        return True
+
+
+def move_book(src_json_path: str, dest_json_path: str) -> None:
+    """ブック本体とシャードフォルダ・ジャーナルをまとめて移動する。"""
+    with journal_lock(src_json_path), journal_lock(dest_json_path):
+        os.replace(src_json_path, dest_json_path)
+        move_sidecar(src_json_path, dest_json_path)
+        if os.path.isdir(shard_dir(src_json_path)):
+            os.replace(shard_dir(src_json_path), shard_dir(dest_json_path))
+        if has_journal(src_json_path):
+            os.replace(journal_path(src_json_path), journal_path(dest_json_path))
+
+
+def recover_journals(root_dir: str, *, should_skip_dir: Optional[Callable[[str], bool]] = None) -> int:
+    """root_dir 配下に残ったジャーナル（未反映の編集）を本体 JSON に畳み込む。
+
+    異常終了などでコンパクション前に落ちた場合に、起動時に呼び出す。
+    戻り値は復元したブック数。
+    """
+    recovered = 0
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        if should_skip_dir is not None:
+            dirnames[:] = [d for d in dirnames if not should_skip_dir(d)]
+        for name in filenames:
+            if not name.endswith(JOURNAL_SUFFIX):
+                continue
+            json_path = os.path.join(dirpath, name[: -len(JOURNAL_SUFFIX)])
+            if not os.path.isfile(json_path):
+                print(f"ジャーナルに対応するJSONがありません: {json_path}")
+                continue
+            try:
+                applied = compact_book(json_path)
+            except Exception as e:
+                print(f"ジャーナルの復元に失敗しました: {json_path}: {e}")
+                continue
+            recovered += 1
+            print(f"未反映の編集を復元しました: {json_path} ({applied}件)")
+    return recovered
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import os
+import pickle
+import secrets
+import struct
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+# 読み込んだ book_data（2.0.0 の形、ジャーナル適用前）を <json>.cache に pickle で保存しておき、
+# 次にキャッシュが空の状態で開くとき（サーバー再起動後など）は JSON を解析せずにこちらを読む
+# - ファイルの先頭に、作ったときの元ファイル（本体 JSON とシャード）の (mtime_ns, size) を JSON で書いておき、一致するときだけ使う
+# - 一致しなければ JSON から読み、その内容で作り直す（ファイルへの書き込みはバックグラウンド）
+# - pickle は読み込むだけでコードを実行できるので、この環境の鍵（data フォルダの外に置く）による HMAC が
+#   一致するときだけ unpickle する。鍵が設定されていなければサイドカーは使わない
+#
+# ファイルの形式: MAGIC | HMAC-SHA256(32バイト) | ヘッダの長さ(4バイト) | ヘッダ(JSON) | pickle
+# HMAC はヘッダの長さ以降のすべてに対して計算する
+SIDECAR_SUFFIX = ".cache"
+SIDECAR_VERSION = 2
+_MAGIC = b"PPTCACHE"
+_MAC_SIZE = hashlib.sha256().digest_size
+_KEY_SIZE = 32
+
+SourceSignature = Tuple[Tuple[str, int, int], ...]
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "errors": 0}
+
+_key_lock = threading.Lock()
+_key_path: Optional[str] = None
+_key: Optional[bytes] = None
+
+
+def configure_sidecar_key(path: str) -> None:
+    """HMAC の鍵ファイルの場所を設定する（無ければ最初に使うときに作る）。data フォルダの外を指定すること。"""
+    global _key_path, _key
+    with _key_lock:
+        _key_path = os.path.abspath(path)
+        _key = None
+
+
+def _load_key() -> Optional[bytes]:
+    global _key
+    with _key_lock:
+        if _key is not None or _key_path is None:
+            return _key
+        try:
+            os.makedirs(os.path.dirname(_key_path), exist_ok=True)
+            try:
+                fd = os.open(_key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                with open(_key_path, "rb") as f:
+                    key = f.read()
+            else:
+                key = secrets.token_bytes(_KEY_SIZE)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(key)
+        except OSError as e:
+            print(f"ブックのキャッシュの鍵を用意できませんでした: {_key_path}: {e}")
+            return None
+        if len(key) != _KEY_SIZE:
+            # 別のプロセスが書き込み中か、壊れている。次に呼ばれたときに読み直す
+            print(f"ブックのキャッシュの鍵が不正です: {_key_path}")
+            return None
+        _key = key
+        return _key
+
+
+def sidecar_path(json_path: str) -> str:
+    return json_path + SIDECAR_SUFFIX
+
+
+def sidecar_enabled() -> bool:
+    return os.getenv("BOOK_SIDECAR", "1").strip() != "0" and _load_key() is not None
+
+
+def _min_bytes() -> int:
+    value = os.getenv("BOOK_SIDECAR_MIN_BYTES", "").strip()
+    return int(value) if value.isdigit() else 256 * 1024
+
+
+def source_signature(json_path: str, shard_dir: Optional[str] = None) -> Optional[SourceSignature]:
+    """本体 JSON と（あれば）シャードの (名前, mtime_ns, size)。本体が無ければ None。"""
+    try:
+        st = os.stat(json_path)
+    except OSError:
+        return None
+    entries = [("", st.st_mtime_ns, st.st_size)]
+    if shard_dir is not None:
+        try:
+            with os.scandir(shard_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".json"):
+                        est = entry.stat()
+                        entries.append((entry.name, est.st_mtime_ns, est.st_size))
+        except OSError:
+            pass
+    return tuple(sorted(entries))
+
+
+def worth_caching(signature: SourceSignature) -> bool:
+    # 小さいブックは JSON を読んでも速いので作らない
+    return sum(size for _, _, size in signature) >= _min_bytes()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def read_sidecar(json_path: str, signature: SourceSignature) -> Optional[Any]:
+    """signature が一致し、HMAC も正しいサイドカーの book_data を返す。無い・古い・壊れている場合は None。
+
+    古い・壊れているファイルは消す（一致しないまま残ったファイルが溜まらないように）。
+    """
+    path = sidecar_path(json_path)
+    key = _load_key()
+    if key is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                # 以前の形式（pickle だけのファイル）など。中身は読まずに捨てる
+                raise ValueError("unknown format")
+            mac = f.read(_MAC_SIZE)
+            size_bytes = f.read(4)
+            (header_size,) = struct.unpack(">I", size_bytes)
+            header_bytes = f.read(header_size)
+            header = json.loads(header_bytes.decode("utf-8"))
+            if (
+                not isinstance(header, dict)
+                or header.get("version") != SIDECAR_VERSION
+                or tuple(tuple(e) for e in header.get("source") or ()) != signature
+            ):
+                _count("misses")
+                discard_sidecar(json_path)
+                return None
+            body = f.read()
+        digest = hmac.new(key, size_bytes + header_bytes + body, hashlib.sha256).digest()
+        if not hmac.compare_digest(mac, digest):
+            raise ValueError("HMAC mismatch")
+        data = pickle.loads(body)
+    except FileNotFoundError:
+        _count("misses")
+        return None
+    except Exception as e:
+        # 別の環境・別の Python で作ったもの・書き込み途中のものなど。作り直せばよいので読めなければ使わない
+        print(f"ブックのキャッシュファイルを読めませんでした: {path}: {e}")
+        _count("errors")
+        discard_sidecar(json_path)
+        return None
+    _count("hits")
+    return data
+
+
+def _write(json_path: str, payload: bytes) -> None:
+    path = sidecar_path(json_path)
+    try:
+        tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(tmp_fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    except Exception as e:
+        print(f"ブックのキャッシュファイルを書けませんでした: {path}: {e}")
+        _count("errors")
+        return
+    _count("writes")
+
+
+def write_sidecar(json_path: str, signature: SourceSignature, data: Any, *, background: bool = True) -> None:
+    """data をサイドカーに保存する。
+
+    data は呼び出し側がこのあと書き換える（ジャーナルの再生など）ので、pickle には先にここで変換し、
+    ファイルへの書き込みだけを background ならバックグラウンドで行う。
+    """
+    key = _load_key()
+    if key is None:
+        return
+    header = {"version": SIDECAR_VERSION, "source": [list(e) for e in signature]}
+    try:
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        signed = struct.pack(">I", len(header_bytes)) + header_bytes + pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        print(f"ブックのキャッシュを作れませんでした: {json_path}: {e}")
+        _count("errors")
+        return
+    payload = _MAGIC + hmac.new(key, signed, hashlib.sha256).digest() + signed
+    if background:
+        threading.Thread(target=_write, args=(json_path, payload), name="book-sidecar", daemon=True).start()
+    else:
+        _write(json_path, payload)
+
+
+def discard_sidecar(json_path: str) -> None:
+    """サイドカーを消す（本体を書き直して使えなくなったときなど）。"""
+    try:
+        os.remove(sidecar_path(json_path))
+    except FileNotFoundError:
+        pass
+
+
+def move_sidecar(src_json_path: str, dest_json_path: str) -> None:
+    # mtime は os.replace で変わらないので、移動先でもそのまま使える
+    if os.path.exists(sidecar_path(src_json_path)):
+        os.replace(sidecar_path(src_json_path), sidecar_path(dest_json_path))
+
+
+def sidecar_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
+
@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.repositories.book_compact import share_book_strings
+from app.repositories.book_journal import has_journal
+from app.repositories.book_sidecar import sidecar_stats
+from app.repositories.book_repo import (
+    append_book_patches,
+    book_signature,
+    compact_book,
+    is_sharded,
+    journal_lock,
+    journal_size,
+    load_book,
+    load_book_meta,
+    load_book_page,
+    save_book,
+    save_book_pages,
+)
+
+Signature = Tuple[int, ...]
+
+
+@dataclass
+class _CachedBook:
+    data: Any
+    signature: Signature
+
+
+@dataclass
+class _DirtyBook:
+    json_path: str
+    first_at: float
+    last_at: float
+
+
+class BookStore:
+    """book JSON をプロセス内にキャッシュし、ブック単位のロックを提供する。
+
+    - 読み出しは JSON（とジャーナル）の mtime/size が変わらない限りメモリ上の book_data を返す
+    - 書き込みはキャッシュ上の book_data を直接変更してから save() / commit() する
+    - modules 側の処理がファイルを書き換えた場合は mtime/size の変化で読み直す
+    - get() が返す book_data は共有オブジェクトなので、参照・変更は lock() の中で行う
+
+    write_behind_sec > 0 のときは編集ジャーナル（<json>.journal）を使う:
+    - commit() は段落単位のパッチをジャーナルへ追記するだけで返る
+    - 読み込み時はジャーナルを再生するので、未畳み込みの編集も常に見える
+    - 最後の編集から write_behind_sec 秒経つと（連続編集中でも max_delay_sec ごと、
+      ジャーナルが compact_bytes を超えた場合も）バックグラウンドで本体に畳み込む
+    """
+
+    def __init__(
+        self,
+        max_books: int = 4,
+        *,
+        write_behind_sec: float = 0.0,
+        max_delay_sec: Optional[float] = None,
+        compact_bytes: int = 1024 * 1024,
+        loader: Callable[[str], Any] = load_book,
+        saver: Callable[[str, Any], None] = save_book,
+        page_saver: Callable[[str, Any, Iterable[str]], None] = save_book_pages,
+        signature: Callable[[str], Optional[Signature]] = book_signature,
+        on_resign: Optional[Callable[[str, Signature, Signature], None]] = None,
+        compact: bool = False,
+    ) -> None:
+        self.max_books = max(1, int(max_books))
+        self.write_behind_sec = max(0.0, float(write_behind_sec))
+        if max_delay_sec is None:
+            max_delay_sec = max(30.0, self.write_behind_sec * 5)
+        self.max_delay_sec = max(self.write_behind_sec, float(max_delay_sec))
+        self.compact_bytes = max(0, int(compact_bytes))
+        self._loader = loader
+        self._saver = saver
+        self._page_saver = page_saver
+        self._signature = signature
+        # flush() で内容を変えずに signature だけが変わったときに (json_path, 旧, 新) で呼ぶ（検索索引などの追従用）
+        self._on_resign = on_resign
+        # 読み込んだ book_data の重複した文字列を共有してキャッシュの常駐メモリを減らす（book_compact.share_book_strings）
+        self.compact = bool(compact)
+        self._books: "OrderedDict[str, _CachedBook]" = OrderedDict()
+        self._dirty: Dict[str, _DirtyBook] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "saves": 0,
+            "journaled": 0,
+            "flushes": 0,
+            "replayed": 0,
+            "partial_reads": 0,
+            "shared_strings": 0,
+        }
+
+    def _key(self, json_path: str) -> str:
+        return os.path.normcase(os.path.abspath(json_path))
+
+    def lock(self, json_path: str) -> threading.RLock:
+        """ブック単位の再入可能ロックを返す（同じパスには常に同じロック）。"""
+        key = self._key(json_path)
+        with self._lock:
+            book_lock = self._locks.get(key)
+            if book_lock is None:
+                book_lock = threading.RLock()
+                self._locks[key] = book_lock
+            return book_lock
+
+    def get(self, json_path: str) -> Any:
+        key = self._key(json_path)
+        with self.lock(json_path):
+            signature = self._signature(json_path)
+            if signature is None:
+                self._drop(key)
+                raise FileNotFoundError(f"{json_path} not found")
+
+            with self._lock:
+                cached = self._books.get(key)
+                if cached is not None and cached.signature == signature:
+                    self._books.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return cached.data
+                self._stats["misses"] += 1
+
+            # stat → load の間に書き換えられても、古い signature で登録されるだけなので次回読み直しになる
+            data = self._loader(json_path)
+            if self.compact and isinstance(data, dict):
+                shared = share_book_strings(data)
+                with self._lock:
+                    self._stats["shared_strings"] += shared
+            if has_journal(json_path):
+                # ローダーがジャーナルを再生済み。modules 側が追記した分も含め、あとで本体へ畳み込む
+                self._mark_dirty(key, json_path)
+                with self._lock:
+                    self._stats["replayed"] += 1
+                self._ensure_flusher()
+            self._put(key, data, signature)
+            return data
+
+    def get_page(self, json_path: str, page_key: Any) -> Any:
+        """1ページだけ必要な場合の読み出し。
+
+        キャッシュに無いシャード形式のブックは、全体を読まずに該当ページだけを含む book_data を返す
+        （部分的なデータなのでキャッシュには載せない）。それ以外は get() と同じ。
+        """
+        return self._get_partial(json_path, lambda: load_book_page(json_path, page_key))
+
+    def get_meta(self, json_path: str) -> Any:
+        """pages 以外の項目だけ必要な場合の読み出し（シャード形式ならマニフェストだけを読む）。"""
+        return self._get_partial(json_path, lambda: load_book_meta(json_path))
+
+    def _get_partial(self, json_path: str, partial_loader: Callable[[], Any]) -> Any:
+        key = self._key(json_path)
+        with self.lock(json_path):
+            signature = self._signature(json_path)
+            with self._lock:
+                cached = self._books.get(key)
+                if cached is not None and signature is not None and cached.signature == signature:
+                    self._books.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return cached.data
+            if signature is None or not is_sharded(json_path):
+                return self.get(json_path)
+            with self._lock:
+                self._stats["partial_reads"] += 1
+            return partial_loader()
+
+    def save(self, json_path: str, data: Any, page_keys: Optional[Iterable[Any]] = None) -> None:
+        """book_data 全体を保存する。page_keys を渡すと、シャード形式ではそのページ（とマニフェスト）だけを書く。"""
+        key = self._key(json_path)
+        with self.lock(json_path):
+            try:
+                if page_keys is None:
+                    self._saver(json_path, data)
+                else:
+                    self._page_saver(json_path, data, [str(k) for k in page_keys])
+            except Exception:
+                # 変更済みのキャッシュがディスクと食い違うので捨てる（次回はディスクから読み直す）
+                self._drop(key)
+                raise
+            # 全体を書き出したので、ジャーナルの内容は本体に含まれている（saver が破棄済み）
+            with self._lock:
+                self._dirty.pop(key, None)
+                self._stats["saves"] += 1
+            signature = self._signature(json_path)
+            if signature is None:
+                self._drop(key)
+                return
+            self._put(key, data, signature)
+
+    def commit(self, json_path: str, data: Any, patches: Optional[List[Dict[str, Any]]] = None) -> None:
+        """変更済みの book_data を永続化する。
+
+        write-behind モードで patches（book_journal.paragraph_patch 等）が渡された場合は
+        ジャーナル追記だけを行い、全体の保存はバックグラウンドのコンパクションに任せる。
+        patches が None（複数段落に波及する変更など）の場合は即座に全体を保存する。
+        """
+        if patches is None or self.write_behind_sec <= 0:
+            self.save(json_path, data)
+            return
+        if not patches:
+            return
+        key = self._key(json_path)
+        with self.lock(json_path), journal_lock(json_path):
+            before = self._signature(json_path)
+            try:
+                append_book_patches(json_path, patches)
+            except Exception:
+                self._drop(key)
+                raise
+            after = self._signature(json_path)
+            with self._lock:
+                cached = self._books.get(key)
+                if cached is not None and cached.data is data and cached.signature == before and after is not None:
+                    # 追記したのは自分だけなので、キャッシュはジャーナル込みの最新状態と一致している
+                    cached.signature = after
+                else:
+                    # 他の書き手（modules 側の追記など）と交差した場合は次回読み直す
+                    if self._books.pop(key, None) is not None:
+                        self._stats["invalidations"] += 1
+            self._mark_dirty(key, json_path)
+            with self._lock:
+                self._stats["journaled"] += len(patches)
+        self._ensure_flusher()
+
+    def flush(self, json_path: str) -> bool:
+        """ジャーナルが残っていれば本体に畳み込む。畳み込んだ場合は True。"""
+        key = self._key(json_path)
+        with self.lock(json_path):
+            with self._lock:
+                dirty = self._dirty.get(key)
+                cached = self._books.get(key)
+            if dirty is None and not has_journal(json_path):
+                return False
+            before = self._signature(json_path)
+            valid = cached is not None and cached.signature == before
+            if valid and not is_sharded(json_path):
+                # キャッシュはジャーナル込みの最新状態なので、そのまま書き出す
+                self.save(json_path, cached.data)
+            else:
+                # キャッシュに無い / 外部で追記された場合、シャード形式（触れたページだけ書く）はディスク上で畳み込む
+                compact_book(json_path)
+                signature = self._signature(json_path)
+                if valid and signature is not None:
+                    # 畳み込んだ結果はキャッシュと同じ内容なので、signature だけ差し替える
+                    self._put(key, cached.data, signature)
+                else:
+                    self._drop(key)
+            with self._lock:
+                self._dirty.pop(key, None)
+                self._stats["flushes"] += 1
+            if valid and self._on_resign is not None:
+                after = self._signature(json_path)
+                if before is not None and after is not None:
+                    self._on_resign(json_path, before, after)
+            return True
+
+    def flush_due(self, now: Optional[float] = None) -> int:
+        """デバウンス時間を過ぎた（またはジャーナルが大きくなった）ブックを畳み込む。"""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            dirty = list(self._dirty.values())
+        due = [
+            d.json_path
+            for d in dirty
+            if now - d.last_at >= self.write_behind_sec
+            or now - d.first_at >= self.max_delay_sec
+            or (self.compact_bytes and journal_size(d.json_path) >= self.compact_bytes)
+        ]
+        flushed = 0
+        for json_path in due:
+            try:
+                if self.flush(json_path):
+                    flushed += 1
+            except Exception as e:
+                print(f"book_store: フラッシュに失敗しました: {json_path}: {e}")
+        return flushed
+
+    def flush_all(self) -> int:
+        """未保存の編集をすべて保存する（シャットダウン時に呼ぶ）。"""
+        with self._lock:
+            paths = [d.json_path for d in self._dirty.values()]
+        flushed = 0
+        for json_path in paths:
+            try:
+                if self.flush(json_path):
+                    flushed += 1
+            except Exception as e:
+                print(f"book_store: フラッシュに失敗しました: {json_path}: {e}")
+        return flushed
+
+    def close(self) -> None:
+        self._stop_event.set()
+        self.flush_all()
+
+    def invalidate(self, json_path: str) -> None:
+        """modules 側でファイルを書き換えた後などに、キャッシュを明示的に破棄する。"""
+        self._drop(self._key(json_path))
+
+    @contextmanager
+    def external_write(self, json_path: str) -> Iterator[None]:
+        """ファイルを直接書き換える処理をブックのロック内で実行し、終了後にキャッシュを破棄する。"""
+        with self.lock(json_path):
+            # 未保存の編集を先に書き出し、modules 側が最新の JSON を読めるようにする
+            self.flush(json_path)
+            try:
+                yield
+            finally:
+                self.invalidate(json_path)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_books"] = len(self._books)
+            stats["dirty_books"] = len(self._dirty)
+            stats["max_books"] = self.max_books
+            stats["write_behind_sec"] = self.write_behind_sec
+            stats["compact_bytes"] = self.compact_bytes
+            stats["compact"] = self.compact
+            stats["books"] = list(self._books.keys())
+        stats["sidecar"] = sidecar_stats()
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] / lookups) if lookups else 0.0
+        return stats
+
+    def _put(self, key: str, data: Any, signature: Signature) -> None:
+        with self._lock:
+            self._books[key] = _CachedBook(data=data, signature=signature)
+            self._books.move_to_end(key)
+            # 未畳み込みの編集はジャーナルにあるので、dirty なブックを追い出しても失われない
+            while len(self._books) > self.max_books:
+                self._books.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _mark_dirty(self, key: str, json_path: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            dirty = self._dirty.get(key)
+            if dirty is None:
+                self._dirty[key] = _DirtyBook(json_path=json_path, first_at=now, last_at=now)
+            else:
+                dirty.last_at = now
+
+    def _ensure_flusher(self) -> None:
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name="book-store-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        interval = min(1.0, max(0.1, self.write_behind_sec / 2))
+        while not self._stop_event.wait(interval):
+            self.flush_due()
+
+    def _drop(self, key: str) -> None:
+        with self._lock:
+            if self._books.pop(key, None) is not None:
+                self._stats["invalidations"] += 1
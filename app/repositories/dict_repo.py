@@ -1,6 +1,7 @@
 import os
 import tempfile
-from typing import List
+import threading
+from typing import Dict, List, Optional, Tuple
 
 DEFAULT_DICT_HEADER = "#英語\t#日本語\t#状態\t#出現回数\n"
 
@@ -37,3 +38,134 @@ def ensure_dict_file(dict_path: str, *, header: str = DEFAULT_DICT_HEADER) -> No
     if not os.path.exists(dict_path):
         with open(dict_path, "w", encoding="utf-8") as f:
             f.write(header)
+
+
+def _dict_signature(dict_path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(dict_path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class _IndexedDict:
+    """パース済みの辞書と、_find_dict_entry の3段階の検索に対応する索引。"""
+
+    def __init__(self, entries: List[List], signature: Optional[Tuple[int, int]]) -> None:
+        self.entries = entries
+        self.signature = signature
+        # 状態0は原語の完全一致、状態1とそれ以外は小文字での一致（いずれも先頭の行を優先）
+        self.exact0: Dict[str, int] = {}
+        self.lower1: Dict[str, int] = {}
+        self.lower_other: Dict[str, int] = {}
+        for i, entry in enumerate(entries):
+            self._index(i, entry)
+
+    def _index(self, i: int, entry: List) -> None:
+        if entry[2] == 0:
+            self.exact0.setdefault(entry[0], i)
+        elif entry[2] == 1:
+            self.lower1.setdefault(entry[0].lower(), i)
+        else:
+            self.lower_other.setdefault(entry[0].lower(), i)
+
+    def find_index(self, word: str) -> int:
+        if not word:
+            return -1
+        i = self.exact0.get(word)
+        if i is None:
+            i = self.lower1.get(word.lower())
+        if i is None:
+            i = self.lower_other.get(word.lower())
+        return -1 if i is None else i
+
+    def append(self, entry: List) -> None:
+        self.entries.append(entry)
+        self._index(len(self.entries) - 1, entry)
+
+
+class DictRepository:
+    """TSV 辞書をパース済みのままキャッシュし、原語で O(1) に引けるようにする。
+
+    - ファイルの mtime/size が変わったら読み直す（エディタでの直接編集にも追従する）
+    - upsert() は既存行の更新ならメモリ上の内容から書き出し、新規なら1行追記するだけで、
+      書き込み後にファイルを読み直さない
+    - load() はコピーを返すので、呼び出し側で自由に変更してから save() してよい
+    """
+
+    def __init__(self) -> None:
+        self._dicts: Dict[str, _IndexedDict] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, dict_path: str) -> str:
+        return os.path.normcase(os.path.abspath(dict_path))
+
+    def _get(self, dict_path: str) -> _IndexedDict:
+        # 呼び出し側で self._lock を取っていること
+        key = self._key(dict_path)
+        signature = _dict_signature(dict_path)
+        cached = self._dicts.get(key)
+        if cached is not None and cached.signature == signature:
+            return cached
+        indexed = _IndexedDict(load_dict(dict_path), signature)
+        self._dicts[key] = indexed
+        return indexed
+
+    def load(self, dict_path: str) -> List[List]:
+        with self._lock:
+            return [list(entry) for entry in self._get(dict_path).entries]
+
+    def find(self, dict_path: str, word: str) -> Optional[List]:
+        with self._lock:
+            indexed = self._get(dict_path)
+            i = indexed.find_index(word)
+            return list(indexed.entries[i]) if i >= 0 else None
+
+    def save(self, dict_path: str, dict_data: List[List]) -> None:
+        with self._lock:
+            entries = [list(entry) for entry in dict_data]
+            save_dict(dict_path, entries)
+            self._dicts[self._key(dict_path)] = _IndexedDict(entries, _dict_signature(dict_path))
+
+    def upsert(self, dict_path: str, original_word: str, translated_word: str, status: int) -> None:
+        """原語の行があれば訳語と状態を更新し、無ければ末尾に追加する。"""
+        with self._lock:
+            indexed = self._get(dict_path)
+            i = indexed.find_index(original_word)
+            if i >= 0:
+                entry = indexed.entries[i]
+                old_status = entry[2]
+                entry[1] = translated_word
+                entry[2] = status
+                save_dict(dict_path, indexed.entries)
+                if old_status != status:
+                    # 状態が変わると索引の置き場所が変わるので作り直す
+                    indexed = _IndexedDict(indexed.entries, None)
+                    self._dicts[self._key(dict_path)] = indexed
+            else:
+                entry = [original_word, translated_word, status, 0]
+                _append_dict_line(dict_path, entry)
+                indexed.append(entry)
+            indexed.signature = _dict_signature(dict_path)
+
+    def invalidate(self, dict_path: Optional[str] = None) -> None:
+        with self._lock:
+            if dict_path is None:
+                self._dicts.clear()
+            else:
+                self._dicts.pop(self._key(dict_path), None)
+
+
+def _append_dict_line(dict_path: str, entry: List) -> None:
+    count = entry[3] if len(entry) > 3 else 0
+    line = f"{entry[0]}\t{entry[1]}\t{entry[2]}\t{count}\n".encode("utf-8")
+    with open(dict_path, "ab+") as f:
+        # 手で編集されて末尾に改行が無い場合は補う
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                line = b"\n" + line
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
@@ -1,19 +1,84 @@
 import json
 import os
 import tempfile
-from typing import Any
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson は任意。無ければ標準の json を使う
+    orjson = None
+
+# JSON の読み書きはすべてここを通す
+# - orjson が入っていれば orjson を使う（環境変数 JSON_CODEC=json なら入っていても標準の json）
+# - JSON_COMPACT=1 なら save_json_atomic() は改行・空白なしで書く（設定ファイルなど compact=False の呼び出しは除く）
+# - orjson は字下げ2（と字下げなし）しか書けないので、それ以外の字下げは標準の json で書く
+# - orjson が読めない JSON（NaN を含むなど、標準の json が書いたもの）は標準の json で読み直す
+
+
+def codec_name() -> str:
+    """使う JSON コーデック（"orjson" か "json"）。"""
+    if orjson is not None and os.getenv("JSON_CODEC", "auto").strip().lower() != "json":
+        return "orjson"
+    return "json"
+
+
+def compact_output() -> bool:
+    return os.getenv("JSON_COMPACT", "0").strip() == "1"
+
+
+def write_indent(indent: Optional[int], compact: Optional[bool] = None) -> Optional[int]:
+    """保存に使う字下げ。compact（省略時は JSON_COMPACT）なら None。"""
+    if compact is None:
+        compact = compact_output()
+    return None if compact else indent
+
+
+def dumps_bytes(data: Any, *, indent: Optional[int] = None) -> bytes:
+    """UTF-8 の JSON を返す。indent=None なら区切りの空白なし。"""
+    if codec_name() == "orjson" and indent in (None, 2):
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent == 2 else 0)
+        try:
+            return orjson.dumps(data, option=option)
+        except orjson.JSONEncodeError:
+            # 64ビットを超える整数など。標準の json で書けるならそちらで書く
+            pass
+    separators = (",", ":") if indent is None else None
+    return json.dumps(data, ensure_ascii=False, indent=indent, separators=separators).encode("utf-8")
+
+
+def dumps(data: Any, *, indent: Optional[int] = None) -> str:
+    return dumps_bytes(data, indent=indent).decode("utf-8")
+
+
+def loads(text: Any) -> Any:
+    """str / bytes の JSON を読む。"""
+    if codec_name() == "orjson":
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(text)
 
 
 def load_json(json_path: str) -> Any:
     if not os.path.isfile(json_path):
         raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(json_path, "rb") as f:
+        return loads(f.read())
 
 
-def save_json_atomic(json_path: str, data: Any, *, indent: int = 2) -> None:
+def save_json_atomic(json_path: str, data: Any, *, indent: Optional[int] = 2, compact: Optional[bool] = None) -> None:
+    """一時ファイルに書いてから置き換える。compact=False なら JSON_COMPACT に関係なく indent で書く。"""
+    payload = dumps_bytes(data, indent=write_indent(indent, compact))
     dir_path = os.path.dirname(json_path) or "."
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=dir_path, suffix=".tmp", text=True)
-    with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmp_file:
-        json.dump(data, tmp_file, ensure_ascii=False, indent=indent)
-    os.replace(tmp_path, json_path)
+    tmp_fd, tmp_path = tempfile.mkstemp(dir=dir_path, suffix=".tmp")
+    try:
+        with os.fdopen(tmp_fd, "wb") as tmp_file:
+            tmp_file.write(payload)
+        os.replace(tmp_path, json_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
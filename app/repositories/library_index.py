@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    pdf_name TEXT PRIMARY KEY,
+    json_path TEXT NOT NULL,
+    title TEXT NOT NULL,
+    book_type TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    paragraphs INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS paragraphs (
+    id INTEGER PRIMARY KEY,
+    pdf_name TEXT NOT NULL,
+    page_number INTEGER,
+    pid TEXT NOT NULL,
+    sort_order INTEGER NOT NULL,
+    column_order INTEGER NOT NULL,
+    y0 REAL NOT NULL,
+    folded TEXT NOT NULL,
+    fields TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS paragraphs_book ON paragraphs (pdf_name);
+"""
+
+# 部分一致検索用の trigram 索引（SQLite の FTS5 が使えない環境では作らず、instr() の全件走査にする）
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS paragraphs_fts USING fts5(
+    folded, content='paragraphs', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS paragraphs_ai AFTER INSERT ON paragraphs BEGIN
+    INSERT INTO paragraphs_fts (rowid, folded) VALUES (new.id, new.folded);
+END;
+CREATE TRIGGER IF NOT EXISTS paragraphs_ad AFTER DELETE ON paragraphs BEGIN
+    INSERT INTO paragraphs_fts (paragraphs_fts, rowid, folded) VALUES ('delete', old.id, old.folded);
+END;
+"""
+
+# trigram 索引は3文字未満の語を引けない
+_FTS_MIN_CHARS = 3
+
+# (pdf_name, title, book_type, page_number, pid, fields)
+CandidateRow = Tuple[str, str, str, Optional[int], str, str]
+
+
+def encode_signature(signature: Optional[Sequence[int]]) -> str:
+    return "" if signature is None else ",".join(str(v) for v in signature)
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+class LibraryIndex:
+    """data/ 以下の全ブックの段落を1つの SQLite に入れた、ライブラリ横断検索用の索引。
+
+    - 段落ごとに、ひらがなに寄せた正規化テキスト（folded）と、フィールドごとの
+      (正規化テキスト, スニペット) を JSON で持つ。検索時にブックの JSON は開かない
+    - ブック単位で作り直す（replace_book）。どの状態から作ったかは book_signature で覚えておく
+    - 1つの接続を Lock で直列化して、検索 API と索引更新スレッドから共有する
+    """
+
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._fts = False
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            try:
+                conn.executescript(_FTS_SCHEMA)
+                self._fts = True
+            except sqlite3.OperationalError:
+                self._fts = False
+            self._conn = conn
+        return self._conn
+
+    def book_signatures(self) -> Dict[str, Tuple[str, str]]:
+        """{pdf_name: (json_path, signature)}"""
+        with self._lock:
+            conn = self._connection()
+            return {row[0]: (row[1], row[2]) for row in conn.execute("SELECT pdf_name, json_path, signature FROM books")}
+
+    def replace_book(
+        self,
+        pdf_name: str,
+        *,
+        json_path: str,
+        title: str,
+        book_type: str,
+        signature: str,
+        rows: Iterable[Tuple[Optional[int], str, int, int, float, str, str]],
+    ) -> int:
+        """ブックの段落を丸ごと入れ替える。rows は (page_number, pid, order, column_order, y0, folded, fields)。"""
+        rows = [(pdf_name,) + tuple(row) for row in rows]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM paragraphs WHERE pdf_name=?", (pdf_name,))
+                conn.executemany(
+                    "INSERT INTO paragraphs (pdf_name, page_number, pid, sort_order, column_order, y0, folded, fields) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.execute(
+                    "INSERT INTO books (pdf_name, json_path, title, book_type, signature, paragraphs, indexed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(pdf_name) DO UPDATE SET json_path=excluded.json_path, title=excluded.title, "
+                    "book_type=excluded.book_type, signature=excluded.signature, "
+                    "paragraphs=excluded.paragraphs, indexed_at=excluded.indexed_at",
+                    (pdf_name, json_path, title, book_type, signature, len(rows), time.time()),
+                )
+        return len(rows)
+
+    def remove_books(self, pdf_names: Iterable[str]) -> int:
+        names = [(name,) for name in pdf_names]
+        if not names:
+            return 0
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("DELETE FROM paragraphs WHERE pdf_name=?", names)
+                conn.executemany("DELETE FROM books WHERE pdf_name=?", names)
+        return len(names)
+
+    def resign(self, json_path: str, before: str, after: str) -> None:
+        """内容を変えずに signature だけが変わった（ジャーナルの畳み込みなど）ときに呼ぶ。"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "UPDATE books SET signature=? WHERE json_path=? AND signature=?",
+                    (after, json_path, before),
+                )
+
+    def scan_candidates(
+        self,
+        key: str,
+        visit: Callable[[CandidateRow], bool],
+        *,
+        pdf_names: Optional[Sequence[str]] = None,
+    ) -> None:
+        """folded に key を含む段落を、ブック（タイトル順）→ページ内の並び順で visit に渡す。
+
+        visit が False を返したら打ち切る。候補の絞り込みだけなので、visit 側で語ごとの判定をやり直すこと。
+        """
+        params: List[Any] = []
+        with self._lock:
+            conn = self._connection()
+            if self._fts and len(key) >= _FTS_MIN_CHARS:
+                source = "paragraphs_fts f JOIN paragraphs p ON p.id = f.rowid"
+                where = ["paragraphs_fts MATCH ?"]
+                params.append(_fts_phrase(key))
+            else:
+                source = "paragraphs p"
+                where = ["instr(p.folded, ?) > 0"]
+                params.append(key)
+            if pdf_names:
+                where.append(f"p.pdf_name IN ({','.join('?' for _ in pdf_names)})")
+                params.extend(pdf_names)
+            cursor = conn.execute(
+                f"SELECT p.pdf_name, b.title, b.book_type, p.page_number, p.pid, p.fields "
+                f"FROM {source} JOIN books b ON b.pdf_name = p.pdf_name "
+                f"WHERE {' AND '.join(where)} "
+                f"ORDER BY b.title COLLATE NOCASE, p.pdf_name, p.page_number, p.sort_order, p.column_order, p.y0",
+                params,
+            )
+            try:
+                while True:
+                    rows = cursor.fetchmany(500)
+                    if not rows:
+                        break
+                    for row in rows:
+                        if not visit(row):
+                            return
+            finally:
+                cursor.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            conn = self._connection()
+            books, paragraphs = conn.execute("SELECT COUNT(*), COALESCE(SUM(paragraphs), 0) FROM books").fetchone()
+            return {"books": books, "paragraphs": paragraphs, "fts": self._fts, "db_path": self.db_path}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
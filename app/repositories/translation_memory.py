@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tm (
+    engine TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    src_hash TEXT NOT NULL,
+    src_text TEXT NOT NULL,
+    trans_text TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (engine, source, target, src_hash)
+);
+CREATE INDEX IF NOT EXISTS tm_last_used ON tm (last_used_at);
+"""
+
+
+def _src_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """翻訳結果を (engine, source, target, 原文) をキーに SQLite へ保存する翻訳メモリ。
+
+    - 原文はハッシュで引き、保存済みの原文と完全一致した場合だけヒットとする
+    - max_entries を超えたら、最後に使われた日時が古いものから削除する（LRU）
+    - 1つの接続を Lock で直列化して、翻訳ワーカーのスレッドから共有する
+    """
+
+    def __init__(self, db_path: str, *, max_entries: int = 200000) -> None:
+        self.db_path = db_path
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._count: Optional[int] = None
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            self._count = conn.execute("SELECT COUNT(*) FROM tm").fetchone()[0]
+        return self._conn
+
+    def get(self, engine: str, source: str, target: str, text: str) -> Optional[str]:
+        return self.get_many(engine, source, target, [text])[0]
+
+    def get_many(self, engine: str, source: str, target: str, texts: Sequence[str]) -> List[Optional[str]]:
+        """texts と同じ並びで訳文（無ければ None）を返す。"""
+        source, target = source.lower(), target.lower()
+        results: List[Optional[str]] = [None] * len(texts)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            used = []
+            for i, text in enumerate(texts):
+                row = conn.execute(
+                    "SELECT src_text, trans_text FROM tm WHERE engine=? AND source=? AND target=? AND src_hash=?",
+                    (engine, source, target, _src_hash(text)),
+                ).fetchone()
+                if row is not None and row[0] == text:
+                    results[i] = row[1]
+                    used.append((now, engine, source, target, _src_hash(text)))
+                    self._stats["hits"] += 1
+                else:
+                    self._stats["misses"] += 1
+            if used:
+                conn.executemany(
+                    "UPDATE tm SET last_used_at=?, hits=hits+1 WHERE engine=? AND source=? AND target=? AND src_hash=?",
+                    used,
+                )
+                conn.commit()
+        return results
+
+    def put(self, engine: str, source: str, target: str, text: str, translated: str) -> None:
+        self.put_many(engine, source, target, [(text, translated)])
+
+    def put_many(self, engine: str, source: str, target: str, pairs: Sequence[tuple]) -> None:
+        """(原文, 訳文) の組を保存する。空の原文・訳文は保存しない。"""
+        source, target = source.lower(), target.lower()
+        now = time.time()
+        rows = [
+            (engine, source, target, _src_hash(text), text, translated, now, now)
+            for text, translated in pairs
+            if text and translated
+        ]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT INTO tm (engine, source, target, src_hash, src_text, trans_text, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(engine, source, target, src_hash) DO UPDATE SET "
+                "src_text=excluded.src_text, trans_text=excluded.trans_text, last_used_at=excluded.last_used_at",
+                rows,
+            )
+            self._stats["stores"] += len(rows)
+            self._count = (self._count or 0) + (conn.total_changes - before)
+            if self._count > self.max_entries:
+                self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        # 上限の9割まで減らして、追加のたびに削除が走らないようにする
+        self._count = conn.execute("SELECT COUNT(*) FROM tm").fetchone()[0]
+        excess = self._count - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+        conn.execute(
+            "DELETE FROM tm WHERE rowid IN (SELECT rowid FROM tm ORDER BY last_used_at LIMIT ?)",
+            (excess,),
+        )
+        self._count -= excess
+        self._stats["evictions"] += excess
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._count
+            stats["max_entries"] = self.max_entries
+            stats["db_path"] = self.db_path
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,17 +1,16 @@
 from __future__ import annotations
 
 import os
-import tempfile
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Callable, Dict, List, Optional, Tuple
 
 from app.repositories.dict_repo import (
     DEFAULT_DICT_HEADER,
+    DictRepository,
     ensure_dict_file,
-    load_dict,
-    save_dict,
 )
 from app.repositories.settings_repo import load_settings, save_settings
+from modules.parapara_dict_replacer import DictMatcher, invalidate_dict_matchers, load_merged_dict_matcher
 
 
 @dataclass
@@ -22,6 +21,7 @@ class DictService:
     dict_path: str
     get_paths: Callable[[str], Tuple[str, str]]
     should_skip_dir: Callable[[str], bool]
+    dicts: DictRepository = field(default_factory=DictRepository)
 
     def _settings_path(self) -> str:
         return os.path.join(self.data_folder, "paraparatrans.settings.json")
@@ -127,33 +127,13 @@ class DictService:
     def ensure_dict_file(self, path: str) -> None:
         ensure_dict_file(path, header=DEFAULT_DICT_HEADER)
 
-    def merged_dict_file(self, dict_paths: List[str]) -> str:
-        tmp_fd, tmp_path = tempfile.mkstemp(dir=self.config_folder, suffix=".dict.txt", text=True)
-        with os.fdopen(tmp_fd, "w", encoding="utf-8") as out:
-            out.write(DEFAULT_DICT_HEADER)
-            for path in dict_paths:
-                if not os.path.exists(path):
-                    continue
-                with open(path, "r", encoding="utf-8") as f:
-                    for line in f:
-                        if not line.strip() or line.lstrip().startswith("#"):
-                            continue
-                        out.write(line)
-        return tmp_path
-
-    def _find_dict_entry(self, dict_data: List[List], word: str) -> Optional[List]:
-        if not word:
-            return None
-        for entry in dict_data:
-            if entry[2] == 0 and entry[0] == word:
-                return entry
-        for entry in dict_data:
-            if entry[2] == 1 and entry[0].lower() == word.lower():
-                return entry
-        for entry in dict_data:
-            if entry[2] not in [0, 1] and entry[0].lower() == word.lower():
-                return entry
-        return None
+    def merged_dict(self, dict_paths: List[str]) -> DictMatcher:
+        """選択中の辞書を順に重ねたコンパイル済み辞書（各辞書の mtime が変わるまでリクエスト間で共有）。"""
+        return load_merged_dict_matcher(dict_paths)
+
+    def _save_dict(self, dict_path: str, dict_data: List[List]) -> None:
+        self.dicts.save(dict_path, dict_data)
+        invalidate_dict_matchers(dict_path)
 
     def get_active_dict_paths(self, pdf_name: str) -> List[str]:
         selected_rel = self._load_dict_selection(pdf_name)
@@ -177,7 +157,7 @@ class DictService:
         else:
             dict_path = self.dict_path
 
-        dict_data = load_dict(dict_path)
+        dict_data = self.dicts.load(dict_path)
         entries = []
         for entry in dict_data:
             count = entry[3] if len(entry) > 3 else 0
@@ -218,7 +198,7 @@ class DictService:
             new_data.append([original_word, translated_word, status, count])
 
         os.makedirs(os.path.dirname(dict_path), exist_ok=True)
-        save_dict(dict_path, new_data)
+        self._save_dict(dict_path, new_data)
         return len(new_data)
 
     def catalog(self) -> Tuple[List[Dict[str, str]], str]:
@@ -234,7 +214,7 @@ class DictService:
 
     def compare(self, dict_path: str) -> Tuple[Dict[str, Dict[str, object]], str]:
         dict_abs = self._resolve_rel_path(dict_path)
-        dict_data = load_dict(dict_abs)
+        dict_data = self.dicts.load(dict_abs)
         entries: Dict[str, Dict[str, object]] = {}
         for entry in dict_data:
             key = entry[0]
@@ -264,7 +244,7 @@ class DictService:
         if not translated_entries:
             raise ValueError("翻訳対象の entries がありません")
 
-        dict_data = load_dict(dict_abs)
+        dict_data = self.dicts.load(dict_abs)
         dict_map = {item[0]: item for item in dict_data}
 
         for entry in translated_entries:
@@ -287,7 +267,7 @@ class DictService:
 
             dict_map[key] = [key, translated_word, status, max(0, count)]
 
-        save_dict(dict_abs, list(dict_map.values()))
+        self._save_dict(dict_abs, list(dict_map.values()))
         return self._relpath_from_abs(dict_abs), len(translated_entries)
 
     def create_book_dict(
@@ -323,8 +303,8 @@ class DictService:
                 raise ValueError("target_path が必要です")
 
         self.ensure_dict_file(source_abs)
-        source_data = load_dict(source_abs)
-        target_data = load_dict(target_abs) if target_abs else []
+        source_data = self.dicts.load(source_abs)
+        target_data = self.dicts.load(target_abs) if target_abs else []
 
         source_map = {entry[0]: entry for entry in source_data}
         target_map = {entry[0]: entry for entry in target_data}
@@ -350,9 +330,9 @@ class DictService:
             if action in {"move", "delete"}:
                 source_map.pop(key, None)
 
-        save_dict(source_abs, list(source_map.values()))
+        self._save_dict(source_abs, list(source_map.values()))
         if target_abs:
-            save_dict(target_abs, list(target_map.values()))
+            self._save_dict(target_abs, list(target_map.values()))
 
     def selection_get(self, pdf_name: str) -> Tuple[List[Dict[str, str]], Dict[str, object], List[str]]:
         config_dicts = self._list_config_dicts()
@@ -398,8 +378,7 @@ class DictService:
     def search(self, word: str, pdf_name: Optional[str]) -> Optional[List]:
         dict_paths = self.get_active_dict_paths(pdf_name) if pdf_name else [self.dict_path]
         for path in reversed(dict_paths):
-            dict_data = load_dict(path)
-            found_entry = self._find_dict_entry(dict_data, word)
+            found_entry = self.dicts.find(path, word)
             if found_entry:
                 return found_entry
         return None
@@ -427,36 +406,13 @@ class DictService:
             dict_paths = self.get_active_dict_paths(pdf_name) if pdf_name else [self.dict_path]
             target_path = None
             for path in reversed(dict_paths):
-                if self._find_dict_entry(load_dict(path), original_word):
+                if self.dicts.find(path, original_word):
                     target_path = path
                     break
             if target_path is None:
                 target_path = dict_paths[-1] if dict_paths else self.dict_path
 
         self.ensure_dict_file(target_path)
-        dict_data = load_dict(target_path)
-        found_index = -1
-
-        for i, entry in enumerate(dict_data):
-            if entry[2] == 0 and entry[0] == original_word:
-                found_index = i
-                break
-        if found_index == -1:
-            for i, entry in enumerate(dict_data):
-                if entry[2] == 1 and entry[0].lower() == original_word.lower():
-                    found_index = i
-                    break
-        if found_index == -1:
-            for i, entry in enumerate(dict_data):
-                if entry[2] not in [0, 1] and entry[0].lower() == original_word.lower():
-                    found_index = i
-                    break
-
-        if found_index != -1:
-            dict_data[found_index][1] = translated_word
-            dict_data[found_index][2] = status
-        else:
-            dict_data.append([original_word, translated_word, status, 0])
-
-        save_dict(target_path, dict_data)
+        self.dicts.upsert(target_path, original_word, translated_word, status)
+        invalidate_dict_matchers(target_path)
         return True
@@ -1,6 +1,17 @@
 import os
+import threading
 from dotenv import load_dotenv
 
+import sys
+
+if __name__ == "__main__":
+    # python modules/api_translate.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories.translation_memory import TranslationMemory
+
 # .env ファイルの内容を読み込む
 load_dotenv()
 _SUPPORTED_TRANSLATORS = ("google", "deepl", "google_v3")
@@ -82,14 +93,100 @@ except Exception as e:
 print(f"Using {_label_for_translator(get_current_translator())} translator.")
 
 
-def translate_text(text, source="EN", target="JA", translator=None):
+_TRANSLATION_MEMORY = None
+_TRANSLATION_MEMORY_CONFIGURED = False
+_TRANSLATION_MEMORY_LOCK = threading.Lock()
+
+
+def _translation_memory_enabled():
+    v = os.getenv("TRANSLATION_MEMORY", "1").strip().lower()
+    return v not in {"0", "false", "no", "off"}
+
+
+def _translation_memory_max_entries():
+    try:
+        return max(1, int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "200000")))
+    except ValueError:
+        return 200000
+
+
+def configure_translation_memory(db_path, max_entries=None):
+    """翻訳メモリの保存先を設定する（アプリ起動時に data フォルダを渡す）。"""
+    global _TRANSLATION_MEMORY, _TRANSLATION_MEMORY_CONFIGURED
+    with _TRANSLATION_MEMORY_LOCK:
+        if _TRANSLATION_MEMORY is not None:
+            _TRANSLATION_MEMORY.close()
+        _TRANSLATION_MEMORY = None
+        if _translation_memory_enabled():
+            _TRANSLATION_MEMORY = TranslationMemory(
+                db_path,
+                max_entries=max_entries if max_entries is not None else _translation_memory_max_entries(),
+            )
+        _TRANSLATION_MEMORY_CONFIGURED = True
+    return _TRANSLATION_MEMORY
+
+
+def get_translation_memory():
+    """翻訳メモリを返す。無効化されている場合は None。"""
+    if not _TRANSLATION_MEMORY_CONFIGURED:
+        # スクリプト実行時など未設定の場合は data フォルダ直下を使う
+        data_dir = os.getenv("PARAPARATRANS_DATA_DIR") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+        configure_translation_memory(os.path.join(data_dir, "translation_memory.sqlite3"))
+    return _TRANSLATION_MEMORY
+
+
+def _count_memory(stats, hits, misses):
+    if stats is None:
+        return
+    stats.tm_hits = getattr(stats, "tm_hits", 0) + hits
+    stats.tm_misses = getattr(stats, "tm_misses", 0) + misses
+
+
+def lookup_translations(texts, source="EN", target="JA", translator=None, stats=None):
+    """翻訳メモリから texts の訳文を引く（texts と同じ並び、無ければ None）。"""
+    selected = get_current_translator() if translator is None else _normalize_translator(translator)
+    tm = get_translation_memory()
+    if tm is None or not texts:
+        return [None] * len(texts)
+    try:
+        results = tm.get_many(selected, source, target, texts)
+    except Exception as e:
+        print(f"[WARN] 翻訳メモリの参照に失敗: {e}")
+        return [None] * len(texts)
+    hits = sum(1 for r in results if r is not None)
+    _count_memory(stats, hits, len(results) - hits)
+    return results
+
+
+def remember_translations(pairs, source="EN", target="JA", translator=None):
+    """(原文, 訳文) の組を翻訳メモリへ保存する。"""
+    selected = get_current_translator() if translator is None else _normalize_translator(translator)
+    tm = get_translation_memory()
+    if tm is None or not pairs:
+        return
+    try:
+        tm.put_many(selected, source, target, pairs)
+    except Exception as e:
+        print(f"[WARN] 翻訳メモリへの保存に失敗: {e}")
+
+
+def translate_text(text, source="EN", target="JA", translator=None, stats=None, memory=False):
     print(f"translate_text")
     """
     環境変数に基づいて翻訳サービスを選択し、テキストを翻訳する。
+    memory=True の場合は先に翻訳メモリを引き、API で翻訳した結果も保存する。
+    既定は memory=False（段落ごとの再翻訳などで、保存済みの訳ではなく API の訳を返す）。一括翻訳は呼び出し側で指定する。
     """
     selected = get_current_translator() if translator is None else _normalize_translator(translator)
+    if memory:
+        cached = lookup_translations([text], source, target, translator=selected, stats=stats)[0]
+        if cached is not None:
+            return cached
     translator_func = _resolve_translator_func(selected)
-    return translator_func(text, source, target)
+    translated = translator_func(text, source, target)
+    if memory and isinstance(translated, str):
+        remember_translations([(text, translated)], source, target, translator=selected)
+    return translated
 
 
 def _resolve_translate_texts_func(translator_name):
@@ -114,7 +211,8 @@ def _resolve_translate_texts_func(translator_name):
     return translate_texts_env
 
 
-def translate_texts(texts, source="EN", target="JA", translator=None):
+def translate_texts(texts, source="EN", target="JA", translator=None, stats=None, memory=False):
+    """texts をまとめて翻訳する。memory は translate_text と同じ（既定は翻訳メモリを使わない）。"""
     selected = get_current_translator() if translator is None else _normalize_translator(translator)
     if not isinstance(texts, list):
         raise ValueError("texts must be a list")
@@ -122,7 +220,23 @@ def translate_texts(texts, source="EN", target="JA", translator=None):
         return []
 
     translate_texts_func = _resolve_translate_texts_func(selected)
-    return translate_texts_func(texts, source, target)
+    if not memory:
+        return translate_texts_func(texts, source, target)
+
+    # 翻訳メモリにあるものは API に送らない
+    results = lookup_translations(texts, source, target, translator=selected, stats=stats)
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        translated = translate_texts_func([texts[i] for i in missing], source, target)
+        for i, t in zip(missing, translated):
+            results[i] = t
+        remember_translations(
+            [(texts[i], t) for i, t in zip(missing, translated) if isinstance(t, str)],
+            source,
+            target,
+            translator=selected,
+        )
+    return results
 
 if __name__ == "__main__":
     html_text = "<p>Hello <strong>ParaParaTrans</strong>!</p>"
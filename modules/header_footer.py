@@ -7,44 +7,70 @@ import math  # ← 追加
 
 def get_header_y1_footer_y0(pdf_path):
     doc = fitz.open(pdf_path)
-    header_text_map = defaultdict(list)
-    footer_text_map = defaultdict(list)
-    page_heights = []
+    page_stats = []
 
     for page in doc:
         print(f"Processing page {page.number + 1}...")
 
         # ページのテキストブロックを取得
         blocks = page.get_text("dict")["blocks"]
-        if not blocks:
-            continue
-        page_heights.append(page.rect.height)
+        page_stats.append(page_header_footer_stat(blocks, page.rect.height))
 
-        text_blocks = [b for b in blocks if b.get("type") == 0 and b.get("lines")]
-        if not text_blocks:
-            continue
+    return header_footer_from_stats(page_stats)
+
+
+def page_header_footer_stat(blocks, page_height):
+    """1ページ分のブロックから (ページの高さ, ヘッダ候補, フッタ候補) を返す。
+
+    ブロックが無いページは高さも None。候補は (正規化テキスト, y) または None。
+    """
+    if not blocks:
+        return None, None, None
+
+    text_blocks = [b for b in blocks if b.get("type") == 0 and b.get("lines")]
+    if not text_blocks:
+        return page_height, None, None
 
-        # 上部と下部のブロック取得
-        text_blocks = sorted(text_blocks, key=lambda b: b["bbox"][1])
-        top = text_blocks[0]
-        bottom = text_blocks[-1]
-        # print(f"Top block: {top['bbox']}, Bottom block: {bottom['bbox']}")
-
-        # ヘッダ候補
-        if len(top["lines"]) <= 2:
-            top_text = join_spans(top["lines"]).strip()
-            norm_top = normalize_text(top_text)
-            if norm_top:
-                y1 = math.ceil(top["bbox"][3])  # ← 切り上げ
-                header_text_map[norm_top].append(y1)
-
-        # フッタ候補
-        if len(bottom["lines"]) <= 2:
-            bottom_text = join_spans(bottom["lines"]).strip()
-            norm_bottom = normalize_text(bottom_text)
-            if norm_bottom:
-                y0 = math.floor(bottom["bbox"][1])  # ← 切り捨て
-                footer_text_map[norm_bottom].append(y0)
+    # 上部と下部のブロック取得
+    text_blocks = sorted(text_blocks, key=lambda b: b["bbox"][1])
+    top = text_blocks[0]
+    bottom = text_blocks[-1]
+    # print(f"Top block: {top['bbox']}, Bottom block: {bottom['bbox']}")
+
+    # ヘッダ候補
+    header = None
+    if len(top["lines"]) <= 2:
+        top_text = join_spans(top["lines"]).strip()
+        norm_top = normalize_text(top_text)
+        if norm_top:
+            y1 = math.ceil(top["bbox"][3])  # ← 切り上げ
+            header = (norm_top, y1)
+
+    # フッタ候補
+    footer = None
+    if len(bottom["lines"]) <= 2:
+        bottom_text = join_spans(bottom["lines"]).strip()
+        norm_bottom = normalize_text(bottom_text)
+        if norm_bottom:
+            y0 = math.floor(bottom["bbox"][1])  # ← 切り捨て
+            footer = (norm_bottom, y0)
+
+    return page_height, header, footer
+
+
+def header_footer_from_stats(page_stats):
+    """page_header_footer_stat() をページ順に並べたものから (header_y1, footer_y0) を決める。"""
+    header_text_map = defaultdict(list)
+    footer_text_map = defaultdict(list)
+    page_heights = []
+    for page_height, header, footer in page_stats:
+        if page_height is None:
+            continue
+        page_heights.append(page_height)
+        if header is not None:
+            header_text_map[header[0]].append(header[1])
+        if footer is not None:
+            footer_text_map[footer[0]].append(footer[1])
 
     header_y1 = select_common_y(header_text_map, len(page_heights), is_header=True,
                                 default=0.0)
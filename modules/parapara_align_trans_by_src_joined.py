@@ -24,6 +24,16 @@ import tempfile
 import argparse
 from typing import Dict, Tuple, Any, Set
 
+import sys
+
+if __name__ == "__main__":
+    # python modules/parapara_align_trans_by_src_joined.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories.book_repo import load_book, save_book
+
 
 _STATUS_RANK = {"none": 0, "auto": 1, "draft": 2, "fixed": 3}
 
@@ -33,17 +43,11 @@ def _rank(status: Any) -> int:
 
 
 def load_json(json_path: str) -> dict:
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_book(json_path)
 
 
 def atomicsave_json(json_path: str, data: dict) -> None:
-    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path), suffix=".json", text=True)
-    with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
-        json.dump(data, tmp_file, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, json_path)
+    save_book(json_path, data)
 
 
 def align_translations_by_src_joined(book_data: dict) -> Tuple[dict, int]:
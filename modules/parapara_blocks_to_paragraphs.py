@@ -1,11 +1,17 @@
 import os
 import sys
-import tempfile
 import re
-import json
 from pathlib import Path
 from typing import List, Dict, Any
 
+if __name__ == "__main__":
+    # python modules/parapara_blocks_to_paragraphs.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories import json_repo
+
 style_dict = {}
 
 def get_span_style(span):
@@ -239,18 +245,11 @@ def pages_to_paragraphs(pages_dict: Dict[int, Any]) -> Dict[int, Dict[str, Any]]
 
 # json を読み込んでobjectを戻す
 def load_json(json_path: str):
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+    return json_repo.load_json(json_path)
 
 # アトミックセーブ
 def atomicsave_json(json_path, data):
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path), suffix=".json", text=True)
-    with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmp_file:
-        json.dump(data, tmp_file, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, json_path)
+    json_repo.save_json_atomic(json_path, data)
 
 # エントリポイント
 # テスト用にpages.jsonでもcolumns.jsonでもparagraphs.jsonに変換できるようにしている
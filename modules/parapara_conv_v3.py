@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+parapara_conv_v3.py
+
+フォルダ内の book JSON を 3.0.0 形式（派生フィールドを省略した形式）に変換する。--down で 2.0.0 に戻す。
+シャード形式のブックはシャード形式のまま、未畳み込みのジャーナルは畳み込んでから変換する。
+
+Usage:
+    python -m modules.parapara_conv_v3 <フォルダ名> [--down]
+
+変換後もアプリが 3.0.0 のまま保存するように、.env で BOOK_FORMAT=3 を指定すること
+（2.0.0 を指定したままだと、編集のたびに 2.0.0 で保存し直される）。
+"""
+import os
+import argparse
+
+import sys
+
+if __name__ == "__main__":
+    # python modules/parapara_conv_v3.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories.book_format import BOOK_VERSION_V2, BOOK_VERSION_V3
+from app.repositories.book_repo import SHARD_DIR_SUFFIX, journal_lock, load_book, save_book
+from app.repositories.json_repo import load_json
+
+
+def _is_book(data) -> bool:
+    if not isinstance(data, dict) or data.get("version") not in (BOOK_VERSION_V2, BOOK_VERSION_V3):
+        return False
+    return "pages" in data or "page_keys" in data
+
+
+def convert_book(json_path: str, version: str) -> bool:
+    """1冊を version の形式で保存し直す。変換した場合は True。"""
+    with journal_lock(json_path):
+        try:
+            if not _is_book(load_json(json_path)):
+                return False
+        except (OSError, ValueError):
+            return False
+        book_data = load_book(json_path)
+        size_before = os.path.getsize(json_path)
+        save_book(json_path, book_data, version=version)
+        print(f"{json_path}: {version} ({size_before} → {os.path.getsize(json_path)} bytes)")
+        return True
+
+
+def process_data_folder(data_folder: str, version: str = BOOK_VERSION_V3) -> int:
+    converted = 0
+    for dirpath, dirnames, filenames in os.walk(data_folder):
+        # シャードフォルダと旧形式の退避先は見ない
+        dirnames[:] = [d for d in dirnames if not d.endswith(SHARD_DIR_SUFFIX) and d != "old"]
+        for name in sorted(filenames):
+            if name.endswith(".json") and convert_book(os.path.join(dirpath, name), version):
+                converted += 1
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="book JSON を 3.0.0 形式に変換する（--down で 2.0.0 に戻す）")
+    parser.add_argument("data_folder", help="変換するフォルダ（サブフォルダも対象）")
+    parser.add_argument("--down", action="store_true", help="2.0.0 形式に戻す")
+    args = parser.parse_args()
+
+    count = process_data_folder(args.data_folder, BOOK_VERSION_V2 if args.down else BOOK_VERSION_V3)
+    print(f"{count}冊を変換しました")
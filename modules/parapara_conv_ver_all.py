@@ -1,9 +1,16 @@
 import os
 import sys
-import json
 import shutil
 from collections import OrderedDict
 
+if __name__ == "__main__":
+    # python modules/parapara_conv_ver_all.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories.json_repo import load_json, save_json_atomic
+
 def process_data_folder(data_folder):
     # 1. data/oldフォルダを作成
     old_folder = os.path.join(data_folder, "old")
@@ -20,8 +27,7 @@ def process_data_folder(data_folder):
         if not os.path.exists(json_path):
             continue
 
-        with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = load_json(json_path)
 
         # 4. data["version"]がなければ処理を実行、それ以外はスキップ
         if "version" not in data:
@@ -38,8 +44,7 @@ def process_data_folder(data_folder):
             data = OrderedDict([("version", data["version"])] + list(data.items()))
 
             # 元のファイル(dataフォルダ直下)に出力
-            with open(json_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
+            save_json_atomic(json_path, data, indent=4)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
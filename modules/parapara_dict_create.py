@@ -6,6 +6,14 @@ import csv
 import os
 from collections import Counter
 
+if __name__ == "__main__":
+    # python modules/parapara_dict_create.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories.book_repo import load_book
+
 def read_dict(filename):
     result = {}
     if not os.path.exists(filename):
@@ -95,11 +103,7 @@ def remove_common_words(key: str) -> str:
 
 # json を読み込んでobjectを戻す
 def load_json(json_path: str):
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+    return load_book(json_path)
 
 def main():
     if len(sys.argv) < 2:
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+parapara_dict_incremental.py
+
+対訳辞書が変わったとき、置換し直す必要のある段落だけを選ぶためのモジュール。
+
+- 直前に適用した辞書の内容と、適用したページの状態を <json>.dictstate に保存する
+  （ページの状態 = src_joined / src_replaced の CRC32。他の処理が書き換えたページは検知できる）
+- 新しい辞書との差分（追加・削除・値の変更があったキー）を求め、そのキーを含む段落だけを候補にする
+- 候補探しには src_joined の英字トークン → 段落 の転置インデックスを使う（ページ単位でメモリに保持）
+
+キーを含むかどうかは「キーの英字の並び（英字以外で区切った1語）が、段落の英字の並びとして現れるか」で判定する。
+キーは前後が英字でない位置にしか一致しないので、キー内の英字の並びは本文でもそのまま1語として現れる。
+英字を含まないキーが変わった場合や、状態が記録されていないページは、従来どおりページ全体を置換し直す。
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.repositories.json_repo import load_json, save_json_atomic
+
+DICT_STATE_SUFFIX = ".dictstate"
+
+_TOKEN_RE = re.compile(r"[A-Za-z]+")
+
+# json_path -> {page_key: (src_joined の CRC, {トークン: {段落ID}})}
+# どちらのキャッシュも、ブックのキャッシュ（BOOK_STORE_MAX_BOOKS）と同じ冊数まで、最近使ったものだけを残す
+_index_cache: "OrderedDict[str, Dict[str, Tuple[int, Dict[str, Set[str]]]]]" = OrderedDict()
+# dictstate のパス -> ((mtime_ns, size), 状態)
+_state_cache: "OrderedDict[str, Tuple[Tuple[int, int], Dict[str, Any]]]" = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def _max_books() -> int:
+    value = os.getenv("BOOK_STORE_MAX_BOOKS", "").strip()
+    return max(1, int(value)) if value.isdigit() else 4
+
+
+def _touch(cache: OrderedDict, key: str) -> None:
+    # _index_lock を持った状態で呼ぶ
+    cache.move_to_end(key)
+    limit = _max_books()
+    while len(cache) > limit:
+        cache.popitem(last=False)
+
+
+def dict_state_path(json_path: str) -> str:
+    return json_path + DICT_STATE_SUFFIX
+
+
+def _tokens(text: str) -> Set[str]:
+    return {t.lower() for t in _TOKEN_RE.findall(text or "")}
+
+
+def _crc(paragraphs: Dict[str, Any], field: str) -> int:
+    crc = 0
+    for pid, p in paragraphs.items():
+        crc = zlib.crc32(f"{pid}\x00{p.get(field) or ''}\x01".encode("utf-8"), crc)
+    return crc
+
+
+def page_signature(page: Dict[str, Any]) -> Tuple[int, int]:
+    """ページの (src_joined の CRC, src_replaced の CRC)。"""
+    paragraphs = (page or {}).get("paragraphs", {}) or {}
+    return _crc(paragraphs, "src_joined"), _crc(paragraphs, "src_replaced")
+
+
+def load_dict_state(json_path: str) -> Optional[Dict[str, Any]]:
+    """保存済みの状態を返す（mtime/サイズが変わらなければ前回読んだものを使い回す）。"""
+    path = dict_state_path(json_path)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    signature = (st.st_mtime_ns, st.st_size)
+    with _index_lock:
+        cached = _state_cache.get(path)
+        if cached is not None and cached[0] == signature:
+            _state_cache.move_to_end(path)
+            return cached[1]
+    try:
+        state = load_json(path)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict):
+        return None
+    with _index_lock:
+        _state_cache[path] = (signature, state)
+        _touch(_state_cache, path)
+    return state
+
+
+def save_dict_state(json_path: str, matcher: Any, pages: Dict[str, Tuple[int, int]]) -> None:
+    save_json_atomic(
+        dict_state_path(json_path),
+        {
+            "version": matcher.fingerprint,
+            "cs": matcher.dict_cs,
+            "ci": matcher.dict_ci,
+            "pages": {k: list(v) for k, v in pages.items()},
+        },
+        indent=None,
+    )
+
+
+def _forget(json_path: str) -> None:
+    with _index_lock:
+        _index_cache.pop(os.path.abspath(json_path), None)
+        _state_cache.pop(dict_state_path(json_path), None)
+
+
+def discard_dict_state(json_path: str) -> None:
+    """状態を捨てる（段落を作り直したときなど。次の置換はページ全体で行う）。"""
+    try:
+        os.remove(dict_state_path(json_path))
+    except FileNotFoundError:
+        pass
+    _forget(json_path)
+
+
+def move_dict_state(src_json_path: str, dest_json_path: str) -> None:
+    """ブックの移動に合わせて状態も移動する（ページの CRC は中身だけで決まるので、移動先でもそのまま使える）。"""
+    if os.path.exists(dict_state_path(src_json_path)):
+        os.replace(dict_state_path(src_json_path), dict_state_path(dest_json_path))
+    _forget(src_json_path)
+
+
+def _changed_keys(old: Dict[str, str], new: Dict[str, str]) -> Set[str]:
+    keys = {k for k in new if old.get(k) != new[k]}
+    keys.update(k for k in old if k not in new)
+    return keys
+
+
+def _page_index(json_path: str, page_key: str, page: Dict[str, Any], joined_crc: int) -> Dict[str, Set[str]]:
+    key = os.path.abspath(json_path)
+    with _index_lock:
+        pages = _index_cache.get(key)
+        cached = pages.get(page_key) if pages is not None else None
+        if cached is not None and cached[0] == joined_crc:
+            _index_cache.move_to_end(key)
+            return cached[1]
+    index: Dict[str, Set[str]] = {}
+    for pid, p in ((page or {}).get("paragraphs", {}) or {}).items():
+        for token in _tokens(p.get("src_joined", "")):
+            index.setdefault(token, set()).add(str(pid))
+    with _index_lock:
+        _index_cache.setdefault(key, {})[page_key] = (joined_crc, index)
+        _touch(_index_cache, key)
+    return index
+
+
+def _lookup_tokens(
+    cs_keys: Iterable[str],
+    ci_keys: Iterable[str],
+    dict_cs: Dict[str, str],
+    old_cs: Dict[str, str],
+) -> Optional[Set[str]]:
+    """差分キーごとに、段落がそれを含み得るかを調べるためのトークン（どれか1つでも含めば候補）。
+
+    英字を含まないキーがあれば None（ページ全体を置換し直す）。
+    """
+    lookup: Set[str] = set()
+    ci_tokens: Set[str] = set()
+    for key in cs_keys:
+        tokens = _tokens(key)
+        if not tokens:
+            return None
+        # キーの中で一番長い語を使う（長い語ほど出現する段落が少ない）
+        lookup.add(max(tokens, key=len))
+    for key in ci_keys:
+        tokens = _tokens(key)
+        if not tokens:
+            return None
+        token = max(tokens, key=len)
+        lookup.add(token)
+        ci_tokens.add(token)
+    if ci_tokens:
+        # 大文字小文字無視の置換は、大文字小文字区別の置換結果に対して行われる。
+        # 値にそのトークンを含む cs キーがある段落も候補に入れる
+        for cs_dict in (dict_cs, old_cs):
+            for key, value in cs_dict.items():
+                if _tokens(value) & ci_tokens:
+                    tokens = _tokens(key)
+                    if not tokens:
+                        return None
+                    lookup.add(max(tokens, key=len))
+    return lookup
+
+
+def plan_replacement(
+    json_path: str,
+    book_data: Dict[str, Any],
+    matcher: Any,
+    page_keys: List[str],
+) -> Dict[str, Optional[Set[str]]]:
+    """置換し直す段落を {page_key: 段落IDの集合（None ならページ全体）} で返す。"""
+    pages = book_data.get("pages", {}) or {}
+    state = load_dict_state(json_path) or {}
+    known_pages = state.get("pages") or {}
+    old_cs = state.get("cs") or {}
+    old_ci = state.get("ci") or {}
+    same_version = state.get("version") == matcher.fingerprint
+
+    lookup: Optional[Set[str]] = set()
+    if not same_version:
+        lookup = _lookup_tokens(
+            _changed_keys(old_cs, matcher.dict_cs),
+            _changed_keys(old_ci, matcher.dict_ci),
+            matcher.dict_cs,
+            old_cs,
+        )
+
+    plan: Dict[str, Optional[Set[str]]] = {}
+    for page_key in page_keys:
+        page = pages.get(page_key)
+        if not isinstance(page, dict):
+            continue
+        signature = page_signature(page)
+        known = known_pages.get(page_key)
+        if known is None or tuple(known) != signature or lookup is None:
+            # 前回の置換以降に他の処理が書き換えた / 記録が無いページは全体を置換し直す
+            plan[page_key] = None
+            continue
+        if not lookup:
+            continue
+        index = _page_index(json_path, page_key, page, signature[0])
+        targets: Set[str] = set()
+        for token in lookup:
+            targets.update(index.get(token, ()))
+        if targets:
+            plan[page_key] = targets
+    return plan
+
+
+def record_replacement(
+    json_path: str,
+    book_data: Dict[str, Any],
+    matcher: Any,
+    page_keys: List[str],
+) -> None:
+    """page_keys を matcher の辞書で置換し終えた状態として記録する。
+
+    辞書が変わっていれば、今回の範囲外のページの記録は古い辞書によるものなので捨てる。
+    """
+    state = load_dict_state(json_path) or {}
+    pages: Dict[str, Tuple[int, int]] = {}
+    same_version = state.get("version") == matcher.fingerprint
+    if same_version:
+        pages = {k: tuple(v) for k, v in (state.get("pages") or {}).items()}
+    before = dict(pages)
+    book_pages = book_data.get("pages", {}) or {}
+    for page_key in page_keys:
+        page = book_pages.get(page_key)
+        if isinstance(page, dict):
+            pages[page_key] = page_signature(page)
+    if same_version and pages == before:
+        return
+    save_dict_state(json_path, matcher, pages)
@@ -7,23 +7,132 @@ python translate_json.py 翻訳データ.json 対訳辞書.csv
 
 import json
 import csv
+import hashlib
 import re
 import sys
 import os
 import tempfile
-from typing import Dict, Tuple
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+if __name__ == "__main__":
+    # python modules/parapara_dict_replacer.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
 
 from modules.stream_logger import setup_progress
+from app.repositories.book_journal import paragraph_patch
+from app.repositories.book_repo import load_book, save_book, save_book_changes
+from modules.parapara_dict_incremental import plan_replacement, record_replacement
 
 
-def load_dictionary(dict_file: str) -> Tuple[Dict[str, str], Dict[str, str]]:
-    """CSVの対訳辞書を読み込む
-    3列目がなければ0として扱う。
-    3列目が'0'の場合は大文字小文字を区別せず、'1'の場合は区別して利用する。
-    それ以外の行は辞書として利用しない。
-    Returns:
-        (辞書_ケースセンシティブ, 辞書_ケースインセンシティブ)
+_ASCII_LETTERS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz")
+# トライ木の終端ノードに置換後の値を入れるキー（1文字のキーとは衝突しない）
+_TERMINAL = ""
+# パスごとにコンパイル済み辞書を保持する件数（一時ファイルの辞書が溜まらないように上限を設ける）
+_MATCHER_CACHE_MAX = 8
+
+_matcher_cache: "OrderedDict[str, Tuple[Tuple[int, int], DictMatcher]]" = OrderedDict()
+_merged_cache: "OrderedDict[str, Tuple[tuple, DictMatcher]]" = OrderedDict()
+_matcher_by_dicts: "OrderedDict[Tuple[int, int], DictMatcher]" = OrderedDict()
+_matcher_lock = threading.Lock()
+
+
+def _build_trie(entries: Dict[str, str]) -> dict:
+    root: dict = {}
+    for key, value in entries.items():
+        if not key:
+            continue
+        node = root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[_TERMINAL] = value
+    return root
+
+
+def _replace_by_trie(text: str, root: dict, fold: bool) -> str:
+    """
+    英字に挟まれていない位置から始まり、英字に続かない位置で終わる最長のキーを左から順に置換する。
+    （キーを長い順に並べた正規表現 (?<![A-Za-z])(?:...)(?![A-Za-z]) と同じ結果になる）
+    """
+    if not root or not text:
+        return text
+    out = []
+    n = len(text)
+    last = 0
+    i = 0
+    while i < n:
+        if i > 0 and text[i - 1] in _ASCII_LETTERS:
+            i += 1
+            continue
+        node = root
+        j = i
+        best_end = -1
+        best_value = None
+        while j < n and node:
+            ch = text[j]
+            if fold:
+                for c in ch.lower():
+                    node = node.get(c)
+                    if node is None:
+                        break
+            else:
+                node = node.get(ch)
+            if node is None:
+                break
+            j += 1
+            if _TERMINAL in node and (j == n or text[j] not in _ASCII_LETTERS):
+                best_end = j
+                best_value = node[_TERMINAL]
+        if best_end < 0:
+            i += 1
+            continue
+        out.append(text[last:i])
+        out.append(best_value)
+        last = i = best_end
+    if last == 0:
+        return text
+    out.append(text[last:])
+    return "".join(out)
+
+
+class DictMatcher:
+    """対訳辞書をトライ木にコンパイルしたもの。
+
+    置換の規則は従来の正規表現版と同じで、先に大文字小文字を区別する辞書、
+    次にその結果へ大文字小文字を区別しない辞書を適用する。
     """
+
+    def __init__(self, dict_cs: Dict[str, str], dict_ci: Dict[str, str]) -> None:
+        self.dict_cs = dict_cs
+        self.dict_ci = dict_ci
+        self._trie_cs = _build_trie(dict_cs)
+        # dict_ci のキーは小文字化済み
+        self._trie_ci = _build_trie(dict_ci)
+        self._fingerprint: Optional[str] = None
+
+    @property
+    def fingerprint(self) -> str:
+        """辞書の内容のハッシュ（同じ内容なら同じ値）。"""
+        if self._fingerprint is None:
+            payload = json.dumps([self.dict_cs, self.dict_ci], ensure_ascii=False, sort_keys=True)
+            self._fingerprint = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        return self._fingerprint
+
+    def replace(self, text: str) -> str:
+        text = _replace_by_trie(text, self._trie_cs, fold=False)
+        return _replace_by_trie(text, self._trie_ci, fold=True)
+
+
+def _file_signature(dict_file: str) -> Tuple[int, int]:
+    st = os.stat(dict_file)
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_dictionary_rows(dict_file: str, *, skip_comments: bool = False) -> List[Tuple[str, str, str]]:
+    """辞書ファイルの有効な行を (キー, ラップ済みの値, モード) のリストで返す。"""
     def wrap_value(val: str) -> str:
         # 置換対象がアルファベットのみなら q_ と _q でラップする
         if re.fullmatch(r'[A-Za-z]+', val):
@@ -31,10 +140,13 @@ def load_dictionary(dict_file: str) -> Tuple[Dict[str, str], Dict[str, str]]:
         return val
 
     print(f"辞書ファイルを読み込みます: {dict_file}")
-    dict_cs = {}  # 3列目が1：大文字小文字区別
-    dict_ci = {}  # 3列目が0：大文字小文字無視
+    rows = []
     with open(dict_file, newline='', encoding='utf-8') as f:
-        reader = csv.reader(f, delimiter='\t')
+        lines = f
+        if skip_comments:
+            # 複数辞書のマージ時は、空行とコメント行（ヘッダー含む）を読み飛ばす
+            lines = (line for line in f if line.strip() and not line.lstrip().startswith("#"))
+        reader = csv.reader(lines, delimiter='\t')
         for row in reader:
             if len(row) < 2:
                 continue
@@ -45,11 +157,19 @@ def load_dictionary(dict_file: str) -> Tuple[Dict[str, str], Dict[str, str]]:
             mode = row[2].strip() if len(row) >= 3 and row[2].strip() != "" else "0"
             if mode not in ("0", "1"):
                 continue
-            if mode == "1":
-                dict_cs[key] = value
-            else:
-                # 格納時はキーを小文字に統一しておく
-                dict_ci[key.lower()] = value
+            rows.append((key, value, mode))
+    return rows
+
+
+def _build_dictionaries(rows: Iterable[Tuple[str, str, str]]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    dict_cs = {}  # 3列目が1：大文字小文字区別
+    dict_ci = {}  # 3列目が0：大文字小文字無視
+    for key, value, mode in rows:
+        if mode == "1":
+            dict_cs[key] = value
+        else:
+            # 格納時はキーを小文字に統一しておく
+            dict_ci[key.lower()] = value
     # キーの長さで降順ソート（それぞれについて）
     dict_cs = {k: v for k, v in sorted(dict_cs.items(), key=lambda x: len(x[0]), reverse=True)}
     dict_ci = {k: v for k, v in sorted(dict_ci.items(), key=lambda x: len(x[0]), reverse=True)}
@@ -58,63 +178,170 @@ def load_dictionary(dict_file: str) -> Tuple[Dict[str, str], Dict[str, str]]:
 
     return dict_cs, dict_ci
 
+
+def _read_dictionary(dict_file: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    return _build_dictionaries(_read_dictionary_rows(dict_file))
+
+
+def _remember_dicts(matcher: DictMatcher) -> None:
+    # replace_with_dict(text, dict_cs, dict_ci) から同じ辞書オブジェクトで引けるようにする
+    # （matcher が辞書を参照しているので id は使い回されない）
+    key = (id(matcher.dict_cs), id(matcher.dict_ci))
+    _matcher_by_dicts[key] = matcher
+    _matcher_by_dicts.move_to_end(key)
+    while len(_matcher_by_dicts) > _MATCHER_CACHE_MAX:
+        _matcher_by_dicts.popitem(last=False)
+
+
+def load_dict_matcher(dict_file: str) -> DictMatcher:
+    """辞書ファイルをコンパイルした DictMatcher を返す。パスと mtime/サイズが同じなら使い回す。"""
+    path = os.path.abspath(dict_file)
+    signature = _file_signature(path)
+    with _matcher_lock:
+        cached = _matcher_cache.get(path)
+        if cached is not None and cached[0] == signature:
+            _matcher_cache.move_to_end(path)
+            return cached[1]
+
+    matcher = DictMatcher(*_read_dictionary(dict_file))
+    with _matcher_lock:
+        _matcher_cache[path] = (signature, matcher)
+        _matcher_cache.move_to_end(path)
+        while len(_matcher_cache) > _MATCHER_CACHE_MAX:
+            _matcher_cache.popitem(last=False)
+        _remember_dicts(matcher)
+    return matcher
+
+
+def _merge_signature(dict_paths: Sequence[str]) -> Tuple[Tuple[str, Optional[Tuple[int, int]]], ...]:
+    signature = []
+    for path in dict_paths:
+        path = os.path.abspath(path)
+        try:
+            signature.append((path, _file_signature(path)))
+        except FileNotFoundError:
+            signature.append((path, None))
+    return tuple(signature)
+
+
+def load_merged_dict_matcher(dict_paths: Sequence[str]) -> DictMatcher:
+    """
+    複数の辞書を順に重ねた DictMatcher を返す（同じキーは後の辞書が優先）。
+    一時ファイルに書き出してから読むのと同じ結果になる。存在しない辞書は無視する。
+    各辞書のパスと mtime/サイズが変わらない限り使い回す。
+    """
+    signature = _merge_signature(dict_paths)
+    cache_key = "\0".join(path for path, _ in signature)
+    with _matcher_lock:
+        cached = _merged_cache.get(cache_key)
+        if cached is not None and cached[0] == signature:
+            _merged_cache.move_to_end(cache_key)
+            return cached[1]
+
+    rows: List[Tuple[str, str, str]] = []
+    for path, file_signature in signature:
+        if file_signature is None:
+            continue
+        rows.extend(_read_dictionary_rows(path, skip_comments=True))
+    matcher = DictMatcher(*_build_dictionaries(rows))
+    with _matcher_lock:
+        _merged_cache[cache_key] = (signature, matcher)
+        _merged_cache.move_to_end(cache_key)
+        while len(_merged_cache) > _MATCHER_CACHE_MAX:
+            _merged_cache.popitem(last=False)
+        _remember_dicts(matcher)
+    return matcher
+
+
+def invalidate_dict_matchers(dict_path: Optional[str] = None) -> None:
+    """辞書を書き換えた後に、その辞書を含むコンパイル済みの辞書を破棄する（None なら全部）。
+
+    通常は mtime/サイズの変化で検知できるが、同じサイズで短時間に書き換えた場合に備えて呼ぶ。
+    """
+    target = os.path.abspath(dict_path) if dict_path else None
+    with _matcher_lock:
+        if target is None:
+            _matcher_cache.clear()
+            _merged_cache.clear()
+            return
+        _matcher_cache.pop(target, None)
+        for key in [k for k in _merged_cache if target in k.split("\0")]:
+            del _merged_cache[key]
+
+
+def load_dictionary(dict_file: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """CSVの対訳辞書を読み込む
+    3列目がなければ0として扱う。
+    3列目が'0'の場合は大文字小文字を区別せず、'1'の場合は区別して利用する。
+    それ以外の行は辞書として利用しない。
+    読み込み結果は load_dict_matcher のキャッシュを共有するので、返した辞書は書き換えないこと。
+    Returns:
+        (辞書_ケースセンシティブ, 辞書_ケースインセンシティブ)
+    """
+    matcher = load_dict_matcher(dict_file)
+    return matcher.dict_cs, matcher.dict_ci
+
 def replace_with_dict(text: str, dict_cs: Dict[str, str], dict_ci: Dict[str, str]) -> str:
     """
     text内の語句を、dict_cs (case-sensitive) および dict_ci (case-insensitive) を用いて置換する。
     先に case-sensitive の置換、その後に case-insensitive の置換を行う。
+    load_dictionary で得た辞書ならコンパイル済みのトライ木を使い回す。
     """
-    # 大文字小文字区別の置換 (dict_cs)
-    if dict_cs:
-        pattern_cs = r'(?<![A-Za-z])(?:' + '|'.join(map(re.escape, dict_cs.keys())) + r')(?![A-Za-z])'
-        def repl_cs(match):
-            return dict_cs.get(match.group(0), match.group(0))
-        text = re.sub(pattern_cs, repl_cs, text)
-    # 大文字小文字無視の置換 (dict_ci)
-    if dict_ci:
-        pattern_ci = r'(?i)(?<![A-Za-z])(?:' + '|'.join(map(re.escape, dict_ci.keys())) + r')(?![A-Za-z])'
-        def repl_ci(match):
-            return dict_ci.get(match.group(0).lower(), match.group(0))
-        text = re.sub(pattern_ci, repl_ci, text)
-    return text
+    key = (id(dict_cs), id(dict_ci))
+    with _matcher_lock:
+        matcher = _matcher_by_dicts.get(key)
+        if matcher is None or matcher.dict_cs is not dict_cs or matcher.dict_ci is not dict_ci:
+            matcher = DictMatcher(dict_cs, dict_ci)
+            _remember_dicts(matcher)
+    return matcher.replace(text)
 
 # def count_alphabet_chars(text: str) -> int:
 #     """アルファベットの文字数をカウント"""
 #     return len(re.findall(r'[a-zA-Z]', text))
 
-def file_replace_with_dict(json_path: str, dict_file: str, start_page: int, end_page: int):
-    
-    print(f"処理を開始します ({start_page} 〜 {end_page} ページ)")
-    dict_cs, dict_ci = load_dictionary(dict_file)
+def file_replace_with_dict(json_path: str, dict_file: str, start_page: Optional[int] = None, end_page: Optional[int] = None):
+    """
+    ページ範囲（省略時は全ページ）の段落に対訳辞書を適用して src_replaced を更新する。
+    前回適用した辞書との差分から、影響を受ける段落だけを置換し直す（parapara_dict_incremental）。
+    """
+    matcher = load_dict_matcher(dict_file)
     print(f"辞書の読み込みが完了しました: {dict_file}")
-    
+    return file_replace_with_matcher(json_path, matcher, start_page, end_page)
+
+
+def file_replace_with_matcher(json_path: str, matcher: DictMatcher, start_page: Optional[int] = None, end_page: Optional[int] = None):
+    """file_replace_with_dict のコンパイル済み辞書版（複数辞書をマージした DictMatcher など）。"""
     book_data = load_json(json_path) # jsonを読み込んでobjectを戻す
+    pages = book_data.get("pages", {}) or {}
+    if start_page is None or end_page is None:
+        page_keys = [k for k in pages.keys()]
+    else:
+        page_keys = [str(p) for p in range(start_page, end_page + 1) if str(p) in pages]
+    print(f"処理を開始します ({page_keys[0] if page_keys else '-'} 〜 {page_keys[-1] if page_keys else '-'} ページ)")
+
+    plan = plan_replacement(json_path, book_data, matcher, page_keys)
+    full_pages = sum(1 for targets in plan.values() if targets is None)
+    partial = sum(len(targets) for targets in plan.values() if targets is not None)
+    print(f"置換対象: ページ全体={full_pages} 段落={partial}（範囲 {len(page_keys)} ページ）")
 
     # 対象ページ範囲のパラグラフに対して処理
-    progress = setup_progress(end_page - start_page + 1, "パラグラフ置換中......")
-
-    for page_number in range(start_page, end_page + 1):
-        page_key = str(page_number)
-        if page_key in book_data["pages"]:
-            progress(f"{page_number} Page")
-            page = book_data["pages"][page_key]
-            for paragraph in page["paragraphs"].values():
-                replaced_text = replace_with_dict(paragraph["src_joined"], dict_cs, dict_ci)
-                paragraph["src_replaced"] = replaced_text
-                # 対訳辞書の変更により、置換結果が以前と異なる場合は翻訳状態を "none" に変更
-                # if replaced_text != paragraph.get("src_replaced") and paragraph.get("trans_status") == "auto":
-                #     paragraph["trans_status"] = "none"
-                
-                # alphabet_count = count_alphabet_chars(replaced_text)
-                # if alphabet_count < 1:
-                #     paragraph["trans_auto"] = replaced_text
-                #     paragraph["trans_text"] = replaced_text
-                #     paragraph["trans_status"] = "fixed"
-                # elif alphabet_count < 2:
-                #     paragraph["trans_auto"] = replaced_text
-                #     paragraph["trans_text"] = replaced_text
-                #     paragraph["trans_status"] = "draft"
-
-    atomicsave_json(json_path,book_data) # jsonを保存  
+    progress = setup_progress(len(plan), "パラグラフ置換中......")
+
+    patches = []
+    for page_key, targets in plan.items():
+        progress(f"{page_key} Page")
+        page = pages[page_key]
+        for para_id, paragraph in page["paragraphs"].items():
+            if targets is not None and str(para_id) not in targets:
+                continue
+            replaced_text = matcher.replace(paragraph["src_joined"])
+            if paragraph.get("src_replaced") != replaced_text:
+                patches.append(paragraph_patch(page_key, para_id, {"src_replaced": replaced_text}, ("src_replaced",)))
+            paragraph["src_replaced"] = replaced_text
+
+    # 置換結果が変わった段落だけをジャーナルへ追記する（件数が多い場合は全体を保存）
+    save_book_changes(json_path, book_data, patches)
+    record_replacement(json_path, book_data, matcher, page_keys)
 
     print(f"処理が完了しました: {json_path}")
 
@@ -122,18 +349,11 @@ def file_replace_with_dict(json_path: str, dict_file: str, start_page: int, end_
 
 # json を読み込んでobjectを戻す
 def load_json(json_path: str):
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+    return load_book(json_path)
 
 # アトミックセーブ
 def atomicsave_json(json_path, data):
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path), suffix=".json", text=True)
-    with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmp_file:
-        json.dump(data, tmp_file, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, json_path)
+    save_book(json_path, data)
 
 def main():
     if len(sys.argv) == 3:
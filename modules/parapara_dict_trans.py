@@ -4,6 +4,12 @@ import os
 import csv
 import re
 
+if __name__ == "__main__":
+    # python modules/parapara_dict_trans.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
 from api_translate import translate_text  # 翻訳関数は別ファイルで定義済み
 
 def is_katakana(text):
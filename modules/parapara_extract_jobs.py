@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+parapara_extract_jobs.py
+
+PDFのパラグラフ抽出（extract_paragraphs）をバックグラウンドのジョブとして動かすモジュール。
+
+- 抽出は別プロセス（parapara_extract_worker.py）で行い、進捗はその標準出力で受け取る
+- 抽出し終えたページはチェックポイント（<book>.extract.jsonl）に追記しておき、落ちても続きのページから再開する
+- 実行中のジョブは data/extract_jobs.json に記録しておき、サーバーを再起動したら resume_pending() で再開する
+- 進捗（ページ数・ページ/秒）は print で SSE のログへ流し、status() でも返す
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.repositories.json_repo import load_json, save_json_atomic
+from modules.parapara_extract_worker import ERROR_PREFIX, PROGRESS_PREFIX
+from modules.parapara_pdf2json import checkpoint_path_for
+
+# 進捗をログへ出す間隔（秒）
+_LOG_INTERVAL_SEC = 1.0
+
+_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parapara_extract_worker.py")
+
+
+def _worker_command(pdf_path: str, json_path: str, checkpoint_path: Optional[str]) -> List[str]:
+    if getattr(sys, "frozen", False):
+        # 配布版（exe）は自分自身を --extract-worker 付きで起動する（pdf-paraparatrans.py の先頭で振り分ける）
+        cmd = [sys.executable, "--extract-worker"]
+    else:
+        cmd = [sys.executable, _WORKER_SCRIPT]
+    cmd += [pdf_path, json_path]
+    if checkpoint_path:
+        cmd += ["--checkpoint", checkpoint_path]
+    return cmd
+
+
+def extract_in_subprocess(
+    pdf_path: str,
+    json_path: str,
+    *,
+    checkpoint_path: Optional[str] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> None:
+    """extract_paragraphs() を別プロセスで動かし、終わるまで待つ。失敗したら RuntimeError。
+
+    サーバーのプロセスからはプロセスプールを作らない（parapara_extract_worker.py 参照）。
+    ワーカーの出力は進捗の行を除いてこのプロセスで print し直す。
+    """
+    env = dict(os.environ, PYTHONIOENCODING="utf-8", PYTHONUNBUFFERED="1")
+    proc = subprocess.Popen(
+        _worker_command(pdf_path, json_path, checkpoint_path),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=env,
+        encoding="utf-8",
+        errors="replace",
+    )
+    error = None
+    last_line = ""
+    with proc:
+        for line in proc.stdout:
+            line = line.rstrip("\r\n")
+            if line.startswith(PROGRESS_PREFIX):
+                if progress is not None:
+                    done, total = (int(v) for v in line[len(PROGRESS_PREFIX):].split())
+                    progress(done, total)
+            elif line.startswith(ERROR_PREFIX):
+                error = line[len(ERROR_PREFIX):]
+            elif line:
+                last_line = line
+                print(line)
+    if proc.returncode != 0:
+        raise RuntimeError(error or last_line or f"抽出プロセスが終了コード {proc.returncode} で終了しました")
+
+
+class ExtractJob:
+    """1冊分の抽出ジョブの状態。state は queued → running → done / error。"""
+
+    def __init__(self, pdf_name: str, pdf_path: str, json_path: str) -> None:
+        self.pdf_name = pdf_name
+        self.pdf_path = pdf_path
+        self.json_path = json_path
+        self.checkpoint_path = checkpoint_path_for(json_path)
+        self.state = "queued"
+        self.message = ""
+        self.done = 0
+        self.total = 0
+        self.resumed_from: Optional[int] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._first_page_at: Optional[float] = None
+        self._last_log_at = 0.0
+        self._finished = threading.Event()
+
+    def _on_progress(self, done: int, total: int) -> None:
+        now = time.time()
+        if self.resumed_from is None:
+            # 最初の呼び出しはチェックポイントから読み込んだページ数（新規なら0）
+            self.resumed_from = done
+            self._first_page_at = now
+        self.done = done
+        self.total = total
+        if done >= total or now - self._last_log_at >= _LOG_INTERVAL_SEC:
+            self._last_log_at = now
+            print(f"パラグラフ抽出 {self.pdf_name}: {done}/{total}ページ ({self.pages_per_sec():.1f}ページ/秒)")
+
+    def pages_per_sec(self) -> float:
+        # チェックポイントから読み込んだページは数えない
+        if self._first_page_at is None or self.resumed_from is None:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self._first_page_at
+        if elapsed <= 0:
+            return 0.0
+        return (self.done - self.resumed_from) / elapsed
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._finished.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "pdf_name": self.pdf_name,
+            "state": self.state,
+            "message": self.message,
+            "done": self.done,
+            "total": self.total,
+            "resumed_from": self.resumed_from,
+            "pages_per_sec": round(self.pages_per_sec(), 2),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ExtractJobManager:
+    """抽出ジョブを max_jobs 本ずつ順に動かす（抽出自体がプロセスを並べるので既定は1本）。
+
+    同じブックのジョブが終わっていなければ、start() は新しく作らずにそのジョブを返す。
+    on_done(job) は抽出が成功したあとに呼ぶ（キャッシュの破棄などに使う）。
+    """
+
+    def __init__(
+        self,
+        registry_path: str,
+        *,
+        extract: Callable[..., Any] = extract_in_subprocess,
+        on_done: Optional[Callable[[ExtractJob], None]] = None,
+        max_jobs: int = 1,
+    ) -> None:
+        self.registry_path = registry_path
+        self._extract = extract
+        self._on_done = on_done
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(max(1, int(max_jobs)))
+        self._jobs: Dict[str, ExtractJob] = {}
+
+    def _load_registry(self) -> Dict[str, Dict[str, str]]:
+        # 呼び出し側で self._lock を取っていること
+        if not os.path.exists(self.registry_path):
+            return {}
+        try:
+            data = load_json(self.registry_path)
+        except (OSError, ValueError) as e:
+            print(f"抽出ジョブの記録を読み込めませんでした: {e}")
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _update_registry(self, job: ExtractJob, running: bool) -> None:
+        with self._lock:
+            registry = self._load_registry()
+            if running:
+                registry[job.pdf_name] = {"pdf_path": job.pdf_path, "json_path": job.json_path}
+            elif registry.pop(job.pdf_name, None) is None:
+                return
+            save_json_atomic(self.registry_path, registry)
+
+    def start(self, pdf_name: str, pdf_path: str, json_path: str) -> ExtractJob:
+        with self._lock:
+            job = self._jobs.get(pdf_name)
+            if job is not None and job.state in ("queued", "running"):
+                return job
+            job = ExtractJob(pdf_name, pdf_path, json_path)
+            self._jobs[pdf_name] = job
+        self._update_registry(job, True)
+        threading.Thread(target=self._run, args=(job,), name=f"extract-{pdf_name}", daemon=True).start()
+        return job
+
+    def _run(self, job: ExtractJob) -> None:
+        with self._slots:
+            job.state = "running"
+            job.started_at = time.time()
+            try:
+                self._extract(
+                    job.pdf_path,
+                    job.json_path,
+                    checkpoint_path=job.checkpoint_path,
+                    progress=job._on_progress,
+                )
+            except Exception as e:
+                # チェックポイントは残しておくので、次に抽出を始めたときは続きから再開する
+                job.state = "error"
+                job.message = str(e)
+                print(f"パラグラフ抽出に失敗しました {job.pdf_name}: {e}")
+            else:
+                job.state = "done"
+            job.finished_at = time.time()
+        try:
+            self._update_registry(job, False)
+            if job.state == "done" and self._on_done is not None:
+                self._on_done(job)
+        except Exception as e:
+            print(f"抽出ジョブの後処理に失敗しました {job.pdf_name}: {e}")
+        finally:
+            job._finished.set()
+
+    def resume_pending(self) -> List[ExtractJob]:
+        """前回のサーバーで終わらなかったジョブを再開する（チェックポイントがあれば続きから）。"""
+        with self._lock:
+            registry = self._load_registry()
+        jobs = []
+        for pdf_name, entry in registry.items():
+            pdf_path = (entry or {}).get("pdf_path")
+            json_path = (entry or {}).get("json_path")
+            if not pdf_path or not json_path or not os.path.isfile(pdf_path) or os.path.exists(json_path):
+                job = ExtractJob(pdf_name, pdf_path or "", json_path or "")
+                self._update_registry(job, False)
+                continue
+            jobs.append(self.start(pdf_name, pdf_path, json_path))
+        return jobs
+
+    def get(self, pdf_name: str) -> Optional[ExtractJob]:
+        with self._lock:
+            return self._jobs.get(pdf_name)
+
+    def status(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in sorted(jobs, key=lambda j: j.created_at)]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+parapara_extract_worker.py
+
+パラグラフ抽出（extract_paragraphs）をサーバーとは別のプロセスで動かすための入口。
+parapara_extract_jobs.py の extract_in_subprocess() がこのファイル（配布版では exe を --extract-worker 付き）で起動する。
+
+- サーバーのプロセスは Flask のスレッドを持っているので、そこからプロセスプールを fork するとロックを抱えたまま
+  止まることがある。プロセスプールはこのプロセスから spawn で作る（ワーカーが読み込むのはこのファイルと
+  parapara_pdf2json だけで、アプリ本体は読み込まない）
+- 進捗は "@@progress 抽出済みページ数 全ページ数"、失敗は "@@error メッセージ" の行で標準出力に書く。
+  それ以外の出力はサーバー側でそのまま print し直す（ログはサーバー側で書く）
+
+使い方: python modules/parapara_extract_worker.py <pdf> <json> [--checkpoint <path>]
+"""
+
+import argparse
+import os
+import sys
+import traceback
+
+PROGRESS_PREFIX = "@@progress "
+ERROR_PREFIX = "@@error "
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description="Extract paragraphs from a PDF into a book JSON.")
+    parser.add_argument("pdf_path")
+    parser.add_argument("json_path")
+    parser.add_argument("--checkpoint", default=None, help="チェックポイントのパス（あれば続きから抽出する）")
+    args = parser.parse_args(argv)
+
+    # サーバーは UTF-8 の行単位で読む
+    sys.stdout.reconfigure(encoding="utf-8", errors="replace", line_buffering=True)
+
+    # プロセスプールのワーカーがこのファイルを読み込み直すときに pdf2json まで読まなくて済むよう、ここで import する
+    from parapara_pdf2json import extract_paragraphs
+
+    def report(done: int, total: int) -> None:
+        print(f"{PROGRESS_PREFIX}{done} {total}")
+
+    try:
+        extract_paragraphs(args.pdf_path, args.json_path, checkpoint_path=args.checkpoint, progress=report)
+    except Exception as e:
+        traceback.print_exc(file=sys.stdout)
+        print(f"{ERROR_PREFIX}{e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    # python modules/parapara_extract_worker.py で起動したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+    raise SystemExit(main(sys.argv[1:]))
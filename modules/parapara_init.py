@@ -2,6 +2,15 @@ import os
 import sys
 import json
 
+if __name__ == "__main__":
+    # python modules/parapara_init.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories.book_repo import SHARD_DIR_SUFFIX, load_book
+from app.repositories.json_repo import load_json, save_json_atomic
+
 
 def parapara_init(data_folder, settings_folder=None):
     if settings_folder is None:
@@ -9,8 +18,7 @@ def parapara_init(data_folder, settings_folder=None):
     # 1. paraparatrans.settings.jsonを読み込み。存在しなければ空の辞書を生成。
     settings_path = os.path.join(settings_folder, "paraparatrans.settings.json")
     if os.path.exists(settings_path):
-        with open(settings_path, "r", encoding="utf-8") as f:
-            settings = json.load(f)
+        settings = load_json(settings_path)
     else:
         settings = {}
 
@@ -24,6 +32,8 @@ def parapara_init(data_folder, settings_folder=None):
             return True
         if name.startswith("."):
             return True
+        if name.endswith(SHARD_DIR_SUFFIX):
+            return True
         return name in ignored_dirs
 
     pdf_files = []
@@ -43,8 +53,7 @@ def parapara_init(data_folder, settings_folder=None):
 
         if os.path.exists(json_file):
             try:
-                with open(json_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
+                data = load_book(json_file)
 
                 # 4. data["version"]が1.0.0でなければ以降の処理はスキップ
                 if data.get("version") != "2.0.0":
@@ -81,8 +90,8 @@ def parapara_init(data_folder, settings_folder=None):
 
     # 6. paraparatrans.settings.jsonに出力
     os.makedirs(settings_folder, exist_ok=True)
-    with open(settings_path, "w", encoding="utf-8") as f:
-        json.dump(settings, f, ensure_ascii=False, indent=4)
+    # 設定ファイルは手で見ることもあるので JSON_COMPACT でも字下げして書く
+    save_json_atomic(settings_path, settings, indent=4, compact=False)
     
     return settings
 
@@ -12,11 +12,19 @@ Example as function:
     from parapara_join import join_paragraphs_in_file
     data = join_paragraphs_in_file("data.json")
 """
-import os
-import json
-import tempfile
 import argparse
 
+import os
+import sys
+
+if __name__ == "__main__":
+    # python modules/parapara_join.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories.book_repo import load_book, save_book
+
 def join_replaced_paragraphs(book_data):
     """
     ドキュメント全体の段落を page, order 順にソートし、
@@ -101,20 +109,13 @@ def join_replaced_paragraphs_in_file(json_file):
     return data
 
 
-# json を読み込んでobjectを戻す
+# json を読み込んでobjectを戻す（3.0.0 形式やシャード形式も 2.0.0 の形にして返す）
 def load_json(json_path: str):
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+    return load_book(json_path)
 
 # アトミックセーブ
 def atomicsave_json(json_path, data):
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path), suffix=".json", text=True)
-    with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmp_file:
-        json.dump(data, tmp_file, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, json_path)
+    save_book(json_path, data)
 
 def main():
     parser = argparse.ArgumentParser(description='join フラグに基づいて src_joined をマージする')
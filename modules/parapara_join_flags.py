@@ -21,6 +21,16 @@ import tempfile
 import argparse
 import re
 
+import sys
+
+if __name__ == "__main__":
+    # python modules/parapara_join_flags.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories.book_repo import load_book, save_book
+
 def load_symbol_fonts(file_path=None):
     """
     シンボルフォント名リストをファイルから読み込む。未指定/ファイル未検出時はデフォルトリストを返す。
@@ -71,18 +81,11 @@ def join_flags_in_file(json_file, symbol_font_file=None):
 
 # json を読み込んでobjectを戻す(テスト用)
 def load_json(json_path: str):
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+    return load_book(json_path)
 
 # アトミックセーブ
 def atomicsave_json(json_path, data):
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path), suffix=".json", text=True)
-    with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmp_file:
-        json.dump(data, tmp_file, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, json_path)
+    save_book(json_path, data)
 
 
 def main():
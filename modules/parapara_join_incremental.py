@@ -197,14 +197,12 @@ def find_run_end_index(refs: List[ParaRef], base_i: int) -> int:
     return end
 
 
-def rebuild_run(refs: List[ParaRef], base_i: int, *, sep: str = "") -> List[int]:
+def run_members(refs: List[ParaRef], base_i: int) -> List[int]:
     """
-    base_i を起点に run を再構築して src_joined を書き換える。
-
-    - base: src_joined = src_text(base)+sep+src_text(join=1...).
-    - join=1側: src_joined = "".
+    base_i を起点とする run に含まれる段落の index リスト(ベース含む)を返す。src_joined は書き換えない。
 
-    戻り値: run に含めた段落の index リスト(ベース含む)。
+    - base の block_tag が 'p' 以外: base から run の終端までの全段落
+    - base の block_tag が 'p': そのうち block_tag が 'p' の join=1 段落だけ(間の他 block_tag は含めない)
     """
     if base_i is None or base_i < 0 or base_i >= len(refs):
         return []
@@ -225,6 +223,23 @@ def rebuild_run(refs: List[ParaRef], base_i: int, *, sep: str = "") -> List[int]
             if _is_p_tag(_block_tag(pk)) and _join_flag(pk) == 1:
                 members.append(k)
 
+    return members
+
+
+def rebuild_run(refs: List[ParaRef], base_i: int, *, sep: str = "") -> List[int]:
+    """
+    base_i を起点に run を再構築して src_joined を書き換える。
+
+    - base: src_joined = src_text(base)+sep+src_text(join=1...).
+    - join=1側: src_joined = "".
+
+    戻り値: run に含めた段落の index リスト(ベース含む)。
+    """
+    members = run_members(refs, base_i)
+    if not members:
+        return []
+    base_p = refs[base_i].p
+
     parts: List[str] = [_src_text(refs[k].p) for k in members]
     joined = sep.join(parts) if sep != "" else "".join(parts)
 
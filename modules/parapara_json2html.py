@@ -2,10 +2,17 @@ import json
 import sys
 import os
 
+if __name__ == "__main__":
+    # python modules/parapara_json2html.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories.book_repo import load_book
+
 def json2html(json_file_path: str):
-    # JSONファイルの読み込み
-    with open(json_file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # JSONファイルの読み込み（未畳み込みの編集ジャーナルも反映）
+    data = load_book(json_file_path)
 
     title = data.get("title", "PDF 翻訳")
     # 目次と本文のエントリを保持する変数
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+parapara_library_search.py
+
+data/ 以下の全ブック（PDF・URLブック）を横断して段落を検索するモジュール。
+
+- 段落は app/repositories/library_index.py の SQLite 索引に入れておき、検索時にブックの JSON は開かない
+- 索引の更新はバックグラウンドのスレッドで行う。一定間隔（または request_refresh() のたび）に
+  ブックの一覧を取り、book_signature が索引作成時から変わったブックだけを読み直して入れ替える
+- ヒットの判定とスニペットは /api/search（parapara_search.py）と同じ規則
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from app.repositories.book_repo import book_signature, load_book
+from app.repositories.json_repo import dumps, loads
+from app.repositories.library_index import LibraryIndex, encode_signature
+from modules.parapara_search import (
+    _IndexedParagraph,
+    _make_snippet,
+    _parse_terms,
+    _to_hiragana,
+    _to_katakana,
+)
+
+# 1回の検索で判定するヒット数の上限。超えたら打ち切り、件数とファセットは下限値になる
+MAX_MATCHES = 5000
+
+
+def book_rows(book_data: Dict[str, Any]) -> List[tuple]:
+    """LibraryIndex.replace_book() に渡す段落の行を作る。"""
+    rows = []
+    for page_key, page in ((book_data or {}).get("pages", {}) or {}).items():
+        for pid, p in ((page or {}).get("paragraphs", {}) or {}).items():
+            if not isinstance(p, dict):
+                continue
+            para = _IndexedParagraph(str(page_key), str(pid), p)
+            if not para.folded:
+                continue
+            fields = [None if f is None else [f[0], _make_snippet(f[1])] for f in para.fields]
+            rows.append(
+                (
+                    para.page_number,
+                    para.id,
+                    para.sort[1],
+                    para.sort[2],
+                    para.sort[3],
+                    para.folded,
+                    dumps(fields),
+                )
+            )
+    return rows
+
+
+def _hit_snippet(fields: List[Optional[List[str]]], terms: List[str]) -> Optional[str]:
+    # _IndexedParagraph.hit_snippet と同じ判定（スニペットは索引作成時に作ったもの）
+    for field in fields:
+        if not field:
+            continue
+        s = field[0]
+        normset = (s, _to_hiragana(s), _to_katakana(s))
+        if all(any(t in n for n in normset) for t in terms):
+            return field[1]
+    return None
+
+
+class LibrarySearch:
+    """ライブラリ横断検索と、その索引を最新に保つバックグラウンドの更新処理。
+
+    list_books() はブックごとに pdf_name / json_path / title / book_type を持つ dict を返すこと。
+    一覧は更新のたびに取るので、ブックを読み込まずに作ること。title は省略でき、その場合は索引し直すときに
+    読み込んだ book_data の title を使う。
+    """
+
+    def __init__(
+        self,
+        index: LibraryIndex,
+        list_books: Callable[[], Iterable[Dict[str, Any]]],
+        *,
+        load: Callable[[str], Any] = load_book,
+        interval_sec: float = 60.0,
+    ) -> None:
+        self.index = index
+        self._list_books = list_books
+        self._load = load
+        self.interval_sec = max(1.0, float(interval_sec))
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats: Dict[str, Any] = {
+            "refreshes": 0,
+            "books_indexed": 0,
+            "books_removed": 0,
+            "books_failed": 0,
+            "last_refresh_at": None,
+            "last_refresh_sec": None,
+        }
+
+    def refresh(self) -> Dict[str, int]:
+        """ブックの一覧と索引を突き合わせ、変わったブックだけを索引し直す。"""
+        with self._refresh_lock:
+            started = time.time()
+            known = self.index.book_signatures()
+            seen = set()
+            counts = {"indexed": 0, "unchanged": 0, "removed": 0, "failed": 0}
+            for book in self._list_books():
+                pdf_name = book.get("pdf_name")
+                json_path = book.get("json_path")
+                if not pdf_name or not json_path or pdf_name in seen:
+                    continue
+                seen.add(pdf_name)
+                book_type = str(book.get("book_type") or "pdf")
+                signature = encode_signature(book_signature(json_path))
+                if not signature:
+                    continue
+                cached = known.get(pdf_name)
+                if cached is not None and cached == (json_path, signature):
+                    counts["unchanged"] += 1
+                    continue
+                try:
+                    book_data = self._load(json_path)
+                    rows = book_rows(book_data)
+                except Exception as e:
+                    print(f"ライブラリ索引: {pdf_name} を読み込めませんでした: {e}")
+                    counts["failed"] += 1
+                    continue
+                title = str(book.get("title") or (book_data or {}).get("title") or pdf_name)
+                # 読み込み中に書き換えられていたら、古い signature で登録されるだけなので次回作り直しになる
+                self.index.replace_book(
+                    pdf_name,
+                    json_path=json_path,
+                    title=title,
+                    book_type=book_type,
+                    signature=signature,
+                    rows=rows,
+                )
+                counts["indexed"] += 1
+            counts["removed"] = self.index.remove_books(name for name in known if name not in seen)
+            self._stats["refreshes"] += 1
+            self._stats["books_indexed"] += counts["indexed"]
+            self._stats["books_removed"] += counts["removed"]
+            self._stats["books_failed"] += counts["failed"]
+            self._stats["last_refresh_at"] = started
+            self._stats["last_refresh_sec"] = round(time.time() - started, 3)
+            return counts
+
+    def resign(self, json_path: str, before: Sequence[int], after: Sequence[int]) -> None:
+        """BookStore の on_resign 用。畳み込みだけで内容が変わっていないブックを読み直さない。"""
+        self.index.resign(json_path, encode_signature(before), encode_signature(after))
+
+    def search(
+        self,
+        query: str,
+        *,
+        offset: int = 0,
+        limit: int = 50,
+        pdf_names: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Any]:
+        """ヒットした段落の offset 件目から limit 件と、ブックごとの件数（facets）を返す。"""
+        terms = _parse_terms(query)
+        offset = max(0, int(offset))
+        limit = max(1, min(int(limit), 500))
+        result: Dict[str, Any] = {"total": 0, "truncated": False, "results": [], "facets": []}
+        if not terms:
+            return result
+
+        folded_terms = [_to_hiragana(t) for t in terms]
+        key = max(folded_terms, key=len)
+        others = [t for t in folded_terms if t != key]
+        results: List[Dict[str, Any]] = result["results"]
+        facets: Dict[str, Dict[str, Any]] = {}
+
+        def visit(row) -> bool:
+            pdf_name, title, book_type, page_number, pid, fields_json = row
+            fields = loads(fields_json)
+            if others:
+                folded = [_to_hiragana(f[0]) for f in fields if f]
+                if any(not any(t in f for f in folded) for t in others):
+                    return True
+            snippet = _hit_snippet(fields, terms)
+            if snippet is None:
+                return True
+            if offset <= result["total"] < offset + limit:
+                results.append(
+                    {
+                        "pdf_name": pdf_name,
+                        "title": title,
+                        "book_type": book_type,
+                        "page_number": page_number,
+                        "id": pid,
+                        "snippet": snippet,
+                    }
+                )
+            result["total"] += 1
+            facet = facets.get(pdf_name)
+            if facet is None:
+                facet = facets[pdf_name] = {"pdf_name": pdf_name, "title": title, "book_type": book_type, "count": 0}
+            facet["count"] += 1
+            if result["total"] >= MAX_MATCHES:
+                result["truncated"] = True
+                return False
+            return True
+
+        self.index.scan_candidates(key, visit, pdf_names=pdf_names)
+        result["facets"] = sorted(facets.values(), key=lambda f: (-f["count"], f["title"].lower()))
+        return result
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="library-indexer", daemon=True)
+        self._thread.start()
+
+    def request_refresh(self) -> None:
+        """次の間隔を待たずに索引の更新を始めさせる。"""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"ライブラリ索引の更新に失敗しました: {e}")
+            self._wake.wait(self.interval_sec)
+            self._wake.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats.update(self.index.stats())
+        stats["running"] = self._thread is not None and self._thread.is_alive()
+        stats["updating"] = self._refresh_lock.locked()
+        stats["interval_sec"] = self.interval_sec
+        return stats
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.index.close()
@@ -5,30 +5,31 @@ Merge ver1.0.0 translation data into ver2.0.0 parapara JSON with optimized looku
 """
 import os
 import sys
-import json
-import tempfile
 import argparse
 
+if __name__ == "__main__":
+    # python modules/parapara_merge_1to2.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories import json_repo
+from app.repositories.book_repo import load_book, save_book
+
 
 def load_json(path: str):
-    if not os.path.isfile(path):
-        raise FileNotFoundError(f"{path} not found")
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return json_repo.load_json(path)
 
 
 def atomicsave_json(path: str, data):
     # 安全に上書き保存
-    dirpath = os.path.dirname(path) or '.'
-    fd, tmp = tempfile.mkstemp(dir=dirpath, suffix='.tmp', text=True)
-    with os.fdopen(fd, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
+    json_repo.save_json_atomic(path, data)
 
 
 def merge_translation_data(v1_path: str, v2_path: str):
     v1 = load_json(v1_path)
-    v2 = load_json(v2_path)
+    # 3.0.0 形式・シャード形式のブックも 2.0.0 の形で読み込む
+    v2 = load_book(v2_path)
 
     # versionチェック
     if v1.get("version") != "1.0.0":
@@ -71,7 +72,7 @@ def merge_translation_data(v1_path: str, v2_path: str):
             p2["order"]        = p1.get("order",        p2.get("order"))
             print(f"Processing page {page}, id {p2.get('id')}")
 
-    atomicsave_json(v2_path, v2)
+    save_book(v2_path, v2)
     print(f"Updated translation data saved to: {v2_path}")
 
 
@@ -21,17 +21,115 @@ import os
 import sys
 import tempfile
 import pathlib
-import json
+import bisect
+import math
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from contextlib import ExitStack
+from collections import deque
+from itertools import chain, islice, repeat
+from typing import Callable, List, Dict, Any, Optional
 import fitz  # PyMuPDF
 from fitz import TOOLS  # TOOLS をインポート
 from typing import Union
+
+if __name__ == "__main__":
+    # python modules/parapara_pdf2json.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
 from parapara_blocks_to_paragraphs import block_to_paragraphs
-from header_footer import get_header_y1_footer_y0
+from header_footer import header_footer_from_stats, page_header_footer_stat
+
+from app.repositories.book_repo import BookStreamWriter
+from app.repositories import json_repo
 
 Block = Dict[str, Any] # ブロックを辞書形式で定義
 
+# 重なり判定の空間索引で使う格子の幅（pt）
+_GRID_CELL = 48.0
+
+
+def _finite(*values: float) -> bool:
+    return all(math.isfinite(v) for v in values)
+
+
+def _cell_range(v0: float, v1: float) -> range:
+    return range(math.floor(v0 / _GRID_CELL), math.floor(v1 / _GRID_CELL) + 1)
+
+
+class _BoxGrid:
+    """create_boxes_from_blocks 用の格子索引。box の番号を、bbox がかかる格子に登録する。
+
+    box は広がるだけなので、広がった分の格子に追加で登録する。
+    """
+
+    def __init__(self) -> None:
+        self._cells: Dict[tuple, List[int]] = {}
+        self._ranges: List[tuple] = []
+
+    def add(self, i: int, x0: float, y0: float, x1: float, y1: float) -> None:
+        xs, ys = _cell_range(x0, x1), _cell_range(y0, y1)
+        if i == len(self._ranges):
+            self._ranges.append((range(0), range(0)))
+        old_xs, old_ys = self._ranges[i]
+        for cx in xs:
+            for cy in ys:
+                if cx in old_xs and cy in old_ys:
+                    continue
+                self._cells.setdefault((cx, cy), []).append(i)
+        self._ranges[i] = (xs, ys)
+
+    def candidates(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+        """bbox と同じ格子にかかる box の番号（作成順）。重なりの判定は呼び出し側で行う。"""
+        found = set()
+        for cx in _cell_range(x0, x1):
+            for cy in _cell_range(y0, y1):
+                found.update(self._cells.get((cx, cy), ()))
+        return sorted(found)
+
+
+class _ClosedColumns(list):
+    """閉じたカラムのリスト。can_expand_to の判定用に、X の格子ごとに y1 の大きい順で索引を持つ。"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._cells: Dict[int, tuple] = {}
+        self._unbounded: List["Column"] = []
+
+    def append(self, col: "Column") -> None:
+        super().append(col)
+        if not _finite(col.x0, col.x1, col.y1):
+            self._unbounded.append(col)
+            return
+        for cx in _cell_range(col.x0, col.x1):
+            keys, cols = self._cells.setdefault(cx, ([], []))
+            pos = bisect.bisect_right(keys, -col.y1)
+            keys.insert(pos, -col.y1)
+            cols.insert(pos, col)
+
+    def any_overlapping(self, x0: float, x1: float, min_y1: float) -> bool:
+        """y1 が min_y1 以上で、X 範囲 (x0, x1) と重なる閉じたカラムがあるか。"""
+        if not _finite(x0, x1, min_y1):
+            return any(c.y1 >= min_y1 and x0 < c.x1 and x1 > c.x0 for c in self)
+        for c in self._unbounded:
+            if c.y1 >= min_y1 and x0 < c.x1 and x1 > c.x0:
+                return True
+        for cx in _cell_range(x0, x1):
+            entry = self._cells.get(cx)
+            if entry is None:
+                continue
+            keys, cols = entry
+            for i in range(bisect.bisect_right(keys, -min_y1)):
+                c = cols[i]
+                if x0 < c.x1 and x1 > c.x0:
+                    return True
+        return False
+
+
 @dataclass
 class Column:
     x0: float
@@ -113,6 +211,9 @@ class Column:
                 return False
 
         # 閉じたカラムとの X 範囲の重なりをチェック
+        if isinstance(closed_cols, _ClosedColumns):
+            # 索引で「y1 >= self.y0 かつ X 範囲が重なる」閉じたカラムを探す（下のループと同じ判定）
+            return not closed_cols.any_overlapping(new_x0, new_x1, self.y0)
         for closed in closed_cols:
             # 閉じたカラムの y1 が現在のカラムの y0 以上の場合のみチェック(y0は必ず上から処理するので下になることはない)
             if closed.y1 >= self.y0:
@@ -156,6 +257,8 @@ def create_boxes_from_blocks(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any
     block_dict = {block["number"]: block for block in blocks if "number" in block and "bbox" in block}
 
     boxes = []  # 結果として返す boxes のリスト
+    # 作成順で最初に重なるboxを格子索引で探す（座標に inf/nan があるページは全件を見る）
+    grid = _BoxGrid() if all(_finite(*block["bbox"]) for block in block_dict.values()) else None
 
     # block_dictのitemでループ
     # エリアの重なるboxがあればboxに追加
@@ -164,7 +267,9 @@ def create_boxes_from_blocks(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any
         bx0, by0, bx1, by1 = block["bbox"]
         added_to_existing_box = False
 
-        for box in boxes:
+        candidates = grid.candidates(bx0, by0, bx1, by1) if grid is not None else range(len(boxes))
+        for i in candidates:
+            box = boxes[i]
             # エリアが重なるか判定
             if not (bx1 < box["x0"] or bx0 > box["x1"] or by1 < box["y0"] or by0 > box["y1"]):
                 # 重なる場合、boxにブロックを追加
@@ -173,6 +278,8 @@ def create_boxes_from_blocks(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any
                 box["y0"] = min(box["y0"], by0)
                 box["x1"] = max(box["x1"], bx1)
                 box["y1"] = max(box["y1"], by1)
+                if grid is not None:
+                    grid.add(i, box["x0"], box["y0"], box["x1"], box["y1"])
                 added_to_existing_box = True
                 break
 
@@ -186,6 +293,8 @@ def create_boxes_from_blocks(blocks: List[Dict[str, Any]]) -> List[Dict[str, Any
                 "blocks": [block]
             }
             boxes.append(new_box)
+            if grid is not None:
+                grid.add(len(boxes) - 1, bx0, by0, bx1, by1)
 
     for box in boxes:
         text_list = []
@@ -258,15 +367,17 @@ def group_blocks_by_column(blocks: List[Block]) -> List[Column]:
 
     # 開いている列（現在処理中の列）と閉じた列（処理済みの列）を保持
     open_cols: List[Column] = []
-    closed_cols: List[Column] = []
+    closed_cols: List[Column] = _ClosedColumns()
 
     # 未処理ブロックを初期化（リストを使用）
     unprocessed_blocks = list(blocks)  # 辞書はハッシュ可能ではないため、リストを使用
 
     boxes = create_boxes_from_blocks(unprocessed_blocks)  # blocksからboxesを作成
     y0_sorted_boxes = sorted(boxes, key=lambda b: (b["y0"], b["x0"]))  # boxesをy0昇順、x0昇順でソート
+    # 処理済みのboxは順に取り除かれるので、未処理のboxは常に y0_sorted_boxes[index + 1:] になる
+    sweep = all(b["y0"] == b["y0"] for b in y0_sorted_boxes)  # nan があるとソート順が崩れるので打ち切らない
 
-    for box in y0_sorted_boxes:
+    for index, box in enumerate(y0_sorted_boxes):
         # print(f"Processing box: {box["text"]}")  # デバッグ用
 
         # boxと X範囲が重なる開いているカラムを取得
@@ -275,7 +386,6 @@ def group_blocks_by_column(blocks: List[Block]) -> List[Column]:
         # X 範囲が重なるカラムがなければ、新しいカラムを作成してブロックを追加
         if not overlapping:
             created_col = create_new_column(box, open_cols, closed_cols)
-            boxes.remove(box)
             if created_col:
                  pass # カラムが正常に作成された
             continue # 次のboxへ
@@ -310,7 +420,6 @@ def group_blocks_by_column(blocks: List[Block]) -> List[Column]:
                 # 処理後にまだ2つ以上のカラムがoverlappingとして残っている場合は、
                 # それらと重なるため、新しいカラムを生成し、重なる既存カラムをクローズ。
                 create_new_column(box, open_cols, closed_cols)
-                boxes.remove(box)
                 continue  # 次のブロックへ
 
         # 1個のカラムとのみ重なるか、2個以上重なっていたが絞り込みの結果1個になった場合
@@ -323,7 +432,6 @@ def group_blocks_by_column(blocks: List[Block]) -> List[Column]:
                       open_cols.remove(target_col)
                       closed_cols.append(target_col)
                  created_col = create_new_column(box, open_cols, closed_cols)
-                 boxes.remove(box)
                  if created_col:
                       pass # カラムが正常に作成された
                  continue
@@ -334,15 +442,7 @@ def group_blocks_by_column(blocks: List[Block]) -> List[Column]:
              # target_colに複合ブロックを追加した場合のX範囲を取得
              new_x0 = min(target_col.x0, box["x0"])
              new_x1 = max(target_col.x1, box["x1"])
-             conflicting_box = [
-                other_box for other_box in boxes
-                # 自分自身を除外
-                if other_box is not box and
-                # Y範囲が重なるかを判定
-                box["y0"] < other_box["y1"] and box["y1"] > other_box["y0"] and
-                # X範囲が重なるかを判定
-                other_box["x0"] < new_x1 and other_box["x1"] > new_x0
-            ]
+             conflicting_box = _has_conflicting_box(y0_sorted_boxes, index, new_x0, new_x1, sweep)
 
              # 拡張した範囲と衝突するboxがあれば
              if conflicting_box:
@@ -352,110 +452,169 @@ def group_blocks_by_column(blocks: List[Block]) -> List[Column]:
                     open_cols.remove(target_col)
                     closed_cols.append(target_col)
                     created_col = create_new_column(box, open_cols, closed_cols)
-                    boxes.remove(box)
                  if created_col:
                       pass # カラムが正常に作成された
                  continue
 
              # target_colにboxを追加
              target_col.expand_with_box(box)
-             boxes.remove(box)
     # 4. ループ終了後、残った open 列もクローズ
     closed_cols.extend(open_cols)
 
-    return closed_cols
+    return list(closed_cols)
 
-def sort_and_number_columns(columns: List[Column]) -> List[Column]:
+
+def _has_conflicting_box(y0_sorted_boxes: List[Dict[str, Any]], index: int, new_x0: float, new_x1: float, sweep: bool = True) -> bool:
+    """未処理のbox（y0_sorted_boxes[index + 1:]）に、box[index] と Y 範囲が重なり、X 範囲 (new_x0, new_x1) と重なるものがあるか。
+
+    y0 昇順なので、y0 が box の y1 以上になったところで打ち切れる。
     """
-    カラムのリストを受け取り、指定されたルールで並べ替え、番号を付与する。
+    box = y0_sorted_boxes[index]
+    for other_box in islice(y0_sorted_boxes, index + 1, None):
+        if sweep and other_box["y0"] >= box["y1"]:
+            break
+        # Y範囲が重なるかを判定
+        if box["y0"] < other_box["y1"] and box["y1"] > other_box["y0"] and \
+                other_box["x0"] < new_x1 and other_box["x1"] > new_x0:  # X範囲が重なるかを判定
+            return True
+    return False
+
+class _ColumnBuckets:
+    """sort_and_number_columns 用の索引。カラムを X または Y の格子に登録し、格子ごとに key 順で並べておく。
+
+    処理済み（removed[i] が True）のカラムは読み飛ばす。座標に inf/nan があれば全カラムを1つの格子に入れる。
     """
-    sorted_cols: List[Column] = []
-    remaining_cols = set(columns)
-
-    while remaining_cols:
-        # 未処理のカラムの中からY0が最も小さいカラムを「候補カレントカラム」として選択
-        # 同じY0の場合はX0が最も小さいカラムを優先 (ルール3)
-        candidate_current_col = min(remaining_cols, key=lambda col: (col.y0, col.x0))
-
-        # 「候補カレントカラム」とY範囲が重なる、X0がより小さい未処理のカラムがあるかチェック
-        # Y範囲の重なり方をより厳密に判定 (少なくとも1ポイントでも重なっているか)
-        true_current_col = candidate_current_col
-        found_smaller_x0_overlapping_with_candidate = False
-        for col in remaining_cols:
-            if col is candidate_current_col:
-                continue
-            # Y範囲が重なるか判定
-            y_overlap = max(candidate_current_col.y0, col.y0) < min(candidate_current_col.y1, col.y1)
-            # 候補カレントカラムよりX0が小さく、Y範囲が重なるカラムがあれば
-            if y_overlap and col.x0 < candidate_current_col.x0:
-                 # その中で最もX0が小さいY範囲の重なるカラムを真のカレントカラムとする
-                 # このループを続行して、最もX0が小さいものを見つける
-                 if true_current_col is candidate_current_col or col.x0 < true_current_col.x0:
-                     true_current_col = col
-                     found_smaller_x0_overlapping_with_candidate = True
-
-        # 「真のカレントカラム」を結果リストに追加し、未処理から削除
-        sorted_cols.append(true_current_col)
-        remaining_cols.remove(true_current_col)
-
-        last_added_col = true_current_col
 
-        while True:
-            # 追加した「真のカレントカラム」を基点として、そのX範囲に重なる、次に小さいY0の未処理カラムを見つける
-            # 同じY0の場合はX0が小さい方を優先 (ルール3)
-            next_col = None
-            min_y0 = float('inf')
-            min_x0_at_min_y0 = float('inf')
-
-            for col in remaining_cols:
-                # X範囲が重なるか判定
-                x_overlap = max(last_added_col.x0, col.x0) < min(last_added_col.x1, col.x1)
-
-                if x_overlap:
-                    # Y0がより小さいカラムが見つかった場合
-                    if col.y0 < min_y0:
-                        min_y0 = col.y0
-                        min_x0_at_min_y0 = col.x0
-                        next_col = col
-                    # Y0が同じ場合はX0が小さい方を優先（ルール3の適用）
-                    elif col.y0 == min_y0 and col.x0 < min_x0_at_min_y0:
-                         min_x0_at_min_y0 = col.x0
-                         next_col = col
-
-            # 次に見つけるカラムがなければループを抜ける
-            if next_col is None:
-                break
+    def __init__(self, cols: List[Column], removed: List[bool], axis: str, key, finite: bool) -> None:
+        self._removed = removed
+        self._key = key
+        self._finite = finite
+        self._cells: Dict[int, List[int]] = {}
+        self._offsets: Dict[int, int] = {}
+        for i in sorted(range(len(cols)), key=key):
+            for cell in self._span(*self._bounds(cols[i], axis)):
+                self._cells.setdefault(cell, []).append(i)
+
+    @staticmethod
+    def _bounds(col: Column, axis: str) -> tuple:
+        return (col.x0, col.x1) if axis == "x" else (col.y0, col.y1)
 
-            # 見つけたカラムよりX0の小さいY範囲の重なるカラムがあるかチェック
-            # Y範囲の重なり方をより厳密に判定
-            potential_next_col = next_col
-            found_smaller_x0_overlapping_with_next = False
+    def _span(self, lo: float, hi: float):
+        return _cell_range(lo, hi) if self._finite else (0,)
 
-            for col in remaining_cols:
-                 if col is potential_next_col:
-                     continue
+    def first(self, lo: float, hi: float, accept, stop=None) -> Optional[int]:
+        """[lo, hi] にかかる格子から、accept を満たす未処理のカラムのうち key が最小のもの。
 
-                 # Y範囲が重なるか判定
-                 y_overlap = max(potential_next_col.y0, col.y0) < min(potential_next_col.y1, col.y1)
+        格子内は key 順なので、stop を満たしたらその格子の残りは見ない。
+        """
+        best = None
+        for cell in self._span(lo, hi):
+            lst = self._cells.get(cell)
+            if not lst:
+                continue
+            j = self._offsets.get(cell, 0)
+            while j < len(lst) and self._removed[lst[j]]:
+                j += 1
+            self._offsets[cell] = j
+            for i in islice(lst, j, None):
+                if self._removed[i]:
+                    continue
+                if stop is not None and stop(i):
+                    break
+                if accept(i):
+                    if best is None or self._key(i) < self._key(best):
+                        best = i
+                    break
+        return best
 
-                 # 見つけたカラムよりX0が小さく、Y範囲が重なるカラムがあれば
-                 if y_overlap and col.x0 < potential_next_col.x0:
-                      # その中で最もX0が小さいY範囲の重なるカラムを次に処理するカラムとする
-                      # このループを続行して、最もX0が小さいものを見つける
-                      if potential_next_col is next_col or col.x0 < potential_next_col.x0:
-                           potential_next_col = col
-                           found_smaller_x0_overlapping_with_next = True
 
-            # もし見つけたカラムよりX0が小さいY範囲の重なるカラムが見つかった場合、
-            # その中で最もX0が小さいカラムを「次に処理するカラム」として再設定
-            if found_smaller_x0_overlapping_with_next:
-                 next_col = potential_next_col
+def sort_and_number_columns(columns: List[Column]) -> List[Column]:
+    """
+    カラムのリストを受け取り、指定されたルールで並べ替え、番号を付与する。
 
-            # 決定した「次に処理するカラム」を結果リストに追加し、未処理から削除
-            sorted_cols.append(next_col)
-            remaining_cols.remove(next_col)
-            last_added_col = next_col # カレントカラムを更新
+    1. 未処理のカラムで Y0 が最小（同じなら X0 が最小）のものを選ぶ。そのカラムと Y 範囲が重なり X0 が
+       より小さい未処理のカラムがあれば、その中で X0 が最小のものに置き換える
+    2. 直前に追加したカラムと X 範囲が重なる未処理のカラムから、Y0 が最小（同じなら X0 が最小）のものを選び、
+       1 と同じ置き換えをして追加する。ただしこちらの置き換えは、左のカラムが見つかるたびに
+       そのカラムを基準にして続きを調べる（従来の実装どおり）。見つからなくなったら 1 に戻る
+    条件が同じカラムが複数あるときや 2 の置き換えで調べる順番は、従来の実装と同じく set(columns) を
+    列挙した順に従う。Column のハッシュは座標から決まるので、同じ入力なら毎回同じ順になる。
+    """
+    # 座標が同じカラムは1つにまとめ、set を列挙した順に番号を振る（set から取り除いても残りの順番は変わらない）
+    cols = list(set(columns))
+    n = len(cols)
+    removed = [False] * n
+    finite = all(_finite(c.x0, c.y0, c.x1, c.y1) for c in cols)
+
+    def reading_key(i: int):
+        return (cols[i].y0, cols[i].x0, i)
+
+    def x0_key(i: int):
+        return (cols[i].x0, i)
+
+    by_reading = sorted(range(n), key=reading_key)
+    x_buckets = _ColumnBuckets(cols, removed, "x", reading_key, finite)
+    y_buckets = _ColumnBuckets(cols, removed, "y", x0_key, finite)
+
+    def leftmost_y_overlapping(k: int) -> int:
+        # k と Y 範囲が重なり、X0 が k より小さい未処理のカラムのうち X0 が最小のもの（無ければ k）
+        base = cols[k]
+        found = y_buckets.first(
+            base.y0,
+            base.y1,
+            accept=lambda i: i != k and max(base.y0, cols[i].y0) < min(base.y1, cols[i].y1),
+            stop=lambda i: cols[i].x0 >= base.x0,
+        )
+        return k if found is None else found
+
+    def next_x_overlapping(k: int) -> Optional[int]:
+        # k と X 範囲が重なる未処理のカラムのうち、Y0 が最小（同じなら X0 が最小）のもの
+        base = cols[k]
+        return x_buckets.first(
+            base.x0,
+            base.x1,
+            accept=lambda i: max(base.x0, cols[i].x0) < min(base.x1, cols[i].x1),
+        )
 
+    by_x0 = sorted(range(n), key=x0_key)
+    x0_sorted = [cols[i].x0 for i in by_x0]
+
+    def leftmost_y_overlapping_chained(k: int) -> int:
+        # k より左で Y 範囲が重なる未処理のカラムを番号順に調べ、見つかるたびにそのカラムを基準にする
+        # 左側に候補が無い（ほとんどの場合）は索引だけで済ませる
+        if finite and leftmost_y_overlapping(k) == k:
+            return k
+        lefts = by_x0[:bisect.bisect_left(x0_sorted, cols[k].x0)] if finite else range(n)
+        best = k
+        for i in sorted(lefts):
+            if removed[i]:
+                continue
+            col, cur = cols[i], cols[best]
+            if max(cur.y0, col.y0) < min(cur.y1, col.y1) and col.x0 < cur.x0:
+                best = i
+        return best
+
+    order: List[int] = []
+    pos = 0
+    while True:
+        while pos < n and removed[by_reading[pos]]:
+            pos += 1
+        if pos >= n:
+            break
+        # 未処理のカラムの中からY0が最も小さいカラムを候補にし、Y範囲の重なる左側のカラムを優先する
+        last = leftmost_y_overlapping(by_reading[pos])
+        removed[last] = True
+        order.append(last)
+        while True:
+            # 追加したカラムとX範囲が重なる、次に小さいY0の未処理カラム
+            next_col = next_x_overlapping(last)
+            if next_col is None:
+                break
+            last = leftmost_y_overlapping_chained(next_col)
+            removed[last] = True
+            order.append(last)
+
+    sorted_cols = [cols[i] for i in order]
     # ソートされたカラムに番号を付与
     for i, col in enumerate(sorted_cols):
         col.order = i + 1  # 1から始まる番号を付与
@@ -489,13 +648,381 @@ def blocks_into_columns(pages_blocks: Dict[str, Any]) -> Dict[str, Any]:
         }
     return pages_columns_blocks
 
-def extract_paragraphs(pdf_path: str, output_json_path: str, header_y1:float = None, footer_y0: float = None ) -> None:
+# 並列抽出で1ワーカーに割り当てる最小ページ数（これより少ないPDFは逐次で処理する）
+_MIN_PAGES_PER_WORKER = 8
+# ワーカー数あたりのページ範囲の分割数（ページごとの重さのばらつきを均す）
+_CHUNKS_PER_WORKER = 4
+# 1つのページ範囲の最大ページ数と、ワーカー数あたりの同時に投入するページ範囲の数。
+# 書き出し待ちの結果としてメモリに持つのは、最大で ワーカー数 × _PENDING_CHUNKS_PER_WORKER × _MAX_PAGES_PER_CHUNK ページ
+_MAX_PAGES_PER_CHUNK = 32
+_PENDING_CHUNKS_PER_WORKER = 2
+
+
+# ヘッダ/フッタ位置の判定中に、メモリに保持しておくページ数（超えた分は一時ファイルへ書き出す）
+_SPOOL_MEMORY_PAGES = 100
+
+
+def _page_blocks(page) -> List[Block]:
+    page_dict = page.get_text("dict", flags=0)  # 辞書形式で取得
+    return page_dict.get("blocks", []) # 'blocks' キーが存在しない場合も考慮
+
+
+def _iter_spill(path: str):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
 
-    # header_y1 と footeter_y0 が省略されたら、get_header_y1_footer_y0()を実行
-    if header_y1 is None or footer_y0 is None:
-        header_y1, footer_y0 = get_header_y1_footer_y0(pdf_path)
+class _BlocksSpool:
+    """ページごとの blocks を順に溜めておき、あとで同じ順に取り出す。
+
+    keep_pages ページまではメモリに持ち、それ以降は path の一時ファイルへ pickle で追記する。
+    取り出しは1回だけ（取り出したページはメモリから解放する）。
+    """
+
+    def __init__(self, path: str, keep_pages: int = _SPOOL_MEMORY_PAGES) -> None:
+        self.path = path
+        self.keep_pages = keep_pages
+        self._memory: List[Any] = []
+        self._file = None
+
+    def append(self, blocks: List[Block]) -> None:
+        if len(self._memory) < self.keep_pages:
+            self._memory.append(blocks)
+            return
+        if self._file is None:
+            self._file = open(self.path, "wb")
+        pickle.dump(blocks, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def close_writer(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __iter__(self):
+        self.close_writer()
+        for i in range(len(self._memory)):
+            blocks, self._memory[i] = self._memory[i], None
+            yield blocks
+        if os.path.exists(self.path):
+            yield from _iter_spill(self.path)
+
+
+def _paragraphs_from_blocks(blocks: List[Block], page_number: int, header_y1: float, footer_y0: float):
+    """1ページ分のブロックから、段落（ID→段落）とそのページで使われたスタイルを返す。page_number は0始まり。"""
+     # header_y1より上にあるブロックをheader_blokcsとして取り出す
+    header_blocks = sorted([blk for blk in blocks if "bbox" in blk and blk["bbox"][3] < header_y1], key=lambda b: (b["bbox"][1], b["bbox"][0]))
+    # footer_y0より下にあるブロックをfooter_blokcsとして取り出す
+    footer_blocks = sorted([blk for blk in blocks if "bbox" in blk and blk["bbox"][1] > footer_y0], key=lambda b: (b["bbox"][1], b["bbox"][0]))
+    # header_blocksとfooter_blocksを除外
+    body_blocks = [blk for blk in blocks if blk not in header_blocks and blk not in footer_blocks]
+
+    # 解析して列順まで行ったブロック配列を返す
+    columned_blocks = set_column_order_to_blocks(body_blocks)
+
+    #header_blocksにcolumn_orderを付与
+    for blk in header_blocks:
+        blk["column_order"] = 0
+    #footer_blocksにcolumn_orderを付与
+    for blk in footer_blocks:
+        blk["column_order"] = 999
+
+    columned_blocks = header_blocks + columned_blocks + footer_blocks
+
+    page_paragraphs = {}
+    styles = {}
+    for blk in columned_blocks:
+        block_paragraphs_dict = block_to_paragraphs(blk)
+
+        # paragraphsからstyle_chars_dictを除去
+        # style_dictはstylesに追加する
+        for id,paragraph in block_paragraphs_dict.items():
+            paragraph["page_number"] = page_number + 1
+            if paragraph.get("column_order") == 0:
+                paragraph["block_tag"] = "header"
+            if paragraph.get("column_order") == 999:
+                paragraph["block_tag"] = "footer"
+
+            style_chars_dict = paragraph.pop("style_chars_dict",{})
+            # style_chars_dictのKeysを元にスタイルを生成
+            for key, value in style_chars_dict.items():
+                font_name, font_size = key.rsplit("_", 1)
+                font_size_px = f"{int(font_size) / 10:.1f}px"
+                styles[key] = f"font-family: {font_name}; font-size: {font_size_px};"
+
+        # idをキーとする辞書block_paragraphs_dictの要素をpage_paragraphs_dictの要素として追加
+        page_paragraphs.update(block_paragraphs_dict) 
+
+    # page_paragraphsをpage/column_order/y0/start_line_number順でソートして初期順序を付与
+    sorted_paragraphs = sorted(
+        page_paragraphs.values(),
+        key=lambda x: (int(x["page_number"]), int(x["column_order"]), int(x["column_order"]), float(x["bbox"][1]), x["id"])
+    )
+
+    # ソートされたリストを使って処理
+    for i, paragraph in enumerate(sorted_paragraphs):
+        paragraph["order"] = i + 1
+        paragraph["src_joined"] = paragraph["src_text"]
+        paragraph["src_replaced"] = paragraph["src_text"]
+        paragraph["trans_auto"] = paragraph["src_text"]
+        paragraph["trans_text"] = paragraph["src_text"]
+
+    return page_paragraphs, styles
+
+
+def _scan_page(page, spool: _BlocksSpool):
+    """ページのブロックを spool に溜め、ヘッダ/フッタ判定用の統計を返す（get_text は1ページ1回だけ）。"""
+    print(f"Processing page {page.number + 1}...")
+    blocks = _page_blocks(page)
+    spool.append(blocks)
+    return page_header_footer_stat(blocks, page.rect.height)
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int, header_y1: float, footer_y0: float):
+    """ワーカープロセス側の処理。PDFを自分で開き、[start, end) のページを段落にする。"""
+    TOOLS.set_small_glyph_heights(True)
+    doc = fitz.open(pdf_path)
+    try:
+        return [_paragraphs_from_blocks(_page_blocks(doc[i]), i, header_y1, footer_y0) for i in range(start, end)]
+    finally:
+        doc.close()
+
+
+def _scan_page_range(pdf_path: str, start: int, end: int, spill_path: str):
+    """ワーカープロセス側の処理（ヘッダ/フッタ未指定時の1段目）。
+
+    [start, end) のブロックを spill_path へ書き出し、ヘッダ/フッタ判定用の統計をページ順に返す。
+    2段目（_paragraphs_from_spill）はどのワーカーで動いてもよいように、メモリには残さない。
+    """
+    TOOLS.set_small_glyph_heights(True)
+    doc = fitz.open(pdf_path)
+    spool = _BlocksSpool(spill_path, keep_pages=0)
+    try:
+        return [_scan_page(doc[i], spool) for i in range(start, end)]
+    finally:
+        spool.close_writer()
+        doc.close()
+
+
+def _paragraphs_from_spill(spill_path: str, start: int, header_y1: float, footer_y0: float):
+    """ワーカープロセス側の処理（2段目）。_scan_page_range が書き出したブロックを段落にする。"""
+    return [
+        _paragraphs_from_blocks(blocks, start + i, header_y1, footer_y0)
+        for i, blocks in enumerate(_iter_spill(spill_path))
+    ]
+
+
+# チェックポイントの形式（変えたら上げる。合わないチェックポイントは使わずに最初から抽出し直す）
+_CHECKPOINT_VERSION = 1
+
+
+def checkpoint_path_for(json_path: str) -> str:
+    """extract_paragraphs() のチェックポイントの既定の置き場所（<book>.extract.jsonl）。"""
+    base = json_path[: -len(".json")] if json_path.endswith(".json") else json_path
+    return base + ".extract.jsonl"
+
+
+class _ExtractCheckpoint:
+    """抽出し終えたページを JSON Lines で追記しておき、中断しても続きのページから再開できるようにする。
+
+    1行目はヘッダ（形式、PDFの mtime/size、ページ数、header_y1/footer_y0）、2行目以降は1ページ1行の [段落, スタイル]。
+    書きかけで落ちた最後の行は捨てる。PDFやヘッダ/フッタ位置が変わっていたらチェックポイントは使わない。
+    """
+
+    def __init__(self, path: str, pdf_path: str, page_count: int) -> None:
+        self.path = path
+        self.page_count = page_count
+        st = os.stat(pdf_path)
+        self._pdf_signature = [st.st_mtime_ns, st.st_size]
+        self._file = None
+        self._offset = 0
+        self.done = 0
+
+    def _header(self, header_y1: float, footer_y0: float) -> Dict[str, Any]:
+        return {
+            "checkpoint": _CHECKPOINT_VERSION,
+            "pdf": self._pdf_signature,
+            "page_count": self.page_count,
+            "header_y1": header_y1,
+            "footer_y0": footer_y0,
+        }
+
+    def load(self, header_y1: Optional[float], footer_y0: Optional[float]):
+        """使えるチェックポイントがあれば (header_y1, footer_y0) を返し、done に抽出済みのページ数を入れる。"""
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return None
+        with f:
+            try:
+                header = json_repo.loads(f.readline())
+            except ValueError:
+                return None
+            if not isinstance(header, dict):
+                return None
+            expected = self._header(header.get("header_y1"), header.get("footer_y0"))
+            if header != expected:
+                return None
+            if header_y1 is not None and footer_y0 is not None and (header_y1, footer_y0) != (header["header_y1"], header["footer_y0"]):
+                return None
+            done = 0
+            offset = f.tell()
+            for line in f:
+                # 改行で終わっていない行は書きかけ
+                if not line.endswith(b"\n") or done >= self.page_count:
+                    break
+                done += 1
+                offset += len(line)
+        self.done = done
+        self._offset = offset
+        return header["header_y1"], header["footer_y0"]
+
+    def begin(self, header_y1: float, footer_y0: float) -> None:
+        """追記を始める。load() で再開しない場合はチェックポイントを作り直す。"""
+        if self._offset:
+            self._file = open(self.path, "r+", encoding="utf-8", newline="\n")
+            self._file.seek(self._offset)
+            self._file.truncate()
+            return
+        self.done = 0
+        self._file = open(self.path, "w", encoding="utf-8", newline="\n")
+        self._file.write(json_repo.dumps(self._header(header_y1, footer_y0)) + "\n")
+        self._file.flush()
+
+    def replay(self):
+        """抽出済みのページを (段落, スタイル) の順に返す。"""
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.readline()
+            for line in islice(f, self.done):
+                page_paragraphs, styles = json_repo.loads(line)
+                yield page_paragraphs, styles
+
+    def record(self, pages):
+        """pages を1ページずつチェックポイントへ追記しながら返す。"""
+        for page in pages:
+            self._file.write(json_repo.dumps(page) + "\n")
+            self._file.flush()
+            yield page
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self) -> None:
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _pool_context():
+    # ワーカーは spawn で起動する（fork はスレッドを持つプロセスから使うと止まることがあり、Windows には無い）。
+    # spawn のワーカーは呼び出し元の __main__ を読み込み直すので、サーバーからは parapara_extract_worker.py の
+    # プロセス経由で呼ぶこと（parapara_extract_jobs.extract_in_subprocess）
+    return multiprocessing.get_context("spawn")
+
+
+def _quiet_worker() -> None:
+    # ワーカーはページごとのログを出さない（進捗は呼び出し元が progress で出す）
+    sys.stdout = open(os.devnull, "w")
+
+
+def _extract_workers(workers: Optional[int], page_count: int) -> int:
+    if workers is None:
+        try:
+            workers = int(os.getenv("EXTRACT_WORKERS", "0") or 0)
+        except ValueError:
+            workers = 0
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, page_count // _MIN_PAGES_PER_WORKER))
+
+
+def _map_bounded(executor, fn, *iterables, limit: int):
+    """executor.map と同じく入力の順に結果を返すが、投入するのは limit 件先まで。
+
+    executor.map は最初に全件を投入するので、書き出しが追いつかないと終わった結果がすべてメモリに溜まる。
+    """
+    args = zip(*iterables)
+    pending = deque(executor.submit(fn, *a) for a in islice(args, limit))
+    while pending:
+        result = pending.popleft().result()
+        for a in islice(args, 1):
+            pending.append(executor.submit(fn, *a))
+        yield result
+
+
+def _extract_pages_parallel(stack: ExitStack, pdf_path: str, page_count: int, header_y1: Optional[float], footer_y0: Optional[float], workers: int, start_page: int = 0):
+    """ページ範囲をプロセスプールで分担して抽出する。
+
+    (header_y1, footer_y0, ページ順に (段落, スタイル) を返すイテレータ) を返す。ヘッダ/フッタが未指定なら、
+    1段目で各ワーカーがブロックを一時ファイルに書き出しつつ統計を集め、位置を決めてから2段目で段落にする。
+    プロセスプールと一時フォルダは stack に登録するので、呼び出し側が書き終えるまで開いておくこと。
+    start_page より前のページは抽出しない（チェックポイントからの再開用。ヘッダ/フッタ位置の指定が必要）。
+    """
+    chunk = min(-(-(page_count - start_page) // (workers * _CHUNKS_PER_WORKER)), _MAX_PAGES_PER_CHUNK)
+    limit = workers * _PENDING_CHUNKS_PER_WORKER
+    starts = list(range(start_page, page_count, chunk))
+    ends = [min(start + chunk, page_count) for start in starts]
+    executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(), initializer=_quiet_worker))
+    if header_y1 is not None and footer_y0 is not None:
+        results = _map_bounded(
+            executor,
+            _extract_page_range,
+            repeat(pdf_path),
+            starts,
+            ends,
+            repeat(header_y1),
+            repeat(footer_y0),
+            limit=limit,
+        )
+        return header_y1, footer_y0, chain.from_iterable(results)
+
+    spill_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="parapara_extract_"))
+    spill_paths = [os.path.join(spill_dir, f"{start}.blocks") for start in starts]
+    page_stats = []
+    for stats in _map_bounded(executor, _scan_page_range, repeat(pdf_path), starts, ends, spill_paths, limit=limit):
+        page_stats.extend(stats)
+    header_y1, footer_y0 = header_footer_from_stats(page_stats)
+    results = _map_bounded(
+        executor,
+        _paragraphs_from_spill,
+        spill_paths,
+        starts,
+        repeat(header_y1),
+        repeat(footer_y0),
+        limit=limit,
+    )
+    return header_y1, footer_y0, chain.from_iterable(results)
+
+
+def extract_paragraphs(
+    pdf_path: str,
+    output_json_path: str,
+    header_y1:float = None,
+    footer_y0: float = None,
+    workers: Optional[int] = None,
+    checkpoint_path: Optional[str] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> None:
+    """PDFを読み込み、ページごとにブロックを抽出して段落単位の book JSON として保存する。
+
+    header_y1 / footer_y0 が省略されたら、抽出と同じ get_text("dict") の結果からヘッダ/フッタ位置を決める
+    （PDFの読み取りは1ページ1回だけ。判定が終わるまでブロックは _BlocksSpool に溜めておく）。
+    workers はページを分担するプロセス数（省略時は環境変数 EXTRACT_WORKERS、0 ならCPU数）。
+    1 または少ないページ数のPDFでは逐次で処理する。どちらでも出力は同じ。
+    段落はページごとに BookStreamWriter で書き出すので、book 全体をメモリに持たない（styles は最後に書く）。
+    checkpoint_path を渡すと抽出し終えたページをそこへ追記し、前回中断したチェックポイントがあれば続きから抽出する
+    （保存が済んだらチェックポイントは消す）。progress は (抽出済みページ数, 全ページ数) で呼ばれる。
+    """
 
     # PDFを読み込み、ページごとにブロックを抽出してJSON形式で保存する関数
+    output_json_path = os.fspath(output_json_path)  # __main__ からは pathlib.Path で渡される
     if not pathlib.Path(pdf_path).is_file():
         raise FileNotFoundError(f"{pdf_path} not found")
     doc = fitz.open(pdf_path)
@@ -509,81 +1036,89 @@ def extract_paragraphs(pdf_path: str, output_json_path: str, header_y1:float = N
         title = pdf_name
 
     print(f"PDF Title: {title}")
-    book = {
-        "version":"2.0.0",
-        "src_filename": pdf_path,
-        "title": title,
-        "page_count": len(doc),
-        "header_y1": header_y1,
-        "footer_y0": footer_y0,
-        "styles": {},
-        "pages": {}
-    }
-
-    for page_number in range(len(doc)):
-        page = doc[page_number]
-        page_dict = page.get_text("dict", flags=0)  # 辞書形式で取得
-        blocks = page_dict.get("blocks", []) # 'blocks' キーが存在しない場合も考慮
-
-         # header_y1より上にあるブロックをheader_blokcsとして取り出す
-        header_blocks = sorted([blk for blk in blocks if "bbox" in blk and blk["bbox"][3] < header_y1], key=lambda b: (b["bbox"][1], b["bbox"][0]))
-        # footer_y0より下にあるブロックをfooter_blokcsとして取り出す
-        footer_blocks = sorted([blk for blk in blocks if "bbox" in blk and blk["bbox"][1] > footer_y0], key=lambda b: (b["bbox"][1], b["bbox"][0]))
-        # header_blocksとfooter_blocksを除外
-        body_blocks = [blk for blk in blocks if blk not in header_blocks and blk not in footer_blocks]
-
-        # 解析して列順まで行ったブロック配列を返す
-        columned_blocks = set_column_order_to_blocks(body_blocks)
-
-        #header_blocksにcolumn_orderを付与
-        for blk in header_blocks:
-            blk["column_order"] = 0
-        #footer_blocksにcolumn_orderを付与
-        for blk in footer_blocks:
-            blk["column_order"] = 999
-
-        columned_blocks = header_blocks + columned_blocks + footer_blocks
-
-        book["pages"][page_number + 1] = {"paragraphs": {}}
-        for blk in columned_blocks:
-            block_paragraphs_dict = block_to_paragraphs(blk)
-
-            # paragraphsからstyle_chars_dictを除去
-            # style_dictはstylesに追加する
-            for id,paragraph in block_paragraphs_dict.items():
-                paragraph["page_number"] = page_number + 1
-                if paragraph.get("column_order") == 0:
-                    paragraph["block_tag"] = "header"
-                if paragraph.get("column_order") == 999:
-                    paragraph["block_tag"] = "footer"
-
-                style_chars_dict = paragraph.pop("style_chars_dict",{})
-                # style_chars_dictのKeysを元にスタイルを生成
-                for key, value in style_chars_dict.items():
-                    font_name, font_size = key.rsplit("_", 1)
-                    font_size_px = f"{int(font_size) / 10:.1f}px"
-                    book["styles"][key] = f"font-family: {font_name}; font-size: {font_size_px};"
+    page_count = len(doc)
+    start_page = 0
+    checkpoint = None
+    if checkpoint_path:
+        checkpoint = _ExtractCheckpoint(checkpoint_path, pdf_path, page_count)
+        resumed = checkpoint.load(header_y1, footer_y0)
+        if resumed is not None:
+            header_y1, footer_y0 = resumed
+            start_page = checkpoint.done
+            print(f"チェックポイントから再開: {start_page}/{page_count}ページ抽出済み")
+    detect_header_footer = header_y1 is None or footer_y0 is None
+    workers = _extract_workers(workers, page_count - start_page)
+    with ExitStack() as stack:
+        if workers > 1:
+            print(f"並列抽出: {page_count - start_page}ページを{workers}プロセスで処理します")
+            header_y1, footer_y0, pages = _extract_pages_parallel(
+                stack,
+                pdf_path,
+                page_count,
+                None if detect_header_footer else header_y1,
+                None if detect_header_footer else footer_y0,
+                workers,
+                start_page,
+            )
+        elif detect_header_footer:
+            # header_y1 と footer_y0 が省略されたら、抽出と同じ get_text の結果からヘッダ/フッタ位置を決める
+            spill_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="parapara_extract_"))
+            spool = _BlocksSpool(os.path.join(spill_dir, "pages.blocks"))
+            page_stats = [_scan_page(doc[i], spool) for i in range(page_count)]
+            header_y1, footer_y0 = header_footer_from_stats(page_stats)
+            pages = (_paragraphs_from_blocks(blocks, i, header_y1, footer_y0) for i, blocks in enumerate(spool))
+        else:
+            pages = (_paragraphs_from_blocks(_page_blocks(doc[i]), i, header_y1, footer_y0) for i in range(start_page, page_count))
+
+        if checkpoint is not None:
+            stack.callback(checkpoint.close)
+            checkpoint.begin(header_y1, footer_y0)
+            pages = chain(checkpoint.replay(), checkpoint.record(pages))
+
+        head = {
+            "version":"2.0.0",
+            "src_filename": pdf_path,
+            "title": title,
+            "page_count": page_count,
+            "header_y1": header_y1,
+            "footer_y0": footer_y0,
+        }
+        if progress is not None:
+            progress(start_page, page_count)
+        # 再抽出で段落IDが変わるため、旧ブックの編集ジャーナルは破棄される
+        with BookStreamWriter(output_json_path, head) as writer:
+            # スタイルはページ順に初出の順で登録する（並列でも逐次と同じ並びになる）
+            book_styles = {}
+            for page_number, (page_paragraphs, styles) in enumerate(pages):
+                book_styles.update(styles)
+                writer.write_page(page_number + 1, {"paragraphs": page_paragraphs})
+                if progress is not None and page_number >= start_page:
+                    progress(page_number + 1, page_count)
+            writer.close({"styles": book_styles})
 
-            # idをキーとする辞書block_paragraphs_dictの要素をpage_paragraphs_dictの要素として追加
-            book["pages"][page_number + 1]["paragraphs"].update(block_paragraphs_dict) 
+    doc.close()
+    if checkpoint is not None:
+        checkpoint.remove()
+    print(f"Converted columns saved to: {output_json_path}")
 
-        # page_paragraphsをpage/column_order/y0/start_line_number順でソートして初期順序を付与
-        sorted_paragraphs = sorted(
-            book["pages"][page_number + 1]["paragraphs"].values(),
-            key=lambda x: (int(x["page_number"]), int(x["column_order"]), int(x["column_order"]), float(x["bbox"][1]), x["id"])
-        )
 
-        # ソートされたリストを使って処理
-        for i, paragraph in enumerate(sorted_paragraphs):
-            paragraph["order"] = i + 1
-            paragraph["src_joined"] = paragraph["src_text"]
-            paragraph["src_replaced"] = paragraph["src_text"]
-            paragraph["trans_auto"] = paragraph["src_text"]
-            paragraph["trans_text"] = paragraph["src_text"]
 
-    doc.close()
-    atomicsave_json(output_json_path, book)
-    print(f"Converted columns saved to: {output_json_path}")
+def extract_pages(pdf_path: str, page_numbers: List[int], header_y1: float, footer_y0: float) -> Dict[int, Any]:
+    """指定ページ（1始まり）だけを抽出し、{ページ番号: (段落, スタイル)} を返す。部分的な再抽出用。"""
+    if not pathlib.Path(pdf_path).is_file():
+        raise FileNotFoundError(f"{pdf_path} not found")
+    doc = fitz.open(pdf_path)
+    TOOLS.set_small_glyph_heights(True)
+    try:
+        page_count = len(doc)
+        results = {}
+        for page_number in sorted(set(page_numbers)):
+            if not 1 <= page_number <= page_count:
+                raise ValueError(f"page {page_number} is out of range (1-{page_count})")
+            results[page_number] = _paragraphs_from_blocks(_page_blocks(doc[page_number - 1]), page_number - 1, header_y1, footer_y0)
+        return results
+    finally:
+        doc.close()
 
 
 
@@ -596,10 +1131,7 @@ def rect_json_test(input_json_path: str, output_json_path: str):
     input_path = pathlib.Path(input_json_path)
     output_path = pathlib.Path(output_json_path)
     pages = {}
-    if not input_path.is_file():
-        raise FileNotFoundError(f"{input_json_path} not found")
-    with open(input_path, "r", encoding="utf-8") as f:
-        pages = json.load(f)
+    pages = json_repo.load_json(str(input_path))
 
     for page_number, page in pages.items():
         # ページのブロックを取得
@@ -658,18 +1190,11 @@ def pages_convert_to_columned(pages_json_path: str, header_y1, footer_y0):
 
 # json を読み込んでオブジェクトを戻す
 def load_json(json_path: str):
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+    return json_repo.load_json(json_path)
 
 # アトミックセーブ
 def atomicsave_json(json_path, data):
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path), suffix=".json", text=True)
-    with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmp_file:
-        json.dump(data, tmp_file, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, json_path)
+    json_repo.save_json_atomic(str(json_path), data)
 
 # エントリポイント
 if __name__ == "__main__":
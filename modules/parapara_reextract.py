@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+parapara_reextract.py
+
+抽出済みのブックのうち、指定したページだけを PDF から抽出し直すモジュール。
+
+- ヘッダ/フッタ位置や段組の規則を直したあと、JSON を消さずに該当ページだけ作り直すために使う
+- 旧段落の訳などは parapara_merge_1to2.py と同じく (ページ, src_text) で引き当てて新段落へ引き継ぐ
+  （索引は抽出し直すページの旧段落だけで作るハッシュ索引）
+- 抽出も索引も指定ページだけなので、かかる時間は本全体ではなく触ったページ数に比例する
+- join の値は段落ごとに引き継ぐ。結合から作られる src_joined などは、結合チェーンの段落がすべて
+  引き継げたときだけ引き継ぎ、そうでなければ parapara_join_incremental でチェーンを組み直す
+  （ページをまたぐ 'p' のチェーンのため、組み直しは前後のページも見る）
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from modules.parapara_join_incremental import (
+    ParaRef,
+    find_base_index,
+    iter_paragraph_refs,
+    rebuild_run,
+    run_members,
+)
+from modules.parapara_pdf2json import extract_pages
+from modules.parapara_trans import recalc_trans_status_counts
+
+# 旧段落から引き継ぐフィールド（旧段落に無いものは引き継がない）
+CARRY_FIELDS = (
+    "trans_text",
+    "trans_status",
+    "comment",
+    "join",
+    "group_id",
+    "markup",
+    "modified_at",
+)
+# 結合から作られるフィールド（結合チェーンの段落がすべて引き継げたときだけ引き継ぐ）
+JOIN_FIELDS = (
+    "src_joined",
+    "src_replaced",
+    "trans_auto",
+)
+# 抽出時に位置から決まる block_tag（これ以外はユーザーが付けたものとして引き継ぐ）
+_EXTRACTED_TAGS = ("header", "footer")
+_TRANS_STATUS_KEYS = ("none", "auto", "draft", "fixed")
+
+
+def _reading_order(p: Dict[str, Any]):
+    return (int(p.get("order", 0) or 0), str(p.get("id", "")))
+
+
+def carry_over(
+    old_paragraphs: Dict[str, Any],
+    new_paragraphs: Dict[str, Any],
+    matched: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> int:
+    """同じページの旧段落から、src_text が同じ新段落へ訳などを引き継ぐ。引き継いだ段落数を返す。
+
+    同じ src_text の段落が複数あれば、ページ内の並び順に前から対応させる。
+    JOIN_FIELDS は引き継がない（結合チェーン単位で reextract_pages が決める）。
+    matched を渡したら、引き継いだ旧段落のキー -> 新段落を入れる。
+    """
+    lookup: Dict[str, Deque[Tuple[str, Dict[str, Any]]]] = {}
+    old_items = ((k, p) for k, p in old_paragraphs.items() if isinstance(p, dict))
+    for key, p in sorted(old_items, key=lambda item: _reading_order(item[1])):
+        text = p.get("src_text", "")
+        if text:
+            lookup.setdefault(text, deque()).append((key, p))
+
+    carried = 0
+    for p in sorted(new_paragraphs.values(), key=_reading_order):
+        candidates = lookup.get(p.get("src_text", ""))
+        if not candidates:
+            continue
+        key, old = candidates.popleft()
+        for name in CARRY_FIELDS:
+            if name in old:
+                p[name] = old[name]
+        old_tag = old.get("block_tag")
+        if old_tag and old_tag not in _EXTRACTED_TAGS and p.get("block_tag") not in _EXTRACTED_TAGS:
+            p["block_tag"] = old_tag
+        if matched is not None:
+            matched[str(key)] = p
+        carried += 1
+    return carried
+
+
+def _has_join_base(paragraphs: Dict[str, Any]) -> bool:
+    """ページに 'p' の join=0 段落があるか（あればページをまたぐ 'p' のチェーンはそこで切れる）。"""
+    for p in paragraphs.values():
+        if isinstance(p, dict) and p.get("block_tag") == "p" and str(p.get("join", 0)) != "1":
+            return True
+    return False
+
+
+def _join_window(pages: Dict[str, Any], first: int, last: int) -> List[str]:
+    """first..last ページの結合チェーンを組み直すときに見るページのキーを返す。
+
+    'p' のチェーンはページをまたぐので、前後それぞれ 'p' の join=0 段落があるページまで広げる。
+    """
+    numbers = sorted(int(k) for k in pages if str(k).isdigit())
+    window = [n for n in numbers if first <= n <= last]
+    for n in reversed([n for n in numbers if n < first]):
+        window.insert(0, n)
+        if _has_join_base((pages[str(n)] or {}).get("paragraphs") or {}):
+            break
+    for n in (n for n in numbers if n > last):
+        window.append(n)
+        if _has_join_base((pages[str(n)] or {}).get("paragraphs") or {}):
+            break
+    return [str(n) for n in window]
+
+
+def _join_chains(refs: List[ParaRef]) -> List[List[int]]:
+    """refs を結合チェーン（run）に分ける。apply_all() と同じく、先頭の無い join=1 はそれ自身を base とみなす。"""
+    chains: List[List[int]] = []
+    visited: Set[int] = set()
+    for i in range(len(refs)):
+        if i in visited:
+            continue
+        base_i = find_base_index(refs, i, normalize_head=True)
+        if base_i is None or base_i in visited:
+            base_i = i
+        members = run_members(refs, base_i)
+        if i not in members:
+            members = run_members(refs, i)
+        visited.update(members)
+        chains.append(members)
+    return chains
+
+
+def _status(p: Dict[str, Any]) -> str:
+    status = p.get("trans_status", "none")
+    return status if status in _TRANS_STATUS_KEYS else "none"
+
+
+def reextract_pages(
+    book_data: Dict[str, Any],
+    pdf_path: str,
+    page_numbers: Iterable[int],
+    *,
+    header_y1: Optional[float] = None,
+    footer_y0: Optional[float] = None,
+) -> Dict[str, Any]:
+    """book_data の指定ページ（1始まり）を抽出し直して置き換え、統計を返す（book_data を直接書き換える）。
+
+    header_y1 / footer_y0 を省略したらブックに記録されている値を使う。指定したらブックの値も更新する
+    （指定しなかったページは元の位置で抽出されたままなので、必要なら全ページを指定すること）。
+    """
+    if header_y1 is None:
+        header_y1 = book_data.get("header_y1")
+    if footer_y0 is None:
+        footer_y0 = book_data.get("footer_y0")
+    if header_y1 is None or footer_y0 is None:
+        raise ValueError("header_y1 / footer_y0 がブックに記録されていません")
+
+    extracted = extract_pages(pdf_path, list(page_numbers), header_y1, footer_y0)
+    pages = book_data.setdefault("pages", {})
+    styles = book_data.setdefault("styles", {})
+    counts = book_data.get("trans_status_counts")
+    delta_counts = isinstance(counts, dict) and all(k in counts for k in _TRANS_STATUS_KEYS)
+
+    # 置き換える前の結合チェーン（抽出し直すページと、それにつながる前後のページの分）
+    page_keys = {str(n) for n in extracted}
+    window = _join_window(pages, min(extracted), max(extracted)) if extracted else []
+    old_refs = iter_paragraph_refs({"pages": {k: pages[k] for k in window}})
+    old_chains = _join_chains(old_refs)
+
+    stats: Dict[str, Any] = {"pages": [], "paragraphs": 0, "carried": 0, "dropped": 0, "rejoined": 0, "joined_pages": []}
+    matched: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for page_number, (new_paragraphs, page_styles) in extracted.items():
+        key = str(page_number)
+        old_paragraphs = ((pages.get(key) or {}).get("paragraphs") or {})
+        page_matched: Dict[str, Dict[str, Any]] = {}
+        carried = carry_over(old_paragraphs, new_paragraphs, page_matched)
+        matched.update(((key, para_key), p) for para_key, p in page_matched.items())
+        if delta_counts:
+            for p in old_paragraphs.values():
+                if isinstance(p, dict):
+                    counts[_status(p)] = max(0, int(counts.get(_status(p), 0)) - 1)
+            for p in new_paragraphs.values():
+                counts[_status(p)] = int(counts.get(_status(p), 0)) + 1
+        page = dict(pages.get(key) or {})
+        page["paragraphs"] = new_paragraphs
+        pages[key] = page
+        styles.update(page_styles)
+        stats["pages"].append(page_number)
+        stats["paragraphs"] += len(new_paragraphs)
+        stats["carried"] += carried
+        stats["dropped"] += len(old_paragraphs) - carried
+
+    # 結合から作られるフィールドは、チェーンの段落がすべて引き継げたときだけ引き継ぐ
+    for members in old_chains:
+        keys = [old_refs[k].key for k in members if old_refs[k].key[0] in page_keys]
+        if not keys:
+            continue
+        if any(k not in matched for k in keys):
+            if len(members) > 1:
+                stats["rejoined"] += 1
+            continue
+        for k in members:
+            ref = old_refs[k]
+            if ref.key in matched:
+                for name in JOIN_FIELDS:
+                    if name in ref.p:
+                        matched[ref.key][name] = ref.p[name]
+
+    # 抽出し直したページにかかるチェーンを組み直す（引き継げたチェーンは src_joined が変わらないのでそのまま）
+    window = sorted(set(window) | page_keys, key=int)
+    new_refs = iter_paragraph_refs({"pages": {k: pages[k] for k in window}})
+    joined_pages: Set[str] = set()
+    for members in _join_chains(new_refs):
+        if not any(new_refs[k].key[0] in page_keys for k in members):
+            continue
+        before = [(new_refs[k].p.get("src_joined"), _status(new_refs[k].p)) for k in members]
+        base_p = new_refs[members[0]].p
+        if str(base_p.get("join", 0)) == "1":
+            base_p["join"] = 0
+        rebuild_run(new_refs, members[0])
+        for k, (src_joined, status) in zip(members, before):
+            ref = new_refs[k]
+            if (ref.p.get("src_joined"), _status(ref.p)) == (src_joined, status):
+                continue
+            if ref.key[0] not in page_keys:
+                joined_pages.add(ref.key[0])
+            if delta_counts and _status(ref.p) != status:
+                counts[status] = max(0, int(counts.get(status, 0)) - 1)
+                counts[_status(ref.p)] = int(counts.get(_status(ref.p), 0)) + 1
+    stats["joined_pages"] = sorted(int(k) for k in joined_pages)
+
+    book_data["header_y1"] = header_y1
+    book_data["footer_y0"] = footer_y0
+    if not delta_counts:
+        recalc_trans_status_counts(book_data)
+    return stats
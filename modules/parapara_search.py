@@ -1,11 +1,17 @@
 def _strip_html(text: str) -> str:
     return _TAG_RE.sub("", text)
 
+import bisect
 import html
 import json
+import os
 import re
+import threading
 import unicodedata
-from typing import Any
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from app.repositories.book_repo import load_book
 
 _TAG_RE = re.compile(r"<[^>]+>")
 
@@ -14,27 +20,17 @@ _KATAKANA_END = ord("ヶ")
 _HIRAGANA_START = ord("ぁ")
 _HIRAGANA_END = ord("ゖ")
 
+_TO_HIRAGANA = {code: code - 0x60 for code in range(_KATAKANA_START, _KATAKANA_END + 1)}
+_TO_KATAKANA = {code: code + 0x60 for code in range(_HIRAGANA_START, _HIRAGANA_END + 1)}
+
+
 def _to_hiragana(text: str) -> str:
     # カタカナ→ひらがな
-    res = []
-    for c in text:
-        code = ord(c)
-        if _KATAKANA_START <= code <= _KATAKANA_END:
-            res.append(chr(code - 0x60))
-        else:
-            res.append(c)
-    return ''.join(res)
+    return text.translate(_TO_HIRAGANA)
 
 def _to_katakana(text: str) -> str:
     # ひらがな→カタカナ
-    res = []
-    for c in text:
-        code = ord(c)
-        if _HIRAGANA_START <= code <= _HIRAGANA_END:
-            res.append(chr(code + 0x60))
-        else:
-            res.append(c)
-    return ''.join(res)
+    return text.translate(_TO_KATAKANA)
 
 def _normalize(text: Any) -> str:
     s = "" if text is None else str(text)
@@ -66,67 +62,279 @@ def _find_hit_field(paragraph: dict, terms: list[str]) -> tuple[str, str]:
     return "", ""
 
 
-def search_paragraphs_in_book(json_path: str, query: str, *, limit: int = 200) -> list[dict]:
-    """Search paragraphs in a book JSON.
-        Targets: src_joined, src_text, trans_text, trans_auto.
-    Returns list of dict:
-      {page_number:int, id:str, snippet:str}
-    """
+_SEARCH_FIELDS = ("src_joined", "src_text", "trans_text", "trans_auto")
+# 索引ブロブ内の区切り（正規化後のテキストには現れない制御文字）
+_PARA_SEP = "\x00"
+_FIELD_SEP = "\x01"
+
+
+def _parse_terms(query: str) -> list[str]:
     q = (query or "").strip()
     if not q:
         return []
     # split by whitespace, AND semantics
+    # 正規化で空になる語（"<b>" などタグだけの語）は条件にしない
     terms = [_normalize(t) for t in re.split(r"\s+", q) if t]
-    if not terms:
-        return []
+    return [t for t in terms if t]
+
+
+def _clamp_limit(limit: Any) -> int:
     limit = int(limit) if isinstance(limit, int) or str(limit).isdigit() else 200
-    limit = max(1, min(limit, 2000))
-    with open(json_path, "r", encoding="utf-8") as f:
-        book_data = json.load(f)
-    pages = book_data.get("pages", {}) or {}
-    results: list[dict] = []
-    for page_key, page in pages.items():
-        paragraphs = (page or {}).get("paragraphs", {}) or {}
-        for pid, p in paragraphs.items():
+    return max(1, min(limit, 2000))
+
+
+def _make_snippet(value: Any) -> str:
+    snippet = _strip_html(html.unescape(str(value))).replace("\n", " ").strip()
+    if len(snippet) > 90:
+        snippet = snippet[:90] + "…"
+    return snippet
+
+
+class _IndexedParagraph:
+    """検索用に正規化済みの段落。元の段落の代わりにヒット判定・スニペット・並び順に使う。"""
+
+    __slots__ = ("id", "page_number", "sort", "fields", "folded")
+
+    def __init__(self, page_key: str, pid: str, p: dict) -> None:
+        try:
+            page_number = int(p.get("page_number") or page_key)
+        except Exception:
+            page_number = None
+        try:
+            order = int(p.get("order") or 0)
+        except Exception:
+            order = 0
+        try:
+            column_order = int(p.get("column_order") or 0)
+        except Exception:
+            column_order = 0
+        try:
+            y0 = float((p.get("bbox") or [0, 0])[1] or 0)
+        except Exception:
+            y0 = 0.0
+        self.id = str(p.get("id") or pid)
+        self.page_number = page_number
+        self.sort = (page_number or 0, order, column_order, y0)
+        # (正規化済みテキスト, 元の値) をフィールド順に。空のフィールドは None（スニペットはヒット時に作る）
+        fields = []
+        for key in _SEARCH_FIELDS:
+            v = p.get(key)
+            fields.append((_normalize(v), v) if v else None)
+        self.fields = tuple(fields)
+        # 候補絞り込み用: ひらがなに寄せたテキスト（カタカナ/ひらがな/元の表記のどれでヒットしても含まれる）
+        self.folded = _FIELD_SEP.join(_to_hiragana(f[0]) for f in fields if f is not None)
+
+    def hit_snippet(self, terms: list[str]) -> str | None:
+        # _find_hit_field と同じ判定（最初にすべての語を含んだフィールドのスニペットを返す）
+        for field in self.fields:
+            if field is None:
+                continue
+            s = field[0]
+            normset = (s, _to_hiragana(s), _to_katakana(s))
+            if all(any(t in n for n in normset) for t in terms):
+                return _make_snippet(field[1])
+        return None
+
+
+class _PageIndex:
+    __slots__ = ("paragraphs", "keys", "blob", "starts")
+
+    def __init__(self, page_key: str, page: dict) -> None:
+        self.paragraphs: list[_IndexedParagraph] = []
+        self.keys: dict[str, int] = {}
+        for pid, p in ((page or {}).get("paragraphs", {}) or {}).items():
             if not isinstance(p, dict):
                 continue
-            # 各フィールドでヒット判定
-            hit_field, hit_value = _find_hit_field(p, terms)
-            if not hit_field:
+            self.keys[str(pid)] = len(self.paragraphs)
+            self.paragraphs.append(_IndexedParagraph(page_key, str(pid), p))
+        self._rebuild_blob()
+
+    def _rebuild_blob(self) -> None:
+        self.starts: list[int] = []
+        pos = 0
+        for para in self.paragraphs:
+            self.starts.append(pos)
+            pos += len(para.folded) + 1
+        self.blob = _PARA_SEP.join(para.folded for para in self.paragraphs)
+
+    def update(self, page_key: str, pid: str, p: dict) -> bool:
+        i = self.keys.get(str(pid))
+        if i is None or not isinstance(p, dict):
+            return False
+        self.paragraphs[i] = _IndexedParagraph(page_key, str(pid), p)
+        self._rebuild_blob()
+        return True
+
+
+class BookSearchIndex:
+    """1冊分の検索索引。
+
+    - ページごとに、段落のフィールドを正規化（NFKC・小文字化・HTML除去）してひらがなに寄せたテキストを
+      1本の文字列に連結して持つ。クエリの語をひらがなに寄せて str.find で探し、ヒットした段落だけを
+      従来と同じ規則（フィールドごとに、元の表記・ひらがな・カタカナのいずれかに全語が含まれるか）で判定する
+    - 段落単位で更新できる（update_paragraph）。ページ内の連結文字列だけを作り直す
+    """
+
+    def __init__(self, book_data: dict) -> None:
+        self.pages: dict[str, _PageIndex] = {}
+        for page_key, page in (book_data.get("pages", {}) or {}).items():
+            self.pages[str(page_key)] = _PageIndex(str(page_key), page)
+
+    def update_paragraph(self, page_key: Any, pid: Any, paragraph: dict) -> bool:
+        page = self.pages.get(str(page_key))
+        return page is not None and page.update(str(page_key), str(pid), paragraph)
+
+    def search(self, query: str, *, limit: int = 200) -> list[dict]:
+        terms = _parse_terms(query)
+        if not terms:
+            return []
+        limit = _clamp_limit(limit)
+        folded_terms = [_to_hiragana(t) for t in terms]
+        # 長い語ほどヒットする段落が少ないので、それで候補を探す
+        key = max(folded_terms, key=len)
+        others = [t for t in folded_terms if t != key]
+
+        results: list[dict] = []
+        for page in self.pages.values():
+            blob = page.blob
+            starts = page.starts
+            if not starts:
                 continue
-            try:
-                page_number = int(p.get("page_number") or page_key)
-            except Exception:
-                page_number = None
-            para_id = p.get("id") or pid
-            snippet = _strip_html(html.unescape(hit_value)).replace("\n", " ").strip()
-            if len(snippet) > 90:
-                snippet = snippet[:90] + "…"
-            try:
-                order = int(p.get("order") or 0)
-            except Exception:
-                order = 0
-            try:
-                column_order = int(p.get("column_order") or 0)
-            except Exception:
-                column_order = 0
-            try:
-                y0 = float((p.get("bbox") or [0, 0])[1] or 0)
-            except Exception:
-                y0 = 0.0
-            results.append(
-                {
-                    "page_number": page_number,
-                    "id": str(para_id),
-                    "snippet": snippet,
-                    "_sort": (page_number or 0, order, column_order, y0),
-                }
-            )
+            pos = 0
+            while True:
+                found = blob.find(key, pos)
+                if found < 0:
+                    break
+                i = bisect.bisect_right(starts, found) - 1
+                para = page.paragraphs[i]
+                pos = starts[i + 1] if i + 1 < len(starts) else len(blob) + 1
+                if any(t not in para.folded for t in others):
+                    continue
+                snippet = para.hit_snippet(terms)
+                if snippet is None:
+                    continue
+                results.append(
+                    {
+                        "page_number": para.page_number,
+                        "id": para.id,
+                        "snippet": snippet,
+                        "_sort": para.sort,
+                    }
+                )
+                if len(results) >= limit:
+                    break
             if len(results) >= limit:
                 break
-        if len(results) >= limit:
-            break
-    results.sort(key=lambda r: r.get("_sort") or (0, 0, 0, 0))
-    for r in results:
-        r.pop("_sort", None)
-    return results
+        results.sort(key=lambda r: r.get("_sort") or (0, 0, 0, 0))
+        for r in results:
+            r.pop("_sort", None)
+        return results
+
+
+class SearchIndexStore:
+    """ブックごとの BookSearchIndex をプロセス内に保持する。
+
+    - 索引は作成時のブックの signature（book_repo.book_signature）と組で持ち、一致する間は使い回す
+    - 段落の保存時は apply_patches() で変更のあった段落だけを索引し直し、signature を進める
+    - 翻訳・辞書置換など modules 側がファイルを書き換えた場合は signature の不一致で作り直す
+    """
+
+    def __init__(self, max_books: int = 4) -> None:
+        self.max_books = max(1, int(max_books))
+        self._indexes: "OrderedDict[str, tuple[Any, BookSearchIndex]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "builds": 0, "incremental": 0, "invalidations": 0}
+
+    def _key(self, json_path: str) -> str:
+        return os.path.normcase(os.path.abspath(json_path))
+
+    def search(
+        self,
+        json_path: str,
+        query: str,
+        *,
+        limit: int = 200,
+        signature: Any,
+        load: Callable[[], dict],
+    ) -> list[dict]:
+        """signature が一致する索引があればそれで、無ければ load() したブックから作って検索する。"""
+        key = self._key(json_path)
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is not None and cached[0] == signature:
+                self._indexes.move_to_end(key)
+                self._stats["hits"] += 1
+                return cached[1].search(query, limit=limit)
+        index = BookSearchIndex(load())
+        with self._lock:
+            self._indexes[key] = (signature, index)
+            self._indexes.move_to_end(key)
+            self._stats["builds"] += 1
+            while len(self._indexes) > self.max_books:
+                self._indexes.popitem(last=False)
+            return index.search(query, limit=limit)
+
+    def apply_patches(
+        self,
+        json_path: str,
+        book_data: dict,
+        patches: Optional[list[dict]],
+        *,
+        before: Any,
+        after: Any,
+    ) -> None:
+        """ブックの保存後に呼ぶ。保存前の signature で作った索引なら、パッチの段落だけ索引し直す。"""
+        key = self._key(json_path)
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is None:
+                return
+            if patches is None or cached[0] != before or after is None:
+                self._indexes.pop(key, None)
+                self._stats["invalidations"] += 1
+                return
+            index = cached[1]
+            pages = book_data.get("pages", {}) or {}
+            for patch in patches:
+                if "page" not in patch:
+                    continue
+                page_key = str(patch.get("page"))
+                pid = str(patch.get("id"))
+                paragraph = ((pages.get(page_key) or {}).get("paragraphs", {}) or {}).get(pid)
+                if not index.update_paragraph(page_key, pid, paragraph):
+                    # 索引に無い段落（追加など）は作り直す
+                    self._indexes.pop(key, None)
+                    self._stats["invalidations"] += 1
+                    return
+            self._indexes[key] = (after, index)
+            self._stats["incremental"] += 1
+
+    def resign(self, json_path: str, before: Any, after: Any) -> None:
+        """内容を変えずに signature だけが変わった（ジャーナルの畳み込みなど）ときに呼ぶ。"""
+        key = self._key(json_path)
+        with self._lock:
+            cached = self._indexes.get(key)
+            if cached is not None and cached[0] == before:
+                self._indexes[key] = (after, cached[1])
+
+    def invalidate(self, json_path: str) -> None:
+        with self._lock:
+            if self._indexes.pop(self._key(json_path), None) is not None:
+                self._stats["invalidations"] += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached_books"] = len(self._indexes)
+        return stats
+
+
+def search_paragraphs_in_book(json_path: str, query: str, *, limit: int = 200) -> list[dict]:
+    """Search paragraphs in a book JSON.
+        Targets: src_joined, src_text, trans_text, trans_auto.
+    Returns list of dict:
+      {page_number:int, id:str, snippet:str}
+    """
+    if not _parse_terms(query):
+        return []
+    return BookSearchIndex(load_book(json_path)).search(query, limit=limit)
@@ -1,11 +1,12 @@
 from __future__ import annotations
 
 import datetime
-import json
 import os
 import shutil
 from typing import Any, Dict, Tuple
 
+from app.repositories.json_repo import loads
+
 
 STRUCTURE_EXCLUDE_KEYS = {
     # 原文/派生原文（著作権配慮＆共同作業用に除外）
@@ -116,4 +117,4 @@ def merge_structure_into_book(
 
 def load_json_from_upload(upload_file) -> Dict[str, Any]:
     """Flaskの upload file から JSON object を読む（例外は呼び出し側で処理）。"""
-    return json.load(upload_file)
+    return loads(upload_file.read())
@@ -40,6 +40,16 @@ import re
 import tempfile
 from typing import Dict, Iterable, Iterator, Tuple
 
+import sys
+
+if __name__ == "__main__":
+    # python modules/parapara_symbolfont_rebuild.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories.book_repo import load_book, save_book
+
 
 _SPAN_RE = re.compile(r'<span class="([^"]+)">(.*?)</span>', re.DOTALL)
 
@@ -169,24 +179,11 @@ def rebuild_src_text_in_book_data(
 
 
 def load_json(json_path: str) -> dict:
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_book(json_path)
 
 
 def atomicsave_json(json_path: str, data: dict) -> None:
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path), suffix=".json", text=True)
-    try:
-        with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmp_file:
-            json.dump(data, tmp_file, ensure_ascii=False, indent=2)
-        os.replace(tmp_path, json_path)
-    finally:
-        if os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except OSError:
-                pass
+    save_book(json_path, data)
 
 
 def rebuild_src_text_in_file(json_path: str, symbolfont_dict_path: str) -> int:
@@ -6,6 +6,14 @@ import numpy as np
 import os
 import re
 
+if __name__ == "__main__":
+    # python modules/parapara_tagging_by_structure.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories.book_repo import load_book, save_book
+
 def set_analyzed_block_tags(book_data, symbol_fonts=None):
 
     head_styles = book_data.get("styles", {})
@@ -226,18 +234,11 @@ def structure_tagging(file_path, symbol_font_path):
 
 # json を読み込んでobjectを戻す(テスト用)
 def load_json(json_path: str):
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+    return load_book(json_path)
 
 # アトミックセーブ
 def atomicsave_json(json_path, data):
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path), suffix=".json", text=True)
-    with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmp_file:
-        json.dump(data, tmp_file, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, json_path)
+    save_book(json_path, data)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
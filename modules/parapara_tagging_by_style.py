@@ -3,6 +3,14 @@ import sys
 import os
 import tempfile
 
+if __name__ == "__main__":
+    # python modules/parapara_tagging_by_style.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories.book_repo import load_book, save_book
+
 def tag_paragraphs_by_style(file_path, target_style, target_tag):
     """
     指定されたJSONファイル内の、指定されたスタイルを持つ段落のblock_tagを指定された値に設定する。
@@ -45,20 +53,13 @@ def load_json(json_path: str):
     """
     JSONファイルを読み込んでデータを返す。
     """
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+    return load_book(json_path)
 
 def atomicsave_json(json_path, data):
     """
     JSONデータをアトミックにファイルに保存する。
     """
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path), suffix=".json", text=True)
-    with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmp_file:
-        json.dump(data, tmp_file, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, json_path)
+    save_book(json_path, data)
 
 if __name__ == "__main__":
     if len(sys.argv) != 4:
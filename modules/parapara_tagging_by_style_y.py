@@ -5,6 +5,14 @@ import sys
 import tempfile
 from typing import Any, Dict, Tuple
 
+if __name__ == "__main__":
+    # python modules/parapara_tagging_by_style_y.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+from app.repositories.book_repo import load_book, save_book
+
 
 _ALLOWED_ACTIONS = {"header", "footer", "remove"}
 
@@ -158,17 +166,11 @@ def _reorder_page_paragraphs_for_special_tags(page_data: Dict[str, Any]) -> None
 
 
 def load_json(json_path: str) -> Dict[str, Any]:
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return load_book(json_path)
 
 
 def atomicsave_json(json_path: str, data: Dict[str, Any]) -> None:
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path), suffix=".json", text=True)
-    with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmp_file:
-        json.dump(data, tmp_file, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, json_path)
+    save_book(json_path, data)
 
 
 def tag_paragraphs_by_style_y_in_file(
@@ -11,21 +11,100 @@ import logging
 import unicodedata
 from datetime import datetime
 import tempfile
-from dataclasses import dataclass, asdict
-from typing import Dict, List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, asdict, field, fields
+from typing import Dict, List, Optional, Tuple
 
-# 対訳辞書置換用
-from modules.parapara_dict_replacer import load_dictionary, replace_with_dict
 import sys
 
+if __name__ == "__main__":
+    # python modules/parapara_trans.py で直接実行したときも app パッケージを読めるよう、リポジトリルートを追加する
+    _REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _REPO_ROOT not in sys.path:
+        sys.path.insert(0, _REPO_ROOT)
+
+# 対訳辞書置換用
+from modules.parapara_dict_replacer import DictMatcher, load_dict_matcher
+
+from app.repositories.book_journal import book_patch, paragraph_patch
+from app.repositories.book_repo import append_book_patches, compact_book, load_book, save_book
+
 DICT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "dict.txt")
 
 try:
     # パッケージとして読み込まれる（Flaskアプリなど）ケース
-    from .api_translate import translate_text  # type: ignore
+    from .api_translate import (  # type: ignore
+        get_current_translator,
+        lookup_translations,
+        remember_translations,
+        translate_text,
+        translate_texts,
+    )
 except Exception:
     # スクリプトとして直接実行されるケース（sys.path に modules が入っている前提）
-    from api_translate import translate_text  # type: ignore
+    from api_translate import (  # type: ignore
+        get_current_translator,
+        lookup_translations,
+        remember_translations,
+        translate_text,
+        translate_texts,
+    )
+
+# 翻訳エンジンごとの同時リクエスト数の上限（複数ブックの翻訳が同時に走っても合計で超えない）
+_ENGINE_CONCURRENCY = {"google": 4, "google_v3": 4, "deepl": 2}
+# 翻訳エンジンごとの1リクエストあたりの文字数上限（マーカー・HTMLエスケープ込み）
+# - google(v2): 1リクエスト 5000 文字程度が推奨
+# - google_v3: 1リクエスト 30000 コードポイントまでだが、長すぎるとマーカー欠落が増えるので控えめにする
+# - deepl: リクエストサイズ上限(128KiB)に十分収まる範囲
+_ENGINE_GROUP_CHARS = {"google": 5000, "google_v3": 10000, "deepl": 10000}
+_engine_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_engine_semaphores_lock = threading.Lock()
+
+
+def _translate_workers() -> int:
+    """グループ翻訳のワーカー数（TRANSLATE_WORKERS、既定4）。1 なら従来どおり逐次処理。"""
+    try:
+        return max(1, int(os.getenv("TRANSLATE_WORKERS", "4")))
+    except ValueError:
+        return 4
+
+
+def _checkpoint_pages() -> int:
+    """何ページ翻訳するごとにジャーナルを本体へ畳み込むか（TRANSLATE_CHECKPOINT_PAGES、既定20）。"""
+    try:
+        return max(1, int(os.getenv("TRANSLATE_CHECKPOINT_PAGES", "20")))
+    except ValueError:
+        return 20
+
+
+def _group_chars(engine: str) -> int:
+    """1グループ（1リクエスト）の文字数上限。TRANSLATE_GROUP_CHARS があればそれを優先する。"""
+    v = os.getenv("TRANSLATE_GROUP_CHARS", "").strip()
+    if v:
+        try:
+            return max(1, int(v))
+        except ValueError:
+            pass
+    return _ENGINE_GROUP_CHARS.get(engine, 4000)
+
+
+def _engine_semaphore(engine: str) -> threading.BoundedSemaphore:
+    with _engine_semaphores_lock:
+        sem = _engine_semaphores.get(engine)
+        if sem is None:
+            sem = threading.BoundedSemaphore(_ENGINE_CONCURRENCY.get(engine, 2))
+            _engine_semaphores[engine] = sem
+        return sem
+
+
+def _load_matcher() -> DictMatcher:
+    """対訳辞書のコンパイル済みマッチャー（mtime が変わらない限りページ・グループ間で共有される）。"""
+    try:
+        return load_dict_matcher(DICT_PATH)
+    except Exception as e:
+        print(f"[WARN] 対訳辞書の読み込みに失敗: {e}")
+        return DictMatcher({}, {})
 
 
 def _debug_pagetrans_enabled() -> bool:
@@ -33,6 +112,14 @@ def _debug_pagetrans_enabled() -> bool:
     return v in {"1", "true", "yes", "on"}
 
 
+# ページ翻訳で書き換わり得る段落フィールド（ジャーナルへ追記する対象）
+_PAGETRANS_PATCH_FIELDS = ("src_replaced", "trans_auto", "trans_text", "trans_status", "modified_at")
+
+
+def _paragraph_snapshot(paragraph: dict) -> tuple:
+    return tuple(paragraph.get(name) for name in _PAGETRANS_PATCH_FIELDS)
+
+
 def _pagetrans_debug(msg: str):
     if _debug_pagetrans_enabled():
         # 既存の仕組みに載せるため print を使う（SSE/ログ出力に流れる）
@@ -53,6 +140,63 @@ class TranslationStats:
     skipped_join_empty: int = 0
     missing_from_batch: int = 0
     groups: int = 0
+    tm_hits: int = 0
+    tm_misses: int = 0
+    # マーカー欠落時の回復（二分割した回数 / translate_texts でまとめた回数 / 段落単体で訳した数）
+    recovery_splits: int = 0
+    recovery_batches: int = 0
+    recovery_singles: int = 0
+
+
+def _merge_stats(total: TranslationStats, part: TranslationStats) -> None:
+    for f in fields(TranslationStats):
+        setattr(total, f.name, getattr(total, f.name) + getattr(part, f.name))
+
+
+@dataclass
+class _PageJob:
+    """1ページ分の翻訳作業（辞書置換を済ませ、翻訳対象の段落を選んだ状態）。"""
+    page_number: int
+    paragraphs: dict
+    snapshots: dict
+    before: dict
+    targets: List[dict] = field(default_factory=list)
+    pending: int = 0
+
+
+def _group_payload(para: dict) -> str:
+    """process_group が翻訳 API へ送る段落1つ分のテキスト（マーカー付き・HTMLエスケープ済み）。"""
+    return f"\n【{para['id']}】\n{html.escape(para.get('src_replaced', ''))}\n"
+
+
+def _pack_groups(jobs: List["_PageJob"], limit: int) -> List[Tuple[List[dict], List["_PageJob"]]]:
+    """
+    ページをまたいで、文書順のまま翻訳対象段落を limit 文字以内のグループに詰める。
+
+    戻り値は (段落のリスト, そのグループが含むページ) の組のリスト。各ページの pending には
+    そのページを含むグループ数を設定する。1段落で limit を超える場合はその段落だけのグループにする。
+    """
+    groups: List[Tuple[List[dict], List[_PageJob]]] = []
+    current: List[dict] = []
+    current_jobs: List[_PageJob] = []
+    current_length = 0
+    for job in jobs:
+        job.pending = 0
+        for para in job.targets:
+            cost = len(_group_payload(para))
+            if current and current_length + cost > limit:
+                groups.append((current, current_jobs))
+                current, current_jobs, current_length = [], [], 0
+            current.append(para)
+            current_length += cost
+            if not current_jobs or current_jobs[-1] is not job:
+                current_jobs.append(job)
+    if current:
+        groups.append((current, current_jobs))
+    for _, group_jobs in groups:
+        for job in group_jobs:
+            job.pending += 1
+    return groups
 
 
 _MARKER_RE = re.compile(r"【\s*([0-9]+[＿_][0-9]+)\s*】")
@@ -91,11 +235,13 @@ def _apply_translation_to_paragraph(para: dict, translated_content: str) -> None
 
 def process_group(paragraphs_group: List[dict], stats: Optional[TranslationStats] = None):
     """
-    1. 指定グループの各段落の src_replaced の先頭に【id】を付与して連結し、5000文字以内となる翻訳前テキストを作成
+    1. 指定グループの各段落の src_replaced の先頭に【id】を付与して連結し、翻訳前テキストを作成
+       （グループは _pack_groups でエンジンごとの文字数上限に収まるように作られている）
     2. 翻訳関数 translate_text を呼び出し、翻訳結果を取得
     3. 翻訳結果から各部の id と翻訳文を抽出し、該当するパラグラフに trans_auto をセットする
        - trans_status が "none" の場合、"auto" に変更
        - modified_at を現在時刻に更新
+       - マーカーが欠落した段落は二分割して再翻訳する（_recover_missing）
     4. 翻訳結果を反映した JSON データをファイルへ保存する
     """
     if stats is not None:
@@ -103,89 +249,124 @@ def process_group(paragraphs_group: List[dict], stats: Optional[TranslationStats
 
 
     # --- 追加: 単体パラグラフ翻訳前にも対訳辞書置換を適用 ---
-    try:
-        dict_cs, dict_ci = load_dictionary(DICT_PATH)
-    except Exception as e:
-        print(f"[WARN] 対訳辞書の読み込みに失敗: {e}")
-        dict_cs, dict_ci = {}, {}
+    matcher = _load_matcher()
     for para in paragraphs_group:
         src_joined = para.get("src_joined", "")
-        para["src_replaced"] = replace_with_dict(src_joined, dict_cs, dict_ci)
+        para["src_replaced"] = matcher.replace(src_joined)
 
-    # 各段落のテキストを生成（src_replacedをHTMLエスケープ）
-    texts = [
-        f"\n【{para['id']}】\n{html.escape(para.get('src_replaced', ''))}\n" for para in paragraphs_group
-    ]
-    concatenated_text = "".join(texts)
+    # 翻訳メモリに同じ原文があれば API に送らずに反映する
+    memorized = lookup_translations(
+        [para.get("src_replaced", "") for para in paragraphs_group], source="en", target="ja", stats=stats
+    )
+    remaining = []
+    for para, cached in zip(paragraphs_group, memorized):
+        if cached is None:
+            remaining.append(para)
+            continue
+        _apply_translation_to_paragraph(para, cached)
+        if stats is not None:
+            stats.translated += 1
+    if not remaining:
+        return
+    paragraphs_group = remaining
+
+    _translate_marked_group(paragraphs_group, stats, depth=0)
+
+
+# マーカー欠落時の二分割をどこまで続けるか。これ以下の段落数になったら translate_texts でまとめて訳す
+_BISECT_MIN_PARAGRAPHS = 2
+_BISECT_MAX_DEPTH = 6
+
+
+def _translate_marked_group(paragraphs_group: List[dict], stats: Optional[TranslationStats], depth: int) -> None:
+    """
+    段落を【id】マーカー付きで連結して1リクエストで翻訳し、マーカーで切り分けて反映する。
+    マーカーが欠落した段落は _recover_missing で二分割して再翻訳する。
+    """
+    concatenated_text = "".join(_group_payload(para) for para in paragraphs_group)
     print("FOR DEBUG(LEFT200/1TRANS):" + concatenated_text[:200])
 
     para_by_id: Dict[str, dict] = {str(para['id']): para for para in paragraphs_group}
 
     try:
-        translated_text = translate_text(concatenated_text, source="en", target="ja")
+        # 連結テキストはそのまま再利用されることがほぼ無いので、翻訳メモリには段落単位で保存する
+        translated_text = translate_text(concatenated_text, source="en", target="ja", memory=False)
     except Exception as e:
-        # グループ翻訳が落ちた場合は、段落単体へフォールバックする
-        print(f"Warning: グループ翻訳に失敗。段落単体にフォールバックします: {e}")
-        for pid, para in para_by_id.items():
-            try:
-                t = translate_text(para.get("src_replaced", ""), source="en", target="ja")
-                _apply_translation_to_paragraph(para, t)
-                if stats is not None:
-                    stats.translated += 1
-                    stats.translated_fallback += 1
-            except Exception as ee:
-                if stats is not None:
-                    stats.failed += 1
-                print(f"Warning: 段落単体翻訳にも失敗しました id={pid}: {ee}")
+        # API エラーは分割しても直らないことが多いので、分割せずにまとめて段落単位の翻訳へ
+        print(f"Warning: グループ翻訳に失敗。段落単位の翻訳にフォールバックします: {e}")
+        _translate_batch_fallback(paragraphs_group, stats)
         return
 
     extracted = _extract_translations_by_marker(translated_text)
-    if not extracted:
-        # マーカーが崩れて全く取れない場合は、全段落を単体翻訳へ
-        print("Warning: 翻訳結果からマーカー抽出できません。段落単体にフォールバックします")
-        for pid, para in para_by_id.items():
-            try:
-                t = translate_text(para.get("src_replaced", ""), source="en", target="ja")
-                _apply_translation_to_paragraph(para, t)
-                if stats is not None:
-                    stats.translated += 1
-                    stats.translated_fallback += 1
-                    stats.missing_from_batch += 1
-            except Exception as ee:
-                if stats is not None:
-                    stats.failed += 1
-                    stats.missing_from_batch += 1
-                print(f"Warning: 段落単体翻訳にも失敗しました id={pid}: {ee}")
-        return
 
     matched = 0
+    learned = []
     for pid, content in extracted.items():
         if pid in para_by_id:
             _apply_translation_to_paragraph(para_by_id[pid], content)
+            learned.append((para_by_id[pid].get("src_replaced", ""), content))
             matched += 1
         else:
             print(f"Warning: 翻訳結果のid {pid} に対応する段落が見つかりません。")
+    remember_translations(learned, source="en", target="ja")
 
     if stats is not None:
         stats.translated += matched
 
-    missing_ids = [pid for pid in para_by_id.keys() if pid not in extracted]
-    if missing_ids:
+    missing = [para for pid, para in para_by_id.items() if pid not in extracted]
+    if not missing:
+        return
+    if stats is not None and depth == 0:
+        stats.missing_from_batch += len(missing)
+    print(f"Warning: マーカー欠落により未反映の段落があります。分割して再翻訳します count={len(missing)} depth={depth}")
+    _recover_missing(missing, stats, depth)
+
+
+def _recover_missing(paragraphs: List[dict], stats: Optional[TranslationStats], depth: int) -> None:
+    """
+    マーカーが欠落した段落を半分ずつに分けてマーカー付きで翻訳し直す。
+    段落数が少なくなるか分割が深くなったら、translate_texts で残りを1回にまとめて訳す。
+    マーカーの崩れが一部に限られていれば、追加のリクエストは O(log n) 回で済む。
+    """
+    if len(paragraphs) <= _BISECT_MIN_PARAGRAPHS or depth >= _BISECT_MAX_DEPTH:
+        _translate_batch_fallback(paragraphs, stats)
+        return
+    if stats is not None:
+        stats.recovery_splits += 1
+    mid = len(paragraphs) // 2
+    for half in (paragraphs[:mid], paragraphs[mid:]):
+        _translate_marked_group(half, stats, depth + 1)
+
+
+def _translate_batch_fallback(paragraphs: List[dict], stats: Optional[TranslationStats]) -> None:
+    """マーカーを使わず translate_texts で段落を1リクエストにまとめて訳す。失敗したら段落単体で訳す。"""
+    texts = [para.get("src_replaced", "") for para in paragraphs]
+    try:
         if stats is not None:
-            stats.missing_from_batch += len(missing_ids)
-        print(f"Warning: マーカー欠落により未反映の段落があります。フォールバックします count={len(missing_ids)}")
-        for pid in missing_ids:
-            para = para_by_id[pid]
-            try:
-                t = translate_text(para.get("src_replaced", ""), source="en", target="ja")
-                _apply_translation_to_paragraph(para, t)
-                if stats is not None:
-                    stats.translated += 1
-                    stats.translated_fallback += 1
-            except Exception as ee:
+            stats.recovery_batches += 1
+        # 翻訳メモリは process_group で引き済みなので、ここではヒット/ミスを数えない（訳は保存する）
+        results = translate_texts(texts, source="en", target="ja", memory=True)
+        if len(results) != len(paragraphs):
+            raise ValueError(f"translate_texts の結果数が一致しません: {len(results)} != {len(paragraphs)}")
+    except Exception as e:
+        print(f"Warning: まとめての段落翻訳に失敗。段落単体にフォールバックします: {e}")
+        results = [None] * len(paragraphs)
+
+    for para, t in zip(paragraphs, results):
+        pid = para.get("id")
+        try:
+            if t is None:
                 if stats is not None:
-                    stats.failed += 1
-                print(f"Warning: 段落単体翻訳にも失敗しました id={pid}: {ee}")
+                    stats.recovery_singles += 1
+                t = translate_text(para.get("src_replaced", ""), source="en", target="ja", memory=True)
+            _apply_translation_to_paragraph(para, t)
+            if stats is not None:
+                stats.translated += 1
+                stats.translated_fallback += 1
+        except Exception as ee:
+            if stats is not None:
+                stats.failed += 1
+            print(f"Warning: 段落単体翻訳にも失敗しました id={pid}: {ee}")
 
 def recalc_trans_status_counts(book_data):
     """
@@ -208,7 +389,7 @@ def paraparatrans_json_file(json_path, start_page, end_page):
     JSONファイルを読み込み、指定したページ範囲内の段落について翻訳処理を行い、結果をファイルへ保存する。
     ・filepath: JSONファイルのパス
     ・start_page, end_page: ページ範囲（両端を含む）
-    各グループは5000文字以内に収まるように連結して翻訳される。
+    段落はページをまたいで、翻訳エンジンごとの文字数上限に収まるように連結して翻訳される。
     """
     print(f"翻訳処理を開始します: {json_path} ({start_page} 〜 {end_page} ページ)")
 
@@ -217,17 +398,19 @@ def paraparatrans_json_file(json_path, start_page, end_page):
 
     stats = TranslationStats()
 
-    # start_pageからend_pageをループしてpagetransを実行
-    for page in range(start_page, end_page + 1):
-        # 存在しないページはスキップ（end_page=9999などの運用を許容）
-        if str(page) not in book_data.get("pages", {}):
-            continue
-        pagetrans(json_path, book_data, page, stats=stats)
-        stats.pages_processed += 1
+    # 存在しないページはスキップ（end_page=9999などの運用を許容）
+    pages = [page for page in range(start_page, end_page + 1) if str(page) in book_data.get("pages", {})]
+
+    workers = _translate_workers()
+    if workers <= 1:
+        _translate_pages_sequentially(json_path, book_data, pages, stats)
+    else:
+        _translate_pages_concurrently(json_path, book_data, pages, stats, workers)
 
-    # 翻訳ステータスの集計を更新
+    # 翻訳ステータスの集計を更新し、ページごとに積んだジャーナルを本体へ畳み込む
     recalc_trans_status_counts(book_data)
-    atomicsave_json(json_path, book_data)
+    append_book_patches(json_path, [book_patch(book_data, ("trans_status_counts",))])
+    compact_book(json_path)
     
     # 翻訳終了メッセージ（SSEログにも流れる）
     print(
@@ -244,6 +427,88 @@ def paraparatrans_json_file(json_path, start_page, end_page):
 
     return book_data, asdict(stats)
 
+def _process_group_limited(engine: str, paragraphs_group: List[dict], stats: TranslationStats) -> None:
+    with _engine_semaphore(engine):
+        process_group(paragraphs_group, stats=stats)
+
+
+def _translate_pages_sequentially(json_path, book_data, pages: List[int], stats: TranslationStats) -> None:
+    """ページをまたいで詰めたグループを文書順に1つずつ翻訳する。"""
+    jobs = [_prepare_page(book_data, page, stats=stats) for page in pages]
+    groups = _pack_groups(jobs, _group_chars(get_current_translator()))
+    print(f"逐次翻訳: pages={len(pages)} groups={len(groups)}")
+
+    for job in jobs:
+        if job.pending == 0:
+            _finish_page(json_path, job)
+    for group, group_jobs in groups:
+        process_group(group, stats=stats)
+        for job in group_jobs:
+            job.pending -= 1
+            if job.pending == 0:
+                _finish_page(json_path, job)
+    stats.pages_processed += len(jobs)
+
+
+def _translate_pages_concurrently(json_path, book_data, pages: List[int], stats: TranslationStats, workers: int) -> None:
+    """
+    複数ページのグループをスレッドプールで並行して翻訳する。
+
+    - グループはページをまたいで詰める（_pack_groups）。段落はいずれか1つのグループにしか
+      属さないので、各グループは自分の段落だけを書き換える
+    - 統計はグループごとに集計し、完了順ではなく投入順で合算する
+    - ページの全グループが終わった時点でそのページの変更をジャーナルへ追記し、
+      一定ページごとに本体へ畳み込む（チェックポイント）
+    """
+    engine = get_current_translator()
+    workers = min(workers, _ENGINE_CONCURRENCY.get(engine, workers))
+    checkpoint_every = _checkpoint_pages()
+    print(f"並行翻訳: engine={engine} workers={workers} pages={len(pages)}")
+
+    jobs = [_prepare_page(book_data, page, stats=stats) for page in pages]
+    groups = _pack_groups(jobs, _group_chars(engine))
+    print(f"並行翻訳: groups={len(groups)}")
+    submitted = []
+    finished_pages = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pagetrans") as executor:
+        futures = {}
+        for group, group_jobs in groups:
+            group_stats = TranslationStats()
+            future = executor.submit(_process_group_limited, engine, group, group_stats)
+            futures[future] = group_jobs
+            submitted.append((future, group, group_stats))
+
+        # グループの無いページ（翻訳対象なし）は即座に確定する
+        for job in jobs:
+            if job.pending == 0:
+                _finish_page(json_path, job)
+                finished_pages += 1
+
+        for future in as_completed(futures):
+            group_jobs = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                # process_group 内で拾えなかった例外。該当グループは未翻訳のまま残る
+                pages_label = ",".join(str(job.page_number) for job in group_jobs)
+                print(f"Warning: グループ翻訳で予期しないエラーが発生しました pages={pages_label}: {e}")
+            for job in group_jobs:
+                job.pending -= 1
+                if job.pending > 0:
+                    continue
+                _finish_page(json_path, job)
+                finished_pages += 1
+                if finished_pages % checkpoint_every == 0:
+                    compact_book(json_path)
+                    print(f"チェックポイント: {finished_pages}/{len(jobs)} ページを保存しました")
+
+    for future, group, group_stats in submitted:
+        if future.exception() is not None:
+            group_stats.failed += len(group)
+        _merge_stats(stats, group_stats)
+    stats.pages_processed += len(jobs)
+
+
 def count_alphabet_chars(text: str) -> int:
     """アルファベットの文字数をカウント"""
     return len(re.findall(r'[a-zA-Z]', text))
@@ -318,13 +583,15 @@ def _migrate_auto_to_draft_if_low_content(paragraph: dict) -> bool:
     return True
 
 
-def pagetrans(filepath, book_data, page_number, stats: Optional[TranslationStats] = None):
+def _prepare_page(book_data, page_number, stats: Optional[TranslationStats] = None) -> _PageJob:
     """
-    各グループは5000文字以内に収まるように連結して翻訳され、各グループ処理後に必ずファイルへ保存する。
+    ページ内の段落に辞書置換・短文の draft 化を施し、翻訳対象の段落を文書順に並べる。
+    グループ分け（_pack_groups）と翻訳そのものは行わない。
     """
     print(f"ページ {page_number} の翻訳を開始します...")
 
     paragraphs_dict = book_data["pages"][str(page_number)].get("paragraphs", {}) # 辞書として取得
+    snapshots = {pid: _paragraph_snapshot(p) for pid, p in paragraphs_dict.items()}
     print(f"FOR DEBUG:段落数: {len(paragraphs_dict)}")
     if stats is not None:
         stats.paragraphs_total_in_range += len(paragraphs_dict)
@@ -344,11 +611,7 @@ def pagetrans(filepath, book_data, page_number, stats: Optional[TranslationStats
 
 
     # --- 追加: ページ翻訳前に全段落へ対訳辞書置換を適用 ---
-    try:
-        dict_cs, dict_ci = load_dictionary(DICT_PATH)
-    except Exception as e:
-        print(f"[WARN] 対訳辞書の読み込みに失敗: {e}")
-        dict_cs, dict_ci = {}, {}
+    matcher = _load_matcher()
     for paragraph in paragraphs_dict.values():
         if "src_joined" in paragraph and paragraph.get("src_joined") == "":
             paragraph["src_replaced"] = ""
@@ -364,7 +627,7 @@ def pagetrans(filepath, book_data, page_number, stats: Optional[TranslationStats
                 stats.skipped_join_empty += 1
         else:
             src_joined = paragraph.get("src_joined", "")
-            paragraph["src_replaced"] = replace_with_dict(src_joined, dict_cs, dict_ci)
+            paragraph["src_replaced"] = matcher.replace(src_joined)
         _migrate_auto_to_draft_if_low_content(paragraph)
 
     for para_id, paragraph in paragraphs_dict.items():
@@ -417,24 +680,29 @@ def pagetrans(filepath, book_data, page_number, stats: Optional[TranslationStats
     if stats is not None:
         stats.paragraphs_target += len(filtered_paragraphs)
 
-    current_group = []
-    current_length = 0
-    # 4000文字を上限にグループ化して翻訳処理を実施
-    for para in filtered_paragraphs:
-        text_to_add = f"【{para['id']}】{para.get('src_replaced','')}"
-        if current_length + len(text_to_add) > 4000:
-            if current_group:
-                process_group(current_group, stats=stats)
-                current_group = []
-                current_length = 0
-        current_group.append(para)
-        current_length += len(text_to_add)
-    
-    # 残ったグループがあれば処理
-    if current_group:
-        process_group(current_group, stats=stats)
+    return _PageJob(
+        page_number=page_number,
+        paragraphs=paragraphs_dict,
+        snapshots=snapshots,
+        before=before,
+        targets=filtered_paragraphs,
+    )
+
+
+def _finish_page(filepath, job: _PageJob) -> None:
+    """翻訳済みのページについて、変更のあった段落をジャーナルへ追記する。"""
+    page_number = job.page_number
+    paragraphs_dict = job.paragraphs
+    snapshots = job.snapshots
+    before = job.before
 
-    atomicsave_json(filepath, book_data)  # 最後にアトミックセーブ
+    # 全体を書き直さず、変更のあった段落だけをジャーナルへ追記する
+    patches = [
+        paragraph_patch(page_number, pid, p, _PAGETRANS_PATCH_FIELDS)
+        for pid, p in paragraphs_dict.items()
+        if snapshots.get(pid) != _paragraph_snapshot(p)
+    ]
+    append_book_patches(filepath, patches)
     print(f"ページ {page_number} の翻訳が完了しました。")
 
     # デバッグ: 既存(auto/draft/fixed)の段落で想定外の書き換えが発生していないか検知
@@ -483,20 +751,24 @@ def pagetrans(filepath, book_data, page_number, stats: Optional[TranslationStats
         else:
             _pagetrans_debug("no unexpected trans_auto changes")
 
-# json を読み込んでobjectを戻す
+def pagetrans(filepath, book_data, page_number, stats: Optional[TranslationStats] = None):
+    """
+    1ページ分を翻訳エンジンごとの文字数上限に収まるように連結して翻訳し、ページの処理後に変更のあった段落を
+    ジャーナルへ追記する（本体への畳み込みは paraparatrans_json_file の最後にまとめて行う）。
+    """
+    job = _prepare_page(book_data, page_number, stats=stats)
+    for group, _ in _pack_groups([job], _group_chars(get_current_translator())):
+        process_group(group, stats=stats)
+    _finish_page(filepath, job)
+
+
+# json を読み込んでobjectを戻す（未畳み込みの編集ジャーナルも再生する）
 def load_json(json_path: str):
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+    return load_book(json_path)
 
-# アトミックセーブ
+# アトミックセーブ（ジャーナルは本体に含まれるので破棄される）
 def atomicsave_json(json_path, data):
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path), suffix=".tmp", text=True)
-    with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmp_file:
-        json.dump(data, tmp_file, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, json_path)
+    save_book(json_path, data)
 
 if __name__ == '__main__':
     import argparse
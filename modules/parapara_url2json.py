@@ -1,10 +1,8 @@
 import datetime
 import html
-import json
 import os
 import re
 import time
-import uuid
 from collections import deque
 from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 from urllib.parse import urljoin, urlsplit, urlunsplit
@@ -13,6 +11,9 @@ from urllib.robotparser import RobotFileParser
 import requests
 from bs4 import BeautifulSoup, Comment
 
+from app.repositories.book_repo import save_book
+from app.repositories.json_repo import load_json
+
 
 _BAD_CLASS_RE = re.compile(
     r"(nav|footer|header|sidebar|ads?|promo|sponsor|breadcrumb|cookie|popup|modal|newsletter|share|social|comment|related|recommend|subscribe)",
@@ -59,8 +60,7 @@ def load_site_profiles(config_folder: str) -> Dict[str, Any]:
     if not os.path.exists(path):
         return {}
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = load_json(path)
         if isinstance(data, dict):
             return data
     except Exception:
@@ -77,23 +77,9 @@ def get_site_profile(profiles: Dict[str, Any], host: str) -> Optional[Dict[str,
     return None
 
 
-def _atomic_save_json(path: str, data: Dict[str, Any]) -> None:
-    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
-    try:
-        with open(tmp_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        os.replace(tmp_path, path)
-    finally:
-        if os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
-
-
 def save_url_book(path: str, book_data: Dict[str, Any]) -> None:
-    _atomic_save_json(path, book_data)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    save_book(path, book_data)
 
 
 def fetch_html(url: str, timeout: int = 15) -> str:
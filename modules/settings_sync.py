@@ -1,8 +1,9 @@
-import json
 import os
-import uuid
 from typing import Any, Dict, Tuple
 
+from app.repositories.book_repo import load_book
+from app.repositories.json_repo import load_json, save_json_atomic
+
 
 _TRANS_STATUS_KEYS = ("none", "auto", "draft", "fixed")
 
@@ -23,24 +24,14 @@ def _normalize_trans_status_counts(counts: Any) -> Dict[str, int]:
 
 def _atomic_write_json(path: str, data: Dict[str, Any], *, indent: int = 4) -> None:
     os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
-    try:
-        with open(tmp_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=indent)
-        os.replace(tmp_path, path)
-    finally:
-        if os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
+    # 設定ファイルは JSON_COMPACT でも字下げして書く
+    save_json_atomic(path, data, indent=indent, compact=False)
 
 
 def load_settings(settings_path: str) -> Dict[str, Any]:
     if not os.path.exists(settings_path):
         return {"files": {}}
-    with open(settings_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = load_json(settings_path)
     if not isinstance(data, dict):
         return {"files": {}}
     if not isinstance(data.get("files"), dict):
@@ -57,8 +48,7 @@ def save_settings(settings_path: str, settings: Dict[str, Any], *, indent: int =
 
 
 def extract_book_info_from_json(json_path: str) -> Dict[str, Any]:
-    with open(json_path, "r", encoding="utf-8") as f:
-        book_data = json.load(f)
+    book_data = load_book(json_path)
 
     if not isinstance(book_data, dict):
         return {}
@@ -1,11 +1,13 @@
 from flask import Flask, request, render_template, redirect, url_for, send_from_directory, jsonify, send_file
 import os
+import copy
 import json
 import datetime
 import io
 import sys
 import threading
 import shutil
+import atexit
 import time
 import html
 import gzip
@@ -18,6 +20,15 @@ import re
 # modulesディレクトリをPythonのモジュール検索パスに追加
 sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
 
+if __name__ == "__main__":
+    # 配布版（exe）ではパラグラフ抽出のプロセスとそのプロセスプールのワーカーも、この exe で起動される。
+    # どちらの場合もアプリ（.env・ログ・サーバー）は立ち上げない（modules/parapara_extract_worker.py 参照）
+    import multiprocessing
+    multiprocessing.freeze_support()
+    if sys.argv[1:2] == ["--extract-worker"]:
+        from modules.parapara_extract_worker import main as _extract_worker_main
+        sys.exit(_extract_worker_main(sys.argv[2:]))
+
 from dotenv import load_dotenv
 
 # .envが存在しない場合に .env.example から作成
@@ -46,7 +57,6 @@ if log_level not in ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]:
 logging.getLogger('werkzeug').setLevel(log_level)
 
 # PDFからパラグラフJSON生成(header/footerは自動判定でセット)
-from modules.parapara_pdf2json import extract_paragraphs
 # block_tagをセット
 from modules.parapara_tagging_by_structure import structure_tagging
 # 先頭小文字にjoinをセット
@@ -59,11 +69,10 @@ from modules.parapara_dict_trans_array import translate_dict_entries
 # 対訳辞書で置換
 from modules.parapara_dict_replacer import (
     atomicsave_json,
-    file_replace_with_dict,
-    load_dictionary,
+    file_replace_with_matcher,
     load_json,
-    replace_with_dict,
 )
+from modules.parapara_dict_incremental import discard_dict_state, move_dict_state
 
 # joinフラグに従って src_joined/src_replaced を再構築（UIトグル対応）
 from modules.parapara_join_incremental import (
@@ -76,7 +85,9 @@ from modules.parapara_join_incremental import (
 from modules.parapara_symbolfont_rebuild import rebuild_src_text_in_file
 
 from modules.api_translate import (
+    configure_translation_memory,
     get_current_translator,
+    get_translation_memory,
     get_supported_translators,
     set_current_translator,
     translate_text,
@@ -106,7 +117,10 @@ from modules.parapara_structure import (
     strip_structure as structure_strip,
 )
 
-from modules.parapara_search import search_paragraphs_in_book
+from modules.parapara_search import SearchIndexStore
+from modules.parapara_library_search import LibrarySearch
+from modules.parapara_extract_jobs import ExtractJobManager
+from modules.parapara_reextract import reextract_pages
 from modules.parapara_url2json import (
     build_url_book_data,
     crawl_site,
@@ -120,6 +134,18 @@ from modules.parapara_url2json import (
     save_url_book,
 )
 from app.services.dict_service import DictService
+from app.repositories.book_journal import book_patch, paragraph_patch
+from app.repositories.book_repo import (
+    SHARD_DIR_SUFFIX,
+    book_signature,
+    load_book,
+    move_book,
+    recover_journals,
+)
+from app.repositories.book_sidecar import configure_sidecar_key
+from app.repositories.book_store import BookStore
+from app.repositories import json_repo
+from app.repositories.library_index import LibraryIndex
 
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
@@ -158,17 +184,7 @@ def _get_current_url_book() -> str:
 def _save_site_profiles(config_folder: str, profiles: dict) -> None:
     os.makedirs(config_folder, exist_ok=True)
     path = os.path.join(config_folder, "url_site_profiles.json")
-    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
-    try:
-        with open(tmp_path, "w", encoding="utf-8") as f:
-            json.dump(profiles, f, ensure_ascii=False, indent=2)
-        os.replace(tmp_path, path)
-    finally:
-        if os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
+    json_repo.save_json_atomic(path, profiles, indent=2, compact=False)
 
 
 def _normalize_selector_list(values) -> list:
@@ -377,6 +393,9 @@ def _migrate_user_file(filename: str) -> None:
 os.makedirs(DATA_FOLDER, exist_ok=True)
 os.makedirs(CONFIG_FOLDER, exist_ok=True)
 
+# <json>.cache（pickle）を検証する HMAC の鍵。data/ に書ける人が鍵まで作り直せないよう config/ に置く
+configure_sidecar_key(os.path.join(CONFIG_FOLDER, "book_cache.key"))
+
 
 def _startup_cleanup_tmp_files(folder: str, min_age_seconds: int = 600) -> int:
     """起動時に残った tmp ファイルを掃除する。
@@ -504,6 +523,9 @@ def _should_skip_dir(name: str) -> bool:
         return True
     if name.startswith("."):
         return True
+    # シャード形式ブックのページフォルダ（<base>.pages）はフォルダとして見せない
+    if name.endswith(SHARD_DIR_SUFFIX):
+        return True
     return name in _IGNORED_DIR_NAMES
 
 
@@ -592,6 +614,64 @@ dict_service = DictService(
     should_skip_dir=_should_skip_dir,
 )
 
+# book JSON のプロセス内キャッシュ（mtime/size で検証し、ブック単位のロックで読み書きを直列化する）
+_book_store_max_books = os.getenv("BOOK_STORE_MAX_BOOKS", "4").strip()
+# 段落編集をジャーナルへ追記してから本体に畳み込むまでの秒数。0 なら保存のたびに全体を書き出す
+try:
+    _book_write_behind_sec = max(0.0, float(os.getenv("BOOK_WRITE_BEHIND_SEC", "5") or 0))
+except ValueError:
+    _book_write_behind_sec = 5.0
+# ジャーナルがこのサイズ（バイト）を超えたら、デバウンスを待たずに畳み込む
+_book_journal_compact_bytes = os.getenv("BOOK_JOURNAL_COMPACT_BYTES", "1048576").strip()
+# /api/search の索引（ブックごと。段落の保存時は変更のあった段落だけ索引し直す）
+search_index = SearchIndexStore(max_books=int(_book_store_max_books) if _book_store_max_books.isdigit() else 4)
+# /api/library_search の索引（全ブック横断。get_url_books の定義後に作る。無効なら None）
+library_search = None
+
+
+def _on_book_resign(json_path, before, after):
+    # ジャーナルの畳み込みで signature だけが変わった。索引は作り直さず signature を進める
+    search_index.resign(json_path, before, after)
+    if library_search is not None:
+        library_search.resign(json_path, before, after)
+
+
+book_store = BookStore(
+    max_books=int(_book_store_max_books) if _book_store_max_books.isdigit() else 4,
+    write_behind_sec=_book_write_behind_sec,
+    compact_bytes=int(_book_journal_compact_bytes) if _book_journal_compact_bytes.isdigit() else 1024 * 1024,
+    on_resign=_on_book_resign,
+    compact=os.getenv("BOOK_STORE_COMPACT", "1").strip().lower() not in ("0", "false", "no", "off"),
+)
+
+
+def _commit_book_edits(json_path, book_data, patches):
+    """book_store.commit() に加えて、検索索引へ変更のあった段落を反映する（ブックのロック内で呼ぶ）。"""
+    before = book_signature(json_path)
+    book_store.commit(json_path, book_data, patches)
+    search_index.apply_patches(json_path, book_data, patches, before=before, after=book_signature(json_path))
+
+
+# 終了時に未保存の編集を書き出す
+atexit.register(book_store.close)
+
+# 翻訳メモリ（同じ原文は API に送らず再利用する）。TRANSLATION_MEMORY=0 で無効
+configure_translation_memory(os.path.join(DATA_FOLDER, "translation_memory.sqlite3"))
+
+
+def _close_translation_memory():
+    tm = get_translation_memory()
+    if tm is not None:
+        tm.close()
+
+
+atexit.register(_close_translation_memory)
+
+# 前回フラッシュ前に落ちた編集ジャーナルを本体JSONへ反映
+recovered_journals = recover_journals(DATA_FOLDER, should_skip_dir=_should_skip_dir)
+if recovered_journals:
+    print(f"起動時リカバリ: 編集ジャーナルを{recovered_journals}件反映しました")
+
 
 def _sanitize_pdf_basename(original_filename: str) -> str:
     """アップロードされたファイル名から pdf_name（拡張子なし）を安全に生成する。
@@ -680,8 +760,8 @@ def get_pdf_files(rel_dir: str = ""):
     return file_dict
 
 
-def get_url_books() -> dict:
-    books: dict = {}
+def _iter_url_book_files():
+    """URL ブックの (pdf_name, json_path) を列挙する。JSON は開かない。"""
     seen_keys: set[str] = set()
     base_dir = BASE_FOLDER
 
@@ -695,34 +775,7 @@ def get_url_books() -> dict:
                 rel_path = os.path.relpath(full_path, base_dir).replace(os.sep, "/")
                 book_key = rel_path[:-len(URL_BOOK_JSON_SUFFIX)]
                 seen_keys.add(book_key)
-                pdf_name = f"{URL_BOOK_PREFIX}{book_key}"
-
-                try:
-                    with open(full_path, "r", encoding="utf-8") as f:
-                        book_data = json.load(f)
-                except Exception:
-                    book_data = {}
-
-                updated_date = ""
-                try:
-                    updated_date = datetime.datetime.fromtimestamp(os.path.getmtime(full_path)).strftime("%Y/%m/%d")
-                except Exception:
-                    pass
-
-                trans_counts = (book_data or {}).get("trans_status_counts", {}) or {}
-                books[pdf_name] = {
-                    "json_path": full_path,
-                    "pdf_name": pdf_name,
-                    "title": (book_data or {}).get("title") or pdf_name,
-                    "updated": updated_date,
-                    "trans_status_counts": {
-                        "none": trans_counts.get("none", 0),
-                        "auto": trans_counts.get("auto", 0),
-                        "draft": trans_counts.get("draft", 0),
-                        "fixed": trans_counts.get("fixed", 0),
-                    },
-                    "book_type": (book_data or {}).get("source_type") or "url",
-                }
+                yield f"{URL_BOOK_PREFIX}{book_key}", full_path
 
     try:
         legacy_dir = _safe_join_data(URL_BOOKS_DIRNAME)
@@ -730,7 +783,8 @@ def get_url_books() -> dict:
         legacy_dir = None
 
     if legacy_dir and os.path.isdir(legacy_dir):
-        for root, _dirs, files in os.walk(legacy_dir):
+        for root, dirs, files in os.walk(legacy_dir):
+            dirs[:] = [d for d in dirs if not d.endswith(SHARD_DIR_SUFFIX)]
             for fname in files:
                 if not fname.lower().endswith(".json"):
                     continue
@@ -739,39 +793,87 @@ def get_url_books() -> dict:
                 book_key = rel_path[:-5].replace(os.sep, "/")
                 if book_key in seen_keys:
                     continue
-                pdf_name = f"{URL_BOOK_PREFIX}{book_key}"
+                yield f"{URL_BOOK_PREFIX}{book_key}", full_path
 
-                try:
-                    with open(full_path, "r", encoding="utf-8") as f:
-                        book_data = json.load(f)
-                except Exception:
-                    book_data = {}
 
-                updated_date = ""
-                try:
-                    updated_date = datetime.datetime.fromtimestamp(os.path.getmtime(full_path)).strftime("%Y/%m/%d")
-                except Exception:
-                    pass
-
-                trans_counts = (book_data or {}).get("trans_status_counts", {}) or {}
-                books[pdf_name] = {
-                    "json_path": full_path,
-                    "pdf_name": pdf_name,
-                    "title": (book_data or {}).get("title") or pdf_name,
-                    "updated": updated_date,
-                    "trans_status_counts": {
-                        "none": trans_counts.get("none", 0),
-                        "auto": trans_counts.get("auto", 0),
-                        "draft": trans_counts.get("draft", 0),
-                        "fixed": trans_counts.get("fixed", 0),
-                    },
-                    "book_type": (book_data or {}).get("source_type") or "url",
-                }
+def get_url_books() -> dict:
+    books: dict = {}
+
+    for pdf_name, full_path in _iter_url_book_files():
+        try:
+            book_data = load_book(full_path)
+        except Exception:
+            book_data = {}
+
+        updated_date = ""
+        try:
+            updated_date = datetime.datetime.fromtimestamp(os.path.getmtime(full_path)).strftime("%Y/%m/%d")
+        except Exception:
+            pass
+
+        trans_counts = (book_data or {}).get("trans_status_counts", {}) or {}
+        books[pdf_name] = {
+            "json_path": full_path,
+            "pdf_name": pdf_name,
+            "title": (book_data or {}).get("title") or pdf_name,
+            "updated": updated_date,
+            "trans_status_counts": {
+                "none": trans_counts.get("none", 0),
+                "auto": trans_counts.get("auto", 0),
+                "draft": trans_counts.get("draft", 0),
+                "fixed": trans_counts.get("fixed", 0),
+            },
+            "book_type": (book_data or {}).get("source_type") or "url",
+        }
 
     books = dict(sorted(books.items(), key=lambda x: x[1].get("updated", ""), reverse=True))
     return books
 
 
+def _iter_library_books():
+    """ライブラリ横断検索の対象（JSON のある PDF ブックと URL ブック）。"""
+    pending = [""]
+    while pending:
+        subdirs, file_dict = get_directory_listing(pending.pop())
+        pending.extend(d["rel_path"] for d in subdirs)
+        for info in file_dict.values():
+            if info.get("json_path"):
+                yield {**info, "book_type": "pdf"}
+    # URL ブックは一覧のために読み込まない。タイトルは索引し直すときに読み込んだ内容から取る
+    for pdf_name, json_path in _iter_url_book_files():
+        yield {"pdf_name": pdf_name, "json_path": json_path, "book_type": "url"}
+
+
+# ライブラリ横断検索（data/library_index.sqlite3）。索引はバックグラウンドで更新する。LIBRARY_SEARCH=0 で無効
+if os.getenv("LIBRARY_SEARCH", "1").strip().lower() not in ("0", "false", "no", "off"):
+    try:
+        _library_search_interval_sec = max(1.0, float(os.getenv("LIBRARY_SEARCH_INTERVAL_SEC", "60") or 60))
+    except ValueError:
+        _library_search_interval_sec = 60.0
+    library_search = LibrarySearch(
+        LibraryIndex(os.path.join(DATA_FOLDER, "library_index.sqlite3")),
+        _iter_library_books,
+        interval_sec=_library_search_interval_sec,
+    )
+    library_search.start()
+    atexit.register(library_search.close)
+
+
+def _on_extract_done(job):
+    book_store.invalidate(job.json_path)
+    # 段落を作り直したので、前回の辞書置換の記録は使えない
+    discard_dict_state(job.json_path)
+    if library_search is not None:
+        library_search.request_refresh()
+
+
+# パラグラフ抽出のジョブ（チェックポイントから再開できる）。終わらなかったジョブは起動時に再開する。EXTRACT_RESUME_ON_START=0 で再開しない
+extract_jobs = ExtractJobManager(os.path.join(DATA_FOLDER, "extract_jobs.json"), on_done=_on_extract_done)
+if os.getenv("EXTRACT_RESUME_ON_START", "1").strip().lower() not in ("0", "false", "no", "off"):
+    for _job in extract_jobs.resume_pending():
+        print(f"起動時リカバリ: パラグラフ抽出を再開します {_job.pdf_name}")
+
+
 def get_all_dirs() -> list:
     dirs = []
     for root, subdirs, _files in os.walk(BASE_FOLDER):
@@ -890,11 +992,11 @@ def index():
         parapara_init(BASE_FOLDER, DATA_FOLDER)
     
     # paraparatrans.settings.jsonを読み込む
-    with open(settings_path, "r", encoding="utf-8") as f:
-        settings = json.load(f)
+    settings = load_json(settings_path)
 
     # settingsのキャッシュが古い場合、各PDFのjson更新日時（PDFごとのjson_mtime）を基準に必要分だけ同期
     try:
+        book_store.flush_all()
         changed, _updated = lazy_sync_settings_from_json_files(settings=settings, base_folder=BASE_FOLDER)
         if changed:
             save_settings(settings_path, settings, indent=4)
@@ -1128,14 +1230,18 @@ def move_pdf_api():
 
     try:
         if is_url_book:
-            os.replace(src_json_path, dest_json_path)
+            with book_store.external_write(src_json_path):
+                move_book(src_json_path, dest_json_path)
+                move_dict_state(src_json_path, dest_json_path)
             if _get_current_url_book() == normalized_pdf_name:
                 _set_current_url_book(new_pdf_name)
             return jsonify({"status": "ok", "pdf_name": new_pdf_name, "moved": True}), 200
 
         os.replace(src_pdf_path, dest_pdf_path)
         if os.path.exists(src_json_path):
-            os.replace(src_json_path, dest_json_path)
+            with book_store.external_write(src_json_path):
+                move_book(src_json_path, dest_json_path)
+                move_dict_state(src_json_path, dest_json_path)
 
         if os.path.exists(dest_json_path):
             try:
@@ -1149,8 +1255,7 @@ def move_pdf_api():
         settings_path = os.path.join(DATA_FOLDER, "paraparatrans.settings.json")
         if os.path.exists(settings_path):
             try:
-                with open(settings_path, "r", encoding="utf-8") as f:
-                    settings = json.load(f)
+                settings = load_json(settings_path)
                 if not isinstance(settings, dict):
                     settings = {"files": {}}
                 files = settings.get("files")
@@ -1278,10 +1383,12 @@ def detail(pdf_name, page_number=1):
     pdf_path, json_path = get_paths(pdf_name)
 
     if os.path.exists(json_path):
-        with open(json_path, "r", encoding="utf-8") as f:
-            book_data = json.load(f)
-        if isinstance(book_data, dict) and book_type == "url":
-            book_data.setdefault("source_type", "url")
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)
+            if isinstance(book_data, dict) and book_type == "url":
+                # キャッシュ上の book_data は共有なので、表示用の補完は浅いコピーに対して行う
+                book_data = dict(book_data)
+                book_data.setdefault("source_type", "url")
     else:
         if is_url_book:
             return "URLブックが存在しません", 404
@@ -1316,9 +1423,9 @@ def get_book_data(pdf_name):
     pdf_path, json_path = get_paths(pdf_name)
     if not os.path.exists(json_path):
         return jsonify({"status": "ok", "message": "JSONが存在しません"}), 206
-    with open(json_path, "r", encoding="utf-8") as f:
-        book_data = json.load(f)
-    return jsonify(book_data)
+    with book_store.lock(json_path):
+        book_data = book_store.get(json_path)
+        return jsonify(book_data)
 
 
 # API: book_data のメタ情報のみ取得（初期ロード高速化用）
@@ -1333,23 +1440,22 @@ def get_book_meta(pdf_name):
     except OSError:
         json_mtime = None
 
-    with open(json_path, "r", encoding="utf-8") as f:
-        book_data = json.load(f)
-
-    meta = {
-        "version": book_data.get("version"),
-        "src_filename": book_data.get("src_filename"),
-        "title": book_data.get("title"),
-        "page_count": book_data.get("page_count"),
-        "styles": book_data.get("styles") or {},
-        "trans_status_counts": book_data.get("trans_status_counts") or {},
-        "json_mtime": json_mtime,
-        "source_type": book_data.get("source_type") or "pdf",
-        "source_root_url": book_data.get("source_root_url"),
-        "source_host": book_data.get("source_host"),
-        "page_url_map": book_data.get("page_url_map") or {},
-    }
-    return jsonify({"status": "ok", "meta": meta})
+    with book_store.lock(json_path):
+        book_data = book_store.get_meta(json_path)
+        meta = {
+            "version": book_data.get("version"),
+            "src_filename": book_data.get("src_filename"),
+            "title": book_data.get("title"),
+            "page_count": book_data.get("page_count"),
+            "styles": book_data.get("styles") or {},
+            "trans_status_counts": book_data.get("trans_status_counts") or {},
+            "json_mtime": json_mtime,
+            "source_type": book_data.get("source_type") or "pdf",
+            "source_root_url": book_data.get("source_root_url"),
+            "source_host": book_data.get("source_host"),
+            "page_url_map": book_data.get("page_url_map") or {},
+        }
+        return jsonify({"status": "ok", "meta": meta})
 
 
 # API: 目次（見出し）情報のみ取得（初期ロード高速化用）
@@ -1359,10 +1465,8 @@ def get_book_toc(pdf_name):
     if not os.path.exists(json_path):
         return jsonify({"status": "error", "message": "JSONが存在しません"}), 404
 
-    try:
-        mtime = os.path.getmtime(json_path)
-    except OSError:
-        mtime = None
+    # ジャーナルへの追記やシャード更新でも変わるよう、本体とジャーナルの stat をキーにする
+    mtime = book_signature(json_path)
 
     if mtime is not None:
         with _BOOK_TOC_CACHE_LOCK:
@@ -1370,44 +1474,43 @@ def get_book_toc(pdf_name):
             if cached and cached.get("mtime") == mtime and isinstance(cached.get("toc"), list):
                 return jsonify({"status": "ok", "toc": cached["toc"], "cached": True})
 
-    with open(json_path, "r", encoding="utf-8") as f:
-        book_data = json.load(f)
-
-    headlines = []
-    pages = book_data.get("pages", {}) or {}
-    for page_key, page in pages.items():
-        paragraphs = (page or {}).get("paragraphs", {}) or {}
-        for _pid, p in paragraphs.items():
-            block_tag = (p or {}).get("block_tag")
-            join_flag = int((p or {}).get("join", 0) or 0)
-            if join_flag == 1:
-                continue
-            if not isinstance(block_tag, str):
-                continue
-            if not re.match(r"^h[1-6]$", block_tag):
-                continue
-
-            page_number = (p or {}).get("page_number")
-            para_id = (p or {}).get("id")
-            try:
-                y0 = (p or {}).get("bbox")[1]
-            except Exception:
-                y0 = 0
+    with book_store.lock(json_path):
+        book_data = book_store.get(json_path)
+        headlines = []
+        pages = book_data.get("pages", {}) or {}
+        for page_key, page in pages.items():
+            paragraphs = (page or {}).get("paragraphs", {}) or {}
+            for _pid, p in paragraphs.items():
+                block_tag = (p or {}).get("block_tag")
+                join_flag = int((p or {}).get("join", 0) or 0)
+                if join_flag == 1:
+                    continue
+                if not isinstance(block_tag, str):
+                    continue
+                if not re.match(r"^h[1-6]$", block_tag):
+                    continue
 
-            headlines.append(
-                {
-                    "rowId": f"{page_number}_{para_id}",
-                    "page_number": page_number,
-                    "id": para_id,
-                    "order": (p or {}).get("order", 0) or 0,
-                    "column_order": (p or {}).get("column_order", 0) or 0,
-                    "y0": y0,
-                    "block_tag": block_tag,
-                    "src_joined": (p or {}).get("src_joined"),
-                    "trans_text": (p or {}).get("trans_text"),
-                    "join": join_flag,
-                }
-            )
+                page_number = (p or {}).get("page_number")
+                para_id = (p or {}).get("id")
+                try:
+                    y0 = (p or {}).get("bbox")[1]
+                except Exception:
+                    y0 = 0
+
+                headlines.append(
+                    {
+                        "rowId": f"{page_number}_{para_id}",
+                        "page_number": page_number,
+                        "id": para_id,
+                        "order": (p or {}).get("order", 0) or 0,
+                        "column_order": (p or {}).get("column_order", 0) or 0,
+                        "y0": y0,
+                        "block_tag": block_tag,
+                        "src_joined": (p or {}).get("src_joined"),
+                        "trans_text": (p or {}).get("trans_text"),
+                        "join": join_flag,
+                    }
+                )
 
     def _toc_sort_key(item: dict):
         try:
@@ -1450,39 +1553,39 @@ def get_book_page(pdf_name, page_number: int):
     except Exception:
         json_size = None
 
-    t_load_start = time.perf_counter()
-    with open(json_path, "r", encoding="utf-8") as f:
-        book_data = json.load(f)
-    t_load_end = time.perf_counter()
-
-    t_page_start = time.perf_counter()
-    page_key = str(page_number)
-    page = (book_data.get("pages", {}) or {}).get(page_key)
-    t_page_end = time.perf_counter()
-    if page is None:
-        return jsonify({"status": "error", "message": f"ページが存在しません: {page_number}"}), 404
+    with book_store.lock(json_path):
+        t_load_start = time.perf_counter()
+        page_key = str(page_number)
+        book_data = book_store.get_page(json_path, page_key)
+        t_load_end = time.perf_counter()
+
+        t_page_start = time.perf_counter()
+        page = (book_data.get("pages", {}) or {}).get(page_key)
+        t_page_end = time.perf_counter()
+        if page is None:
+            return jsonify({"status": "error", "message": f"ページが存在しません: {page_number}"}), 404
+
+        t1 = time.perf_counter()
+        if _perf_api_enabled():
+            size_kb = (json_size / 1024.0) if isinstance(json_size, (int, float)) else None
+            size_note = f", json_kb={size_kb:.1f}" if size_kb is not None else ""
+            _perf_log(
+                f"[perf] book_page page={page_number} load_json={(t_load_end - t_load_start)*1000:.1f} ms "
+                f"select_page={(t_page_end - t_page_start)*1000:.1f} ms total={(t1 - t0)*1000:.1f} ms"
+                f"{size_note}"
+            )
 
-    t1 = time.perf_counter()
-    if _perf_api_enabled():
-        size_kb = (json_size / 1024.0) if isinstance(json_size, (int, float)) else None
-        size_note = f", json_kb={size_kb:.1f}" if size_kb is not None else ""
-        _perf_log(
-            f"[perf] book_page page={page_number} load_json={(t_load_end - t_load_start)*1000:.1f} ms "
-            f"select_page={(t_page_end - t_page_start)*1000:.1f} ms total={(t1 - t0)*1000:.1f} ms"
-            f"{size_note}"
+        response = jsonify(
+            {
+                "status": "ok",
+                "page_key": page_key,
+                "page": page,
+                "trans_status_counts": book_data.get("trans_status_counts"),
+                "page_count": book_data.get("page_count"),
+                "title": book_data.get("title"),
+            }
         )
 
-    response = jsonify(
-        {
-            "status": "ok",
-            "page_key": page_key,
-            "page": page,
-            "trans_status_counts": book_data.get("trans_status_counts"),
-            "page_count": book_data.get("page_count"),
-            "title": book_data.get("title"),
-        }
-    )
-
     if _perf_api_enabled():
         load_ms = (t_load_end - t_load_start) * 1000.0
         select_ms = (t_page_end - t_page_start) * 1000.0
@@ -1511,7 +1614,14 @@ def search_api(pdf_name: str):
     limit = max(1, min(limit, 2000))
 
     try:
-        results = search_paragraphs_in_book(json_path, query, limit=limit)
+        with book_store.lock(json_path):
+            results = search_index.search(
+                json_path,
+                query,
+                limit=limit,
+                signature=book_signature(json_path),
+                load=lambda: book_store.get(json_path),
+            )
     except Exception as e:
         app.logger.exception("search failed")
         return jsonify({"status": "error", "message": f"検索エラー: {str(e)}"}), 500
@@ -1519,6 +1629,63 @@ def search_api(pdf_name: str):
     return jsonify({"status": "ok", "query": query, "count": len(results), "results": results})
 
 
+# API: ライブラリ横断検索（全ブックの src_joined/trans_text/trans_auto）
+# ?q=語（空白区切りでAND） &offset= &limit= &book=pdf_name（複数可。指定したブックに絞る）
+@app.route("/api/library_search")
+def library_search_api():
+    if library_search is None:
+        return jsonify({"status": "error", "message": "ライブラリ検索は無効です（LIBRARY_SEARCH=0）"}), 503
+
+    query = (request.args.get("q") or "").strip()
+    try:
+        offset = max(0, int(request.args.get("offset") or 0))
+    except Exception:
+        offset = 0
+    try:
+        limit = int(request.args.get("limit") or 50)
+    except Exception:
+        limit = 50
+    limit = max(1, min(limit, 500))
+    books = [b for b in request.args.getlist("book") if b]
+
+    try:
+        result = library_search.search(query, offset=offset, limit=limit, pdf_names=books or None)
+    except Exception as e:
+        app.logger.exception("library search failed")
+        return jsonify({"status": "error", "message": f"検索エラー: {str(e)}"}), 500
+
+    return jsonify(
+        {
+            "status": "ok",
+            "query": query,
+            "offset": offset,
+            "limit": limit,
+            "total": result["total"],
+            "truncated": result["truncated"],
+            "count": len(result["results"]),
+            "results": result["results"],
+            "facets": result["facets"],
+        }
+    )
+
+
+# API: ライブラリ索引の状態（冊数・段落数・最終更新）
+@app.route("/api/library_search/stats", methods=["GET"])
+def library_search_stats_api():
+    if library_search is None:
+        return jsonify({"status": "ok", "enabled": False, "stats": None}), 200
+    return jsonify({"status": "ok", "enabled": True, "stats": library_search.stats()}), 200
+
+
+# API: ライブラリ索引の更新を次の間隔を待たずに始める
+@app.route("/api/library_search/refresh", methods=["POST"])
+def library_search_refresh_api():
+    if library_search is None:
+        return jsonify({"status": "error", "message": "ライブラリ検索は無効です（LIBRARY_SEARCH=0）"}), 503
+    library_search.request_refresh()
+    return jsonify({"status": "ok"}), 202
+
+
 @app.route("/api/url_book/create", methods=["POST"])
 def create_url_book_api():
     payload = request.get_json(silent=True) or {}
@@ -1545,8 +1712,8 @@ def create_url_book_api():
     _, json_path = get_paths(book_name)
     if os.path.exists(json_path):
         try:
-            with open(json_path, "r", encoding="utf-8") as f:
-                book_data = json.load(f)
+            with book_store.lock(json_path):
+                book_data = book_store.get(json_path)
         except Exception:
             book_data = {}
         return jsonify({
@@ -1564,6 +1731,7 @@ def create_url_book_api():
     try:
         book_data = build_url_book_data(normalized, title=title, site_profile=profile)
         save_url_book(json_path, book_data)
+        book_store.invalidate(json_path)
     except Exception as e:
         app.logger.exception("URL book create failed")
         return jsonify({"status": "error", "message": f"URL取得に失敗しました: {str(e)}"}), 500
@@ -1577,6 +1745,57 @@ def create_url_book_api():
     })
 
 
+def _url_book_root_host(book_data) -> str:
+    return (book_data or {}).get("source_host") or normalize_host((book_data or {}).get("source_root_url") or "")
+
+
+def _import_url_page_html(json_path: str, book_name: str, url: str, html_text: str, profile, force: bool):
+    """取得済みの HTML をブックのページとして追加/更新して保存し、(レスポンス, 取り込みイベント) を返す。"""
+    with book_store.lock(json_path):
+        book_data = book_store.get(json_path)
+        try:
+            page_number, page_data, added, updated = ensure_url_page_in_book_from_html(
+                book_data,
+                url,
+                html_text,
+                site_profile=profile,
+                force=force,
+            )
+            if added or updated:
+                book_store.save(json_path, book_data, page_keys=[page_number])
+        except Exception:
+            # 途中まで書き換えたキャッシュを使わないようにする
+            book_store.invalidate(json_path)
+            raise
+
+        exists = (not added and not updated)
+        event = {
+            "id": uuid.uuid4().hex,
+            "book_name": book_name,
+            "kind": "import",
+            "page_number": page_number,
+            "page_count": book_data.get("page_count"),
+            "url": url,
+            "added": bool(added),
+            "updated": bool(updated),
+            "exists": bool(exists),
+            "created_at": int(time.time()),
+        }
+        resp = jsonify({
+            "status": "ok",
+            "page_number": page_number,
+            "page": page_data,
+            "page_count": book_data.get("page_count"),
+            "trans_status_counts": book_data.get("trans_status_counts"),
+            "title": book_data.get("title"),
+            "page_url_map": book_data.get("page_url_map") or {},
+            "added": bool(added),
+            "updated": bool(updated),
+            "exists": bool(exists),
+        })
+    return resp, event
+
+
 @app.route("/api/url_book/navigate", methods=["POST"])
 def navigate_url_book_api():
     payload = request.get_json(silent=True) or {}
@@ -1594,12 +1813,13 @@ def navigate_url_book_api():
         return jsonify({"status": "error", "message": "URLブックが存在しません"}), 404
 
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            book_data = json.load(f)
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)
+            root_host = _url_book_root_host(book_data)
+            known = normalized in ((book_data or {}).get("url_to_page") or {})
     except Exception as e:
         return jsonify({"status": "error", "message": f"URLブックの読み込みに失敗しました: {str(e)}"}), 500
 
-    root_host = (book_data or {}).get("source_host") or normalize_host((book_data or {}).get("source_root_url") or "")
     target_host = normalize_host(normalized)
     if root_host and target_host and root_host != target_host:
         return jsonify({"status": "error", "message": "別ドメインのURLはこのブックに追加できません"}), 400
@@ -1608,22 +1828,36 @@ def navigate_url_book_api():
     profile = get_site_profile(profiles, root_host)
 
     try:
-        page_number, page_data, added = ensure_url_page_in_book(book_data, normalized, site_profile=profile)
-        if added:
-            save_url_book(json_path, book_data)
+        # 取得に時間がかかるので、ページの取得はロックの外で行う
+        html_text = None if known else fetch_html(normalized)
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)
+            try:
+                if html_text is None:
+                    page_number, page_data, added = ensure_url_page_in_book(book_data, normalized, site_profile=profile)
+                else:
+                    page_number, page_data, added, _ = ensure_url_page_in_book_from_html(
+                        book_data, normalized, html_text, site_profile=profile
+                    )
+                if added:
+                    book_store.save(json_path, book_data, page_keys=[page_number])
+            except Exception:
+                book_store.invalidate(json_path)
+                raise
+            resp = jsonify({
+                "status": "ok",
+                "page_number": page_number,
+                "page": page_data,
+                "page_count": book_data.get("page_count"),
+                "trans_status_counts": book_data.get("trans_status_counts"),
+                "title": book_data.get("title"),
+                "page_url_map": book_data.get("page_url_map") or {},
+            })
     except Exception as e:
         app.logger.exception("URL book navigate failed")
         return jsonify({"status": "error", "message": f"URL取得に失敗しました: {str(e)}"}), 500
 
-    return jsonify({
-        "status": "ok",
-        "page_number": page_number,
-        "page": page_data,
-        "page_count": book_data.get("page_count"),
-        "trans_status_counts": book_data.get("trans_status_counts"),
-        "title": book_data.get("title"),
-        "page_url_map": book_data.get("page_url_map") or {},
-    })
+    return resp
 
 
 @app.route("/api/url_book/import_html", methods=["POST", "OPTIONS"])
@@ -1659,14 +1893,14 @@ def import_url_book_html_api():
         return _corsify_response(resp)
 
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            book_data = json.load(f)
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)
+            root_host = _url_book_root_host(book_data)
     except Exception as e:
         resp = jsonify({"status": "error", "message": f"URLブックの読み込みに失敗しました: {str(e)}"})
         resp.status_code = 500
         return _corsify_response(resp)
 
-    root_host = (book_data or {}).get("source_host") or normalize_host((book_data or {}).get("source_root_url") or "")
     target_host = normalize_host(normalized)
     if root_host and target_host and root_host != target_host:
         resp = jsonify({"status": "error", "message": "別ドメインのURLはこのブックに追加できません"})
@@ -1677,48 +1911,14 @@ def import_url_book_html_api():
     profile = get_site_profile(profiles, root_host)
 
     try:
-        page_number, page_data, added, updated = ensure_url_page_in_book_from_html(
-            book_data,
-            normalized,
-            html_text,
-            site_profile=profile,
-            force=force,
-        )
-        if added or updated:
-            save_url_book(json_path, book_data)
+        resp, event = _import_url_page_html(json_path, book_name, normalized, html_text, profile, force)
     except Exception as e:
         app.logger.exception("URL book import_html failed")
         resp = jsonify({"status": "error", "message": f"HTML取り込みに失敗しました: {str(e)}"})
         resp.status_code = 500
         return _corsify_response(resp)
 
-    exists = (not added and not updated)
-    event = {
-        "id": uuid.uuid4().hex,
-        "book_name": book_name,
-        "kind": "import",
-        "page_number": page_number,
-        "page_count": book_data.get("page_count"),
-        "url": normalized,
-        "added": bool(added),
-        "updated": bool(updated),
-        "exists": bool(exists),
-        "created_at": int(time.time()),
-    }
     _set_url_import_event(book_name, event)
-
-    resp = jsonify({
-        "status": "ok",
-        "page_number": page_number,
-        "page": page_data,
-        "page_count": book_data.get("page_count"),
-        "trans_status_counts": book_data.get("trans_status_counts"),
-        "title": book_data.get("title"),
-        "page_url_map": book_data.get("page_url_map") or {},
-        "added": bool(added),
-        "updated": bool(updated),
-        "exists": bool(exists),
-    })
     return _corsify_response(resp)
 
 
@@ -1743,12 +1943,12 @@ def import_url_book_url_api():
         return jsonify({"status": "error", "message": "URLブックが存在しません"}), 404
 
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            book_data = json.load(f)
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)
+            root_host = _url_book_root_host(book_data)
     except Exception as e:
         return jsonify({"status": "error", "message": f"URLブックの読み込みに失敗しました: {str(e)}"}), 500
 
-    root_host = (book_data or {}).get("source_host") or normalize_host((book_data or {}).get("source_root_url") or "")
     target_host = normalize_host(normalized)
     if root_host and target_host and root_host != target_host:
         return jsonify({"status": "error", "message": "別ドメインのURLはこのブックに追加できません"}), 400
@@ -1757,47 +1957,15 @@ def import_url_book_url_api():
     profile = get_site_profile(profiles, root_host)
 
     try:
+        # 取得に時間がかかるので、ページの取得はロックの外で行う
         html_text = fetch_html(normalized)
-        page_number, page_data, added, updated = ensure_url_page_in_book_from_html(
-            book_data,
-            normalized,
-            html_text,
-            site_profile=profile,
-            force=force,
-        )
-        if added or updated:
-            save_url_book(json_path, book_data)
+        resp, event = _import_url_page_html(json_path, book_name, normalized, html_text, profile, force)
     except Exception as e:
         app.logger.exception("URL book import_url failed")
         return jsonify({"status": "error", "message": f"URL取込に失敗しました: {str(e)}"}), 500
 
-    exists = (not added and not updated)
-    event = {
-        "id": uuid.uuid4().hex,
-        "book_name": book_name,
-        "kind": "import",
-        "page_number": page_number,
-        "page_count": book_data.get("page_count"),
-        "url": normalized,
-        "added": bool(added),
-        "updated": bool(updated),
-        "exists": bool(exists),
-        "created_at": int(time.time()),
-    }
     _set_url_import_event(book_name, event)
-
-    return jsonify({
-        "status": "ok",
-        "page_number": page_number,
-        "page": page_data,
-        "page_count": book_data.get("page_count"),
-        "trans_status_counts": book_data.get("trans_status_counts"),
-        "title": book_data.get("title"),
-        "page_url_map": book_data.get("page_url_map") or {},
-        "added": bool(added),
-        "updated": bool(updated),
-        "exists": bool(exists),
-    }), 200
+    return resp, 200
 
 
 @app.route("/api/url_book/import_event/<path:book_name>", methods=["GET"])
@@ -1824,8 +1992,8 @@ def url_book_site_rules_api(book_name: str):
         return jsonify({"status": "error", "message": "URLブックが存在しません"}), 404
 
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            book_data = json.load(f)
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)
     except Exception as e:
         return jsonify({"status": "error", "message": f"URLブックの読み込みに失敗しました: {str(e)}"}), 500
 
@@ -1912,16 +2080,17 @@ def crawl_url_book_api():
         return jsonify({"status": "error", "message": "URLブックが存在しません"}), 404
 
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            book_data = json.load(f)
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)
+            root_url = (book_data or {}).get("source_root_url")
+            root_host = _url_book_root_host(book_data)
+            known_urls = set(((book_data or {}).get("url_to_page") or {}).keys())
     except Exception as e:
         return jsonify({"status": "error", "message": f"URLブックの読み込みに失敗しました: {str(e)}"}), 500
 
-    root_url = (book_data or {}).get("source_root_url")
     if not root_url:
         return jsonify({"status": "error", "message": "source_root_urlが不正です"}), 400
 
-    root_host = (book_data or {}).get("source_host") or normalize_host(root_url)
     profiles = load_site_profiles(CONFIG_FOLDER)
     profile = get_site_profile(profiles, root_host)
 
@@ -1945,25 +2114,48 @@ def crawl_url_book_api():
         app.logger.exception("URL book crawl failed")
         return jsonify({"status": "error", "message": f"クロール失敗: {str(e)}"}), 500
 
-    added_count = 0
+    # ページの取得はロックの外で行い、ブックへの追加だけをロック内でまとめて行う
+    fetched = []
     for url in discovered:
+        normalized = normalize_url(url)
+        if not normalized or normalized in known_urls:
+            continue
+        known_urls.add(normalized)
         try:
-            _, _, added = ensure_url_page_in_book(book_data, url, site_profile=profile)
-            if added:
-                added_count += 1
+            fetched.append((normalized, fetch_html(normalized)))
         except Exception as e:
             app.logger.warning(f"Failed to add URL {url}: {e}")
             continue
 
-    if added_count > 0:
-        save_url_book(json_path, book_data)
+    added_pages = []
+    try:
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)
+            for url, html_text in fetched:
+                try:
+                    page_number, _, added, _ = ensure_url_page_in_book_from_html(
+                        book_data, url, html_text, site_profile=profile
+                    )
+                except Exception as e:
+                    app.logger.warning(f"Failed to add URL {url}: {e}")
+                    continue
+                if added:
+                    added_pages.append(page_number)
+            if added_pages:
+                book_store.save(json_path, book_data, page_keys=added_pages)
+            page_count = book_data.get("page_count")
+            trans_status_counts = book_data.get("trans_status_counts")
+    except Exception as e:
+        book_store.invalidate(json_path)
+        app.logger.exception("URL book crawl failed")
+        return jsonify({"status": "error", "message": f"クロール結果の保存に失敗しました: {str(e)}"}), 500
 
     return jsonify({
         "status": "ok",
         "discovered": len(discovered),
-        "added": added_count,
-        "page_count": book_data.get("page_count"),
-        "trans_status_counts": book_data.get("trans_status_counts"),
+        "added": len(added_pages),
+        "page_count": page_count,
+        "trans_status_counts": trans_status_counts,
     })
 
 
@@ -1975,12 +2167,78 @@ def create_book_data_api(pdf_name):
     pdf_path, json_path = get_paths(pdf_name)
     if os.path.exists(json_path):
         return jsonify({"status": "ok", "message": "既に抽出済みです"}), 200
+    if not os.path.isfile(pdf_path):
+        return jsonify({"status": "error", "message": "PDFが存在しません"}), 404
+
+    # 抽出はジョブとして動かす。background=1 ならすぐに返し、進捗は /api/extract_jobs/<pdf_name> で見る
+    # 待っている間に接続が切れてもジョブは続き、落ちた場合も次の呼び出しでチェックポイントから再開する
+    job = extract_jobs.start(_normalize_pdf_name(pdf_name), pdf_path, json_path)
+    background = str(request.values.get("background", "")).strip().lower() in ("1", "true", "yes", "on")
+    if background:
+        return jsonify({"status": "ok", "job": job.to_dict()}), 202
+    job.wait()
+    if job.state != "done":
+        return jsonify({"status": "error", "message": f"パラグラフ抽出エラー: {job.message}", "job": job.to_dict()}), 500
+    return jsonify({"status": "ok", "job": job.to_dict()}), 200
+
+
+# API: パラグラフ抽出ジョブの一覧と進捗
+@app.route("/api/extract_jobs", methods=["GET"])
+def extract_jobs_api():
+    return jsonify({"status": "ok", "jobs": extract_jobs.status()}), 200
+
+
+@app.route("/api/extract_jobs/<path:pdf_name>", methods=["GET"])
+def extract_job_api(pdf_name):
+    job = extract_jobs.get(_normalize_pdf_name(pdf_name))
+    if job is None:
+        return jsonify({"status": "error", "message": "抽出ジョブがありません"}), 404
+    return jsonify({"status": "ok", "job": job.to_dict()}), 200
+
+
+# API:抽出済みブックの指定ページだけをPDFから抽出し直す（訳・コメントなどは src_text が同じ段落へ引き継ぐ）
+@app.route("/api/reextract_pages/<path:pdf_name>", methods=["POST"])
+def reextract_pages_api(pdf_name):
+    if _is_url_book_name(pdf_name):
+        return jsonify({"status": "error", "message": "URLブックはパラグラフ抽出不要です"}), 400
+    start_page = request.form.get("start_page", type=int)
+    end_page = request.form.get("end_page", type=int)
+    # 省略したらブックに記録されているヘッダ/フッタ位置で抽出する
+    header_y1 = request.form.get("header_y1", type=float)
+    footer_y0 = request.form.get("footer_y0", type=float)
+    if start_page is None or end_page is None or start_page > end_page:
+        return jsonify({"status": "error", "message": "start_page, end_page は必須です"}), 400
+    pdf_path, json_path = get_paths(pdf_name)
+    if not os.path.exists(json_path):
+        return jsonify({"status": "error", "message": "対象のJSONファイルが存在しません"}), 404
+    if not os.path.isfile(pdf_path):
+        return jsonify({"status": "error", "message": "PDFが存在しません"}), 404
 
     try:
-        book_data = extract_paragraphs(pdf_path,json_path)
-        return jsonify({"status": "ok"}), 200
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)
+            stats = reextract_pages(
+                book_data,
+                pdf_path,
+                range(start_page, end_page + 1),
+                header_y1=header_y1,
+                footer_y0=footer_y0,
+            )
+            # シャード形式なら抽出し直したページ（と結合チェーンの組み直しで書き換わった前後のページ）だけを書き直す
+            changed_pages = stats["pages"] + stats["joined_pages"]
+            book_store.save(json_path, book_data, page_keys=changed_pages)
+            pages = book_data.get("pages", {}) or {}
+            delta = {
+                "pages": {str(p): pages[str(p)] for p in changed_pages},
+                "styles": book_data.get("styles"),
+                "trans_status_counts": book_data.get("trans_status_counts"),
+            }
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
-        return jsonify({"status": "error", "message": f"パラグラフ抽出エラー: {str(e)}"}), 500
+        return jsonify({"status": "error", "message": f"再抽出エラー: {str(e)}"}), 500
+    print(f"再抽出: {pdf_name} {start_page}-{end_page}ページ 段落{stats['paragraphs']}件（引き継ぎ{stats['carried']}件 / 引き継げなかった旧段落{stats['dropped']}件 / 組み直した結合{stats['rejoined']}件）")
+    return jsonify({"status": "ok", "stats": stats, "delta": delta}), 200
 
 
 # API:ファイル全翻訳
@@ -1993,7 +2251,11 @@ def translate_all_api(pdf_name):
         # 翻訳前に必ず文書全体へ対訳置換を適用
         _apply_dict_replace_for_range(pdf_name, json_path)
 
-        _, stats = paraparatrans_json_file(json_path, 1, 9999)
+        try:
+            _, stats = paraparatrans_json_file(json_path, 1, 9999)
+        finally:
+            # 翻訳は長時間かかるためロックは取らない（ページ毎の保存は mtime で検知されるが念のため破棄）
+            book_store.invalidate(json_path)
 
         # settingsの該当PDF分だけ同期（PDFごとのjson_mtimeで追従）
         settings_path = os.path.join(DATA_FOLDER, "paraparatrans.settings.json")
@@ -2068,6 +2330,7 @@ def export_html_api(pdf_name):
     if not os.path.exists(json_path):
         return jsonify({"status": "error", "message": "JSONが存在しません"}), 400
     try:
+        book_store.flush(json_path)
         json2html(json_path)
     except Exception as e:
         return jsonify({"status": "error", "message": f"HTML生成エラー: {str(e)}"}), 500
@@ -2086,6 +2349,7 @@ def download_html_api(pdf_name):
     out_path = os.path.splitext(json_path)[0] + ".html"
     if not os.path.exists(out_path):
         try:
+            book_store.flush(json_path)
             json2html(json_path)
         except Exception as e:
             return jsonify({"status": "error", "message": f"HTML生成エラー: {str(e)}"}), 500
@@ -2120,8 +2384,8 @@ def export_structure_api(pdf_name):
         return jsonify({"status": "error", "message": "JSONが存在しません"}), 400
 
     try:
-        book_data = load_json(json_path)
-        structure_data = structure_strip(book_data)
+        with book_store.lock(json_path):
+            structure_data = structure_strip(book_store.get(json_path))
         out_path = _structure_path(pdf_name)
         atomicsave_json(out_path, structure_data)
         rel = os.path.relpath(out_path, APP_DIR)
@@ -2155,17 +2419,16 @@ def export_text_api(pdf_name):
         return jsonify({"status": "error", "message": "fields は1〜2件で指定してください"}), 400
 
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            book_data = json.load(f)
-        content = _build_text_export_content(
-            book_data,
-            fields,
-            include_page_numbers=include_page_numbers,
-            include_header=include_header,
-            include_footer=include_footer,
-            include_remove=include_remove,
-            fmt=fmt,
-        )
+        with book_store.lock(json_path):
+            content = _build_text_export_content(
+                book_store.get(json_path),
+                fields,
+                include_page_numbers=include_page_numbers,
+                include_header=include_header,
+                include_footer=include_footer,
+                include_remove=include_remove,
+                fmt=fmt,
+            )
         out_path = os.path.splitext(json_path)[0] + f".{fmt}"
         with open(out_path, "w", encoding="utf-8") as f:
             f.write(content)
@@ -2205,8 +2468,8 @@ def download_structure_api(pdf_name):
     out_path = _structure_path(pdf_name)
     if not os.path.exists(out_path):
         try:
-            book_data = load_json(json_path)
-            structure_data = structure_strip(book_data)
+            with book_store.lock(json_path):
+                structure_data = structure_strip(book_store.get(json_path))
             atomicsave_json(out_path, structure_data)
         except Exception as e:
             return jsonify({"status": "error", "message": f"構造ファイル生成エラー: {str(e)}"}), 500
@@ -2246,20 +2509,21 @@ def import_structure_api(pdf_name):
         return jsonify({"status": "error", "message": "取り込みデータが不正です（JSON object ではありません）"}), 400
 
     try:
-        book_data = load_json(json_path)
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)
 
-        backup_path = structure_ensure_backup_copy(json_path, backup_dir=os.path.join(DATA_FOLDER, "backup"))
+            backup_path = structure_ensure_backup_copy(json_path, backup_dir=os.path.join(DATA_FOLDER, "backup"))
 
-        book_data, stats, join_changed = structure_merge_into_book(book_data, imported)
+            book_data, stats, join_changed = structure_merge_into_book(book_data, imported)
 
-        # join が変わった場合は派生項目を再構築（src_joined/src_replaced/trans_status が変化し得る）
-        if join_changed:
-            join_apply_all(book_data, sep="", normalize_head=True)
+            # join が変わった場合は派生項目を再構築（src_joined/src_replaced/trans_status が変化し得る）
+            if join_changed:
+                join_apply_all(book_data, sep="", normalize_head=True)
 
-        # trans_status などが変わる可能性があるので再集計
-        recalc_trans_status_counts(book_data)
+            # trans_status などが変わる可能性があるので再集計
+            recalc_trans_status_counts(book_data)
 
-        atomicsave_json(json_path, book_data)
+            book_store.save(json_path, book_data)
         return jsonify(
             {
                 "status": "ok",
@@ -2270,6 +2534,8 @@ def import_structure_api(pdf_name):
             }
         ), 200
     except Exception as e:
+        # 途中まで変更されたキャッシュは破棄してディスクから読み直させる
+        book_store.invalidate(json_path)
         return jsonify({"status": "error", "message": f"構造ファイル取り込みエラー: {str(e)}"}), 500
 
 
@@ -2299,15 +2565,9 @@ def dict_replace_page_api(pdf_name):
     if not os.path.exists(json_path):
         return jsonify({"status": "error", "message": "対象のJSONファイルが存在しません"}), 404
     try:
-        dict_paths = dict_service.get_active_dict_paths(pdf_name)
-        merged_path = dict_service.merged_dict_file(dict_paths)
-        try:
-            book_data = file_replace_with_dict(json_path, merged_path, start_page, end_page)
-        finally:
-            try:
-                os.remove(merged_path)
-            except OSError:
-                pass
+        matcher = dict_service.merged_dict(dict_service.get_active_dict_paths(pdf_name))
+        with book_store.external_write(json_path):
+            book_data = file_replace_with_matcher(json_path, matcher, start_page, end_page)
 
         pages_delta = {}
         pages = (book_data or {}).get("pages", {}) or {}
@@ -2347,61 +2607,46 @@ def dict_replace_paragraph_api(pdf_name):
     paragraph_key = str(paragraph_id)
 
     try:
-        dict_paths = dict_service.get_active_dict_paths(pdf_name)
-        merged_path = dict_service.merged_dict_file(dict_paths)
-        try:
-            dict_cs, dict_ci = load_dictionary(merged_path)
-        finally:
-            try:
-                os.remove(merged_path)
-            except OSError:
-                pass
+        matcher = dict_service.merged_dict(dict_service.get_active_dict_paths(pdf_name))
 
-        book_data = load_json(json_path)
-        pages = (book_data or {}).get("pages", {}) or {}
-        page = pages.get(page_key)
-        if not isinstance(page, dict):
-            return jsonify({"status": "error", "message": f"ページが見つかりません: {page_number}"}), 404
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)
+            pages = (book_data or {}).get("pages", {}) or {}
+            page = pages.get(page_key)
+            if not isinstance(page, dict):
+                return jsonify({"status": "error", "message": f"ページが見つかりません: {page_number}"}), 404
 
-        paragraphs = (page or {}).get("paragraphs", {}) or {}
-        paragraph = paragraphs.get(paragraph_key)
-        if not isinstance(paragraph, dict):
-            for para in paragraphs.values():
-                if isinstance(para, dict) and str(para.get("id")) == paragraph_key:
-                    paragraph = para
-                    break
+            paragraphs = (page or {}).get("paragraphs", {}) or {}
+            paragraph = paragraphs.get(paragraph_key)
+            if not isinstance(paragraph, dict):
+                for para in paragraphs.values():
+                    if isinstance(para, dict) and str(para.get("id")) == paragraph_key:
+                        paragraph = para
+                        break
 
-        if not isinstance(paragraph, dict):
-            return jsonify({"status": "error", "message": f"段落が見つかりません: {paragraph_key}"}), 404
+            if not isinstance(paragraph, dict):
+                return jsonify({"status": "error", "message": f"段落が見つかりません: {paragraph_key}"}), 404
 
-        src_joined = paragraph.get("src_joined", "")
-        paragraph["src_replaced"] = replace_with_dict(src_joined, dict_cs, dict_ci)
+            src_joined = paragraph.get("src_joined", "")
+            paragraph["src_replaced"] = matcher.replace(src_joined)
 
-        atomicsave_json(json_path, book_data)
+            book_store.save(json_path, book_data)
 
-        delta = {
-            "pages": {
-                page_key: page,
-            },
-            "trans_status_counts": (book_data or {}).get("trans_status_counts"),
-        }
-        return jsonify({"status": "ok", "delta": delta}), 200
+            delta = {
+                "pages": {
+                    page_key: page,
+                },
+                "trans_status_counts": (book_data or {}).get("trans_status_counts"),
+            }
+            return jsonify({"status": "ok", "delta": delta}), 200
     except Exception as e:
         return jsonify({"status": "error", "message": f"段落辞書適用中のエラー: {str(e)}"}), 500
 
 
 def _apply_dict_replace_for_range(pdf_name: str, json_path: str, start_page: int | None = None, end_page: int | None = None):
-    dict_paths = dict_service.get_active_dict_paths(pdf_name)
-    merged_path = dict_service.merged_dict_file(dict_paths)
-    try:
-        if start_page is None or end_page is None:
-            return file_replace_with_dict(json_path, merged_path)
-        return file_replace_with_dict(json_path, merged_path, start_page, end_page)
-    finally:
-        try:
-            os.remove(merged_path)
-        except OSError:
-            pass
+    matcher = dict_service.merged_dict(dict_service.get_active_dict_paths(pdf_name))
+    with book_store.external_write(json_path):
+        return file_replace_with_matcher(json_path, matcher, start_page, end_page)
 
 @app.route("/api/paraparatrans/<path:pdf_name>", methods=["POST"])
 def paraparatrans_api(pdf_name):
@@ -2418,7 +2663,10 @@ def paraparatrans_api(pdf_name):
         # 翻訳対象範囲に必ず対訳置換を適用してから翻訳する
         _apply_dict_replace_for_range(pdf_name, json_path, start_page, end_page)
 
-        updated_data, stats = paraparatrans_json_file(json_path, start_page, end_page)
+        try:
+            updated_data, stats = paraparatrans_json_file(json_path, start_page, end_page)
+        finally:
+            book_store.invalidate(json_path)
 
         # 差分返却: 更新対象ページのみ返す（クライアント側で bookData にマージして全体再取得を避ける）
         pages_delta = {}
@@ -2456,33 +2704,34 @@ def align_trans_by_src_joined_api(pdf_name):
         return jsonify({"status": "error", "message": "対象のJSONファイルが存在しません"}), 404
 
     try:
-        with open(json_path, "r", encoding="utf-8") as f:
-            book_data = json.load(f)
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)
 
-        _, changed, pages_changed = align_translations_by_src_joined_collect_pages(book_data)
-        recalc_trans_status_counts(book_data)
-        atomicsave_json(json_path, book_data)
+            _, changed, pages_changed = align_translations_by_src_joined_collect_pages(book_data)
+            recalc_trans_status_counts(book_data)
+            book_store.save(json_path, book_data)
 
-        pages_delta = {}
-        pages = book_data.get("pages", {}) or {}
-        for key in pages_changed:
-            if key in pages:
-                pages_delta[key] = pages[key]
+            pages_delta = {}
+            pages = book_data.get("pages", {}) or {}
+            for key in pages_changed:
+                if key in pages:
+                    pages_delta[key] = pages[key]
 
-        delta = {
-            "pages": pages_delta,
-            "trans_status_counts": book_data.get("trans_status_counts"),
-        }
-
-        return jsonify(
-            {
-                "status": "ok",
-                "changed": changed,
+            delta = {
+                "pages": pages_delta,
                 "trans_status_counts": book_data.get("trans_status_counts"),
-                "delta": delta,
             }
-        ), 200
+
+            return jsonify(
+                {
+                    "status": "ok",
+                    "changed": changed,
+                    "trans_status_counts": book_data.get("trans_status_counts"),
+                    "delta": delta,
+                }
+            ), 200
     except Exception as e:
+        book_store.invalidate(json_path)
         app.logger.error(f"訳揃え処理中にエラーが発生しました: {str(e)}")
         return jsonify({"status": "error", "message": f"訳揃え処理中にエラーが発生しました: {str(e)}"}), 500
 
@@ -2492,9 +2741,30 @@ def reload_book_data_api(pdf_name):
     pdf_path, json_path = get_paths(pdf_name)
     if not os.path.exists(json_path):
         return jsonify({"status": "error", "message": "JSONファイルが存在しません"}), 404
-    with open(json_path, "r", encoding="utf-8") as f:
-        book_data = json.load(f)
-    return jsonify(book_data), 200
+    with book_store.lock(json_path):
+        book_data = book_store.get(json_path)
+        return jsonify(book_data), 200
+
+# API: book_store のキャッシュ統計（ヒット/ミス/追い出し）
+@app.route("/api/book_store/stats", methods=["GET"])
+def book_store_stats_api():
+    return jsonify({"status": "ok", "stats": book_store.stats()}), 200
+
+
+# API: 検索索引の統計（構築/差分更新/破棄）
+@app.route("/api/search_index/stats", methods=["GET"])
+def search_index_stats_api():
+    return jsonify({"status": "ok", "stats": search_index.stats()}), 200
+
+
+# API: 翻訳メモリの統計（ヒット/ミス/保存/追い出し）
+@app.route("/api/translation_memory/stats", methods=["GET"])
+def translation_memory_stats_api():
+    tm = get_translation_memory()
+    if tm is None:
+        return jsonify({"status": "ok", "enabled": False, "stats": None}), 200
+    return jsonify({"status": "ok", "enabled": True, "stats": tm.stats()}), 200
+
 
 @app.route("/pdf_view/<path:pdf_name>")
 def pdf_view(pdf_name):
@@ -2545,72 +2815,84 @@ def save_order_api(pdf_name):
     if not os.path.exists(json_path):
         return jsonify({"status": "error", "message": "JSONが存在しません"}), 404
 
-    with open(json_path, "r", encoding="utf-8") as f:
-        book_data = json.load(f)
-
-    new_order = json.loads(order_json) # new_order は配列のままと想定
-    paragraphs_dict = book_data.get("paragraphs", {}) # 辞書として取得
-
-    changed_count = 0
-    last_processed_item = {} # 保存時のログ表示用
-
-    for item in new_order:
-        page_number = str(item.get("page_number"))
-        p_id_str = str(item.get("id"))
-        new_order_val = item.get("order")
-        new_block_tag = item.get("block_tag")
-        new_group_id = item.get("group_id")
-        new_join = item.get("join", 0)
-        last_processed_item = item # ログ用に保持
-
-        print (f"  Found ID: {p_id_str}, Current Order: {p.get('order')}, Block Tag: {p.get('block_tag')}, Group ID: {p.get('group_id')}, Join: {p.get('join')}")
-        print(f"Processing ID: {p_id_str}, Order: {new_order_val}, Block Tag: {new_block_tag}, Group ID: {new_group_id}, Join: {new_join}")
-
-        p = book_data["pages"][page_number]["paragraphs"][p_id_str]
-        updated = False
-        if p.get("order") != new_order_val:
-            p["order"] = new_order_val
-            updated = True
-        if new_block_tag is not None and p.get("block_tag") != new_block_tag:
-            p["block_tag"] = new_block_tag
-            updated = True
-        if new_group_id is not None and p.get("group_id") != new_group_id:
-            p["group_id"] = new_group_id
-            updated = True
-        if new_join is not None and p.get("join") != new_join:
-            p["join"] = new_join
-            updated = True
-        if updated:
+    with book_store.lock(json_path):
+        book_data = book_store.get(json_path)
+
+        new_order = json.loads(order_json) # new_order は配列のままと想定
+        paragraphs_dict = book_data.get("paragraphs", {}) # 辞書として取得
+
+        changed_count = 0
+        last_processed_item = {} # 保存時のログ表示用
+
+        for item in new_order:
+            page_number = str(item.get("page_number"))
+            p_id_str = str(item.get("id"))
+            new_order_val = item.get("order")
+            new_block_tag = item.get("block_tag")
+            new_group_id = item.get("group_id")
+            new_join = item.get("join", 0)
+            last_processed_item = item # ログ用に保持
+
+            print (f"  Found ID: {p_id_str}, Current Order: {p.get('order')}, Block Tag: {p.get('block_tag')}, Group ID: {p.get('group_id')}, Join: {p.get('join')}")
+            print(f"Processing ID: {p_id_str}, Order: {new_order_val}, Block Tag: {new_block_tag}, Group ID: {new_group_id}, Join: {new_join}")
+
+            p = book_data["pages"][page_number]["paragraphs"][p_id_str]
+            updated = False
+            if p.get("order") != new_order_val:
+                p["order"] = new_order_val
+                updated = True
+            if new_block_tag is not None and p.get("block_tag") != new_block_tag:
+                p["block_tag"] = new_block_tag
+                updated = True
+            if new_group_id is not None and p.get("group_id") != new_group_id:
+                p["group_id"] = new_group_id
+                updated = True
+            if new_join is not None and p.get("join") != new_join:
+                p["join"] = new_join
+                updated = True
+            if updated:
+                changed_count += 1
+                print(f"  Updated ID: {p_id_str}")
+
+        if title is not None and book_data.get("title") != title:
+            book_data["title"] = title
             changed_count += 1
-            print(f"  Updated ID: {p_id_str}")
+            print("Title updated.")
 
-    if title is not None and book_data.get("title") != title:
-        book_data["title"] = title
-        changed_count += 1
-        print("Title updated.")
-
-    if changed_count > 0:
-        temp_file = f"{json_path}.{uuid.uuid4().hex}.tmp"  # ユニークな一時ファイル名を生成
-        try:
-            # 保存時のログは最後に処理したアイテム情報を使う (ループ変数はスコープ外になる可能性があるため)
-            log_p_id = str(last_processed_item.get("id", "N/A"))
-            log_order = last_processed_item.get("order", "N/A")
-            log_block_tag = last_processed_item.get("block_tag", "N/A")
-            log_group_id = last_processed_item.get("group_id", "N/A")
-            log_join = last_processed_item.get("join", "N/A")
-            print(f"Writing changes to file. Last processed item for logging - ID: {log_p_id}, Order: {log_order}, Block Tag: {log_block_tag}, Group ID: {log_group_id}, Join: {log_join}")
-
-            with open(temp_file, "w", encoding="utf-8") as f:
-                json.dump(book_data, f, ensure_ascii=False, indent=2) # book_data["paragraphs"] は辞書のまま保存
-            os.replace(temp_file, json_path)  # アトミックにリネーム
-        except Exception as e:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-            return jsonify({"status": "error", "message": f"保存中のエラー: {str(e)}"}), 500
+        if changed_count > 0:
+            try:
+                # 保存時のログは最後に処理したアイテム情報を使う (ループ変数はスコープ外になる可能性があるため)
+                log_p_id = str(last_processed_item.get("id", "N/A"))
+                log_order = last_processed_item.get("order", "N/A")
+                log_block_tag = last_processed_item.get("block_tag", "N/A")
+                log_group_id = last_processed_item.get("group_id", "N/A")
+                log_join = last_processed_item.get("join", "N/A")
+                print(f"Writing changes to file. Last processed item for logging - ID: {log_p_id}, Order: {log_order}, Block Tag: {log_block_tag}, Group ID: {log_group_id}, Join: {log_join}")
+
+                book_store.save(json_path, book_data)  # アトミックセーブ（失敗時はキャッシュも破棄される）
+            except Exception as e:
+                return jsonify({"status": "error", "message": f"保存中のエラー: {str(e)}"}), 500
 
     return jsonify({"status": "ok", "changed": changed_count}), 200
 
 
+def _book_page_delta(json_path: str, page_number: int) -> dict | None:
+    """指定ページと trans_status_counts だけを差分として返す（クライアント側で bookData にマージする）。"""
+    with book_store.lock(json_path):
+        book_data = book_store.get(json_path)
+        page_key = str(page_number)
+        page_obj = (book_data.get("pages", {}) or {}).get(page_key)
+        if page_obj is None:
+            return None
+        # jsonify はロックの外で行われるので、キャッシュと共有しないコピーを返す
+        return copy.deepcopy(
+            {
+                "pages": {page_key: page_obj},
+                "trans_status_counts": book_data.get("trans_status_counts"),
+            }
+        )
+
+
 @app.route("/api/auto_tagging/<path:pdf_name>", methods=["POST"])
 def auto_tagging_api(pdf_name):
     pdf_path, json_path = get_paths(pdf_name)
@@ -2618,20 +2900,13 @@ def auto_tagging_api(pdf_name):
         return jsonify({"status": "error", "message": "JSONファイルが存在しません"}), 404
     try:
         current_page = request.form.get("current_page", type=int)
-        structure_tagging(json_path, SIMBLE_DICT_PATH)
-        join_flags_in_file(json_path, SIMBLE_DICT_PATH)
+        with book_store.external_write(json_path):
+            structure_tagging(json_path, SIMBLE_DICT_PATH)
+            join_flags_in_file(json_path, SIMBLE_DICT_PATH)
 
         delta = None
         if current_page is not None:
-            with open(json_path, "r", encoding="utf-8") as f:
-                book_data = json.load(f)
-            page_key = str(current_page)
-            page_obj = (book_data.get("pages", {}) or {}).get(page_key)
-            if page_obj is not None:
-                delta = {
-                    "pages": {page_key: page_obj},
-                    "trans_status_counts": book_data.get("trans_status_counts"),
-                }
+            delta = _book_page_delta(json_path, current_page)
 
     except Exception as e:
         return jsonify({"status": "error", "message": f"自動タグ付けエラー: {str(e)}"}), 500
@@ -2647,21 +2922,14 @@ def rebuild_src_text_api(pdf_name):
 
     try:
         current_page = request.form.get("current_page", type=int)
-        changed = rebuild_src_text_in_file(json_path, SYMBOLFONT_DICT_PATH)
+        with book_store.external_write(json_path):
+            changed = rebuild_src_text_in_file(json_path, SYMBOLFONT_DICT_PATH)
     except Exception as e:
         return jsonify({"status": "error", "message": f"シンボル置換エラー: {str(e)}"}), 500
 
     delta = None
     if current_page is not None:
-        with open(json_path, "r", encoding="utf-8") as f:
-            book_data = json.load(f)
-        page_key = str(current_page)
-        page_obj = (book_data.get("pages", {}) or {}).get(page_key)
-        if page_obj is not None:
-            delta = {
-                "pages": {page_key: page_obj},
-                "trans_status_counts": book_data.get("trans_status_counts"),
-            }
+        delta = _book_page_delta(json_path, current_page)
 
     return jsonify({"status": "ok", "message": f"シンボル置換完了 (更新: {changed}段落)", "changed": changed, "delta": delta}), 200
 
@@ -2682,19 +2950,12 @@ def update_block_tags_by_style_api(pdf_name):
 
     try:
         # parapara_tagging_by_style.py の関数を呼び出す
-        tag_paragraphs_by_style(json_path, target_style, target_tag)
+        with book_store.external_write(json_path):
+            tag_paragraphs_by_style(json_path, target_style, target_tag)
 
         delta = None
         if current_page is not None:
-            with open(json_path, "r", encoding="utf-8") as f:
-                book_data = json.load(f)
-            page_key = str(int(current_page))
-            page_obj = (book_data.get("pages", {}) or {}).get(page_key)
-            if page_obj is not None:
-                delta = {
-                    "pages": {page_key: page_obj},
-                    "trans_status_counts": book_data.get("trans_status_counts"),
-                }
+            delta = _book_page_delta(json_path, int(current_page))
 
         # 成功レスポンスを返す
         return jsonify({"status": "ok", "message": "スタイルによるblock_tag一括更新が完了しました", "delta": delta}), 200
@@ -2726,19 +2987,12 @@ def update_block_tags_by_style_y_api(pdf_name):
         return jsonify({"status": "error", "message": "JSONファイルが存在しません"}), 404
 
     try:
-        changed = tag_paragraphs_by_style_y_in_file(json_path, target_style, float(y0), float(y1), action)
+        with book_store.external_write(json_path):
+            changed = tag_paragraphs_by_style_y_in_file(json_path, target_style, float(y0), float(y1), action)
 
         delta = None
         if current_page is not None:
-            with open(json_path, "r", encoding="utf-8") as f:
-                book_data = json.load(f)
-            page_key = str(int(current_page))
-            page_obj = (book_data.get("pages", {}) or {}).get(page_key)
-            if page_obj is not None:
-                delta = {
-                    "pages": {page_key: page_obj},
-                    "trans_status_counts": book_data.get("trans_status_counts"),
-                }
+            delta = _book_page_delta(json_path, int(current_page))
 
         return jsonify({"status": "ok", "message": f"更新しました (変更: {changed}段落)", "changed": changed, "delta": delta}), 200
     except Exception as e:
@@ -2753,29 +3007,25 @@ def auto_join_replaced_paragraphs_api(pdf_name):
         return jsonify({"status": "error", "message": "JSONファイルが存在しません"}), 404
     try:
         current_page = request.form.get("current_page", type=int)
-        with open(json_path, "r", encoding="utf-8") as f:
-            book_data = json.load(f)
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)
 
-        join_apply_all(book_data, sep="", normalize_head=True)
-        recalc_trans_status_counts(book_data)
-        atomicsave_json(json_path, book_data)
+            join_apply_all(book_data, sep="", normalize_head=True)
+            recalc_trans_status_counts(book_data)
+            book_store.save(json_path, book_data)
+            trans_status_counts = dict(book_data.get("trans_status_counts") or {})
 
         delta = None
         if current_page is not None:
-            page_key = str(current_page)
-            page_obj = (book_data.get("pages", {}) or {}).get(page_key)
-            if page_obj is not None:
-                delta = {
-                    "pages": {page_key: page_obj},
-                    "trans_status_counts": book_data.get("trans_status_counts"),
-                }
+            delta = _book_page_delta(json_path, current_page)
     except Exception as e:
+        book_store.invalidate(json_path)
         return jsonify({"status": "error", "message": f"置換文結合エラー: {str(e)}"}), 500
     return jsonify(
         {
             "status": "ok",
             "message": "置換文結合完了",
-            "trans_status_counts": book_data.get("trans_status_counts"),
+            "trans_status_counts": trans_status_counts,
             "delta": delta,
         }
     ), 200
@@ -2789,6 +3039,7 @@ def dict_create_api(pdf_name):
     try:
         dict_path = dict_service.get_primary_dict_path(pdf_name)
         dict_service.ensure_dict_file(dict_path)
+        book_store.flush(json_path)
         dict_create(json_path, dict_path, COMMON_WORDS_PATH)
     except Exception as e:
         return jsonify({"status": "error", "message": f"辞書生成エラー: {str(e)}"}), 500
@@ -2830,8 +3081,7 @@ def update_book_info_api(pdf_name):
 
     try:
         # settingsファイルを読み込む
-        with open(settings_path, "r", encoding="utf-8") as f:
-            settings = json.load(f)
+        settings = load_json(settings_path)
 
         # 指定されたPDF名が存在するか確認
         if pdf_name not in settings["files"]:
@@ -2849,8 +3099,7 @@ def update_book_info_api(pdf_name):
             settings["files"][pdf_name]["trans_status_counts"] = new_trans_status_counts
 
         # 更新内容をファイルに書き込む
-        with open(settings_path, "w", encoding="utf-8") as f:
-            json.dump(settings, f, ensure_ascii=False, indent=2)
+        save_settings(settings_path, settings, indent=2)
 
         return jsonify({"status": "ok", "message": "文書情報が更新されました"}), 200
 
@@ -2916,6 +3165,15 @@ def apply_trans_status_delta(book_data, old_status, new_status):
     counts[old_s] = max(0, counts.get(old_s, 0) - 1)
     counts[new_s] = counts.get(new_s, 0) + 1
 
+# write-behind 時にジャーナルへ記録する段落フィールド（各APIが更新し得るもの）
+_PARAGRAPH_EDIT_FIELDS = (
+    "src_text", "trans_auto", "trans_text", "comment", "trans_status", "block_tag", "markup", "modified_at",
+)
+_PARAGRAPHS_EDIT_FIELDS = (
+    "src_text", "trans_text", "comment", "trans_status", "order", "block_tag", "group_id", "modified_at",
+)
+
+
 # 単パラグラフの翻訳を保存するAPI
 @app.route("/api/update_paragraph/<path:pdf_name>", methods=["POST"])
 def update_paragraph_api(pdf_name):
@@ -2937,88 +3195,97 @@ def update_paragraph_api(pdf_name):
     if not os.path.exists(json_path):
         return jsonify({"status": "error", "message": "(update_paragraph_api 1)JSONが存在しません"}), 400
 
-    book_data = load_json(json_path)
+    with book_store.lock(json_path):
+        book_data = book_store.get(json_path)
 
-    paragraph = book_data["pages"][page_number]["paragraphs"][id]
-    if not paragraph:
-        return jsonify({"status": "error", "message": "(update_paragraph_api 2)該当パラグラフが見つかりません"}), 404
+        paragraph = book_data["pages"][page_number]["paragraphs"][id]
+        if not paragraph:
+            return jsonify({"status": "error", "message": "(update_paragraph_api 2)該当パラグラフが見つかりません"}), 404
 
-    # trans_status_counts は全件再集計だと重いので、基本は変更分だけ更新する。
-    # ただし counts が欠損/破損している場合は、最後に1回だけ再集計する。
-    old_status = paragraph.get("trans_status", "none")
-    old_status_norm = _normalize_trans_status(old_status)
-    can_delta = is_trans_status_counts_usable_for_delta(book_data)
-    if can_delta:
-        # これから old_status を 1 減らすので、0 以下は不整合とみなして再集計へ
-        try:
-            if int(book_data["trans_status_counts"].get(old_status_norm, 0)) <= 0:
+        # trans_status_counts は全件再集計だと重いので、基本は変更分だけ更新する。
+        # ただし counts が欠損/破損している場合は、最後に1回だけ再集計する。
+        old_status = paragraph.get("trans_status", "none")
+        old_status_norm = _normalize_trans_status(old_status)
+        can_delta = is_trans_status_counts_usable_for_delta(book_data)
+        if can_delta:
+            # これから old_status を 1 減らすので、0 以下は不整合とみなして再集計へ
+            try:
+                if int(book_data["trans_status_counts"].get(old_status_norm, 0)) <= 0:
+                    can_delta = False
+            except Exception:
                 can_delta = False
-        except Exception:
-            can_delta = False
 
-    paragraph["src_text"] = new_src_text
-    paragraph["trans_auto"] = new_trans_auto
-    paragraph["trans_text"] = new_trans_text
-    if new_comment is not None:
-        paragraph["comment"] = new_comment
-    paragraph["trans_status"] = new_status
-    paragraph["block_tag"] = new_block_tag
-    if isinstance(new_markup, list):
-        paragraph["markup"] = new_markup
-
-    join_changed = False
-    if new_join is not None:
-        try:
-            desired_join = 1 if int(new_join) == 1 else 0
-        except Exception:
-            desired_join = 0
-        old_join = 1 if int(paragraph.get("join", 0)) == 1 else 0
-        if old_join != desired_join:
-            refs = join_iter_paragraph_refs(book_data)
-            index = join_build_index(refs)
-            join_apply_change(
-                book_data,
-                (page_number, id),
-                desired_join,
-                refs=refs,
-                index=index,
-                sep="",
-                normalize_head=True,
-            )
-            join_changed = True
+        paragraph["src_text"] = new_src_text
+        paragraph["trans_auto"] = new_trans_auto
+        paragraph["trans_text"] = new_trans_text
+        if new_comment is not None:
+            paragraph["comment"] = new_comment
+        paragraph["trans_status"] = new_status
+        paragraph["block_tag"] = new_block_tag
+        if isinstance(new_markup, list):
+            paragraph["markup"] = new_markup
 
-            # 既存データ互換: join=0 はキーごと消す運用
-            if desired_join == 0:
-                try:
-                    if "join" in paragraph:
-                        del paragraph["join"]
-                except Exception:
-                    pass
+        join_changed = False
+        if new_join is not None:
+            try:
+                desired_join = 1 if int(new_join) == 1 else 0
+            except Exception:
+                desired_join = 0
+            old_join = 1 if int(paragraph.get("join", 0)) == 1 else 0
+            if old_join != desired_join:
+                refs = join_iter_paragraph_refs(book_data)
+                index = join_build_index(refs)
+                join_apply_change(
+                    book_data,
+                    (page_number, id),
+                    desired_join,
+                    refs=refs,
+                    index=index,
+                    sep="",
+                    normalize_head=True,
+                )
+                join_changed = True
 
-    paragraph["modified_at"] = datetime.datetime.now().isoformat()
+                # 既存データ互換: join=0 はキーごと消す運用
+                if desired_join == 0:
+                    try:
+                        if "join" in paragraph:
+                            del paragraph["join"]
+                    except Exception:
+                        pass
 
-    # join が変わると複数段落の trans_status が変わり得るので、カウントは再集計する
-    if join_changed:
-        recalc_trans_status_counts(book_data)
-        can_delta = False
-    elif can_delta:
-        apply_trans_status_delta(book_data, old_status, new_status)
-    else:
-        recalc_trans_status_counts(book_data)
+        paragraph["modified_at"] = datetime.datetime.now().isoformat()
 
-    try:
-        atomicsave_json(json_path, book_data)  # アトミックセーブ
-        return jsonify(
-            {
-                "status": "ok",
-                "trans_status_counts": book_data.get("trans_status_counts"),
-                "reload_book_data": bool(join_changed),
-            }
-        ), 200
-    except ValueError as ve:
-        return jsonify({"status": "error", "message:": "(update_paragraph_api 3)" + str(ve)}), 400
-    except Exception as e:
-        return jsonify({"status": "error", "message": f"(update_paragraph_api 4): {str(e)}"}), 500
+        # join が変わると複数段落の trans_status が変わり得るので、カウントは再集計する
+        if join_changed:
+            recalc_trans_status_counts(book_data)
+            can_delta = False
+        elif can_delta:
+            apply_trans_status_delta(book_data, old_status, new_status)
+        else:
+            recalc_trans_status_counts(book_data)
+
+        try:
+            if join_changed:
+                # join は前後の段落へ波及するので全体を保存する
+                patches = None
+            else:
+                patches = [
+                    paragraph_patch(page_number, id, paragraph, _PARAGRAPH_EDIT_FIELDS),
+                    book_patch(book_data, ("trans_status_counts",)),
+                ]
+            _commit_book_edits(json_path, book_data, patches)  # write-behind 無効時はアトミックセーブ
+            return jsonify(
+                {
+                    "status": "ok",
+                    "trans_status_counts": book_data.get("trans_status_counts"),
+                    "reload_book_data": bool(join_changed),
+                }
+            ), 200
+        except ValueError as ve:
+            return jsonify({"status": "error", "message:": "(update_paragraph_api 3)" + str(ve)}), 400
+        except Exception as e:
+            return jsonify({"status": "error", "message": f"(update_paragraph_api 4): {str(e)}"}), 500
 
 
 # 複数パラグラフを更新するAPI
@@ -3038,120 +3305,132 @@ def update_paragraphs_api(pdf_name):
     print("update_paragraphs_api:" + json.dumps(request_data, indent=2, ensure_ascii=False))
 
     try:
-        book_data = load_json(json_path)  # JSONファイルを読み込む
+        with book_store.lock(json_path):
+            book_data = book_store.get(json_path)  # キャッシュ（無ければJSONファイル）から読み込む
 
-        request_title = request_data.get("title")
-        if request_title is not None:
-            book_data["title"] = request_title
+            request_title = request_data.get("title")
+            if request_title is not None:
+                book_data["title"] = request_title
 
 
-        def apply_update(p, upd_value): # 第2引数は更新内容のオブジェクト
-            # デバッグ用にupd_valueをprint
-            # print(json.dumps(upd_value, indent=2, ensure_ascii=False))
+            def apply_update(p, upd_value): # 第2引数は更新内容のオブジェクト
+                # デバッグ用にupd_valueをprint
+                # print(json.dumps(upd_value, indent=2, ensure_ascii=False))
 
-            p["modified_at"] = datetime.datetime.now().isoformat()
-            p["src_text"] = upd_value.get("src_text", p.get("src_text"))
-            p["trans_text"] = upd_value.get("trans_text", p.get("trans_text"))
-            p["comment"] = upd_value.get("comment", p.get("comment", ""))
-            p["trans_status"] = upd_value.get("trans_status", p.get("trans_status"))
-            p["order"] = upd_value.get("order", p.get("order"))
-            p["block_tag"] = upd_value.get("block_tag", p.get("block_tag"))
+                p["modified_at"] = datetime.datetime.now().isoformat()
+                p["src_text"] = upd_value.get("src_text", p.get("src_text"))
+                p["trans_text"] = upd_value.get("trans_text", p.get("trans_text"))
+                p["comment"] = upd_value.get("comment", p.get("comment", ""))
+                p["trans_status"] = upd_value.get("trans_status", p.get("trans_status"))
+                p["order"] = upd_value.get("order", p.get("order"))
+                p["block_tag"] = upd_value.get("block_tag", p.get("block_tag"))
 
-            group_id = upd_value.get("group_id", None)
-            # group_idがparagraphs_dictに存在しない場合は、group_idを削除
-            if group_id is not None:
-                p["group_id"] = group_id
-            elif "group_id" in p:
-                del p["group_id"]  # group_idを削除
+                group_id = upd_value.get("group_id", None)
+                # group_idがparagraphs_dictに存在しない場合は、group_idを削除
+                if group_id is not None:
+                    p["group_id"] = group_id
+                elif "group_id" in p:
+                    del p["group_id"]  # group_idを削除
 
-            # join は波及更新が必要なので、ここでは触らない（後段で join_apply_change する）
+                # join は波及更新が必要なので、ここでは触らない（後段で join_apply_change する）
 
-        join_updates = []  # (page_number(str), id(str), desired_join(0/1))
+            join_updates = []  # (page_number(str), id(str), desired_join(0/1))
 
-        # 差分更新ができる場合は差分で、無理なら最後に1回だけ再集計する
-        can_delta = is_trans_status_counts_usable_for_delta(book_data)
-        if can_delta:
-            ensure_trans_status_counts(book_data)
-
-        request_paragraphs = request_data.get("paragraphs")
-        for request_paragraph in request_paragraphs:
-            page_number = str(request_paragraph.get("page_number"))
-            id = str(request_paragraph.get("id"))
-            # print(f"page:{page_number} id:{id}")
-            paragraph_dict = book_data["pages"][page_number]["paragraphs"][id]
-
-            desired_join = 1 if request_paragraph.get("join") == 1 else 0
-            old_join = 1 if int(paragraph_dict.get("join", 0)) == 1 else 0
-            if old_join != desired_join:
-                join_updates.append((page_number, id, desired_join))
-
-            old_status = paragraph_dict.get("trans_status", "none")
+            # 差分更新ができる場合は差分で、無理なら最後に1回だけ再集計する
+            can_delta = is_trans_status_counts_usable_for_delta(book_data)
             if can_delta:
-                old_status_norm = _normalize_trans_status(old_status)
-                try:
-                    if int(book_data["trans_status_counts"].get(old_status_norm, 0)) <= 0:
-                        can_delta = False
-                except Exception:
-                    can_delta = False
-            apply_update(paragraph_dict, request_paragraph)
-            new_status = paragraph_dict.get("trans_status", "none")
-            if can_delta:
-                apply_trans_status_delta(book_data, old_status, new_status)
-
-        join_changed = False
-        if join_updates:
-            refs = join_iter_paragraph_refs(book_data)
-            index = join_build_index(refs)
-            for page_number, id, desired_join in join_updates:
-                join_apply_change(
-                    book_data,
-                    (page_number, id),
-                    desired_join,
-                    refs=refs,
-                    index=index,
-                    sep="",
-                    normalize_head=True,
-                )
-                join_changed = True
-
-                # 既存データ互換: join=0 はキーごと消す
-                if desired_join == 0:
+                ensure_trans_status_counts(book_data)
+
+            request_paragraphs = request_data.get("paragraphs")
+            for request_paragraph in request_paragraphs:
+                page_number = str(request_paragraph.get("page_number"))
+                id = str(request_paragraph.get("id"))
+                # print(f"page:{page_number} id:{id}")
+                paragraph_dict = book_data["pages"][page_number]["paragraphs"][id]
+
+                desired_join = 1 if request_paragraph.get("join") == 1 else 0
+                old_join = 1 if int(paragraph_dict.get("join", 0)) == 1 else 0
+                if old_join != desired_join:
+                    join_updates.append((page_number, id, desired_join))
+
+                old_status = paragraph_dict.get("trans_status", "none")
+                if can_delta:
+                    old_status_norm = _normalize_trans_status(old_status)
                     try:
-                        p = book_data["pages"][page_number]["paragraphs"][id]
-                        if "join" in p:
-                            del p["join"]
+                        if int(book_data["trans_status_counts"].get(old_status_norm, 0)) <= 0:
+                            can_delta = False
                     except Exception:
-                        pass
-
-        # join が変わると複数段落の trans_status が変わり得るので、カウントは再集計する
-        if join_changed:
-            recalc_trans_status_counts(book_data)
-            can_delta = False
-        elif not can_delta:
-            recalc_trans_status_counts(book_data)
+                        can_delta = False
+                apply_update(paragraph_dict, request_paragraph)
+                new_status = paragraph_dict.get("trans_status", "none")
+                if can_delta:
+                    apply_trans_status_delta(book_data, old_status, new_status)
+
+            join_changed = False
+            if join_updates:
+                refs = join_iter_paragraph_refs(book_data)
+                index = join_build_index(refs)
+                for page_number, id, desired_join in join_updates:
+                    join_apply_change(
+                        book_data,
+                        (page_number, id),
+                        desired_join,
+                        refs=refs,
+                        index=index,
+                        sep="",
+                        normalize_head=True,
+                    )
+                    join_changed = True
+
+                    # 既存データ互換: join=0 はキーごと消す
+                    if desired_join == 0:
+                        try:
+                            p = book_data["pages"][page_number]["paragraphs"][id]
+                            if "join" in p:
+                                del p["join"]
+                        except Exception:
+                            pass
+
+            # join が変わると複数段落の trans_status が変わり得るので、カウントは再集計する
+            if join_changed:
+                recalc_trans_status_counts(book_data)
+                can_delta = False
+            elif not can_delta:
+                recalc_trans_status_counts(book_data)
 
-        atomicsave_json(json_path, book_data)
-        return jsonify(
-            {
-                "status": "ok",
-                "trans_status_counts": book_data.get("trans_status_counts"),
-                "reload_book_data": bool(join_changed),
-            }
-        ), 200
+            if join_changed:
+                patches = None
+            else:
+                patches = [
+                    paragraph_patch(
+                        str(p.get("page_number")),
+                        str(p.get("id")),
+                        book_data["pages"][str(p.get("page_number"))]["paragraphs"][str(p.get("id"))],
+                        _PARAGRAPHS_EDIT_FIELDS,
+                    )
+                    for p in request_paragraphs
+                ]
+                patches.append(book_patch(book_data, ("title", "trans_status_counts")))
+            _commit_book_edits(json_path, book_data, patches)
+            return jsonify(
+                {
+                    "status": "ok",
+                    "trans_status_counts": book_data.get("trans_status_counts"),
+                    "reload_book_data": bool(join_changed),
+                }
+            ), 200
 
     except ValueError as ve:
+        book_store.invalidate(json_path)
         return jsonify({"status": "error", "message": str(ve)}), 400
     except Exception as e:
+        book_store.invalidate(json_path)
         return jsonify({"status": "error", "message": f"更新中にエラーが発生しました: {str(e)}"}), 500
 
 
 # json を読み込んでオブジェクトを戻す
 def load_json(json_path: str):
-    if not os.path.isfile(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data
+    return json_repo.load_json(json_path)
 @app.route("/dict_maintenance")
 def dict_maintenance_page():
     return render_template("dict_maintenance.html")
@@ -3232,6 +3511,7 @@ def dict_create_book_api(pdf_name):
         return jsonify({"status": "error", "message": "JSONファイルが存在しません"}), 404
     COMMON_WORDS_PATH = get_resource_path(os.path.join("modules", "english_common_words.txt"))
     try:
+        book_store.flush(json_path)
         book_rel = dict_service.create_book_dict(pdf_name, json_path, COMMON_WORDS_PATH, dict_create)
     except Exception as e:
         return jsonify({"status": "error", "message": f"辞書生成エラー: {str(e)}"}), 500
@@ -3281,10 +3561,7 @@ def dict_selection_save_api(pdf_name):
 
 
 def atomicsave_json(json_path, data):
-    tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(json_path), suffix=".tmp", text=True)
-    with os.fdopen(tmp_fd, "w", encoding="utf-8") as tmp_file:
-        json.dump(data, tmp_file, ensure_ascii=False, indent=2)
-    os.replace(tmp_path, json_path)
+    json_repo.save_json_atomic(json_path, data)
 
 # API: 単語辞書検索
 @app.route("/api/dict/search", methods=["POST"])
@@ -0,0 +1,151 @@
+"""Measure JSON load/dump times of book JSON files for each codec.
+
+背景:
+- JSON の読み書きは app/repositories/json_repo.py を通る。orjson が入っていれば orjson、無ければ標準の json を使う。
+- このスクリプトで実際のブックを使って、コーデックごと・字下げあり/なし（JSON_COMPACT）ごとの時間とサイズを比べる。
+
+注意:
+- ファイルは読むだけで書き換えません。
+- シャード形式のブックはマニフェストだけを測ります（各ページは小さいファイルなので）。
+- 時間は --repeat 回のうち最短のものです。
+
+使い方例:
+  python tools/bench_json.py
+  python tools/bench_json.py --repeat 10 data/foo/bar.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+
+def _repo_root() -> Path:
+    # tools/ の1つ上をリポジトリルート想定
+    return Path(__file__).resolve().parent.parent
+
+
+ROOT = _repo_root()
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.repositories import json_repo  # noqa: E402
+
+IGNORED_DIR_NAMES = {"backup", "structure", "doc_structure", "__pycache__", "old"}
+
+
+def _default_data_dir(root: Path) -> Path:
+    return Path(os.getenv("PARAPARATRANS_DATA_DIR", str(root / "data"))).resolve()
+
+
+def iter_json_files(targets: list[Path]) -> list[Path]:
+    files: list[Path] = []
+    for target in targets:
+        if target.is_file():
+            files.append(target)
+            continue
+        if not target.is_dir():
+            continue
+        for dirpath, dirnames, filenames in os.walk(target):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".") and not d.endswith(".pages") and d not in IGNORED_DIR_NAMES]
+            for name in filenames:
+                if name.endswith(".json") and not name.endswith(".settings.json"):
+                    files.append(Path(dirpath) / name)
+    return sorted(set(files))
+
+
+def _best_of(repeat: int, func: Callable[[], Any]) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _codecs() -> list[str]:
+    return ["json", "orjson"] if json_repo.orjson is not None else ["json"]
+
+
+def bench_file(path: Path, repeat: int) -> list[dict[str, Any]]:
+    raw = path.read_bytes()
+    rows = []
+    saved = os.environ.get("JSON_CODEC")
+    try:
+        for codec in _codecs():
+            os.environ["JSON_CODEC"] = codec
+            data = json_repo.loads(raw)
+            rows.append(
+                {
+                    "codec": codec,
+                    "load": _best_of(repeat, lambda: json_repo.loads(raw)),
+                    "dump": _best_of(repeat, lambda: json_repo.dumps_bytes(data, indent=2)),
+                    "dump_compact": _best_of(repeat, lambda: json_repo.dumps_bytes(data, indent=None)),
+                    "size": len(json_repo.dumps_bytes(data, indent=2)),
+                    "size_compact": len(json_repo.dumps_bytes(data, indent=None)),
+                }
+            )
+    finally:
+        if saved is None:
+            os.environ.pop("JSON_CODEC", None)
+        else:
+            os.environ["JSON_CODEC"] = saved
+    return rows
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Measure JSON load/dump times of book JSON files.")
+    parser.add_argument("--repeat", type=int, default=5, help="各測定の繰り返し回数（最短を採る）")
+    parser.add_argument(
+        "--data-dir",
+        default=None,
+        help="data ディレクトリ（省略時: PARAPARATRANS_DATA_DIR または ./data）",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="対象の JSON ファイルまたはフォルダ（省略時: data ディレクトリ全体）",
+    )
+    args = parser.parse_args(argv)
+
+    data_dir = Path(args.data_dir).resolve() if args.data_dir else _default_data_dir(ROOT)
+    targets = [Path(p).resolve() for p in args.paths] or [data_dir]
+    files = iter_json_files(targets)
+    if not files:
+        print("対象の JSON がありません")
+        return 1
+
+    print(f"codecs: {', '.join(_codecs())} (current: {json_repo.codec_name()}), repeat={args.repeat}")
+    header = f"{'file':<40} {'codec':<7} {'load ms':>9} {'dump ms':>9} {'compact ms':>11} {'size KB':>9} {'compact KB':>11}"
+    print(header)
+    totals: dict[str, dict[str, float]] = {}
+    for path in files:
+        try:
+            rows = bench_file(path, max(1, args.repeat))
+        except (OSError, ValueError) as e:
+            print(f"! {path}: {e}")
+            continue
+        for row in rows:
+            total = totals.setdefault(row["codec"], {"load": 0.0, "dump": 0.0, "dump_compact": 0.0, "size": 0, "size_compact": 0})
+            for key in total:
+                total[key] += row[key]
+            print(
+                f"{path.name[:40]:<40} {row['codec']:<7} {row['load'] * 1000:>9.1f} {row['dump'] * 1000:>9.1f}"
+                f" {row['dump_compact'] * 1000:>11.1f} {row['size'] / 1024:>9.0f} {row['size_compact'] / 1024:>11.0f}"
+            )
+
+    print(f"\n{len(files)} files")
+    for codec, total in totals.items():
+        print(
+            f"{'total':<40} {codec:<7} {total['load'] * 1000:>9.1f} {total['dump'] * 1000:>9.1f}"
+            f" {total['dump_compact'] * 1000:>11.1f} {total['size'] / 1024:>9.0f} {total['size_compact'] / 1024:>11.0f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
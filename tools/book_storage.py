@@ -0,0 +1,148 @@
+"""Convert book JSON between single-file and sharded storage.
+
+背景:
+- 1ファイル形式の <pdf>.json は 1ページ取得や保存のたびに全体を読み書きする。
+- シャード形式では <pdf>.json がマニフェスト（タイトル・スタイル・集計・page_keys）だけになり、
+  各ページは <pdf>.pages/<page>.json に分かれるので、触れたページだけを読み書きできる。
+- このスクリプトで既存ブックを一括で相互変換する。
+
+注意:
+- アプリ停止中に実行してください（変換中のブックへの書き込みを避けるため）。
+- デフォルトは dry-run です（変換はしません）。
+- 未反映の編集ジャーナル（<json>.journal）は変換時に本体へ畳み込まれます。
+
+使い方例:
+  python tools/book_storage.py --to sharded --apply
+  python tools/book_storage.py --to single --apply data/foo/bar.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+
+def _repo_root() -> Path:
+    # tools/ の1つ上をリポジトリルート想定
+    return Path(__file__).resolve().parent.parent
+
+
+ROOT = _repo_root()
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.repositories.book_repo import SHARD_DIR_SUFFIX, is_sharded, shard_book, unshard_book  # noqa: E402
+from app.repositories.json_repo import load_json  # noqa: E402
+
+IGNORED_DIR_NAMES = {"backup", "structure", "doc_structure", "__pycache__", "old"}
+
+
+def _default_data_dir(root: Path) -> Path:
+    return Path(os.getenv("PARAPARATRANS_DATA_DIR", str(root / "data"))).resolve()
+
+
+def _should_skip_dir(name: str) -> bool:
+    return name.startswith(".") or name.endswith(SHARD_DIR_SUFFIX) or name in IGNORED_DIR_NAMES
+
+
+def _is_book_json(path: Path) -> bool:
+    try:
+        data = load_json(str(path))
+    except (OSError, ValueError):
+        return False
+    if not isinstance(data, dict):
+        return False
+    return data.get("storage") == "sharded" or isinstance(data.get("pages"), dict)
+
+
+def iter_book_jsons(targets: list[Path]) -> list[Path]:
+    books: list[Path] = []
+    for target in targets:
+        if target.is_file():
+            if _is_book_json(target):
+                books.append(target)
+            continue
+        if not target.is_dir():
+            continue
+        for dirpath, dirnames, filenames in os.walk(target):
+            dirnames[:] = [d for d in dirnames if not _should_skip_dir(d)]
+            for name in filenames:
+                if not name.endswith(".json") or name.endswith(".settings.json"):
+                    continue
+                path = Path(dirpath) / name
+                if _is_book_json(path):
+                    books.append(path)
+    return sorted(set(books))
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Convert book JSON between single-file and sharded storage.")
+    parser.add_argument(
+        "--to",
+        choices=["sharded", "single"],
+        required=True,
+        help="変換先の形式（sharded: ページごとに分割 / single: 1ファイル）",
+    )
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="実際に変換します（指定しない場合は dry-run）",
+    )
+    parser.add_argument(
+        "--data-dir",
+        default=None,
+        help="data ディレクトリ（省略時: PARAPARATRANS_DATA_DIR または ./data）",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="対象の book JSON またはフォルダ（省略時: data ディレクトリ全体）",
+    )
+
+    args = parser.parse_args(argv)
+
+    data_dir = Path(args.data_dir).resolve() if args.data_dir else _default_data_dir(ROOT)
+    targets = [Path(p).resolve() for p in args.paths] or [data_dir]
+
+    mode = "APPLY" if args.apply else "DRY-RUN"
+    print(f"[{mode}] to={args.to}")
+    for t in targets:
+        print(f"target: {t}")
+
+    converted = 0
+    skipped = 0
+    failed = 0
+    for path in iter_book_jsons(targets):
+        sharded = is_sharded(str(path))
+        if (args.to == "sharded") == sharded:
+            skipped += 1
+            continue
+        if not args.apply:
+            print(f"- {path}")
+            converted += 1
+            continue
+        try:
+            ok = shard_book(str(path)) if args.to == "sharded" else unshard_book(str(path))
+        except Exception as e:
+            print(f"! {path}: {e}")
+            failed += 1
+            continue
+        if ok:
+            print(f"- {path}")
+            converted += 1
+        else:
+            skipped += 1
+
+    if args.apply:
+        print(f"\nConverted: {converted}, Skipped: {skipped}, Failed: {failed}")
+    else:
+        print(f"\n(dry-run) Would convert: {converted}, Skipped: {skipped}")
+        print("実行するには --apply を付けてください")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
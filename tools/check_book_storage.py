@@ -0,0 +1,482 @@
+"""Check the book storage layer on generated books.
+
+背景:
+- ブックの読み書きは app/repositories の BookStore / book_repo を通り、編集は編集ジャーナルに追記してから本体へ畳み込む。
+  本体は1ファイルか、ページごとのシャード形式で、2.0.0 か 3.0.0 形式で保存する。
+  読み込んだ結果はサイドカー（<json>.cache）にも保存しておく。
+- どの経路で保存・読み込みしても、アプリから見える book_data が元と同じになるかをここで確かめる。
+
+確かめること（それぞれ一時フォルダに作ったブックで行う）:
+- book_store:  キャッシュの再利用、外部からの書き換えの検知、ブック単位のロックでの並行更新
+- write_behind: commit() はジャーナルへの追記だけで、flush 後に本体へ反映される
+- journal:     パッチ（set / unset / ブック直下）の再生、書きかけの行の無視、起動時の畳み込み（recover_journals）
+- shards:      シャード形式への変換・1ページ読み・一部ページの保存・ジャーナルの畳み込み・1ファイル形式への戻し
+- compact:     BookStore(compact=True) で読んだ book_data が元と同じ
+- format_v3:   3.0.0 で保存したブック（1ファイル・シャード）が元と同じに読める
+- codecs:      json / orjson（あれば）と字下げあり/なしで、書いて読んだ結果が元と同じ
+- sidecar:     サイドカーの作成・利用、改ざんしたファイルを使わないこと、本体の保存で消えること
+
+注意:
+- 畳み込んだあとの本体は load_book() で読んで比べる（BOOK_FORMAT=3 なら本体は 3.0.0 で書かれる）。
+- data フォルダのブックには触りません（--book を渡した場合も、一時フォルダにコピーしてから使います）。
+
+使い方例:
+  python tools/check_book_storage.py
+  python tools/check_book_storage.py --pages 200 --paragraphs 40
+  python tools/check_book_storage.py --book data/foo/bar.json shards format_v3
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.repositories import book_sidecar, json_repo  # noqa: E402
+from app.repositories.book_format import BOOK_VERSION_V2, BOOK_VERSION_V3  # noqa: E402
+from app.repositories.book_journal import (  # noqa: E402
+    apply_patches,
+    book_patch,
+    has_journal,
+    journal_path,
+    paragraph_patch,
+)
+from app.repositories.book_repo import (  # noqa: E402
+    append_book_patches,
+    compact_book,
+    is_sharded,
+    load_book,
+    load_book_page,
+    recover_journals,
+    save_book,
+    save_book_pages,
+    shard_book,
+    shard_dir,
+    shard_path,
+    unshard_book,
+)
+from app.repositories.book_store import BookStore  # noqa: E402
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def expect(condition: bool, message: str) -> None:
+    if not condition:
+        raise CheckFailed(message)
+
+
+def expect_same_book(actual: Any, expected: Any, what: str) -> None:
+    if actual == expected:
+        return
+    # どこが違うかを1か所だけ示す
+    for key in sorted(set(expected) | set(actual)):
+        if key == "pages":
+            continue
+        if actual.get(key) != expected.get(key):
+            raise CheckFailed(f"{what}: {key} が違います: {actual.get(key)!r} != {expected.get(key)!r}")
+    pages_a, pages_e = actual.get("pages") or {}, expected.get("pages") or {}
+    if list(pages_a) != list(pages_e):
+        raise CheckFailed(f"{what}: ページの並びが違います")
+    for page_key, page in pages_e.items():
+        paras_a = (pages_a[page_key] or {}).get("paragraphs") or {}
+        for pid, p in ((page or {}).get("paragraphs") or {}).items():
+            got = paras_a.get(pid)
+            if got != p:
+                if not isinstance(got, dict):
+                    raise CheckFailed(f"{what}: ページ {page_key} の段落 {pid} がありません")
+                diff = {k: (got.get(k), p.get(k)) for k in set(got) | set(p) if got.get(k) != p.get(k)}
+                raise CheckFailed(f"{what}: ページ {page_key} の段落 {pid} が違います（実際, 期待）: {diff!r}")
+        if pages_a[page_key] != page:
+            raise CheckFailed(f"{what}: ページ {page_key} が違います")
+    raise CheckFailed(f"{what}: 内容が違います")
+
+
+# ---- 検証用のブック ----
+
+_WORDS = "the of and dragon sword magic level spell armor castle dungeon cleric rogue damage ranger".split()
+_STATUSES = ("none", "auto", "draft", "fixed")
+
+
+def make_book(pages: int, paragraphs: int, seed: int = 0) -> Dict[str, Any]:
+    """抽出直後・翻訳途中・編集済みの段落が混ざった 2.0.0 のブックを作る。"""
+    rng = random.Random(seed)
+    styles: Dict[str, str] = {}
+    book_pages: Dict[str, Any] = {}
+    counts = {k: 0 for k in _STATUSES}
+    for page_number in range(1, pages + 1):
+        paras: Dict[str, Any] = {}
+        for order in range(1, paragraphs + 1):
+            pid = f"{page_number}_{order}"
+            style = f"Font{rng.randint(1, 4)}_{rng.choice((90, 100, 120))}"
+            styles[style] = f"font-family: Font; font-size: {int(style.rsplit('_', 1)[1]) / 10:.1f}px;"
+            src = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, 30)))
+            status = rng.choice(_STATUSES)
+            p = {
+                "id": pid,
+                "page_number": page_number,
+                "order": order,
+                "column_order": rng.randint(1, 3),
+                "bbox": [rng.uniform(0, 300), rng.uniform(0, 700), rng.uniform(300, 600), rng.uniform(700, 800)],
+                "base_style": style,
+                "block_tag": rng.choice(("p", "p", "p", "h2", "header", "footer")),
+                "src_text": src,
+                "src_html": f'<span class="{style}">{src}</span>' if rng.random() < 0.8 else f"<b>{src}</b>",
+                "src_joined": src if rng.random() < 0.9 else src + " joined",
+                "trans_status": status,
+                "join": rng.randint(0, 1),
+            }
+            p["src_replaced"] = p["src_joined"] if rng.random() < 0.7 else p["src_joined"].replace("dragon", "ドラゴン")
+            p["trans_auto"] = p["src_replaced"] if status == "none" else f"訳{rng.randint(0, 10**6)}"
+            p["trans_text"] = p["trans_auto"] if status != "fixed" else p["trans_auto"] + "（修正）"
+            if rng.random() < 0.1:
+                p["comment"] = "確認"
+            paras[pid] = p
+            counts[status] += 1
+        book_pages[str(page_number)] = {"paragraphs": paras}
+    return {
+        "version": BOOK_VERSION_V2,
+        "src_filename": "check.pdf",
+        "title": "check book",
+        "page_count": pages,
+        "header_y1": 30.0,
+        "footer_y0": 760.0,
+        "pages": book_pages,
+        "styles": styles,
+        "trans_status_counts": counts,
+    }
+
+
+def some_paragraphs(book: Dict[str, Any], count: int, seed: int) -> List[tuple]:
+    rng = random.Random(seed)
+    refs = [(page_key, pid) for page_key, page in book["pages"].items() for pid in page["paragraphs"]]
+    return rng.sample(refs, min(count, len(refs)))
+
+
+def edit_paragraphs(book: Dict[str, Any], count: int, seed: int) -> List[Dict[str, Any]]:
+    """book の段落をいくつか書き換え、その変更のパッチを返す（UI からの編集と同じ形）。"""
+    fields = ("trans_text", "trans_status", "comment")
+    patches = []
+    for i, (page_key, pid) in enumerate(some_paragraphs(book, count, seed)):
+        p = book["pages"][page_key]["paragraphs"][pid]
+        p["trans_text"] = f"編集{seed}-{i}"
+        p["trans_status"] = "fixed"
+        if i % 3 == 0:
+            p.pop("comment", None)
+        else:
+            p["comment"] = f"コメント{i}"
+        patches.append(paragraph_patch(page_key, pid, p, fields))
+    book["title"] = f"check book {seed}"
+    patches.append(book_patch(book, ("title",)))
+    return patches
+
+
+# ---- 各チェック ----
+
+
+def check_book_store(work: Path, book: Dict[str, Any]) -> str:
+    json_path = str(work / "store.json")
+    json_repo.save_json_atomic(json_path, copy.deepcopy(book))
+    store = BookStore(max_books=2)
+    first = store.get(json_path)
+    expect_same_book(first, book, "初回の読み込み")
+    expect(store.get(json_path) is first, "2回目の get() がキャッシュを使っていません")
+
+    # modules 側の書き換え（mtime/size の変化）を検知して読み直す
+    external = copy.deepcopy(book)
+    external["title"] = "changed outside the store"
+    json_repo.save_json_atomic(json_path, external)
+    expect(store.get(json_path)["title"] == external["title"], "外部での書き換えを検知できていません")
+
+    # ブック単位のロックの中で読み・変更・保存すれば、並行した更新が失われない
+    threads, rounds = 8, 25
+
+    def worker(n: int) -> None:
+        for _ in range(rounds):
+            with store.lock(json_path):
+                data = store.get(json_path)
+                data["counter"] = data.get("counter", 0) + 1
+                store.save(json_path, data)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    on_disk = json_repo.load_json(json_path).get("counter")
+    expect(on_disk == threads * rounds, f"並行更新が失われました: {on_disk} != {threads * rounds}")
+    stats = store.stats()
+    return f"hits={stats['hits']} misses={stats['misses']} saves={stats['saves']}"
+
+
+def check_write_behind(work: Path, book: Dict[str, Any]) -> str:
+    json_path = str(work / "write_behind.json")
+    json_repo.save_json_atomic(json_path, copy.deepcopy(book))
+    before = os.stat(json_path)
+    store = BookStore(max_books=2, write_behind_sec=3600)
+    with store.lock(json_path):
+        data = store.get(json_path)
+        patches = edit_paragraphs(data, 20, seed=1)
+        store.commit(json_path, data, patches)
+    expected = copy.deepcopy(data)
+    after = os.stat(json_path)
+    expect((before.st_mtime_ns, before.st_size) == (after.st_mtime_ns, after.st_size), "commit() が本体を書き換えました")
+    expect(has_journal(json_path), "commit() がジャーナルに追記していません")
+    # 別の BookStore（落ちたあとに起動し直したサーバー）で読んでも、ジャーナルが再生される
+    expect_same_book(BookStore(max_books=1, write_behind_sec=3600).get(json_path), expected, "ジャーナルを再生した読み込み")
+    expect(store.flush_all() == 1, "flush_all() が畳み込みませんでした")
+    expect(not has_journal(json_path), "畳み込み後もジャーナルが残っています")
+    expect_same_book(load_book(json_path), expected, "畳み込み後の本体")
+    return f"journaled={store.stats()['journaled']}"
+
+
+def check_journal(work: Path, book: Dict[str, Any]) -> str:
+    json_path = str(work / "journal.json")
+    save_book(json_path, copy.deepcopy(book))
+    expected = copy.deepcopy(book)
+    patches = edit_paragraphs(expected, 30, seed=2) + edit_paragraphs(expected, 30, seed=3)
+    for i in range(0, len(patches), 7):
+        append_book_patches(json_path, patches[i : i + 7])
+    # 追記の途中で落ちた行（改行で終わらない壊れた JSON）は捨てられる
+    with open(journal_path(json_path), "a", encoding="utf-8") as f:
+        f.write('{"page": "1", "id": "1_1", "set": {"trans_te')
+
+    replayed = apply_patches(copy.deepcopy(book), patches)
+    expect(replayed == len(patches), f"適用できないパッチがあります: {replayed}/{len(patches)}")
+    expect_same_book(load_book(json_path), expected, "ジャーナルの再生")
+
+    # 異常終了後の起動時の処理（recover_journals）で本体へ畳み込まれる
+    recovered = recover_journals(str(work), should_skip_dir=lambda name: True)
+    expect(recovered >= 1, "recover_journals() が畳み込みませんでした")
+    expect(not has_journal(json_path), "recover_journals() 後もジャーナルが残っています")
+    expect_same_book(load_book(json_path), expected, "recover_journals() 後の本体")
+    return f"patches={len(patches)}"
+
+
+def check_shards(work: Path, book: Dict[str, Any]) -> str:
+    json_path = str(work / "shards.json")
+    save_book(json_path, copy.deepcopy(book))
+    expect(shard_book(json_path), "shard_book() が変換しませんでした")
+    expect(is_sharded(json_path), "シャード形式になっていません")
+    expect_same_book(load_book(json_path), book, "シャード形式の読み込み")
+    page_keys = list(book["pages"])
+    middle = page_keys[len(page_keys) // 2]
+    expect(load_book_page(json_path, middle)["pages"] == {middle: book["pages"][middle]}, "1ページ読みの結果が違います")
+
+    # 一部のページだけを保存すると、そのシャード以外は書き換えない
+    expected = copy.deepcopy(book)
+    target = expected["pages"][middle]["paragraphs"]
+    for p in target.values():
+        p["trans_text"] = "ページ単位の保存"
+    untouched = {k: os.stat(shard_path(json_path, k)).st_mtime_ns for k in page_keys if k != middle}
+    save_book_pages(json_path, copy.deepcopy(expected), [middle])
+    changed = [k for k, mtime in untouched.items() if os.stat(shard_path(json_path, k)).st_mtime_ns != mtime]
+    expect(not changed, f"保存しなかったページのシャードが書き換えられました: {changed[:5]}")
+    expect_same_book(load_book(json_path), expected, "一部ページ保存後の読み込み")
+
+    # シャード形式のジャーナルは、触れたページのシャードだけに畳み込む
+    patches = edit_paragraphs(expected, 25, seed=4)
+    append_book_patches(json_path, patches)
+    expect_same_book(load_book(json_path), expected, "シャード形式のジャーナル再生")
+    expect(compact_book(json_path) == len(patches), "compact_book() の件数が違います")
+    expect(not has_journal(json_path), "畳み込み後もジャーナルが残っています")
+    expect_same_book(load_book(json_path), expected, "シャード形式の畳み込み後")
+
+    expect(unshard_book(json_path), "unshard_book() が変換しませんでした")
+    expect(not os.path.isdir(shard_dir(json_path)), "1ファイル形式に戻したあともシャードフォルダが残っています")
+    expect_same_book(load_book(json_path), expected, "1ファイル形式に戻した本体")
+    return f"pages={len(page_keys)}"
+
+
+def check_compact(work: Path, book: Dict[str, Any]) -> str:
+    json_path = str(work / "compact.json")
+    save_book(json_path, copy.deepcopy(book))
+    store = BookStore(max_books=1, compact=True)
+    data = store.get(json_path)
+    expect_same_book(data, book, "compact=True の読み込み")
+    shared = sum(
+        1
+        for page in data["pages"].values()
+        for p in page["paragraphs"].values()
+        if p["src_joined"] == p["src_text"] and p["src_joined"] is p["src_text"]
+    )
+    expect(shared > 0, "同じ内容のテキストが共有されていません")
+    return f"shared_strings={store.stats()['shared_strings']}"
+
+
+def check_format_v3(work: Path, book: Dict[str, Any]) -> str:
+    v2_path = str(work / "format_v2.json")
+    v3_path = str(work / "format_v3.json")
+    save_book(v2_path, copy.deepcopy(book), version=BOOK_VERSION_V2)
+    save_book(v3_path, copy.deepcopy(book), version=BOOK_VERSION_V3)
+    expect(json_repo.load_json(v3_path).get("version") == BOOK_VERSION_V3, "3.0.0 で保存されていません")
+    expect_same_book(load_book(v3_path), book, "3.0.0 の読み込み")
+
+    # シャード形式 + 3.0.0（シャードも派生フィールドを省いて書く）
+    sharded_path = str(work / "format_v3_sharded.json")
+    save_book(sharded_path, copy.deepcopy(book), version=BOOK_VERSION_V2)
+    shard_book(sharded_path)
+    save_book(sharded_path, copy.deepcopy(book), version=BOOK_VERSION_V3)
+    expect(is_sharded(sharded_path), "シャード形式のまま保存されていません")
+    expect_same_book(load_book(sharded_path), book, "3.0.0 のシャード形式の読み込み")
+
+    # 3.0.0 で読んだものを 2.0.0 で保存し直しても元に戻る
+    v2_size, v3_size = os.path.getsize(v2_path), os.path.getsize(v3_path)
+    save_book(v3_path, load_book(v3_path), version=BOOK_VERSION_V2)
+    expect_same_book(json_repo.load_json(v3_path), book, "3.0.0 → 2.0.0 で保存し直した本体")
+    return f"2.0.0={v2_size // 1024}KB 3.0.0={v3_size // 1024}KB"
+
+
+def check_codecs(work: Path, book: Dict[str, Any]) -> str:
+    codecs = ["json", "orjson"] if json_repo.orjson is not None else ["json"]
+    saved = os.environ.get("JSON_CODEC")
+    written: Dict[tuple, bytes] = {}
+    try:
+        for codec in codecs:
+            os.environ["JSON_CODEC"] = codec
+            for indent in (2, None):
+                payload = json_repo.dumps_bytes(book, indent=indent)
+                written[(codec, indent)] = payload
+                expect(json_repo.loads(payload) == book, f"{codec} indent={indent}: 書いて読んだ結果が違います")
+        # どのコーデックで書いたものも、どのコーデックで読める
+        for codec in codecs:
+            os.environ["JSON_CODEC"] = codec
+            for key, payload in written.items():
+                expect(json_repo.loads(payload) == book, f"{key} で書いたものを {codec} で読めません")
+    finally:
+        if saved is None:
+            os.environ.pop("JSON_CODEC", None)
+        else:
+            os.environ["JSON_CODEC"] = saved
+    return "codecs=" + ",".join(codecs)
+
+
+def _wait_for(path: str, timeout: float = 10.0) -> bool:
+    # サイドカーはバックグラウンドで書かれる
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if os.path.exists(path):
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def check_sidecar(work: Path, book: Dict[str, Any]) -> str:
+    saved = {name: os.environ.get(name) for name in ("BOOK_SIDECAR", "BOOK_SIDECAR_MIN_BYTES")}
+    os.environ["BOOK_SIDECAR"] = "1"
+    os.environ["BOOK_SIDECAR_MIN_BYTES"] = "0"
+    book_sidecar.configure_sidecar_key(str(work / "config" / "book_cache.key"))
+    try:
+        json_path = str(work / "sidecar.json")
+        cache_path = book_sidecar.sidecar_path(json_path)
+        save_book(json_path, copy.deepcopy(book), version=BOOK_VERSION_V2)
+        expect_same_book(load_book(json_path), book, "サイドカー作成時の読み込み")
+        expect(_wait_for(cache_path), "サイドカーが作られていません")
+
+        hits = book_sidecar.sidecar_stats()["hits"]
+        expect_same_book(load_book(json_path), book, "サイドカーからの読み込み")
+        expect(book_sidecar.sidecar_stats()["hits"] == hits + 1, "サイドカーが使われていません")
+
+        # ジャーナルはサイドカーの上に再生される
+        expected = copy.deepcopy(book)
+        append_book_patches(json_path, edit_paragraphs(expected, 10, seed=5))
+        expect_same_book(load_book(json_path), expected, "サイドカー + ジャーナルの読み込み")
+        compact_book(json_path)
+        expect(not os.path.exists(cache_path), "本体を書き直したあともサイドカーが残っています")
+
+        # 改ざんされたファイル（署名が合わない）は unpickle せずに捨てる
+        load_book(json_path)
+        expect(_wait_for(cache_path), "サイドカーが作り直されていません")
+        with open(cache_path, "r+b") as f:
+            f.seek(-8, os.SEEK_END)
+            last = f.read(1)
+            f.seek(-8, os.SEEK_END)
+            f.write(bytes([last[0] ^ 0xFF]))
+        errors = book_sidecar.sidecar_stats()["errors"]
+        expect_same_book(load_book(json_path), expected, "改ざんされたサイドカーがあるときの読み込み")
+        expect(book_sidecar.sidecar_stats()["errors"] == errors + 1, "改ざんが検出されていません")
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return f"stats={book_sidecar.sidecar_stats()}"
+
+
+CHECKS: Dict[str, Callable[[Path, Dict[str, Any]], str]] = {
+    "book_store": check_book_store,
+    "write_behind": check_write_behind,
+    "journal": check_journal,
+    "shards": check_shards,
+    "compact": check_compact,
+    "format_v3": check_format_v3,
+    "codecs": check_codecs,
+    "sidecar": check_sidecar,
+}
+
+
+def _load_real_book(path: Path) -> Dict[str, Any]:
+    book = load_book(str(path))
+    if not isinstance(book, dict) or not isinstance(book.get("pages"), dict) or not book["pages"]:
+        raise ValueError(f"段落のあるブックではありません: {path}")
+    return book
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Check the book storage layer on generated books.")
+    parser.add_argument("checks", nargs="*", help=f"実行するチェック（{', '.join(CHECKS)}。省略時: すべて）")
+    parser.add_argument("--pages", type=int, default=30, help="生成するブックのページ数")
+    parser.add_argument("--paragraphs", type=int, default=20, help="生成するブックの1ページあたりの段落数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--book", default=None, help="生成する代わりに、このブックのコピーで確かめる")
+    parser.add_argument("--keep", action="store_true", help="作業用の一時フォルダを残す")
+    args = parser.parse_args(argv)
+
+    if args.book:
+        book = _load_real_book(Path(args.book).resolve())
+    else:
+        book = make_book(max(2, args.pages), max(1, args.paragraphs), args.seed)
+
+    names = args.checks or list(CHECKS)
+    unknown = [name for name in names if name not in CHECKS]
+    if unknown:
+        parser.error(f"不明なチェック: {', '.join(unknown)}")
+    work_root = Path(tempfile.mkdtemp(prefix="parapara_check_storage_"))
+    failed = 0
+    try:
+        for name in names:
+            work = work_root / name
+            work.mkdir()
+            start = time.perf_counter()
+            try:
+                detail = CHECKS[name](work, copy.deepcopy(book))
+            except CheckFailed as e:
+                failed += 1
+                print(f"NG  {name}: {e}")
+                continue
+            print(f"ok  {name} ({(time.perf_counter() - start) * 1000:.0f} ms) {detail}")
+    finally:
+        if args.keep:
+            print(f"work dir: {work_root}")
+        else:
+            shutil.rmtree(work_root, ignore_errors=True)
+    print(f"\n{len(names) - failed}/{len(names)} ok")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,135 @@
+"""Check column grouping (group_blocks_by_column) against recorded golden outputs.
+
+背景:
+- modules/parapara_pdf2json.py の group_blocks_by_column() は、ページのブロックを重なりで box にまとめ、
+  box をカラムに仕分ける。重なりの探索を索引にしても、カラムの座標・並び・どのブロックがどのカラムに入るかは
+  以前と同じでなければならない（変わると、抽出し直したときに段落の分かれ方や順番が変わる）。
+- tools/golden/column_grouping/*.json に、ブロックの座標（入力）と、そのときのカラム（出力）を記録してある。
+  このスクリプトで、今の実装が記録と同じカラムを返すか確かめる。読み順は check_column_order.py で確かめる。
+
+ゴールデンファイルの形式:
+- {"description": 説明, "cases": [{"name": 名前, "blocks": [[x0, y0, x1, y1], ...], "columns": [[x0, y0, x1, y1, [番号, ...]], ...]}, ...]}
+- ブロックの "number" は blocks の番号。columns は group_blocks_by_column() が返した順に、カラムの座標と
+  そのカラムに入ったブロックの番号（カラム内の順）を並べたもの。
+
+使い方例:
+  python tools/check_column_grouping.py
+  python tools/check_column_grouping.py tools/golden/column_grouping/layout_pages.json
+  python tools/check_column_grouping.py --record-pdf data/foo/bar.pdf --out tools/golden/column_grouping/bar.json
+
+--record-pdf は、PDF の各ページのブロックと今の実装のカラムを記録する
+（実装を変える前に、手元のブックで記録しておく用）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+MODULES_DIR = PROJECT_ROOT / "modules"
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+if str(MODULES_DIR) not in sys.path:
+    sys.path.append(str(MODULES_DIR))
+
+from parapara_pdf2json import Column, group_blocks_by_column  # noqa: E402
+
+GOLDEN_DIR = PROJECT_ROOT / "tools" / "golden" / "column_grouping"
+
+
+def make_blocks(boxes: List[List[float]]) -> List[Dict[str, Any]]:
+    return [{"number": i, "bbox": (float(x0), float(y0), float(x1), float(y1)), "lines": []} for i, (x0, y0, x1, y1) in enumerate(boxes)]
+
+
+def grouping(boxes: List[List[float]], group_func: Callable[[List[Dict[str, Any]]], List[Column]] = group_blocks_by_column) -> List[List[Any]]:
+    """boxes をブロックにして group_func で仕分けた結果を、[x0, y0, x1, y1, [ブロックの番号, ...]] の列で返す。"""
+    return [[col.x0, col.y0, col.x1, col.y1, [block["number"] for block in col.blocks]] for col in group_func(make_blocks(boxes))]
+
+
+def make_case(name: str, boxes: List[List[float]], group_func: Callable[[List[Dict[str, Any]]], List[Column]] = group_blocks_by_column) -> Dict[str, Any]:
+    return {"name": name, "blocks": boxes, "columns": grouping(boxes, group_func)}
+
+
+def write_golden(path: Path, description: str, cases: List[Dict[str, Any]]) -> None:
+    # 差分が見やすいよう、1ケース1行で書く
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write("{\n")
+        f.write(f'  "description": {json.dumps(description, ensure_ascii=False)},\n')
+        f.write('  "cases": [\n')
+        for i, case in enumerate(cases):
+            sep = "," if i + 1 < len(cases) else ""
+            f.write(f"    {json.dumps(case, ensure_ascii=False, separators=(',', ':'))}{sep}\n")
+        f.write("  ]\n}\n")
+
+
+def check_file(path: Path, show: int) -> tuple[int, int]:
+    with open(path, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+    cases = golden.get("cases") or []
+    failed = 0
+    for case in cases:
+        actual = grouping(case["blocks"])
+        if actual == case["columns"]:
+            continue
+        failed += 1
+        if failed <= show:
+            expected = case["columns"]
+            # 最初に違うカラムだけを表示する
+            i = next(i for i in range(max(len(expected), len(actual))) if expected[i : i + 1] != actual[i : i + 1])
+            print(f"! {path.name}: {case['name']} (columns {len(expected)} -> {len(actual)}, first difference at {i})")
+            print(f"    expected: {expected[i : i + 1]}")
+            print(f"    actual:   {actual[i : i + 1]}")
+    return len(cases), failed
+
+
+def record_pdf(pdf_path: Path, out_path: Path) -> int:
+    import fitz  # PyMuPDF
+
+    from parapara_pdf2json import _page_blocks
+
+    cases = []
+    with fitz.open(str(pdf_path)) as doc:
+        for page in doc:
+            boxes = [list(block["bbox"]) for block in _page_blocks(page) if "bbox" in block]
+            if boxes:
+                cases.append(make_case(f"{pdf_path.name} p{page.number + 1}", boxes))
+    write_golden(out_path, f"{pdf_path.name} の各ページ（ヘッダ/フッタを含む全ブロック）", cases)
+    print(f"{len(cases)} pages -> {out_path}")
+    return 0
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Check column grouping against golden outputs.")
+    parser.add_argument("paths", nargs="*", help=f"ゴールデンファイル（省略時: {GOLDEN_DIR.relative_to(PROJECT_ROOT)} 内のすべて）")
+    parser.add_argument("--show", type=int, default=5, help="ファイルごとに表示する不一致の数")
+    parser.add_argument("--record-pdf", default=None, help="この PDF のカラムを記録する（チェックはしない）")
+    parser.add_argument("--out", default=None, help="--record-pdf の出力先")
+    args = parser.parse_args(argv)
+
+    if args.record_pdf:
+        pdf_path = Path(args.record_pdf).resolve()
+        out_path = Path(args.out) if args.out else GOLDEN_DIR / (pdf_path.stem + ".json")
+        return record_pdf(pdf_path, out_path)
+
+    files = [Path(p) for p in args.paths] or sorted(GOLDEN_DIR.glob("*.json"))
+    if not files:
+        print("ゴールデンファイルがありません")
+        return 1
+
+    total_cases = total_failed = 0
+    for path in files:
+        cases, failed = check_file(path, max(0, args.show))
+        total_cases += cases
+        total_failed += failed
+        print(f"{path.name}: {cases - failed}/{cases} ok")
+    print(f"\n{total_cases - total_failed}/{total_cases} ok")
+    return 1 if total_failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,133 @@
+"""Check column reading order (sort_and_number_columns) against recorded golden outputs.
+
+背景:
+- modules/parapara_pdf2json.py の sort_and_number_columns() はカラムの読み順を決める。読み順が変わると
+  既存のブックを抽出し直したときに段落の順番が変わってしまう。
+- tools/golden/column_order/*.json に、カラムの座標（入力）と、そのときの読み順（出力）を記録してある。
+  このスクリプトで、今の実装が記録と同じ順番を返すか確かめる。
+
+ゴールデンファイルの形式:
+- {"description": 説明, "cases": [{"name": 名前, "columns": [[x0, y0, x1, y1], ...], "order": [番号, ...]}, ...]}
+- order は columns の番号を読み順に並べたもの。座標が同じカラムは1つにまとめられるので、最初の番号だけが入る。
+
+使い方例:
+  python tools/check_column_order.py
+  python tools/check_column_order.py tools/golden/column_order/layout_pages.json
+  python tools/check_column_order.py --record-pdf data/foo/bar.pdf --out tools/golden/column_order/bar.json
+
+--record-pdf は、PDF の各ページのブロックからカラムを作り、今の実装の読み順を記録する
+（実装を変える前に、手元のブックで記録しておく用）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+MODULES_DIR = PROJECT_ROOT / "modules"
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+if str(MODULES_DIR) not in sys.path:
+    sys.path.append(str(MODULES_DIR))
+
+from parapara_pdf2json import Column, sort_and_number_columns  # noqa: E402
+
+GOLDEN_DIR = PROJECT_ROOT / "tools" / "golden" / "column_order"
+
+
+def make_columns(boxes: List[List[float]]) -> List[Column]:
+    return [Column(float(x0), float(y0), float(x1), float(y1), []) for x0, y0, x1, y1 in boxes]
+
+
+def reading_order(boxes: List[List[float]], sort_func: Callable[[List[Column]], List[Column]] = sort_and_number_columns) -> List[int]:
+    """boxes を sort_func で並べた結果を、boxes の番号の列で返す。"""
+    columns = make_columns(boxes)
+    index_of = {id(col): i for i, col in enumerate(columns)}
+    return [index_of[id(col)] for col in sort_func(list(columns))]
+
+
+def make_case(name: str, boxes: List[List[float]], sort_func: Callable[[List[Column]], List[Column]] = sort_and_number_columns) -> Dict[str, Any]:
+    return {"name": name, "columns": boxes, "order": reading_order(boxes, sort_func)}
+
+
+def write_golden(path: Path, description: str, cases: List[Dict[str, Any]]) -> None:
+    # 差分が見やすいよう、1ケース1行で書く
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write("{\n")
+        f.write(f'  "description": {json.dumps(description, ensure_ascii=False)},\n')
+        f.write('  "cases": [\n')
+        for i, case in enumerate(cases):
+            sep = "," if i + 1 < len(cases) else ""
+            f.write(f"    {json.dumps(case, ensure_ascii=False, separators=(',', ':'))}{sep}\n")
+        f.write("  ]\n}\n")
+
+
+def check_file(path: Path, show: int) -> tuple[int, int]:
+    with open(path, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+    cases = golden.get("cases") or []
+    failed = 0
+    for case in cases:
+        actual = reading_order(case["columns"])
+        if actual == case["order"]:
+            continue
+        failed += 1
+        if failed <= show:
+            print(f"! {path.name}: {case['name']}")
+            print(f"    expected: {case['order']}")
+            print(f"    actual:   {actual}")
+    return len(cases), failed
+
+
+def record_pdf(pdf_path: Path, out_path: Path) -> int:
+    import fitz  # PyMuPDF
+
+    from parapara_pdf2json import _page_blocks, group_blocks_by_column
+
+    cases = []
+    with fitz.open(str(pdf_path)) as doc:
+        for page in doc:
+            columns = group_blocks_by_column(_page_blocks(page))
+            boxes = [[col.x0, col.y0, col.x1, col.y1] for col in columns]
+            if boxes:
+                cases.append(make_case(f"{pdf_path.name} p{page.number + 1}", boxes))
+    write_golden(out_path, f"{pdf_path.name} の各ページ（ヘッダ/フッタを含む全ブロック）のカラム", cases)
+    print(f"{len(cases)} pages -> {out_path}")
+    return 0
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Check column reading order against golden outputs.")
+    parser.add_argument("paths", nargs="*", help=f"ゴールデンファイル（省略時: {GOLDEN_DIR.relative_to(PROJECT_ROOT)} 内のすべて）")
+    parser.add_argument("--show", type=int, default=5, help="ファイルごとに表示する不一致の数")
+    parser.add_argument("--record-pdf", default=None, help="この PDF の読み順を記録する（チェックはしない）")
+    parser.add_argument("--out", default=None, help="--record-pdf の出力先")
+    args = parser.parse_args(argv)
+
+    if args.record_pdf:
+        pdf_path = Path(args.record_pdf).resolve()
+        out_path = Path(args.out) if args.out else GOLDEN_DIR / (pdf_path.stem + ".json")
+        return record_pdf(pdf_path, out_path)
+
+    files = [Path(p) for p in args.paths] or sorted(GOLDEN_DIR.glob("*.json"))
+    if not files:
+        print("ゴールデンファイルがありません")
+        return 1
+
+    total_cases = total_failed = 0
+    for path in files:
+        cases, failed = check_file(path, max(0, args.show))
+        total_cases += cases
+        total_failed += failed
+        print(f"{path.name}: {cases - failed}/{cases} ok")
+    print(f"\n{total_cases - total_failed}/{total_cases} ok")
+    return 1 if total_failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
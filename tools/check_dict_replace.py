@@ -0,0 +1,286 @@
+"""Check that dictionary replacement gives the same result as the original regex implementation.
+
+背景:
+- modules/parapara_dict_replacer.py の DictMatcher は、対訳辞書をトライ木にして置換する。以前は辞書のキーを
+  長い順に並べた正規表現 (?<![A-Za-z])(?:キー|...)(?![A-Za-z]) で置換していた（下の reference_replace）。
+- file_replace_with_dict は、前回適用した辞書との差分から影響を受ける段落だけを置換し直す
+  （modules/parapara_dict_incremental.py）。
+
+確かめること:
+- trie:        ランダムな辞書と文で、DictMatcher.replace() が正規表現版と同じ結果になる
+- dict_file:   辞書ファイル（既定: config/dict.txt）と、そのキーを混ぜた文で同じ結果になる
+- incremental: 辞書ファイルを少しずつ変えながら file_replace_with_dict() を繰り返しても、src_replaced が
+               毎回「全段落を今の辞書で置換し直した結果」と同じになる（途中で他の処理が書き換えたページも含む）
+
+注意:
+- 空のキーは以前は単語境界ごとに挿入されていたが、今は無視するので、比較する辞書には入れない。
+- incremental は一時フォルダに作ったブックと辞書ファイルで行います。
+
+使い方例:
+  python tools/check_dict_replace.py
+  python tools/check_dict_replace.py --cases 20000 trie
+  python tools/check_dict_replace.py --dict config/dict.txt dict_file
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+MODULES_DIR = PROJECT_ROOT / "modules"
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+if str(MODULES_DIR) not in sys.path:
+    sys.path.append(str(MODULES_DIR))
+
+from app.repositories.book_repo import load_book, save_book  # noqa: E402
+from modules.parapara_dict_replacer import (  # noqa: E402
+    DictMatcher,
+    file_replace_with_dict,
+    load_dict_matcher,
+    load_dictionary,
+)
+
+DEFAULT_DICT = PROJECT_ROOT / "config" / "dict.txt"
+
+
+def reference_replace(text: str, dict_cs: Dict[str, str], dict_ci: Dict[str, str]) -> str:
+    """以前の replace_with_dict（正規表現版）。dict_cs / dict_ci はキーの長い順に並んでいること。"""
+    dict_cs = {k: v for k, v in dict_cs.items() if k}
+    dict_ci = {k: v for k, v in dict_ci.items() if k}
+    if dict_cs:
+        pattern_cs = r"(?<![A-Za-z])(?:" + "|".join(map(re.escape, dict_cs.keys())) + r")(?![A-Za-z])"
+        text = re.sub(pattern_cs, lambda m: dict_cs.get(m.group(0), m.group(0)), text)
+    if dict_ci:
+        pattern_ci = r"(?i)(?<![A-Za-z])(?:" + "|".join(map(re.escape, dict_ci.keys())) + r")(?![A-Za-z])"
+        text = re.sub(pattern_ci, lambda m: dict_ci.get(m.group(0).lower(), m.group(0)), text)
+    return text
+
+
+def by_length(entries: Dict[str, str]) -> Dict[str, str]:
+    # 辞書ファイルを読んだときと同じく、キーの長い順に並べる
+    return dict(sorted(entries.items(), key=lambda x: len(x[0]), reverse=True))
+
+
+# ---- ランダムな辞書と文 ----
+
+_WORDS = ["dragon", "Dragon", "dragons", "fire", "Fire Dragon", "sword", "long sword", "Long Sword", "elf", "Elf",
+          "elves", "x", "X", "de", "Ré", "rune", "rune-sword", "+1", "1d6", "HP", "hp", "the", "of the",
+          "ドラゴン", "剣", "Ørn", "ÉPÉE", "épée"]
+_FILLER = [" ", " ", " ", ", ", ". ", "(", ")", "-", "'s", "s", "ed", "\n", "　", "の", "は", "1", "x"]
+
+
+def random_dicts(rng: random.Random, size: int) -> Tuple[Dict[str, str], Dict[str, str]]:
+    dict_cs: Dict[str, str] = {}
+    dict_ci: Dict[str, str] = {}
+    for _ in range(size):
+        key = rng.choice(_WORDS)
+        if rng.random() < 0.3:
+            key = key + rng.choice([" ", "-", ""]) + rng.choice(_WORDS)
+        # 値に別のキーが入ることもある（大文字小文字区別の置換結果に、区別しない置換がかかる）
+        value = rng.choice(["竜", "火竜", "長剣", "エルフ", f"q_{key}_q", rng.choice(_WORDS), "[" + key.upper() + "]"])
+        if rng.random() < 0.5:
+            dict_cs[key] = value
+        else:
+            dict_ci[key.lower()] = value
+    return by_length(dict_cs), by_length(dict_ci)
+
+
+def random_text(rng: random.Random, words: List[str], length: int) -> str:
+    parts = []
+    for _ in range(length):
+        word = rng.choice(words)
+        r = rng.random()
+        if r < 0.15:
+            word = word.upper()
+        elif r < 0.3:
+            word = word.lower()
+        elif r < 0.4:
+            word = word.title()
+        parts.append(word)
+        parts.append(rng.choice(_FILLER))
+    return "".join(parts)
+
+
+# ---- 各チェック ----
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def _compare(matcher: DictMatcher, dict_cs: Dict[str, str], dict_ci: Dict[str, str], text: str, name: str) -> None:
+    actual = matcher.replace(text)
+    expected = reference_replace(text, dict_cs, dict_ci)
+    if actual != expected:
+        raise CheckFailed(
+            f"{name}: 結果が違います\n    text:     {text!r}\n    expected: {expected!r}\n    actual:   {actual!r}"
+            f"\n    dict_cs:  {dict_cs!r}\n    dict_ci:  {dict_ci!r}"
+        )
+
+
+def check_trie(args: argparse.Namespace) -> str:
+    rng = random.Random(args.seed)
+    for case in range(args.cases):
+        dict_cs, dict_ci = random_dicts(rng, rng.randint(0, 12))
+        matcher = DictMatcher(dict_cs, dict_ci)
+        for _ in range(3):
+            _compare(matcher, dict_cs, dict_ci, random_text(rng, _WORDS, rng.randint(0, 25)), f"case {case}")
+    return f"cases={args.cases}"
+
+
+def check_dict_file(args: argparse.Namespace) -> str:
+    path = Path(args.dict).resolve()
+    if not path.is_file():
+        raise CheckFailed(f"辞書ファイルがありません: {path}")
+    with contextlib.redirect_stdout(io.StringIO()):
+        dict_cs, dict_ci = load_dictionary(str(path))
+    matcher = DictMatcher(dict_cs, dict_ci)
+    rng = random.Random(args.seed)
+    keys = list(dict_cs) + list(dict_ci)
+    if not keys:
+        raise CheckFailed(f"辞書が空です: {path}")
+    words = keys + _WORDS
+    texts = [random_text(rng, words, rng.randint(5, 40)) for _ in range(args.texts)]
+    # 以前の実装は1回の置換ごとに正規表現を組み立てていたので、ここでは一度だけ組み立てて使い回す
+    ref_cs = re.compile(r"(?<![A-Za-z])(?:" + "|".join(map(re.escape, [k for k in dict_cs if k])) + r")(?![A-Za-z])") if dict_cs else None
+    ref_ci = re.compile(r"(?i)(?<![A-Za-z])(?:" + "|".join(map(re.escape, [k for k in dict_ci if k])) + r")(?![A-Za-z])") if dict_ci else None
+    start = time.perf_counter()
+    expected = []
+    for text in texts:
+        if ref_cs is not None:
+            text = ref_cs.sub(lambda m: dict_cs.get(m.group(0), m.group(0)), text)
+        if ref_ci is not None:
+            text = ref_ci.sub(lambda m: dict_ci.get(m.group(0).lower(), m.group(0)), text)
+        expected.append(text)
+    regex_sec = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = [matcher.replace(text) for text in texts]
+    trie_sec = time.perf_counter() - start
+    for text, e, a in zip(texts, expected, actual):
+        if e != a:
+            raise CheckFailed(f"結果が違います\n    text:     {text!r}\n    expected: {e!r}\n    actual:   {a!r}")
+    return f"entries={len(keys)} texts={len(texts)} regex={regex_sec * 1000:.0f} ms trie={trie_sec * 1000:.0f} ms"
+
+
+def _make_book(rng: random.Random, pages: int, paragraphs: int) -> Dict[str, Any]:
+    book_pages = {}
+    for page_number in range(1, pages + 1):
+        paras = {}
+        for order in range(1, paragraphs + 1):
+            pid = f"{page_number}_{order}"
+            text = random_text(rng, _WORDS + ["cleric", "castle", "magic", "level"] * 3, rng.randint(1, 20))
+            paras[pid] = {"id": pid, "order": order, "src_text": text, "src_joined": text, "src_replaced": text}
+        book_pages[str(page_number)] = {"paragraphs": paras}
+    return {"version": "2.0.0", "title": "dict check", "pages": book_pages, "styles": {}}
+
+
+def _mutate(rng: random.Random, dict_cs: Dict[str, str], dict_ci: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """キーの追加・削除・値の変更をいくつか行った辞書を返す（英字を含まないキーの変更も混ぜる）。"""
+    dict_cs, dict_ci = dict(dict_cs), dict(dict_ci)
+    for _ in range(rng.randint(1, 4)):
+        target = dict_cs if rng.random() < 0.5 else dict_ci
+        op = rng.random()
+        if op < 0.35 and target:
+            del target[rng.choice(list(target))]
+        elif op < 0.7 and target:
+            target[rng.choice(list(target))] = rng.choice(["竜王", "大剣", "妖精", "q_x_q"])
+        else:
+            key = rng.choice(_WORDS + ["cleric", "castle", "magic level"])
+            target[key if target is dict_cs else key.lower()] = rng.choice(["僧侶", "城", "魔法", "竜"])
+    return by_length(dict_cs), by_length(dict_ci)
+
+
+def _write_dict(path: Path, dict_cs: Dict[str, str], dict_ci: Dict[str, str]) -> None:
+    # 辞書ファイルの形式（キー, 値, 1=大文字小文字を区別 / 0=区別しない）
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for key, value in dict_cs.items():
+            f.write(f"{key}\t{value}\t1\n")
+        for key, value in dict_ci.items():
+            f.write(f"{key}\t{value}\t0\n")
+
+
+def check_incremental(args: argparse.Namespace) -> str:
+    rng = random.Random(args.seed)
+    work = Path(tempfile.mkdtemp(prefix="parapara_check_dict_"))
+    try:
+        json_path = str(work / "book.json")
+        save_book(json_path, _make_book(rng, 12, 15))
+        dict_cs, dict_ci = random_dicts(rng, 8)
+        for step in range(args.steps):
+            if step and rng.random() < 0.3:
+                # 他の処理（join の切り替えなど）が src_joined を書き換えたページ
+                book = load_book(json_path)
+                page = rng.choice(list(book["pages"].values()))
+                for p in page["paragraphs"].values():
+                    p["src_joined"] = random_text(rng, _WORDS, rng.randint(1, 10))
+                save_book(json_path, book)
+            if step:
+                dict_cs, dict_ci = _mutate(rng, dict_cs, dict_ci)
+            # 辞書ファイルは mtime/サイズでキャッシュされるので、回ごとに別のファイルにする
+            dict_path = work / f"dict_{step}.txt"
+            _write_dict(dict_path, dict_cs, dict_ci)
+            with contextlib.redirect_stdout(io.StringIO()):
+                file_replace_with_dict(json_path, str(dict_path))
+                matcher = load_dict_matcher(str(dict_path))
+            for page_key, page in load_book(json_path)["pages"].items():
+                for pid, p in page["paragraphs"].items():
+                    expected = matcher.replace(p["src_joined"])
+                    if p.get("src_replaced") != expected:
+                        raise CheckFailed(
+                            f"step {step}: ページ {page_key} の段落 {pid} が置換し直されていません\n"
+                            f"    src_joined: {p['src_joined']!r}\n    expected:   {expected!r}\n    actual:     {p.get('src_replaced')!r}"
+                        )
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return f"steps={args.steps}"
+
+
+CHECKS: Dict[str, Callable[[argparse.Namespace], str]] = {
+    "trie": check_trie,
+    "dict_file": check_dict_file,
+    "incremental": check_incremental,
+}
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Check dictionary replacement against the original regex implementation.")
+    parser.add_argument("checks", nargs="*", help=f"実行するチェック（{', '.join(CHECKS)}。省略時: すべて）")
+    parser.add_argument("--cases", type=int, default=3000, help="trie: ランダムな辞書の数")
+    parser.add_argument("--dict", default=str(DEFAULT_DICT), help="dict_file: 辞書ファイル")
+    parser.add_argument("--texts", type=int, default=300, help="dict_file: 文の数")
+    parser.add_argument("--steps", type=int, default=30, help="incremental: 辞書を変える回数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    names = args.checks or list(CHECKS)
+    unknown = [name for name in names if name not in CHECKS]
+    if unknown:
+        parser.error(f"不明なチェック: {', '.join(unknown)}")
+
+    failed = 0
+    for name in names:
+        start = time.perf_counter()
+        try:
+            detail = CHECKS[name](args)
+        except CheckFailed as e:
+            failed += 1
+            print(f"NG  {name}: {e}")
+            continue
+        print(f"ok  {name} ({(time.perf_counter() - start) * 1000:.0f} ms) {detail}")
+    print(f"\n{len(names) - failed}/{len(names)} ok")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,390 @@
+"""Check that the faster extraction paths write the same book as the plain sequential extraction.
+
+背景:
+- modules/parapara_pdf2json.py の extract_paragraphs() は、ページ数が多ければプロセスプールでページを分担し
+  （EXTRACT_WORKERS）、ヘッダ/フッタ位置も抽出と同じ get_text の結果から決める（PDFを読むのは1回）。
+  checkpoint_path を渡すと、抽出し終えたページを追記しておき、中断しても続きから再開する。
+- modules/parapara_reextract.py の reextract_pages() は、指定ページだけを抽出し直して訳などを引き継ぐ。
+- 速くした経路も「出力は以前の処理と同じ」ことが前提なので、同じ PDF で結果を比べる。
+
+確かめること:
+- parallel:      workers=N の抽出が workers=1 の抽出と同じブックになる
+                 （N プロセスに分けられるよう、短い PDF は繰り返してページ数を増やした一時 PDF を使う）
+- header_footer: 自動で決めたヘッダ/フッタ位置が header_footer.get_header_y1_footer_y0()（2回読む以前の方法）と同じで、
+                 その位置を明示して抽出したブックとも同じ（逐次と並列の両方。--pdf と、ヘッダ/フッタを書き込んだ一時 PDF で）
+- checkpoint:    途中のページで中断し、同じ checkpoint_path で再開した結果が中断しなかった抽出と同じ
+                 （逐次と並列の両方。終わったらチェックポイントが消えていること）
+- reextract:     訳を付けたブックの一部のページを抽出し直しても、訳を含めてブックが変わらない
+                 （原文を変えた段落だけは引き継がれないこと。結合チェーンの一部の段落だけ原文が変わったら、
+                 ページをまたぐチェーンも含めて src_joined が組み直され、apply_all() をかけ直しても変わらないこと）
+
+注意:
+- 抽出結果は一時フォルダに書く。--pdf の PDF は読むだけ。
+- 並列のワーカーは spawn で起動するので、1回目はプロセスの起動ぶん時間がかかる。
+
+使い方例:
+  python tools/check_extraction.py
+  python tools/check_extraction.py --pdf data/foo/bar.pdf parallel checkpoint
+  python tools/check_extraction.py --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import copy
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+MODULES_DIR = PROJECT_ROOT / "modules"
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+if str(MODULES_DIR) not in sys.path:
+    sys.path.append(str(MODULES_DIR))
+
+import fitz  # noqa: E402  PyMuPDF
+
+from app.repositories.book_repo import load_book  # noqa: E402
+from modules.header_footer import get_header_y1_footer_y0  # noqa: E402
+from modules.parapara_pdf2json import _MIN_PAGES_PER_WORKER, extract_paragraphs  # noqa: E402
+
+DEFAULT_PDF = PROJECT_ROOT / "static" / "pdfjs" / "web" / "compressed.tracemonkey-pldi-09.pdf"
+
+
+class CheckFailed(Exception):
+    pass
+
+
+class _Interrupted(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def _quiet():
+    # 抽出はページごとにログを出すので、チェック中は捨てる
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _extract(pdf_path: str, json_path: str, **kwargs: Any) -> Dict[str, Any]:
+    with _quiet():
+        extract_paragraphs(pdf_path, json_path, **kwargs)
+    return load_book(json_path)
+
+
+def _diff(expected: Any, actual: Any, path: str = "") -> List[str]:
+    """違う箇所のパスを返す（段落の中まで降りて、違うフィールドだけを挙げる）。"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        diffs = []
+        for key in list(expected) + [k for k in actual if k not in expected]:
+            if key not in actual:
+                diffs.append(f"{path}/{key}: 消えました")
+            elif key not in expected:
+                diffs.append(f"{path}/{key}: 増えました")
+            else:
+                diffs.extend(_diff(expected[key], actual[key], f"{path}/{key}"))
+        return diffs
+    if expected != actual:
+        return [f"{path}: {expected!r:.80} -> {actual!r:.80}"]
+    return []
+
+
+def expect_same_book(expected: Dict[str, Any], actual: Dict[str, Any], what: str) -> None:
+    diffs = _diff(expected, actual)
+    if diffs:
+        shown = "\n    ".join(diffs[:10])
+        raise CheckFailed(f"{what}: {len(diffs)} か所違います\n    {shown}")
+
+
+def _paragraph_count(book: Dict[str, Any]) -> int:
+    return sum(len((page or {}).get("paragraphs") or {}) for page in (book.get("pages") or {}).values())
+
+
+def _repeated_pdf(src: str, dest: str, min_pages: int) -> int:
+    """src のページを繰り返して min_pages 以上の PDF を dest に作り、ページ数を返す。"""
+    with fitz.open(src) as doc, fitz.open() as out:
+        while len(out) < min_pages:
+            out.insert_pdf(doc)
+        out.save(dest)
+        return len(out)
+
+
+def _stamped_pdf(src: str, dest: str, min_pages: int) -> int:
+    """_repeated_pdf() の各ページに、ヘッダ（全ページ同じ文字列）とフッタ（ページ番号）を書き込む。"""
+    page_count = _repeated_pdf(src, dest + ".tmp", min_pages)
+    with fitz.open(dest + ".tmp") as doc:
+        for page in doc:
+            rect = page.rect
+            page.insert_text((rect.x0 + 36, rect.y0 + 20), "PARAPARA CHECK RUNNING HEADER", fontsize=8)
+            page.insert_text((rect.x1 / 2, rect.y1 - 14), f"- {page.number + 1} -", fontsize=8)
+        doc.save(dest)
+    os.remove(dest + ".tmp")
+    return page_count
+
+
+# ---- 各チェック ----
+
+
+def check_parallel(args: argparse.Namespace, work: Path) -> str:
+    workers = max(2, args.workers)
+    pdf_path = str(work / "parallel.pdf")
+    page_count = _repeated_pdf(args.pdf, pdf_path, workers * _MIN_PAGES_PER_WORKER)
+    start = time.perf_counter()
+    sequential = _extract(pdf_path, str(work / "sequential.json"), workers=1)
+    sequential_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    parallel = _extract(pdf_path, str(work / "parallel.json"), workers=workers)
+    parallel_ms = (time.perf_counter() - start) * 1000
+    # 出力ファイル名の違いは中身に出ない（src_filename は PDF のパス）
+    expect_same_book(sequential, parallel, f"workers={workers}")
+    return f"pages={page_count} paragraphs={_paragraph_count(parallel)} sequential={sequential_ms:.0f} ms workers={workers}: {parallel_ms:.0f} ms"
+
+
+def check_header_footer(args: argparse.Namespace, work: Path) -> str:
+    workers = max(2, args.workers)
+    stamped = str(work / "stamped.pdf")
+    _stamped_pdf(args.pdf, stamped, workers * _MIN_PAGES_PER_WORKER)
+    details = []
+    for name, pdf_path in (("pdf", args.pdf), ("stamped", stamped)):
+        with _quiet():
+            expected = tuple(get_header_y1_footer_y0(pdf_path))
+        explicit = _extract(pdf_path, str(work / f"{name}_explicit.json"), header_y1=expected[0], footer_y0=expected[1], workers=1)
+        for w in (1, workers):
+            detected = _extract(pdf_path, str(work / f"{name}_{w}.json"), workers=w)
+            actual = (detected.get("header_y1"), detected.get("footer_y0"))
+            if actual != expected:
+                raise CheckFailed(f"{name} workers={w}: ヘッダ/フッタ位置が違います expected={expected} actual={actual}")
+            expect_same_book(explicit, detected, f"{name} workers={w}: 位置を明示した抽出")
+        details.append(f"{name}: header_y1={expected[0]} footer_y0={expected[1]}")
+    return " ".join(details)
+
+
+def _resume(pdf_path: str, json_path: str, checkpoint_path: str, stop_at: int, workers: int) -> Dict[str, Any]:
+    def stop(done: int, total: int) -> None:
+        if done >= stop_at:
+            raise _Interrupted()
+
+    try:
+        _extract(pdf_path, json_path, workers=workers, checkpoint_path=checkpoint_path, progress=stop)
+    except _Interrupted:
+        pass
+    else:
+        raise CheckFailed(f"{stop_at}ページ目で中断できませんでした")
+    if not os.path.exists(checkpoint_path):
+        raise CheckFailed(f"{stop_at}ページ目で中断したのにチェックポイントがありません")
+
+    resumed_from = []
+
+    def note(done: int, total: int) -> None:
+        if not resumed_from:
+            resumed_from.append(done)
+
+    book = _extract(pdf_path, json_path, workers=workers, checkpoint_path=checkpoint_path, progress=note)
+    if resumed_from != [stop_at]:
+        raise CheckFailed(f"{stop_at}ページ目からではなく {resumed_from} から再開しました")
+    if os.path.exists(checkpoint_path):
+        raise CheckFailed("保存が済んだのにチェックポイントが残っています")
+    return book
+
+
+def check_checkpoint(args: argparse.Namespace, work: Path) -> str:
+    workers = max(2, args.workers)
+    pdf_path = str(work / "checkpoint.pdf")
+    page_count = _repeated_pdf(args.pdf, pdf_path, workers * _MIN_PAGES_PER_WORKER)
+    expected = _extract(pdf_path, str(work / "straight.json"), workers=1)
+    runs = 0
+    for stop_at in sorted({1, page_count // 2, page_count - 1}):
+        for w in (1, workers):
+            json_path = str(work / f"resumed_{stop_at}_{w}.json")
+            book = _resume(pdf_path, json_path, json_path + ".extract.jsonl", stop_at, w)
+            expect_same_book(expected, book, f"{stop_at}ページで中断して再開 workers={w}")
+            runs += 1
+    return f"pages={page_count} runs={runs}"
+
+
+def check_reextract(args: argparse.Namespace, work: Path) -> str:
+    # 並列抽出のワーカー（spawn でこのファイルを読み込み直す）が翻訳モジュールまで読まないよう、ここで import する
+    from modules.parapara_reextract import reextract_pages
+    from modules.parapara_trans import recalc_trans_status_counts
+
+    extracted = _extract(args.pdf, str(work / "reextract.json"), workers=1)
+    book = copy.deepcopy(extracted)
+    pages = book.get("pages") or {}
+    if not pages:
+        raise CheckFailed("段落がありません")
+    for page in pages.values():
+        for i, p in enumerate((page.get("paragraphs") or {}).values()):
+            p["trans_text"] = f"訳 {p.get('id')}"
+            p["trans_status"] = ("draft", "fixed", "none")[i % 3]
+            if i % 4 == 0:
+                p["comment"] = "確認"
+    recalc_trans_status_counts(book)
+
+    page_numbers = sorted(int(k) for k in pages)
+    targets = sorted({page_numbers[0], page_numbers[len(page_numbers) // 2], page_numbers[-1]})
+    actual = copy.deepcopy(book)
+    with _quiet():
+        stats = reextract_pages(actual, args.pdf, targets)
+    expect_same_book(book, actual, f"ページ {targets} の再抽出")
+    if stats["dropped"]:
+        raise CheckFailed(f"引き継げなかった段落があります: {stats}")
+
+    # 原文が変わった段落（旧ブック側を書き換えて作る）は引き継がない
+    page = pages[str(targets[0])]
+    pid, p = next(iter(page["paragraphs"].items()))
+    changed = copy.deepcopy(book)
+    changed["pages"][str(targets[0])]["paragraphs"][pid]["src_text"] = (p.get("src_text") or "") + " (edited)"
+    with _quiet():
+        stats = reextract_pages(changed, args.pdf, [targets[0]])
+    fresh = changed["pages"][str(targets[0])]["paragraphs"][pid]
+    if stats["dropped"] != 1:
+        raise CheckFailed(f"原文を変えた段落が引き継がれました: {stats}")
+    expect_same_book(extracted["pages"][str(targets[0])]["paragraphs"][pid], fresh, "原文を変えた段落（抽出したままのはず）")
+    recounted = copy.deepcopy(changed)
+    recalc_trans_status_counts(recounted)
+    if changed.get("trans_status_counts") != recounted.get("trans_status_counts"):
+        raise CheckFailed(f"trans_status_counts が合いません {changed.get('trans_status_counts')} != {recounted.get('trans_status_counts')}")
+    chains = _check_reextract_joins(args, book, extracted)
+    return f"pages={targets} paragraphs={stats['paragraphs']} join_cases={chains}"
+
+
+def _body_paragraphs(book: Dict[str, Any], page_number: int) -> List[Dict[str, Any]]:
+    paragraphs = (book["pages"][str(page_number)].get("paragraphs") or {}).values()
+    return sorted((p for p in paragraphs if p.get("block_tag") == "p"), key=lambda p: int(p.get("order", 0)))
+
+
+def _check_reextract_joins(args: argparse.Namespace, book: Dict[str, Any], extracted: Dict[str, Any]) -> int:
+    """結合チェーンの一部だけ引き継げたときに、src_joined がチェーンとして組み直されるか確かめる。"""
+    from modules.parapara_join_incremental import apply_all
+    from modules.parapara_reextract import reextract_pages
+    from modules.parapara_trans import recalc_trans_status_counts
+
+    page_numbers = sorted(int(k) for k in book["pages"])
+    target = next((n for n in page_numbers[1:] if len(_body_paragraphs(book, n)) >= 3 and _body_paragraphs(book, n - 1)), None)
+    if target is None:
+        raise CheckFailed("結合チェーンを作れるページがありません")
+
+    # 前ページ最後の段落 + target の先頭2段落のチェーン（ページまたぎ）と、target の 3 段落目から始まるチェーンを作る
+    joined = copy.deepcopy(book)
+    prev_last = _body_paragraphs(joined, target - 1)[-1]
+    body = _body_paragraphs(joined, target)
+    body[0]["join"] = 1
+    body[1]["join"] = 1
+    if len(body) >= 4:
+        body[3]["join"] = 1
+    apply_all(joined)
+    for p in (prev_last, body[2]):
+        p["trans_auto"] = f"自動訳 {p.get('id')}"
+        p["trans_status"] = "fixed"
+    recalc_trans_status_counts(joined)
+
+    def reextract(edit: Callable[[Dict[str, Any]], None], what: str) -> Dict[str, Any]:
+        actual = copy.deepcopy(joined)
+        edit(actual)
+        with _quiet():
+            stats = reextract_pages(actual, args.pdf, [target])
+        # 組み直したあとのブックは、全体に apply_all() をかけても変わらないはず
+        rejoined = copy.deepcopy(actual)
+        apply_all(rejoined)
+        expect_same_book(rejoined, actual, f"{what}: 結合チェーン")
+        recounted = copy.deepcopy(actual)
+        recalc_trans_status_counts(recounted)
+        if actual.get("trans_status_counts") != recounted.get("trans_status_counts"):
+            raise CheckFailed(f"{what}: trans_status_counts が合いません")
+        return {"book": actual, "stats": stats}
+
+    def paragraph(book_data: Dict[str, Any], p: Dict[str, Any]) -> Dict[str, Any]:
+        return book_data["pages"][str(p["page_number"])]["paragraphs"][p["id"]]
+
+    def edit_src(p: Dict[str, Any]) -> Callable[[Dict[str, Any]], None]:
+        def edit(book_data: Dict[str, Any]) -> None:
+            paragraph(book_data, p)["src_text"] = (p.get("src_text") or "") + " (edited)"
+        return edit
+
+    # 1. チェーンがそのまま引き継げるなら何も変わらない
+    result = reextract(lambda _: None, "そのまま")
+    expect_same_book(joined, result["book"], "チェーンごと引き継げる再抽出")
+    if result["stats"]["rejoined"] or result["stats"]["joined_pages"]:
+        raise CheckFailed(f"組み直す必要のないチェーンを組み直しました: {result['stats']}")
+
+    # 2. 後続（target の 2 段落目）の原文が変わった: 前ページの先頭段落のチェーンから外れる
+    result = reextract(edit_src(body[1]), "後続の原文が変わった")
+    lead = paragraph(result["book"], prev_last)
+    expected_joined = (prev_last.get("src_text") or "") + (body[0].get("src_text") or "")
+    if lead.get("src_joined") != expected_joined or lead.get("trans_status") != "none":
+        raise CheckFailed(f"前ページの先頭段落が組み直されていません: {lead.get('src_joined')!r} ({lead.get('trans_status')})")
+    if result["stats"]["joined_pages"] != [target - 1]:
+        raise CheckFailed(f"書き換わった前ページが stats にありません: {result['stats']}")
+    fresh = paragraph(result["book"], body[1])
+    if fresh.get("join") or fresh.get("src_joined") != fresh.get("src_text"):
+        raise CheckFailed("原文が変わった段落がチェーンに残っています")
+
+    # 3. 先頭（target の 3 段落目）の原文が変わった: 後続は新しい先頭へつながり、古い自動訳は残さない
+    result = reextract(edit_src(body[2]), "先頭の原文が変わった")
+    lead = paragraph(result["book"], body[2])
+    parts = [lead.get("src_text") or ""] + ([body[3].get("src_text") or ""] if len(body) >= 4 else [])
+    if lead.get("src_joined") != "".join(parts):
+        raise CheckFailed(f"新しい先頭段落に後続がつながっていません: {lead.get('src_joined')!r}")
+    if lead.get("trans_auto") != extracted["pages"][str(target)]["paragraphs"][body[2]["id"]].get("trans_auto"):
+        raise CheckFailed("原文が変わった先頭段落に古い自動訳が残っています")
+    if result["stats"]["rejoined"] != 1:
+        raise CheckFailed(f"組み直したチェーンの数が違います: {result['stats']}")
+    return 3
+
+
+CHECKS: Dict[str, Callable[[argparse.Namespace, Path], str]] = {
+    "parallel": check_parallel,
+    "header_footer": check_header_footer,
+    "checkpoint": check_checkpoint,
+    "reextract": check_reextract,
+}
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Check faster extraction paths against the sequential extraction.")
+    parser.add_argument("checks", nargs="*", help=f"実行するチェック（{', '.join(CHECKS)}。省略時: すべて）")
+    parser.add_argument("--pdf", default=str(DEFAULT_PDF), help="使う PDF（読むだけ）")
+    parser.add_argument("--workers", type=int, default=2, help="parallel / header_footer / checkpoint: 並列抽出のプロセス数")
+    parser.add_argument("--keep", action="store_true", help="作業用の一時フォルダを残す")
+    args = parser.parse_args(argv)
+
+    names = args.checks or list(CHECKS)
+    unknown = [name for name in names if name not in CHECKS]
+    if unknown:
+        parser.error(f"不明なチェック: {', '.join(unknown)}")
+    args.pdf = str(Path(args.pdf).resolve())
+    if not os.path.isfile(args.pdf):
+        parser.error(f"PDF がありません: {args.pdf}")
+
+    work_dir = tempfile.mkdtemp(prefix="parapara_check_extraction_")
+    failed = 0
+    try:
+        for name in names:
+            work = Path(work_dir) / name
+            work.mkdir()
+            start = time.perf_counter()
+            try:
+                detail = CHECKS[name](args, work)
+            except CheckFailed as e:
+                failed += 1
+                print(f"NG  {name}: {e}")
+                continue
+            print(f"ok  {name} ({(time.perf_counter() - start) * 1000:.0f} ms) {detail}")
+    finally:
+        if args.keep:
+            print(f"作業フォルダ: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"\n{len(names) - failed}/{len(names)} ok")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,287 @@
+"""Check that the /api/search index returns the same results as the original full scan.
+
+背景:
+- modules/parapara_search.py の BookSearchIndex は、ページごとに正規化済みのテキストを連結して持ち、
+  クエリの語を str.find で探してから、ヒットした段落だけを従来の規則で判定する。
+  SearchIndexStore は段落の保存時に、変更のあった段落だけを索引し直す（apply_patches）。
+- 以前は検索のたびに全段落を正規化して判定していた（下の reference_search）。
+
+確かめること:
+- search:      ランダムなブック（英語・ひらがな・カタカナ・全角・HTML タグ・文字参照）とクエリで、
+               結果（件数の上限・並び順・スニペットを含む）が全件走査と同じ
+- incremental: 段落を編集して apply_patches() で索引を更新したあとも、編集後のブックの全件走査と同じ
+               （索引を作り直さずに差分だけで更新できていること）
+
+注意:
+- 判定の規則（_find_hit_field）と語の分け方（_parse_terms。正規化で空になる語は条件にしない）は
+  modules/parapara_search.py のものを使う。比べるのは索引による候補探しと結果の組み立て。
+- --book を渡すと、そのブック（読むだけ）とその本文から作ったクエリでも search を確かめる。
+
+使い方例:
+  python tools/check_search_index.py
+  python tools/check_search_index.py --queries 5000 search
+  python tools/check_search_index.py --book data/foo/bar.json search
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+MODULES_DIR = PROJECT_ROOT / "modules"
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+if str(MODULES_DIR) not in sys.path:
+    sys.path.append(str(MODULES_DIR))
+
+from app.repositories.book_journal import paragraph_patch  # noqa: E402
+from app.repositories.book_repo import load_book  # noqa: E402
+from modules.parapara_search import (  # noqa: E402
+    BookSearchIndex,
+    SearchIndexStore,
+    _clamp_limit,
+    _find_hit_field,
+    _make_snippet,
+    _parse_terms,
+    _to_hiragana,
+    _to_katakana,
+)
+
+
+def reference_search(book_data: Dict[str, Any], query: str, *, limit: int = 200) -> List[Dict[str, Any]]:
+    """以前の search_paragraphs_in_book（全段落を走査する版）。"""
+    terms = _parse_terms(query)
+    if not terms:
+        return []
+    limit = _clamp_limit(limit)
+    results: List[Dict[str, Any]] = []
+    for page_key, page in (book_data.get("pages", {}) or {}).items():
+        for pid, p in ((page or {}).get("paragraphs", {}) or {}).items():
+            if not isinstance(p, dict):
+                continue
+            hit_field, hit_value = _find_hit_field(p, terms)
+            if not hit_field:
+                continue
+            try:
+                page_number = int(p.get("page_number") or page_key)
+            except Exception:
+                page_number = None
+            try:
+                order = int(p.get("order") or 0)
+            except Exception:
+                order = 0
+            try:
+                column_order = int(p.get("column_order") or 0)
+            except Exception:
+                column_order = 0
+            try:
+                y0 = float((p.get("bbox") or [0, 0])[1] or 0)
+            except Exception:
+                y0 = 0.0
+            results.append(
+                {
+                    "page_number": page_number,
+                    "id": str(p.get("id") or pid),
+                    "snippet": _make_snippet(hit_value),
+                    "_sort": (page_number or 0, order, column_order, y0),
+                }
+            )
+            if len(results) >= limit:
+                break
+        if len(results) >= limit:
+            break
+    results.sort(key=lambda r: r.get("_sort") or (0, 0, 0, 0))
+    for r in results:
+        r.pop("_sort", None)
+    return results
+
+
+# ---- ランダムなブックとクエリ ----
+
+_PIECES = [
+    "Dragon", "dragon", "DRAGON", "ｄｒａｇｏｎ", "sword", "Sword of Fire", "elf", "エルフ", "えるふ", "ドラゴン", "どらごん",
+    "ｶﾀｶﾅ", "カタカナ", "かたかな", "剣", "炎の剣", "魔法", "レベル", "1d6", "１２３", "HP", "&amp;", "&lt;b&gt;", "<b>", "</b>",
+    "<span class=\"F1\">", "</span>", "<br>", " ", " ", " ", "\n", "、", "。", "・", "ヴ", "ゔ", "ｳﾞ", "ー", "Ⅳ", "ﬁre",
+]
+
+
+def _random_value(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(_PIECES) for _ in range(length))
+
+
+def make_book(rng: random.Random, pages: int, paragraphs: int) -> Dict[str, Any]:
+    book_pages: Dict[str, Any] = {}
+    for page_number in range(1, pages + 1):
+        paras: Dict[str, Any] = {}
+        for order in range(1, paragraphs + 1):
+            pid = f"{page_number}_{order}"
+            p: Dict[str, Any] = {
+                "id": pid,
+                "page_number": page_number,
+                # 並び順の同点や、order と段落IDの並びが食い違う場合も混ぜる
+                "order": rng.choice([order, order, rng.randint(0, paragraphs)]),
+                "column_order": rng.randint(0, 3),
+                "bbox": [0, rng.choice([0, 10.5, 100, 100]), 100, 200],
+            }
+            for field in ("src_text", "src_joined", "trans_auto", "trans_text"):
+                if rng.random() < 0.8:
+                    p[field] = _random_value(rng, rng.randint(0, 12))
+            paras[pid] = p
+        book_pages[str(page_number)] = {"paragraphs": paras}
+    return {"version": "2.0.0", "title": "search check", "pages": book_pages}
+
+
+def _texts(book_data: Dict[str, Any]) -> List[str]:
+    return [
+        str(p[field])
+        for page in (book_data.get("pages") or {}).values()
+        for p in ((page or {}).get("paragraphs") or {}).values()
+        if isinstance(p, dict)
+        for field in ("src_text", "src_joined", "trans_auto", "trans_text")
+        if p.get(field)
+    ]
+
+
+def make_query(rng: random.Random, texts: List[str]) -> str:
+    terms = []
+    for _ in range(rng.choice([1, 1, 1, 2, 2, 3])):
+        r = rng.random()
+        if r < 0.1 or not texts:
+            term = _random_value(rng, rng.randint(1, 2))
+        elif r < 0.15:
+            term = rng.choice(["zzz", "<b>", "&amp;", "ぬ"])
+        else:
+            text = rng.choice(texts)
+            start = rng.randrange(len(text))
+            term = text[start : start + rng.randint(1, 8)]
+        # 表記ゆれ（かな・大文字小文字）でもヒットする
+        term = rng.choice([term, term, _to_hiragana(term), _to_katakana(term), term.upper(), term.lower()])
+        terms.append(term)
+    return rng.choice([" ", "  ", "　", "\t"]).join(terms)
+
+
+# ---- 各チェック ----
+
+
+class CheckFailed(Exception):
+    pass
+
+
+def _compare(index: BookSearchIndex, book_data: Dict[str, Any], query: str, limit: int, name: str) -> int:
+    actual = index.search(query, limit=limit)
+    expected = reference_search(book_data, query, limit=limit)
+    if actual != expected:
+        raise CheckFailed(
+            f"{name}: 結果が違います query={query!r} limit={limit}\n"
+            f"    expected({len(expected)}): {expected[:5]!r}\n    actual({len(actual)}):   {actual[:5]!r}"
+        )
+    return len(actual)
+
+
+def _queries_on(book_data: Dict[str, Any], rng: random.Random, count: int, name: str) -> int:
+    start = time.perf_counter()
+    index = BookSearchIndex(book_data)
+    build = time.perf_counter() - start
+    texts = _texts(book_data)
+    hits = 0
+    for i in range(count):
+        limit = rng.choice([1, 3, 20, 200, 2000])
+        hits += _compare(index, book_data, make_query(rng, texts), limit, f"{name} query {i}")
+    print(f"    {name}: queries={count} hits={hits} build={build * 1000:.0f} ms")
+    return hits
+
+
+def check_search(args: argparse.Namespace) -> str:
+    rng = random.Random(args.seed)
+    _queries_on(make_book(rng, 20, 30), rng, args.queries, "generated")
+    if args.book:
+        _queries_on(load_book(str(Path(args.book).resolve())), rng, args.queries, Path(args.book).name)
+    return f"queries={args.queries}"
+
+
+def check_incremental(args: argparse.Namespace) -> str:
+    rng = random.Random(args.seed + 1)
+    book = make_book(rng, 10, 20)
+    store = SearchIndexStore(max_books=1)
+    json_path = "check_search_index.json"  # ファイルは作らない（索引のキーとしてだけ使う）
+    signature = [0]
+
+    def fail_load() -> Dict[str, Any]:
+        raise CheckFailed("差分で更新したはずの索引が作り直されました")
+
+    # 最初の検索で索引を作る
+    store.search(json_path, "dragon", signature=signature[0], load=lambda: copy.deepcopy(book))
+    fields = ("src_text", "src_joined", "trans_auto", "trans_text")
+    for step in range(args.steps):
+        patches = []
+        for _ in range(rng.randint(1, 5)):
+            page_key = rng.choice(list(book["pages"]))
+            pid = rng.choice(list(book["pages"][page_key]["paragraphs"]))
+            p = book["pages"][page_key]["paragraphs"][pid]
+            for field in fields:
+                if rng.random() < 0.5:
+                    p[field] = _random_value(rng, rng.randint(0, 8))
+                elif rng.random() < 0.2:
+                    p.pop(field, None)
+            patches.append(paragraph_patch(page_key, pid, p, fields))
+        before, signature[0] = signature[0], signature[0] + 1
+        store.apply_patches(json_path, book, patches, before=before, after=signature[0])
+        texts = _texts(book)
+        for i in range(5):
+            query = make_query(rng, texts)
+            limit = rng.choice([3, 200, 2000])
+            actual = store.search(json_path, query, limit=limit, signature=signature[0], load=fail_load)
+            expected = reference_search(book, query, limit=limit)
+            if actual != expected:
+                raise CheckFailed(
+                    f"step {step}: 結果が違います query={query!r} limit={limit}\n"
+                    f"    expected({len(expected)}): {expected[:5]!r}\n    actual({len(actual)}):   {actual[:5]!r}"
+                )
+    stats = store.stats()
+    if stats["builds"] != 1:
+        raise CheckFailed(f"索引が作り直されました: {stats}")
+    return f"steps={args.steps} stats={stats}"
+
+
+CHECKS: Dict[str, Callable[[argparse.Namespace], str]] = {
+    "search": check_search,
+    "incremental": check_incremental,
+}
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Check the /api/search index against a full scan.")
+    parser.add_argument("checks", nargs="*", help=f"実行するチェック（{', '.join(CHECKS)}。省略時: すべて）")
+    parser.add_argument("--queries", type=int, default=500, help="search: クエリの数")
+    parser.add_argument("--steps", type=int, default=200, help="incremental: 編集の回数")
+    parser.add_argument("--book", default=None, help="search: このブックでも確かめる（読むだけ）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    names = args.checks or list(CHECKS)
+    unknown = [name for name in names if name not in CHECKS]
+    if unknown:
+        parser.error(f"不明なチェック: {', '.join(unknown)}")
+
+    failed = 0
+    for name in names:
+        start = time.perf_counter()
+        try:
+            detail = CHECKS[name](args)
+        except CheckFailed as e:
+            failed += 1
+            print(f"NG  {name}: {e}")
+            continue
+        print(f"ok  {name} ({(time.perf_counter() - start) * 1000:.0f} ms) {detail}")
+    print(f"\n{len(names) - failed}/{len(names)} ok")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -4,6 +4,8 @@ import sys
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 MODULES_DIR = os.path.join(PROJECT_ROOT, "modules")
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
 if MODULES_DIR not in sys.path:
     sys.path.append(MODULES_DIR)
 